@@ -0,0 +1,296 @@
+"""Benchmarks for the editor core and the hot Qt paths
+
+	python bench.py                        run everything and print the results
+	python bench.py --json out.json        also save them
+	python bench.py --compare base.json    exit 1 when something got slower than the baseline
+
+Every number is a cost (lower is better), so one tolerance works for all of them.
+Runs without a display: Qt is started on the offscreen platform.
+"""
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from core import *
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+	"""Register a benchmark, it returns {metric: (value, unit)}"""
+	BENCHMARKS[func.__name__.removeprefix("bench_")] = func
+	return func
+
+
+def per_op(func, repeat):
+	"""Average microseconds per call"""
+	t = time.perf_counter()
+	for _ in range(repeat):
+		func()
+	return (time.perf_counter() - t) * 1e6 / repeat
+
+
+def sample_source(lines, seed=0):
+	"""Python-looking text with enough variety that the line caches don't hide the lexer"""
+	rng = random.Random(seed)
+	out = []
+	for i in range(lines):
+		indent = "    " * rng.randrange(4)
+		kind = i % 5
+		if kind == 0:
+			out.append(f"{indent}def func_{i}(arg, key='k{i}'):")
+		elif kind == 1:
+			out.append(f"{indent}value_{i} = compute({i}, 0x{rng.randrange(1 << 16):x}) # note {i}")
+		elif kind == 2:
+			out.append(f"{indent}if value_{i} > {rng.random():.4f}: return \"text {i}\"")
+		elif kind == 3:
+			out.append(f"{indent}for item in range({i}): total += item * {i}")
+		else:
+			out.append("")
+	return "\n".join(out) + "\n"
+
+
+_app = None
+
+def qt_app():
+	global _app
+	if _app is None:
+		from PySide6.QtWidgets import QApplication
+		_app = QApplication.instance() or QApplication(sys.argv[:1])
+	return _app
+
+
+@benchmark
+def bench_piece_table(args):
+	lines, edits = args.lines, args.edits
+	text = sample_source(lines)
+	rng = random.Random(1)
+	table = PieceTable(text)
+	offsets = iter([rng.randrange(len(text)) for _ in range(edits)])
+	insert = per_op(lambda: table.insert(next(offsets), "x"), edits)
+	end = len(table)
+	def type_char():
+		nonlocal end
+		table.insert(end, "y")
+		end += 1
+	typing = per_op(type_char, edits)
+	offsets = iter([rng.randrange(len(table) - 2) for _ in range(edits)])
+	delete = per_op(lambda: table.delete(next(offsets), 2), edits)
+	targets = iter([rng.randrange(table.line_count()) for _ in range(edits)])
+	line_start = per_op(lambda: table.line_start(next(targets)), edits)
+	snapshot = per_op(table.snapshot, 100)
+	return {
+		"insert": (insert, "us"),
+		"typing": (typing, "us"),
+		"delete": (delete, "us"),
+		"line_start": (line_start, "us"),
+		"snapshot": (snapshot, "us"),
+	}
+
+
+@benchmark
+def bench_tokenize(args):
+	lines = sample_source(args.lines // 50).splitlines()
+	tokenize_line.cache_clear()
+	t = time.perf_counter()
+	for line in lines:
+		tokenize_line(line.lstrip())
+	cold = (time.perf_counter() - t) * 1e6 / len(lines)
+	return {"line": (cold, "us")}
+
+
+@benchmark
+def bench_find(args):
+	doc = Document(sample_source(args.lines))
+	engine = FindEngine(doc)
+	megabytes = len(doc) / 1e6
+	engine.find("warm")
+	rng = random.Random(2)
+	needles = [f"value_{rng.randrange(args.lines)} =" for _ in range(200)]
+	def scan(case_sensitive):
+		t = time.perf_counter()
+		for needle in needles:
+			engine.find(needle, rng.randrange(len(doc)), case_sensitive)
+		return (time.perf_counter() - t) * 1e3 / len(needles)
+	sensitive = scan(True)
+	insensitive = scan(False)
+	t = time.perf_counter()
+	engine.count("total", True)
+	count = (time.perf_counter() - t) * 1e3 / megabytes
+	# The first search after an edit pays for rebuilding the text
+	doc.apply(0, 0, "x")
+	t = time.perf_counter()
+	engine.find("needle that is not there")
+	after_edit = (time.perf_counter() - t) * 1e3
+	return {
+		"find": (sensitive, "ms"),
+		"find_ignore_case": (insensitive, "ms"),
+		"count_per_mb": (count, "ms"),
+		"first_find_after_edit": (after_edit, "ms"),
+	}
+
+
+def _editor(text=""):
+	qt_app()
+	from snakeide import CodeEditor
+	from highlighter import PythonHighlighter
+	editor = CodeEditor()
+	editor.highlighter = PythonHighlighter(editor.document())
+	if text:
+		editor.setPlainText(text)
+	return editor
+
+
+@benchmark
+def bench_keystroke(args):
+	"""Typing one character, through the document mirror and the highlighter"""
+	from PySide6.QtGui import QTextCursor
+	editor = _editor(sample_source(args.lines // 100))
+	rng = random.Random(3)
+	blocks = editor.document().blockCount()
+	samples = []
+	for _ in range(args.keystrokes):
+		cursor = QTextCursor(editor.document().findBlockByNumber(rng.randrange(blocks)))
+		cursor.movePosition(QTextCursor.EndOfBlock)
+		t = time.perf_counter()
+		cursor.insertText(rng.choice("abc(:'0 "))
+		samples.append((time.perf_counter() - t) * 1e3)
+	samples.sort()
+	return {
+		"p50": (statistics.median(samples), "ms"),
+		"p99": (samples[int(len(samples) * 0.99) - 1], "ms"),
+	}
+
+
+@benchmark
+def bench_multi_cursor(args):
+	"""Typing at a caret on each of 10k lines, a column of a CSV file"""
+	from PySide6.QtCore import Qt
+	from PySide6.QtTest import QTest
+	editor = _editor("".join(f"{i},name{i},{i * 3}\n" for i in range(10_000)))
+	editor.highlighter.add_view(editor)
+	editor.resize(800, 600)
+	editor.set_cursors(CursorSet.box(editor.buffer, 0, 0, 9_999, 0, 4))
+	samples = []
+	for ch in "abcdefgh":
+		t = time.perf_counter()
+		QTest.keyClick(editor, ch)
+		samples.append((time.perf_counter() - t) * 1e3)
+	t = time.perf_counter()
+	QTest.keyClick(editor, Qt.Key_Right, Qt.ControlModifier)
+	move = (time.perf_counter() - t) * 1e3
+	return {
+		"keystroke": (statistics.median(samples), "ms"),
+		"word_right": (move, "ms"),
+	}
+
+
+@benchmark
+def bench_convert_indentation(args):
+	"""Spaces to tabs over a whole file and back, each one undo step"""
+	editor = _editor(sample_source(args.lines // 10))
+	editor.highlighter.add_view(editor)
+	editor.resize(800, 600)
+	qt_app().processEvents()
+	t = time.perf_counter()
+	editor.convert_indentation(4, True)
+	to_tabs = (time.perf_counter() - t) * 1e3
+	t = time.perf_counter()
+	editor.convert_indentation(4, False)
+	to_spaces = (time.perf_counter() - t) * 1e3
+	return {"to_tabs": (to_tabs, "ms"), "to_spaces": (to_spaces, "ms")}
+
+
+@benchmark
+def bench_file_open(args):
+	"""Reading a file into a new highlighted editor"""
+	qt_app()
+	with tempfile.TemporaryDirectory() as folder:
+		path = os.path.join(folder, "big.py")
+		with open(path, 'w', encoding='utf-8') as f:
+			f.write(sample_source(args.lines // 200, seed=4))
+		tokenize_line.cache_clear()
+		t = time.perf_counter()
+		with open(path, 'r', encoding='utf-8') as f:
+			text = f.read()
+		_editor(text)
+		elapsed = (time.perf_counter() - t) * 1e3
+	return {"open": (elapsed, "ms")}
+
+
+@benchmark
+def bench_console(args):
+	"""Appending process output the way BuildThread.handle_stdout does"""
+	qt_app()
+	from snakeide import ConsoleStream
+	from PySide6.QtWidgets import QTextBrowser
+	console = QTextBrowser()
+	stream = ConsoleStream(console)
+	chunk = "".join(f"[{i:06d}] some program output, value={i * 7}\n" for i in range(50)).encode()
+	chunks = args.lines // 250
+	t = time.perf_counter()
+	for _ in range(chunks):
+		stream.write(chunk)
+		stream.flush()
+	append = (time.perf_counter() - t) * 1e6 / (chunks * 50)
+	# Coloured output through the parser alone, an escape every few words
+	colored = "".join(
+		f"\x1b[32m[{i:06d}]\x1b[0m some program \x1b[1moutput\x1b[0m, value={i * 7}\n" for i in range(args.lines // 50)
+	).encode()
+	parser = AnsiStreamParser()
+	t = time.perf_counter()
+	for start in range(0, len(colored), 1 << 16):
+		parser.feed(colored[start:start + (1 << 16)])
+	parse = (time.perf_counter() - t) * 1e3 / (len(colored) / 1e6)
+	return {"append_per_line": (append, "us"), "ansi_parse_per_mb": (parse, "ms")}
+
+
+def compare(results, baseline, tolerance):
+	"""Names of metrics that are more than `tolerance` slower than the baseline"""
+	regressions = []
+	for name, (value, unit) in results.items():
+		if name in baseline and value > baseline[name][0] * (1 + tolerance):
+			regressions.append(f"{name}: {value:.2f} {unit} (baseline {baseline[name][0]:.2f} {unit})")
+	return regressions
+
+
+def main(argv):
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("names", nargs="*", help=f"benchmarks to run ({', '.join(BENCHMARKS)})")
+	# The piece table and find run at the full size, a million lines being the target for
+	# them; the editor benchmarks take a slice, Qt paths that big would take minutes
+	parser.add_argument("--lines", type=int, default=1_000_000, help="size of the generated source")
+	parser.add_argument("--edits", type=int, default=10_000)
+	parser.add_argument("--keystrokes", type=int, default=500)
+	parser.add_argument("--json", help="write the results to this file")
+	parser.add_argument("--compare", help="baseline written by --json")
+	parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+	args = parser.parse_args(argv[1:])
+
+	results = {}
+	for name in args.names or BENCHMARKS:
+		for metric, (value, unit) in BENCHMARKS[name](args).items():
+			results[f"{name}.{metric}"] = (value, unit)
+			print(f"  {name + '.' + metric:<36}{value:12.2f} {unit}")
+
+	if args.json:
+		with open(args.json, 'w') as f:
+			json.dump(results, f, indent=4)
+	if args.compare:
+		with open(args.compare, 'r') as f:
+			regressions = compare(results, json.load(f), args.tolerance)
+		for line in regressions:
+			print(f"SLOWER {line}")
+		return 1 if regressions else 0
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
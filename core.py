@@ -0,0 +1,3273 @@
+import ast
+import base64
+import codecs
+import builtins
+import hashlib
+import json
+import keyword
+import os
+import shlex
+import shutil
+import signal
+import struct
+import sys
+import threading
+import re
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, defaultdict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache, wraps
+from itertools import accumulate
+
+
+class StartupProfiler:
+	"""Records how long each startup phase took, for --profile-startup"""
+	def __init__(self, t0=None):
+		self.t0 = time.perf_counter() if t0 is None else t0
+		self.last = self.t0
+		self.phases = []
+
+	def mark(self, name):
+		"""Close the phase that started at the previous mark"""
+		now = time.perf_counter()
+		self.phases.append((name, (now - self.last) * 1000))
+		self.last = now
+
+	def elapsed_ms(self, until=None):
+		"""Milliseconds from t0 up to the end of phase `until` (or the last mark)"""
+		total = 0.0
+		for name, ms in self.phases:
+			total += ms
+			if name == until:
+				break
+		return total
+
+	def report(self, budget_ms=None, until=None):
+		lines = ["Snake IDE startup profile:"]
+		for name, ms in self.phases:
+			lines.append(f"  {name:<24}{ms:8.1f} ms")
+		cold = self.elapsed_ms(until)
+		label = f"to {until}" if until else "total"
+		lines.append(f"  {label:<24}{cold:8.1f} ms")
+		if budget_ms is not None:
+			verdict = "OK" if cold <= budget_ms else "OVER BUDGET"
+			lines.append(f"  budget{'':<18}{budget_ms:8.1f} ms  {verdict}")
+		return "\n".join(lines)
+
+
+class _Span:
+	__slots__ = ("tracer", "name", "start")
+
+	def __init__(self, tracer, name):
+		self.tracer = tracer
+		self.name = name
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+
+	def __exit__(self, *exc):
+		self.tracer.record(self.name, self.start, time.perf_counter())
+
+
+class Tracer:
+	"""Timing spans around the hot paths, for the performance HUD and Chrome trace export
+
+	Off unless SNAKEIDE_TRACE is set (or --trace is passed) before startup. When off,
+	`traced` hands the function back untouched and `span` is a shared nullcontext,
+	so instrumented code runs exactly as it would without it.
+	"""
+	def __init__(self, enabled=False, capacity=200_000, window=1000):
+		self.enabled = enabled
+		self.t0 = time.perf_counter()
+		self.events = deque(maxlen=capacity)  # (name, start s, duration s, thread id)
+		self.counters = deque(maxlen=capacity)  # (name, time s, value)
+		self._recent = defaultdict(lambda: deque(maxlen=window))
+		self._counts = defaultdict(int)
+		self._null = nullcontext()
+
+	def record(self, name, start, end):
+		self.events.append((name, start, end - start, threading.get_ident()))
+		self._recent[name].append(end - start)
+		self._counts[name] += 1
+
+	def counter(self, name, value):
+		"""A sampled value (like event-loop lag in ms), shown as a counter track in the trace"""
+		if self.enabled:
+			self.counters.append((name, time.perf_counter(), value))
+			self._recent[name].append(value / 1000)
+			self._counts[name] += 1
+
+	def span(self, name):
+		return _Span(self, name) if self.enabled else self._null
+
+	def traced(self, name=None):
+		"""Decorator timing every call of the function, a no-op when tracing is off"""
+		def decorate(func):
+			if not self.enabled:
+				return func
+			label = name or func.__qualname__
+			record = self.record
+			clock = time.perf_counter
+
+			@wraps(func)
+			def wrapper(*args, **kwargs):
+				start = clock()
+				try:
+					return func(*args, **kwargs)
+				finally:
+					record(label, start, clock())
+			return wrapper
+		return decorate
+
+	def stats(self):
+		"""{name: (calls, p50 ms, p99 ms)} over the most recent samples of each span"""
+		stats = {}
+		for name, recent in list(self._recent.items()):
+			samples = sorted(recent)
+			if samples:
+				stats[name] = (
+					self._counts[name],
+					samples[len(samples) // 2] * 1000,
+					samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+				)
+		return stats
+
+	def reset(self):
+		self.events.clear()
+		self.counters.clear()
+		self._recent.clear()
+		self._counts.clear()
+
+	def export_chrome_trace(self, path):
+		"""Write the spans in Chrome's trace event format (chrome://tracing, Perfetto)"""
+		pid = os.getpid()
+		t0 = self.t0
+		events = [
+			{"name": name, "ph": "X", "pid": pid, "tid": tid,
+			 "ts": (start - t0) * 1e6, "dur": duration * 1e6}
+			for name, start, duration, tid in list(self.events)
+		]
+		events += [
+			{"name": name, "ph": "C", "pid": pid, "ts": (at - t0) * 1e6, "args": {name: value}}
+			for name, at, value in list(self.counters)
+		]
+		with open(path, 'w') as f:
+			json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+		return len(events)
+
+
+tracer = Tracer(os.environ.get("SNAKEIDE_TRACE", "") not in ("", "0"))
+traced = tracer.traced
+
+
+# Hidden from the project tree on top of whatever .gitignore says
+DEFAULT_EXCLUDE_GLOBS = [
+	".git", "__pycache__", "*.pyc", ".venv", "venv", "node_modules",
+	".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox"
+]
+
+
+def _glob_to_regex(pattern):
+	"""Translate one gitignore glob (without !, leading or trailing /) into a regex body"""
+	out = []
+	i, n = 0, len(pattern)
+	while i < n:
+		if pattern.startswith("**/", i):
+			out.append("(?:.*/)?")
+			i += 3
+		elif pattern.startswith("/**", i) and i + 3 == n:
+			out.append("(?:/.*)?")
+			i += 3
+		elif pattern.startswith("**", i):
+			out.append(".*")
+			i += 2
+		elif pattern[i] == "*":
+			out.append("[^/]*")
+			i += 1
+		elif pattern[i] == "?":
+			out.append("[^/]")
+			i += 1
+		elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+			end = pattern.index("]", i + 1)
+			body = pattern[i + 1:end].replace("\\", "\\\\")
+			if body.startswith("!"):
+				body = "^" + body[1:]
+			out.append(f"[{body}]")
+			i = end + 1
+		else:
+			out.append(re.escape(pattern[i]))
+			i += 1
+	return "".join(out)
+
+
+class IgnoreRules:
+	"""gitignore-style exclusion rules, each pattern relative to the directory it came from"""
+	def __init__(self, rules=()):
+		self.rules = list(rules)  # (regex, negated, dirs_only, base)
+		self._children = {}
+
+	@classmethod
+	def from_globs(cls, globs, base):
+		rules = cls()
+		rules.add_patterns(globs, base)
+		return rules
+
+	def add_patterns(self, lines, base):
+		base = os.path.normpath(base)
+		for line in lines:
+			line = line.rstrip("\n").rstrip()
+			if not line or line.startswith("#"):
+				continue
+			negated = line.startswith("!")
+			if negated:
+				line = line[1:]
+			dirs_only = line.endswith("/")
+			line = line.rstrip("/")
+			if not line:
+				continue
+			anchored = "/" in line
+			body = _glob_to_regex(line.lstrip("/"))
+			regex = re.compile(("^" if anchored else "^(?:.*/)?") + body + "$")
+			self.rules.append((regex, negated, dirs_only, base))
+
+	def for_directory(self, directory):
+		"""Rules that apply inside `directory`, adding its own .gitignore if it has one
+
+		Called on the rules of the folder above `directory`, so the .gitignore files of
+		every folder on the way down keep applying.
+		"""
+		rules = self._children.get(directory)
+		if rules is None:
+			rules = self
+			gitignore = os.path.join(directory, ".gitignore")
+			if os.path.isfile(gitignore):
+				rules = IgnoreRules(self.rules)
+				try:
+					with open(gitignore, 'r', encoding='utf-8', errors='replace') as f:
+						rules.add_patterns(f, directory)
+				except OSError:
+					pass
+			self._children[directory] = rules
+		return rules
+
+	def matcher(self, directory):
+		"""Returns ignored(name, is_dir) for entries directly inside `directory`"""
+		active = []
+		for regex, negated, dirs_only, base in self.rules:
+			rel = os.path.relpath(directory, base)
+			if rel.startswith(".."):
+				continue
+			prefix = "" if rel == "." else rel.replace(os.sep, "/") + "/"
+			active.append((regex.match, negated, dirs_only, prefix))
+
+		def ignored(name, is_dir):
+			result = False
+			for match, negated, dirs_only, prefix in active:
+				if (is_dir or not dirs_only) and match(prefix + name):
+					result = not negated
+			return result
+		return ignored
+
+
+def scan_directory(path, rules):
+	"""(name, is_dir) entries of `path` that `rules` keep, folders first then by name"""
+	ignored = rules.matcher(path)
+	entries = []
+	with os.scandir(path) as it:
+		for entry in it:
+			try:
+				# Uses the d_type from readdir, no stat per entry
+				is_dir = entry.is_dir()
+			except OSError:
+				is_dir = False
+			if not ignored(entry.name, is_dir):
+				entries.append((entry.name, is_dir))
+	entries.sort(key=lambda entry: (not entry[1], entry[0].lower()))
+	return entries
+
+
+def reindent_line(text, tab_size, to_tabs):
+	"""New leading whitespace for one line as (old_indent_length, new_indent), or None if it stays"""
+	stripped = len(text) - len(text.lstrip(" \t"))
+	if not stripped:
+		return None
+	indent = text[:stripped]
+	if to_tabs:
+		if " " * tab_size not in indent:
+			return None
+	elif "\t" not in indent:
+		return None
+	width = 0
+	for ch in indent:
+		width = width + tab_size - width % tab_size if ch == "\t" else width + 1
+	if to_tabs:
+		new_indent = "\t" * (width // tab_size) + " " * (width % tab_size)
+	else:
+		new_indent = " " * width
+	if new_indent == indent:
+		return None
+	return stripped, new_indent
+
+
+def reindent_edits(buffer, first, last, tab_size, to_tabs):
+	"""(start, end, new indent) for each of lines first..last whose indentation changes"""
+	edits = []
+	start = buffer.line_start(first)
+	for _, text in zip(range(first, last + 1), buffer.lines(first)):
+		new_indent = reindent_line(text, tab_size, to_tabs)
+		if new_indent is not None:
+			edits.append((start, start + new_indent[0], new_indent[1]))
+		start += len(text) + 1
+	return edits
+
+
+def _newline_offsets(text):
+	"""Offsets of every '\\n' in `text`, as a compact int array"""
+	parts = text.split("\n")
+	return array('q', accumulate(map((1).__add__, map(len, parts[:-1])), initial=-1))[1:]
+
+
+# Characters outside the BMP: one code point in Python, two UTF-16 units in a QTextDocument
+_ASTRAL = re.compile("[\U00010000-\U0010ffff]")
+
+def _astral_offsets(text, base=0):
+	if text.isascii():
+		return []
+	return [base + match.start() for match in _ASTRAL.finditer(text)]
+
+
+class _PieceBlock:
+	"""A run of consecutive pieces as parallel lists, with local prefix sums"""
+	__slots__ = ("bufs", "bstarts", "lens", "counts", "starts", "nl_before")
+
+	def __init__(self, pieces=()):
+		self.bufs = [piece[0] for piece in pieces]
+		self.bstarts = [piece[1] for piece in pieces]
+		self.lens = [piece[2] for piece in pieces]
+		self.counts = [piece[3] for piece in pieces]
+		self.reindex()
+
+	def reindex(self, i=0):
+		"""Redo the prefix sums from piece i on, one more entry than pieces: the last is the block total"""
+		if i:
+			self.starts[i:] = accumulate(self.lens[i:], initial=self.starts[i])
+			self.nl_before[i:] = accumulate(self.counts[i:], initial=self.nl_before[i])
+		else:
+			self.starts = list(accumulate(self.lens, initial=0))
+			self.nl_before = list(accumulate(self.counts, initial=0))
+
+	def pieces(self, i=0, j=None):
+		return list(zip(self.bufs[i:j], self.bstarts[i:j], self.lens[i:j], self.counts[i:j]))
+
+	def copy(self):
+		copy = _PieceBlock.__new__(_PieceBlock)
+		for name in _PieceBlock.__slots__:
+			setattr(copy, name, list(getattr(self, name)))
+		return copy
+
+
+class PieceTable:
+	"""Editable text kept as pieces of immutable buffers, so edits never copy the document
+
+	Every inserted string becomes a buffer of its own (typing is appended to the last one)
+	and the document is the sequence of (buffer, start, length, newlines) pieces. Pieces
+	are grouped in blocks of at most 2 * BLOCK, each with its own prefix sums, under one
+	prefix-sum array over the blocks. Offset and line lookups are two bisects plus a
+	bisect in the buffer's newline table, and an edit only re-sums one block and the
+	block totals.
+	"""
+	BLOCK = 128
+	APPEND_LIMIT = 4096  # typing keeps extending the last buffer while it is smaller than this
+
+	def __init__(self, text=""):
+		self.reset(text)
+
+	def reset(self, text=""):
+		self._buffers = []
+		self._newlines = []
+		self._length = len(text)
+		pieces = [self._piece(self._add_buffer(text), 0, len(text))] if text else []
+		self._blocks = [_PieceBlock(pieces)]
+		self._owned = {id(self._blocks[0])}
+		self._block_starts = [0, self._length]
+		self._block_nl = [0, pieces[0][3] if pieces else 0]
+		self._dirty = None
+
+	def __len__(self):
+		return self._length
+
+	def _add_buffer(self, text):
+		self._buffers.append(text)
+		self._newlines.append(_newline_offsets(text))
+		return len(self._buffers) - 1
+
+	def _piece(self, buf, start, length):
+		newlines = self._newlines[buf]
+		count = bisect_left(newlines, start + length) - bisect_left(newlines, start)
+		return (buf, start, length, count)
+
+	def _index(self):
+		"""Bring the block prefix sums up to date from the first edited block"""
+		b = self._dirty
+		if b is None:
+			return
+		blocks = self._blocks[b:]
+		self._block_starts[b:] = accumulate((block.starts[-1] for block in blocks), initial=self._block_starts[b])
+		self._block_nl[b:] = accumulate((block.nl_before[-1] for block in blocks), initial=self._block_nl[b])
+		self._dirty = None
+
+	def _locate(self, offset):
+		"""(block, piece, offset inside the piece) for a document offset"""
+		self._index()
+		b = min(max(bisect_right(self._block_starts, offset) - 1, 0), len(self._blocks) - 1)
+		block = self._blocks[b]
+		local = offset - self._block_starts[b]
+		i = min(max(bisect_right(block.starts, local) - 1, 0), max(len(block.lens) - 1, 0))
+		return b, i, local - block.starts[i]
+
+	def _replace(self, b, i, j, pieces):
+		"""Replace pieces i..j of block b, splitting or dropping the block as needed"""
+		block = self._blocks[b]
+		if id(block) not in self._owned:
+			# Shared with a snapshot: copy on first write
+			block = self._blocks[b] = block.copy()
+			self._owned.add(id(block))
+		block.bufs[i:j] = [piece[0] for piece in pieces]
+		block.bstarts[i:j] = [piece[1] for piece in pieces]
+		block.lens[i:j] = [piece[2] for piece in pieces]
+		block.counts[i:j] = [piece[3] for piece in pieces]
+		if len(block.lens) > 2 * self.BLOCK:
+			all_pieces = block.pieces()
+			split = [_PieceBlock(all_pieces[k:k + self.BLOCK]) for k in range(0, len(all_pieces), self.BLOCK)]
+			self._blocks[b:b + 1] = split
+			self._owned.discard(id(block))
+			self._owned.update(map(id, split))
+			self._block_starts[b + 1:b + 1] = [0] * (len(self._blocks) - len(self._block_starts) + 1)
+			self._block_nl[b + 1:b + 1] = [0] * (len(self._blocks) - len(self._block_nl) + 1)
+		elif not block.lens and len(self._blocks) > 1:
+			del self._blocks[b]
+			self._owned.discard(id(block))
+			del self._block_starts[b + 1]
+			del self._block_nl[b + 1]
+		else:
+			block.reindex(i)
+		self._dirty = b if self._dirty is None else min(self._dirty, b)
+
+	def insert(self, offset, text):
+		if not text:
+			return
+		if not 0 <= offset <= self._length:
+			raise IndexError(f"offset {offset} out of range")
+		b, i, inner = self._locate(offset)
+		if inner == 0 and (i or b):
+			# Offset sits between two pieces: look at the one ending here so typing coalesces
+			if not i:
+				b -= 1
+			block = self._blocks[b]
+			i = (i or len(block.lens)) - 1
+			inner = block.lens[i]
+		block = self._blocks[b]
+		if not block.lens:
+			self._replace(b, 0, 0, [self._piece(self._add_buffer(text), 0, len(text))])
+			self._length += len(text)
+			return
+		buf, start, length = block.bufs[i], block.bstarts[i], block.lens[i]
+		if inner == length and self._extend_last_buffer(buf, start + length, text):
+			self._replace(b, i, i + 1, [self._piece(buf, start, length + len(text))])
+			self._length += len(text)
+			return
+		new = self._piece(self._add_buffer(text), 0, len(text))
+		if inner == 0:
+			self._replace(b, i, i, [new])
+		elif inner == length:
+			self._replace(b, i + 1, i + 1, [new])
+		else:
+			self._replace(b, i, i + 1, [
+				self._piece(buf, start, inner), new, self._piece(buf, start + inner, length - inner)
+			])
+		self._length += len(text)
+
+	def _extend_last_buffer(self, buf, end, text):
+		"""Append typed text to the newest buffer when the piece ends right at its tail"""
+		if buf != len(self._buffers) - 1 or buf == 0 or end != len(self._buffers[buf]):
+			return False
+		if end >= self.APPEND_LIMIT:
+			return False
+		# Rebinding (not mutating) keeps snapshots that share the buffer list valid
+		self._buffers[buf] = self._buffers[buf] + text
+		self._newlines[buf] = self._newlines[buf] + array('q', (end + n for n in _newline_offsets(text)))
+		return True
+
+	def delete(self, offset, length):
+		end = min(offset + length, self._length)
+		if offset < 0 or offset >= end:
+			return
+		self._length -= end - offset
+		while offset < end:
+			# One block per pass, `offset` stays put while the text after it moves up
+			b, i, inner = self._locate(offset)
+			block = self._blocks[b]
+			pos = offset - inner
+			j = i
+			kept = []
+			while j < len(block.lens) and pos < end:
+				buf, start, plen = block.bufs[j], block.bstarts[j], block.lens[j]
+				pend = pos + plen
+				if pos < offset:
+					kept.append(self._piece(buf, start, offset - pos))
+				if pend > end:
+					kept.append(self._piece(buf, start + end - pos, pend - end))
+				pos = pend
+				j += 1
+			end -= min(pos, end) - offset
+			self._replace(b, i, j, kept)
+
+	def replace(self, offset, removed, text):
+		self.delete(offset, removed)
+		self.insert(offset, text)
+
+	def compact(self):
+		"""Flatten everything back into a single buffer"""
+		self.reset(self.text())
+
+	def snapshot(self):
+		"""Copy that shares everything: buffers are only ever appended to, blocks are copied on write"""
+		self._index()
+		copy = PieceTable.__new__(PieceTable)
+		copy.__dict__.update(self.__dict__)
+		copy._blocks = list(self._blocks)
+		copy._owned = set()
+		self._owned = set()
+		copy._block_starts = list(self._block_starts)
+		copy._block_nl = list(self._block_nl)
+		return copy
+
+	def line_count(self):
+		self._index()
+		return self._block_nl[-1] + 1
+
+	def line_start(self, line):
+		"""Offset of the first character of `line` (0-based)"""
+		if line <= 0:
+			return 0
+		if line >= self.line_count():
+			raise IndexError(f"line {line} out of range")
+		# The block, then the piece holding the line-th newline, then that newline in its buffer
+		b = bisect_left(self._block_nl, line) - 1
+		block = self._blocks[b]
+		local = line - self._block_nl[b]
+		i = bisect_left(block.nl_before, local) - 1
+		start = block.bstarts[i]
+		newlines = self._newlines[block.bufs[i]]
+		nl = newlines[bisect_left(newlines, start) + local - block.nl_before[i] - 1]
+		return self._block_starts[b] + block.starts[i] + nl - start + 1
+
+	def line_of(self, offset):
+		"""Line number (0-based) holding `offset`"""
+		b, i, inner = self._locate(min(max(offset, 0), self._length))
+		block = self._blocks[b]
+		if not block.lens:
+			return 0
+		start = block.bstarts[i]
+		newlines = self._newlines[block.bufs[i]]
+		return (self._block_nl[b] + block.nl_before[i]
+			+ bisect_left(newlines, start + inner) - bisect_left(newlines, start))
+
+	def chunks(self, start=0, end=None):
+		"""Yield the text between `start` and `end` piece by piece, never as one string"""
+		end = self._length if end is None else min(end, self._length)
+		if start >= end:
+			return
+		b, i, inner = self._locate(start)
+		pos = start
+		buffers = self._buffers
+		for block in self._blocks[b:]:
+			for buf, bstart, length in zip(block.bufs[i:], block.bstarts[i:], block.lens[i:]):
+				take = min(length - inner, end - pos)
+				text = buffers[buf]
+				if inner == 0 and take == len(text):
+					yield text
+				else:
+					yield text[bstart + inner:bstart + inner + take]
+				pos += take
+				inner = 0
+				if pos >= end:
+					return
+			i = 0
+
+	def text(self, start=0, end=None):
+		return "".join(self.chunks(start, end))
+
+	def line(self, line):
+		start = self.line_start(line)
+		end = self.line_start(line + 1) - 1 if line + 1 < self.line_count() else self._length
+		return self.text(start, end)
+
+	def lines(self, first=0):
+		"""Yield lines (without their newline) from `first` to the end"""
+		pending = []
+		for chunk in self.chunks(self.line_start(first)):
+			parts = chunk.split("\n")
+			if len(parts) == 1:
+				pending.append(chunk)
+				continue
+			pending.append(parts[0])
+			yield "".join(pending)
+			yield from parts[1:-1]
+			pending = [parts[-1]]
+		yield "".join(pending)
+
+	def write_to(self, f):
+		"""Stream the text to a file object"""
+		for chunk in self.chunks():
+			f.write(chunk)
+
+	def matches(self, text):
+		"""Compare with a string without building the document text"""
+		if len(text) != self._length:
+			return False
+		pos = 0
+		for chunk in self.chunks():
+			if text[pos:pos + len(chunk)] != chunk:
+				return False
+			pos += len(chunk)
+		return True
+
+
+
+class Breakpoint:
+	"""Settings of one breakpoint, the line it sits on is kept by its BreakpointSet"""
+	__slots__ = ("condition", "ignore", "hits")
+
+	def __init__(self, condition="", ignore=0, hits=0):
+		self.condition = condition  # only stop when this expression is true
+		self.ignore = ignore  # pass this many times before the first stop
+		self.hits = hits  # stops in the current debug session
+
+	def describe(self, line):
+		parts = [f"Breakpoint on line {line + 1}"]
+		if self.condition:
+			parts.append(f"when {self.condition}")
+		if self.ignore:
+			parts.append(f"after {self.ignore} passes")
+		parts.append(f"hit {self.hits}x")
+		return ", ".join(parts)
+
+
+class BreakpointSet:
+	"""Sorted breakpoint lines (0-based) that follow the text as lines are added and removed
+
+	Lines and their Breakpoint settings are parallel sorted lists, so membership and the
+	visible range are bisects and an edit only touches the breakpoints below it.
+	"""
+	def __init__(self, lines=()):
+		self._lines = sorted(set(lines))
+		self._data = [Breakpoint() for _ in self._lines]
+
+	def __contains__(self, line):
+		i = bisect_left(self._lines, line)
+		return i < len(self._lines) and self._lines[i] == line
+
+	def __iter__(self):
+		return iter(self._lines)
+
+	def __len__(self):
+		return len(self._lines)
+
+	def get(self, line):
+		i = bisect_left(self._lines, line)
+		if i < len(self._lines) and self._lines[i] == line:
+			return self._data[i]
+		return None
+
+	def add(self, line, condition="", ignore=0):
+		i = bisect_left(self._lines, line)
+		if i == len(self._lines) or self._lines[i] != line:
+			self._lines.insert(i, line)
+			self._data.insert(i, Breakpoint(condition, ignore))
+		return self._data[i]
+
+	def remove(self, line):
+		i = bisect_left(self._lines, line)
+		if i < len(self._lines) and self._lines[i] == line:
+			del self._lines[i]
+			del self._data[i]
+
+	def toggle(self, line):
+		if line in self:
+			self.remove(line)
+		else:
+			self.add(line)
+
+	def clear(self):
+		self._lines.clear()
+		self._data.clear()
+
+	def lines(self):
+		return list(self._lines)
+
+	def items(self, first=0, last=None):
+		"""(line, Breakpoint) pairs with first <= line <= last"""
+		lo = bisect_left(self._lines, first)
+		hi = len(self._lines) if last is None else bisect_right(self._lines, last)
+		return list(zip(self._lines[lo:hi], self._data[lo:hi]))
+
+	def reset_hits(self):
+		for breakpoint in self._data:
+			breakpoint.hits = 0
+
+	def lines_changed(self, after, removed, added):
+		"""Lines after+1 .. after+removed were replaced by `added` new ones
+
+		The replaced lines that are still there keep their breakpoints, those on lines that
+		went away go with them.
+		"""
+		if removed == added:
+			return
+		lo = bisect_right(self._lines, after + min(removed, added))
+		hi = bisect_right(self._lines, after + removed)
+		shift = added - removed
+		self._lines[lo:] = [line + shift for line in self._lines[hi:]]
+		del self._data[lo:hi]
+
+	def to_config(self):
+		return [
+			{"line": line, "condition": bp.condition, "ignore": bp.ignore}
+			for line, bp in zip(self._lines, self._data)
+		]
+
+	def load_config(self, entries):
+		self.clear()
+		for entry in entries:
+			self.add(entry.get("line", 0), entry.get("condition", ""), entry.get("ignore", 0))
+
+
+# Triple quotes first so ''' isn't read as an empty string and a quote
+_FOLD_TOKEN = re.compile(r"'''|\"\"\"|'(?:\\.|[^'\\])*'|\"(?:\\.|[^\"\\])*\"|#|[\[\](){}]")
+_TRIPLE_QUOTES = (None, "'''", '"""')
+_FOLD_MAX_DEPTH = 80  # states are stored in a bytearray
+
+
+def fold_state(text, state=0):
+	"""Scanner state at the end of `text` given the one at its start
+
+	A state is bracket depth * 3 + the open triple quote (0 none, 1 ''', 2 \"\"\"), which
+	is all folding needs to tell a new statement from a continuation line.
+	"""
+	depth, quote = divmod(state, 3)
+	pos = 0
+	if quote:
+		pos = text.find(_TRIPLE_QUOTES[quote])
+		if pos < 0:
+			return state
+		pos += 3
+	while True:
+		m = _FOLD_TOKEN.search(text, pos)
+		if m is None:
+			break
+		token = m.group()
+		pos = m.end()
+		if token == "#":
+			break
+		if token in _TRIPLE_QUOTES:
+			end = text.find(token, pos)
+			if end < 0:
+				return min(depth, _FOLD_MAX_DEPTH) * 3 + _TRIPLE_QUOTES.index(token)
+			pos = end + 3
+		elif token in OPEN_BRACKETS:
+			depth += 1
+		elif token in CLOSE_BRACKETS:
+			depth = max(0, depth - 1)
+	return min(depth, _FOLD_MAX_DEPTH) * 3
+
+
+class FoldRegions:
+	"""Foldable line ranges of Python source, derived from indentation and kept up to date by edits
+
+	Regions are (start, end) line pairs in parallel lists sorted by start. They nest, so the
+	lists are an implicit interval tree: a region's children follow it and end before it does.
+	An edit only shifts the regions below it and marks its lines; `refresh` then rescans the
+	top-level statements around them. The scanner state at the start of every line is kept
+	so continuation lines (open brackets, docstrings) never start or end a region.
+	"""
+	def __init__(self):
+		self._starts = []
+		self._ends = []
+		self._states = bytearray(1)
+		self._folded = []  # sorted starts of the collapsed regions
+		self._dirty = (0, 0)  # (first, last) lines to rescan, or None
+		self._resume = None  # (line, scanner state) where a budgeted refresh stopped
+		self.version = 0  # bumped whenever the regions change
+
+	def __len__(self):
+		return len(self._starts)
+
+	def reset(self, line_count):
+		self._starts, self._ends = [], []
+		self._states = bytearray(line_count)
+		self._folded = []
+		self._dirty = (0, line_count - 1)
+		self._resume = None
+		self.version += 1
+
+	def region(self, start):
+		"""End line of the region starting at `start`, or None"""
+		i = bisect_left(self._starts, start)
+		if i < len(self._starts) and self._starts[i] == start:
+			return self._ends[i]
+		return None
+
+	def regions(self, first=0, last=None):
+		"""(start, end) of the regions starting in first..last"""
+		lo = bisect_left(self._starts, first)
+		hi = len(self._starts) if last is None else bisect_right(self._starts, last)
+		return list(zip(self._starts[lo:hi], self._ends[lo:hi]))
+
+	def enclosing(self, line):
+		"""Innermost region starting at or containing `line`, or None"""
+		i = bisect_right(self._starts, line) - 1
+		while i >= 0:
+			if self._ends[i] >= line:
+				return self._starts[i], self._ends[i]
+			i -= 1
+		return None
+
+	def is_folded(self, start):
+		i = bisect_left(self._folded, start)
+		return i < len(self._folded) and self._folded[i] == start
+
+	def has_folded(self):
+		return bool(self._folded)
+
+	def folded(self):
+		"""(start, end) of the collapsed regions"""
+		return [(start, self.region(start)) for start in self._folded]
+
+	def fold(self, start):
+		if self.region(start) is not None and not self.is_folded(start):
+			insort(self._folded, start)
+
+	def unfold(self, start):
+		i = bisect_left(self._folded, start)
+		if i < len(self._folded) and self._folded[i] == start:
+			del self._folded[i]
+
+	def fold_all(self):
+		self._folded = list(self._starts)
+
+	def unfold_all(self):
+		self._folded = []
+
+	def hidden(self, first=0, last=None):
+		"""Merged (first, last) line ranges hidden by collapsed regions, clipped to first..last"""
+		spans = []
+		for start in self._folded:
+			end = self.region(start)
+			lo, hi = start + 1, end
+			if last is not None and lo > last:
+				break
+			if hi < first:
+				continue
+			if spans and lo <= spans[-1][1] + 1:
+				spans[-1] = (spans[-1][0], max(spans[-1][1], hi))
+			else:
+				spans.append((lo, hi))
+		return [(max(lo, first), hi if last is None else min(hi, last)) for lo, hi in spans]
+
+	def revealing(self, line):
+		"""Starts of the collapsed regions that hide `line`"""
+		return [start for start in self._folded if start < line <= self.region(start)]
+
+	def next_visible(self, line):
+		"""First line after `line` that isn't inside a collapsed region"""
+		line += 1
+		for start in self._folded[bisect_left(self._folded, line - 1):]:
+			if start >= line:
+				break
+			line = max(line, self.region(start) + 1)
+		return line
+
+	def skip_visible(self, line, count):
+		"""The line `count` visible lines below `line`"""
+		i = bisect_left(self._folded, line)
+		folded, region = self._folded, self.region
+		while count > 0:
+			if i < len(folded) and folded[i] < line + count:
+				count -= folded[i] - line + 1
+				line = max(line, region(folded[i])) + 1
+				i = bisect_left(folded, line, i)
+			else:
+				line += count
+				count = 0
+		return line
+
+	def lines_changed(self, line, removed, added):
+		"""Lines line..line+removed were replaced by line..line+added"""
+		delta = added - removed
+		if self._resume is not None and line <= self._resume[0]:
+			# The text above where the last refresh stopped changed, it backs up again
+			self._resume = None
+		if delta:
+			cut = line + removed
+			self._states[line + 1:cut + 1] = bytes(added)
+			# Regions around the edit start in the statement `refresh` rescans, so only the
+			# ones below need to move
+			lo = bisect_right(self._starts, line)
+			hi = bisect_right(self._starts, cut)
+			self._starts[lo:] = [start + delta for start in self._starts[hi:]]
+			self._ends[lo:] = [end + delta for end in self._ends[hi:]]
+			lo = bisect_right(self._folded, line)
+			hi = bisect_right(self._folded, cut)
+			self._folded[lo:] = [start + delta for start in self._folded[hi:]]
+			self.version += 1
+		if self._dirty is None:
+			self._dirty = (line, line + added)
+		else:
+			first, last = self._dirty
+			if last > line + removed:
+				last += delta
+			self._dirty = (min(first, line), max(last, line + added))
+
+	@property
+	def pending(self):
+		return self._dirty is not None
+
+	def _statement_start(self, buffer, line):
+		"""Nearest line at or above `line` that starts a top-level statement"""
+		while line > 0:
+			if self._states[line] == 0:
+				text = buffer.line(line)
+				if text and text[0] not in " \t#":
+					break
+			line -= 1
+		return line
+
+	def refresh(self, buffer, budget=None):
+		"""Rescan what edits touched, returns the (first, last) lines rescanned or None
+
+		With a `budget` the scan stops at the first top-level statement after that many
+		lines and leaves the rest for the next call (see `pending`), which carries on from
+		there, so a long bracketed statement is never rescanned over and over.
+		"""
+		if self._dirty is None:
+			return None
+		first, last = self._dirty
+		resume, self._resume = self._resume, None
+		self._dirty = None
+		count = buffer.line_count()
+		if len(self._states) != count:
+			# Out of step with the text, start over
+			self.reset(count)
+			first, last = 0, count - 1
+			self._dirty = None
+		states = self._states
+		first = max(0, min(first, count - 1))
+		last = min(last, count - 1)
+
+		if resume is not None and resume[0] == first:
+			# Where the budget ran out last time, everything above is done
+			start, state = resume
+		else:
+			# Back up to the top-level statement the edit is part of, or the one before when
+			# a region of that still reaches in (the edit may have just made this line top-level)
+			start, state = self._statement_start(buffer, first), 0
+			if start > 0:
+				previous = self._statement_start(buffer, start - 1)
+				lo = bisect_left(self._starts, previous)
+				hi = bisect_left(self._starts, start)
+				if lo < hi and max(self._ends[lo:hi]) >= start:
+					start = previous
+
+		starts, ends = [], []
+		stack = []  # (start, indent) of the open regions
+		last_code = start
+		stop = count
+		for n, text in enumerate(buffer.lines(start), start):
+			code = text.lstrip(" \t")
+			if state == 0 and code and code[0] != "#":
+				indent = len(text) - len(code)
+				if indent == 0 and n > start:
+					if n > last and states[n] == 0:
+						# Same state as before the edit, everything from here on is unchanged
+						stop = n
+						break
+					if budget is not None and n - start >= budget:
+						# No region is open at a top-level statement, its state is all the next
+						# call needs. Stored too, a stale one would send _statement_start back
+						# to the same start
+						stop = n
+						states[n] = state
+						self._resume = (n, state)
+						self._dirty = (n, last)
+						break
+				while stack and stack[-1][1] >= indent:
+					opened = stack.pop()[0]
+					if last_code > opened:
+						starts.append(opened)
+						ends.append(last_code)
+				stack.append((n, indent))
+				last_code = n
+			elif code and (state or not stack or len(text) - len(code) > stack[-1][1]):
+				last_code = n
+			states[n] = state
+			if state or code:
+				state = fold_state(code, state)
+		for opened, _ in stack:
+			if last_code > opened:
+				starts.append(opened)
+				ends.append(last_code)
+
+		order = sorted(range(len(starts)), key=starts.__getitem__)
+		lo = bisect_left(self._starts, start)
+		hi = bisect_left(self._starts, stop)
+		self._starts[lo:hi] = [starts[i] for i in order]
+		self._ends[lo:hi] = [ends[i] for i in order]
+		lo = bisect_left(self._folded, start)
+		hi = bisect_left(self._folded, stop)
+		self._folded[lo:hi] = [line for line in self._folded[lo:hi] if self.region(line) is not None]
+		self.version += 1
+		return start, stop - 1
+
+
+_CELL_MARKER = re.compile(r"^[ \t]*#[ \t]*%%", re.M)
+
+
+class CellMarkers:
+	"""Lines holding a `# %%` cell marker, kept sorted and in step with edits
+
+	An edit only rescans the lines it touched; the whole text is read once, on reset.
+	"""
+	def __init__(self):
+		self.lines = []
+
+	def __len__(self):
+		return len(self.lines)
+
+	@staticmethod
+	def _scan(text, first=0):
+		lines, line, pos = [], first, 0
+		for m in _CELL_MARKER.finditer(text):
+			line += text.count("\n", pos, m.start())
+			pos = m.start()
+			lines.append(line)
+		return lines
+
+	def reset(self, buffer):
+		self.lines = self._scan(buffer.text())
+
+	def lines_changed(self, buffer, line, removed, added):
+		"""After `removed` lines below `line` were replaced by `added`, rescan just those"""
+		lo = bisect_left(self.lines, line)
+		hi = bisect_right(self.lines, line + removed)
+		shift = added - removed
+		end = line + added + 1
+		text = buffer.text(buffer.line_start(line), buffer.line_start(end) if end < buffer.line_count() else None)
+		self.lines[lo:] = self._scan(text, line) + [marker + shift for marker in self.lines[hi:]]
+
+	def is_marker(self, line):
+		i = bisect_left(self.lines, line)
+		return i < len(self.lines) and self.lines[i] == line
+
+	def cell(self, line, line_count):
+		"""(first, last) lines of the cell holding `line`, the whole text when there are no markers"""
+		i = bisect_right(self.lines, line)
+		first = self.lines[i - 1] if i else 0
+		last = self.lines[i] - 1 if i < len(self.lines) else line_count - 1
+		return first, last
+
+
+class Document:
+	"""The text of one file and its line bookkeeping, with no widget attached
+
+	CodeEditor feeds it every contentsChange; the headless benchmarks drive it directly.
+	`version` goes up on every edit so caches built from the text know when to drop.
+	"""
+	def __init__(self, text="", path=None):
+		self.path = path
+		self.buffer = PieceTable(text)
+		self.breakpoints = BreakpointSet()
+		self.folds = FoldRegions()
+		self.folds.reset(self.buffer.line_count())
+		self.cells = CellMarkers()
+		self.cells.reset(self.buffer)
+		self.version = 0
+		# Offsets of the astral characters, where Qt's UTF-16 positions and ours part ways
+		self._astral = _astral_offsets(text)
+
+	@classmethod
+	def load(cls, path):
+		with open(path, 'r', encoding='utf-8') as f:
+			return cls(f.read(), path)
+
+	def __len__(self):
+		return len(self.buffer)
+
+	def text(self, start=0, end=None):
+		return self.buffer.text(start, end)
+
+	def reset(self, text):
+		self.buffer.reset(text)
+		self.folds.reset(self.buffer.line_count())
+		self.cells.reset(self.buffer)
+		self._astral = _astral_offsets(text)
+		self.version += 1
+
+	def utf16_length(self):
+		return len(self.buffer) + len(self._astral)
+
+	def to_utf16(self, offset):
+		"""The QTextCursor position of a text offset"""
+		return offset + bisect_left(self._astral, offset) if self._astral else offset
+
+	def from_utf16(self, position):
+		"""The text offset of a QTextCursor position, one inside a surrogate pair maps to its character"""
+		astral = self._astral
+		lo, hi = 0, len(astral)
+		while lo < hi:
+			mid = (lo + hi) // 2
+			# The mid'th astral character starts at UTF-16 position astral[mid] + mid
+			if astral[mid] + mid < position:
+				lo = mid + 1
+			else:
+				hi = mid
+		return position - lo
+
+	def _move_astral(self, position, removed, text):
+		astral = self._astral
+		added = _astral_offsets(text, position)
+		if not astral and not added:
+			return
+		i = bisect_left(astral, position)
+		j = bisect_left(astral, position + removed, i)
+		delta = len(text) - removed
+		astral[i:] = added + [offset + delta for offset in astral[j:]]
+
+	def apply(self, position, removed, text):
+		"""Replace `removed` characters at `position` with `text`"""
+		buffer = self.buffer
+		if position == 0 and removed and removed >= len(buffer):
+			# Loading or reloading the whole file keeps breakpoints where they were
+			buffer.reset(text)
+			self.breakpoints.lines_changed(buffer.line_count() - 1, len(self.breakpoints) and max(self.breakpoints), 0)
+			self.folds.reset(buffer.line_count())
+			self.cells.reset(buffer)
+			self._astral = _astral_offsets(text)
+			self.version += 1
+			return
+		old = buffer.text(position, position + removed) if removed else ""
+		line = buffer.line_of(position)
+		after = self._breakpoints_after(line, position, old, text)
+		buffer.replace(position, removed, text)
+		self._move_astral(position, removed, text)
+		lines_removed, lines_added = old.count("\n"), text.count("\n")
+		self.breakpoints.lines_changed(after, lines_removed, lines_added)
+		self.folds.lines_changed(line, lines_removed, lines_added)
+		self.cells.lines_changed(buffer, line, lines_removed, lines_added)
+		self.version += 1
+
+	def _breakpoints_after(self, line, position, old, text):
+		# A whole-line edit at column 0 moves the breakpoints of that line with it
+		if ((not old or old.endswith("\n")) and (not text or text.endswith("\n"))
+				and position == self.buffer.line_start(line)):
+			return line - 1
+		return line
+
+	def apply_edits(self, edits):
+		"""Make sorted, non-overlapping [(start, end, text)] edits as one change
+
+		The buffer gets a single replace of the span they cover, like the one contentsChange
+		a multi-cursor keystroke sends. Breakpoints and folds still move edit by edit, back to
+		front, so a newline typed at every caret shifts each of them by the right amount.
+		"""
+		if len(edits) == 1:
+			start, end, text = edits[0]
+			self.apply(start, end - start, text)
+			return
+		buffer = self.buffer
+		first, last = edits[0][0], edits[-1][1]
+		old = buffer.text(first, last)
+		parts, pos, moves = [], first, []
+		for start, end, text in edits:
+			parts.append(old[pos - first:start - first])
+			parts.append(text)
+			pos = end
+			removed = old[start - first:end - first]
+			if "\n" in removed or "\n" in text:
+				line = buffer.line_of(start)
+				moves.append((line, self._breakpoints_after(line, start, removed, text),
+					removed.count("\n"), text.count("\n")))
+		line = buffer.line_of(first)
+		old_lines = old.count("\n")
+		text = "".join(parts)
+		buffer.replace(first, last - first, text)
+		self._move_astral(first, last - first, text)
+		for moved, after, lines_removed, lines_added in reversed(moves):
+			self.breakpoints.lines_changed(after, lines_removed, lines_added)
+			self.folds.lines_changed(moved, lines_removed, lines_added)
+		new_lines = old_lines + sum(added - removed for _, _, removed, added in moves)
+		# The lines in between changed too, the fold rescan and the cell markers cover them all
+		self.folds.lines_changed(line, new_lines, new_lines)
+		self.cells.lines_changed(buffer, line, old_lines, new_lines)
+		self.version += 1
+
+	def save(self, path=None):
+		path = path or self.path
+		with open(path, 'w', encoding='utf-8') as f:
+			self.buffer.write_to(f)
+		self.path = path
+
+
+_python_lexer = None
+
+def python_lexer():
+	"""The shared Pygments lexer, imported on first use since Pygments is slow to load"""
+	global _python_lexer
+	if _python_lexer is None:
+		from pygments.lexers import PythonLexer
+		_python_lexer = PythonLexer()
+	return _python_lexer
+
+
+@lru_cache(maxsize=1 << 18)
+def tokenize_line(code):
+	"""Token (type, length) runs for one line, without its indentation
+
+	Lines are lexed on their own, so the result only depends on the text and can be
+	shared by every block (and every re-indent) that has the same code after the indent.
+	"""
+	from pygments import lex
+	return tuple((token, len(value)) for token, value in lex(code, python_lexer()))
+
+
+OPEN_BRACKETS = {"(": ")", "[": "]", "{": "}"}
+CLOSE_BRACKETS = {close: open for open, close in OPEN_BRACKETS.items()}
+
+
+@lru_cache(maxsize=1 << 16)
+def line_brackets(text):
+	"""(column, char) of the brackets in a line that are code, not inside strings or comments
+
+	Built from tokenize_line's cached tokens, so lines the highlighter has seen cost nothing.
+	"""
+	from pygments.token import Punctuation
+	code = text.lstrip()
+	column = len(text) - len(code)
+	brackets = []
+	for token, length in tokenize_line(code):
+		if token in Punctuation:
+			for i in range(column, column + length):
+				if text[i] in OPEN_BRACKETS or text[i] in CLOSE_BRACKETS:
+					brackets.append((i, text[i]))
+		column += length
+	return tuple(brackets)
+
+
+def match_bracket(document, offset, max_lines=5000):
+	"""(bracket, match) offsets for the bracket at or just before `offset`
+
+	match is None for an unbalanced bracket, and the whole result is None when the cursor
+	isn't next to a bracket. The scan gives up after `max_lines` lines.
+	"""
+	buffer = document.buffer
+	line = buffer.line_of(offset)
+	start = buffer.line_start(line)
+	brackets = line_brackets(buffer.line(line))
+	columns = dict(brackets)
+	for column in (offset - start, offset - start - 1):
+		char = columns.get(column)
+		if char is not None:
+			break
+	else:
+		return None
+	bracket = start + column
+	forward = char in OPEN_BRACKETS
+	partner = OPEN_BRACKETS[char] if forward else CLOSE_BRACKETS[char]
+	depth = 0
+	last_line = min(buffer.line_count() - 1, line + max_lines) if forward else max(0, line - max_lines)
+	step = 1 if forward else -1
+	current = line
+	while True:
+		if current == line:
+			candidates = [b for b in brackets if (b[0] > column if forward else b[0] < column)]
+		else:
+			candidates = line_brackets(buffer.line(current))
+		for col, c in (candidates if forward else reversed(candidates)):
+			if c == char:
+				depth += 1
+			elif c == partner:
+				if depth == 0:
+					return bracket, buffer.line_start(current) + col
+				depth -= 1
+		if current == last_line:
+			return bracket, None
+		current += step
+
+
+class FindEngine:
+	"""Plain-text search over a Document with wrap-around
+
+	Offsets are into the Document's text, Document.to_utf16 turns them into QTextCursor positions.
+	"""
+	def __init__(self, document):
+		self.document = document
+		self._version = None
+		self._text = None
+		self._folded = None
+
+	def _haystack(self, case_sensitive):
+		if self._version != self.document.version:
+			self._text = self.document.text()
+			self._folded = None
+			self._version = self.document.version
+		if case_sensitive:
+			return self._text
+		if self._folded is None:
+			folded = self._text.lower()
+			# A few characters change length when lowered, those documents go through re
+			self._folded = folded if len(folded) == len(self._text) else False
+		return self._folded
+
+	def find(self, needle, start=0, case_sensitive=False, backward=False, wrap=True):
+		"""(start, end) of the next match from `start`, or None"""
+		if not needle:
+			return None
+		haystack = self._haystack(case_sensitive)
+		if haystack is False:
+			return self._find_re(needle, start, backward, wrap)
+		if not case_sensitive:
+			needle = needle.lower()
+		if backward:
+			found = haystack.rfind(needle, 0, start)
+			if found < 0 and wrap:
+				found = haystack.rfind(needle)
+		else:
+			found = haystack.find(needle, start)
+			if found < 0 and wrap:
+				found = haystack.find(needle)
+		return None if found < 0 else (found, found + len(needle))
+
+	def _find_re(self, needle, start, backward, wrap):
+		pattern = re.compile(re.escape(needle), re.IGNORECASE)
+		text = self._text
+		if backward:
+			best = last = None
+			for match in pattern.finditer(text):
+				if match.end() <= start:
+					best = match.span()
+				last = match.span()
+			return best or (last if wrap else None)
+		match = pattern.search(text, start) or (pattern.search(text) if wrap else None)
+		return match.span() if match else None
+
+	def find_all(self, needle, case_sensitive=False, first=0, last=None, limit=1000):
+		"""(start, end) of the matches inside [first, last), at most `limit` of them"""
+		if not needle:
+			return []
+		haystack = self._haystack(case_sensitive)
+		last = len(self._text) if last is None else last
+		if haystack is False:
+			pattern = re.compile(re.escape(needle), re.IGNORECASE)
+			spans = []
+			for match in pattern.finditer(self._text, first, last):
+				spans.append(match.span())
+				if len(spans) >= limit:
+					break
+			return spans
+		if not case_sensitive:
+			needle = needle.lower()
+		spans = []
+		found = haystack.find(needle, first, last)
+		while found >= 0 and len(spans) < limit:
+			spans.append((found, found + len(needle)))
+			found = haystack.find(needle, found + 1, last)
+		return spans
+
+	def count(self, needle, case_sensitive=False):
+		if not needle:
+			return 0
+		haystack = self._haystack(case_sensitive)
+		if haystack is False:
+			return len(re.findall(re.escape(needle), self._text, re.IGNORECASE))
+		return haystack.count(needle if case_sensitive else needle.lower())
+
+
+def visual_column(text, index, tab_size):
+	"""Screen column of `text[index]`, tabs reaching to the next multiple of `tab_size`"""
+	if "\t" not in text:
+		return index
+	column = 0
+	for ch in text[:index]:
+		column += tab_size - column % tab_size if ch == "\t" else 1
+	return column
+
+
+def column_index(text, column, tab_size):
+	"""Index in `text` nearest screen column `column`, the line's end when it's shorter"""
+	if "\t" not in text:
+		return min(max(column, 0), len(text))
+	current = 0
+	for i, ch in enumerate(text):
+		width = tab_size - current % tab_size if ch == "\t" else 1
+		if current + width / 2 > column:
+			return i
+		current += width
+	return len(text)
+
+
+_WORD = re.compile(r"\w+")
+_WORD_RIGHT = re.compile(r"\s*(?:\w+|[^\w\s]+)")
+_WORD_LEFT = re.compile(r"(?:\w+|[^\w\s]+)\s*$")
+
+
+def word_at(buffer, position):
+	"""(start, end) of the word `position` is in or touches, or None"""
+	line = buffer.line_of(position)
+	start = buffer.line_start(line)
+	column = position - start
+	for match in _WORD.finditer(buffer.line(line)):
+		if match.start() > column:
+			break
+		if column <= match.end():
+			return start + match.start(), start + match.end()
+	return None
+
+
+class _LineWindow:
+	"""Line lookups around first..last, from a single read of those lines when that's cheaper
+	than asking the piece table once per cursor (thousands of carets on neighbouring lines)"""
+	def __init__(self, buffer, first, last, lookups):
+		self.buffer = buffer
+		self.line_count = buffer.line_count()
+		self.starts = None
+		first_line = max(buffer.line_of(first) - 1, 0)
+		last_line = min(buffer.line_of(last) + 1, self.line_count - 1)
+		start = buffer.line_start(first_line)
+		end = buffer.line_start(last_line + 1) - 1 if last_line + 1 < self.line_count else len(buffer)
+		if end - start <= lookups * 256:
+			self.first = first_line
+			self.texts = buffer.text(start, end).split("\n")
+			self.starts = list(accumulate((len(text) + 1 for text in self.texts[:-1]), initial=start))
+			self.end = end
+
+	def line_of(self, offset):
+		if self.starts is None or not self.starts[0] <= offset <= self.end:
+			return self.buffer.line_of(offset)
+		return self.first + bisect_right(self.starts, offset) - 1
+
+	def line_start(self, line):
+		if self.starts is None or not 0 <= line - self.first < len(self.starts):
+			return self.buffer.line_start(line)
+		return self.starts[line - self.first]
+
+	def line(self, line):
+		if self.starts is None or not 0 <= line - self.first < len(self.starts):
+			return self.buffer.line(line)
+		return self.texts[line - self.first]
+
+
+class CursorSet:
+	"""The carets of a multi-cursor edit as plain (anchor, position) offsets, sorted and disjoint
+
+	Not QTextCursors: the document moves every cursor it knows about on each change, so
+	thousands of them make every keystroke quadratic. Edits are planned here front to back
+	and the editor applies them back to front, each one leaving the offsets before it alone.
+	`primary` is the cursor the view follows, the last one added.
+	"""
+	def __init__(self, cursors=(), primary=-1):
+		cursors = list(cursors) or [(0, 0)]
+		self._normalize(cursors, cursors[primary])
+
+	@classmethod
+	def box(cls, buffer, line, column, other_line, other_column, tab_size):
+		"""One cursor per line from `line` to `other_line`, over the same screen columns"""
+		step = 1 if other_line >= line else -1
+		first, last = min(line, other_line), max(line, other_line)
+		cursors = []
+		start = buffer.line_start(first)
+		for text in buffer.lines(first):
+			anchor = start + column_index(text, column, tab_size)
+			cursors.append((anchor, start + column_index(text, other_column, tab_size)))
+			start += len(text) + 1
+			if len(cursors) > last - first:
+				break
+		return cls(cursors[::step])
+
+	def _normalize(self, cursors, main):
+		if all(anchor == position for anchor, position in cursors):
+			# Just carets, the common case after typing
+			self._starts = self._ends = sorted({position for _, position in cursors})
+			self.cursors = [(position, position) for position in self._starts]
+			self.primary = max(0, bisect_right(self._starts, min(main)) - 1)
+			return
+		cursors.sort(key=lambda c: (min(c), max(c)))
+		merged = []
+		for anchor, position in cursors:
+			start, end = min(anchor, position), max(anchor, position)
+			if merged:
+				last_anchor, last_position = merged[-1]
+				last_start, last_end = min(last_anchor, last_position), max(last_anchor, last_position)
+				# Overlapping selections, and a caret on another cursor's edge, become one
+				if start < last_end or (start == last_end and (start == end or last_start == last_end)):
+					end = max(end, last_end)
+					backward = position < anchor or last_position < last_anchor
+					merged[-1] = (end, last_start) if backward else (last_start, end)
+					continue
+			merged.append((anchor, position))
+		self.cursors = merged
+		self._starts = [min(c) for c in merged]
+		self._ends = [max(c) for c in merged]
+		self.primary = max(0, bisect_right(self._starts, min(main)) - 1)
+
+	def __len__(self):
+		return len(self.cursors)
+
+	def __iter__(self):
+		return iter(self.cursors)
+
+	def main(self):
+		return self.cursors[self.primary]
+
+	def spans(self):
+		return list(zip(self._starts, self._ends))
+
+	def has_selection(self):
+		return any(anchor != position for anchor, position in self.cursors)
+
+	def add(self, anchor, position):
+		"""Add a cursor and make it the primary one"""
+		self._normalize(self.cursors + [(anchor, position)], (anchor, position))
+
+	def remove_at(self, position):
+		"""Drop the cursor at `position`, if it's there and not the only one"""
+		i = bisect_right(self._starts, position) - 1
+		if len(self.cursors) < 2 or i < 0 or self._ends[i] < position:
+			return False
+		main = self.main() if i != self.primary else self.cursors[i - 1]
+		self._normalize(self.cursors[:i] + self.cursors[i + 1:], main)
+		return True
+
+	def between(self, first, last):
+		"""(index, cursor) of the cursors touching first..last, for drawing the ones in view"""
+		lo = bisect_left(self._ends, first)
+		hi = bisect_right(self._starts, last)
+		return zip(range(lo, hi), self.cursors[lo:hi])
+
+	def selected_text(self, buffer):
+		return [buffer.text(start, end) for start, end in zip(self._starts, self._ends)]
+
+	def _edit(self, edits, carets):
+		"""Make [(start, end, text)] per cursor, the carets landing `carets[i]` into each text"""
+		moved = []
+		shift = 0
+		for (start, end, text), caret in zip(edits, carets):
+			position = start + shift + caret
+			moved.append((position, position))
+			shift += len(text) - (end - start)
+		self._normalize(moved, moved[self.primary])
+		return [edit for edit in edits if edit[0] != edit[1] or edit[2]]
+
+	def replace(self, texts, caret=None):
+		"""Put `texts` (one string, or one per cursor) in place of every selection
+
+		The caret lands `caret` characters into the new text, after it by default.
+		Returns the edits as sorted [(start, end, text)] for the document.
+		"""
+		if isinstance(texts, str):
+			texts = [texts] * len(self.cursors)
+		edits = [(start, end, text) for start, end, text in zip(self._starts, self._ends, texts)]
+		return self._edit(edits, [len(text) if caret is None else caret for text in texts])
+
+	def delete(self, length, forward=False):
+		"""Delete each selection, or the character before (after) each caret, like Backspace (Delete)"""
+		edits = []
+		previous = 0
+		for start, end in zip(self._starts, self._ends):
+			if start == end:
+				start, end = (start, min(start + 1, length)) if forward else (max(start - 1, 0), start)
+			# Neighbouring carets can't both take the character between them
+			start = max(start, previous)
+			end = max(end, start)
+			edits.append((start, end, ""))
+			previous = end
+		return self._edit(edits, [0] * len(edits))
+
+	def move(self, target, extend=False):
+		"""Move each caret to target(anchor, position), keeping its anchor when `extend`"""
+		moved = []
+		for anchor, position in self.cursors:
+			new = target(anchor, position)
+			moved.append((anchor if extend else new, new))
+		self._normalize(moved, moved[self.primary])
+
+	def move_by(self, buffer, unit, direction, extend=False, tab_size=4):
+		"""Arrow keys: by "char", "word", "line" or to the line's "edge", -1 backward and 1 forward"""
+		length = len(buffer)
+		if unit != "char":
+			lines = _LineWindow(buffer, self._starts[0], self._ends[-1], len(self.cursors))
+
+		def target(anchor, position):
+			if unit == "char" and anchor != position and not extend:
+				# Moving off a selection lands on the side of it you moved to
+				return min(anchor, position) if direction < 0 else max(anchor, position)
+			if unit == "char":
+				return min(max(position + direction, 0), length)
+			line = lines.line_of(position)
+			start = lines.line_start(line)
+			text = lines.line(line)
+			column = position - start
+			if unit == "edge":
+				if direction > 0:
+					return start + len(text)
+				# Home goes to the indentation first, then to the line start
+				indent = len(text) - len(text.lstrip())
+				return start + (indent if column != indent else 0)
+			if unit == "word":
+				if direction > 0:
+					match = _WORD_RIGHT.match(text, column)
+					return start + match.end() if match else min(position + 1, length)
+				match = _WORD_LEFT.search(text, 0, column)
+				return start + match.start() if match else max(position - 1, 0)
+			# A line up or down, at the same screen column or the end of a shorter line
+			other = line + direction
+			if other < 0:
+				return 0
+			if other >= lines.line_count:
+				return length
+			other_text = lines.line(other)
+			return lines.line_start(other) + column_index(other_text, visual_column(text, column, tab_size), tab_size)
+		self.move(target, extend)
+
+
+Diagnostic = namedtuple("Diagnostic", "line column end_column severity message")
+
+
+def check_syntax(text, filename="<editor>"):
+	"""The syntax error (as a one item list) that compile() reports, or []"""
+	try:
+		compile(text, filename, "exec", dont_inherit=True)
+	except SyntaxError as e:
+		line = max((e.lineno or 1) - 1, 0)
+		column = max((e.offset or 1) - 1, 0)
+		end_column = column + 1
+		if getattr(e, "end_lineno", None) == e.lineno and (e.end_offset or 0) - 1 > column:
+			end_column = e.end_offset - 1
+		return [Diagnostic(line, column, end_column, "error", e.msg)]
+	except ValueError as e:
+		# Null bytes and the like
+		return [Diagnostic(0, 0, 1, "error", str(e))]
+	return []
+
+
+def check_pyflakes(text, filename="<editor>"):
+	"""pyflakes warnings for code that compiles, [] when pyflakes isn't installed"""
+	try:
+		from pyflakes.checker import Checker
+	except ImportError:
+		return []
+	checker = Checker(ast.parse(text, filename), filename)
+	diagnostics = []
+	for message in sorted(checker.messages, key=lambda m: (m.lineno, m.col)):
+		column = message.col or 0
+		diagnostics.append(Diagnostic(
+			message.lineno - 1, column, column + 1, "warning", message.message % message.message_args
+		))
+	return diagnostics
+
+
+def has_pyflakes():
+	import importlib.util
+	return importlib.util.find_spec("pyflakes") is not None
+
+
+class DiagnosticsEngine:
+	"""Checks documents off the UI thread, versioned, cancellable and cached by content hash
+
+	`submit` returns at once. The syntax check runs on a worker thread, and pyflakes
+	(when installed) runs in a process pool so a big file can't hold the GIL against
+	typing. Work for a version that has been superseded is dropped before each step,
+	and `callback(key, version, diagnostics)` only fires for the latest version of a key,
+	from the worker thread.
+	"""
+	CACHE_SIZE = 256
+
+	def __init__(self, use_pyflakes=True):
+		self.use_pyflakes = use_pyflakes and has_pyflakes()
+		self._threads = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snakeide-diagnostics")
+		self._processes = None
+		self._latest = {}
+		self._cache = OrderedDict()
+		self._lock = threading.Lock()
+
+	def submit(self, key, version, source, filename, callback):
+		"""Check `source` (a str or anything with .text(), like a PieceTable snapshot)"""
+		self._latest[key] = version
+		self._threads.submit(self._run, key, version, source, filename, callback)
+
+	def cancel(self, key):
+		self._latest.pop(key, None)
+
+	def _current(self, key, version):
+		return self._latest.get(key) == version
+
+	def _run(self, key, version, source, filename, callback):
+		if not self._current(key, version):
+			return
+		text = source if isinstance(source, str) else source.text()
+		digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+		with self._lock:
+			diagnostics = self._cache.get(digest)
+			if diagnostics is not None:
+				self._cache.move_to_end(digest)
+		if diagnostics is None:
+			diagnostics = check_syntax(text, filename)
+			if not diagnostics and self.use_pyflakes:
+				if not self._current(key, version):
+					return
+				try:
+					diagnostics = self._pool().submit(check_pyflakes, text, filename).result()
+				except Exception:
+					diagnostics = []
+			with self._lock:
+				self._cache[digest] = diagnostics
+				if len(self._cache) > self.CACHE_SIZE:
+					self._cache.popitem(last=False)
+		if self._current(key, version):
+			callback(key, version, diagnostics)
+
+	def _pool(self):
+		if self._processes is None:
+			# Not imported up front, they pull in multiprocessing before the first frame
+			import multiprocessing
+			from concurrent.futures import ProcessPoolExecutor
+			# Forking a threaded Qt process (from a worker thread at that) can copy a held
+			# lock into the child, a fresh interpreter is the safe start
+			self._processes = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+		return self._processes
+
+	def shutdown(self):
+		self._latest.clear()
+		self._threads.shutdown(wait=False, cancel_futures=True)
+		if self._processes is not None:
+			self._processes.shutdown(wait=False, cancel_futures=True)
+
+
+def cache_dir():
+	"""Per-user folder for indexes that are slow to build"""
+	if os.name == 'nt':
+		base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+	else:
+		base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+	path = os.path.join(base, "snakeide")
+	os.makedirs(path, exist_ok=True)
+	return path
+
+
+def interpreter_info(python):
+	"""Version, stdlib folder and site-packages folders of an interpreter, asked in a subprocess"""
+	script = (
+		"import json, site, sys, sysconfig;"
+		"print(json.dumps([sys.version, sysconfig.get_paths()['stdlib'],"
+		" [p for p in site.getsitepackages() + [site.getusersitepackages()]]]))"
+	)
+	import subprocess
+	out = subprocess.run([python, "-c", script], capture_output=True, text=True, timeout=30).stdout
+	version, stdlib, site_dirs = json.loads(out)
+	return version, stdlib, site_dirs
+
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def public_names(path, max_bytes=1 << 20):
+	"""Names a module defines at top level, from its source without importing it"""
+	try:
+		if os.path.getsize(path) > max_bytes:
+			return []
+		with open(path, 'r', encoding='utf-8', errors='replace') as f:
+			tree = ast.parse(f.read(), path)
+	except (OSError, SyntaxError, ValueError):
+		return []
+	names = set()
+	for node in tree.body:
+		if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+			names.add(node.name)
+		elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+			targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+			for target in targets:
+				if isinstance(target, ast.Name):
+					if target.id == "__all__" and isinstance(node.value, (ast.List, ast.Tuple)):
+						names.update(elt.value for elt in node.value.elts
+							if isinstance(elt, ast.Constant) and isinstance(elt.value, str))
+					names.add(target.id)
+		elif isinstance(node, (ast.Import, ast.ImportFrom)):
+			for alias in node.names:
+				if alias.name != "*":
+					names.add((alias.asname or alias.name).split(".")[0])
+	return sorted(name for name in names if not name.startswith("_"))
+
+
+class PackageIndex:
+	"""Modules of an interpreter's stdlib and site-packages with their public names
+
+	Built by reading the sources (nothing is imported) and stored in the cache folder
+	keyed by the interpreter path and version, so it's only built once per interpreter.
+	"""
+	MAX_DEPTH = 2  # package.sub.module
+
+	def __init__(self, python=None):
+		self.python = python or get_python_executable()
+		self.modules = {}  # dotted module name -> public names
+		self.module_list = []
+
+	def cache_path(self, version):
+		key = hashlib.blake2b(f"{os.path.abspath(self.python)}\0{version}".encode(), digest_size=8).hexdigest()
+		return os.path.join(cache_dir(), f"packages-{key}.json")
+
+	def load(self):
+		"""Read the index from the cache, building and storing it on a miss"""
+		version, stdlib, site_dirs = interpreter_info(self.python)
+		path = self.cache_path(version)
+		try:
+			with open(path, 'r', encoding='utf-8') as f:
+				self.modules = json.load(f)
+		except (OSError, ValueError):
+			self.modules = self.build([stdlib] + site_dirs)
+			tmp = path + ".tmp"
+			with open(tmp, 'w', encoding='utf-8') as f:
+				json.dump(self.modules, f)
+			os.replace(tmp, path)
+		self.module_list = sorted(self.modules)
+		return self
+
+	def build(self, folders):
+		modules = {}
+		for folder in folders:
+			if os.path.isdir(folder):
+				self._scan(folder, "", 0, modules)
+		for name in getattr(sys, "builtin_module_names", ()):
+			modules.setdefault(name, [])
+		return modules
+
+	def _scan(self, folder, package, depth, modules):
+		try:
+			entries = list(os.scandir(folder))
+		except OSError:
+			return
+		for entry in entries:
+			name = entry.name
+			if entry.is_dir():
+				init = os.path.join(entry.path, "__init__.py")
+				if name.isidentifier() and name != "site-packages" and os.path.exists(init):
+					dotted = package + name
+					if dotted not in modules:
+						modules[dotted] = public_names(init)
+						if depth < self.MAX_DEPTH:
+							self._scan(entry.path, dotted + ".", depth + 1, modules)
+			elif name.endswith(".py"):
+				stem = name[:-3]
+				if stem.isidentifier() and stem != "__init__" and package + stem not in modules:
+					modules[package + stem] = public_names(entry.path)
+			elif name.endswith((".so", ".pyd")):
+				# Extension modules: their names come from a .pyi stub next to them, if any
+				stem = name.split(".")[0]
+				if stem.isidentifier() and package + stem not in modules:
+					stub = os.path.join(folder, stem + ".pyi")
+					modules[package + stem] = public_names(stub) if os.path.exists(stub) else []
+
+
+def _prefixed(names, prefix, limit):
+	"""Entries of the sorted list `names` that start with `prefix`"""
+	i = bisect_left(names, prefix)
+	out = []
+	while i < len(names) and names[i].startswith(prefix) and len(out) < limit:
+		out.append(names[i])
+		i += 1
+	return out
+
+
+def narrow_completions(candidates, prefix):
+	"""Filter a previous (sorted) result for a longer prefix instead of querying again"""
+	return [name for name in candidates if name.startswith(prefix)]
+
+
+_WORD_BEFORE = re.compile(r"([A-Za-z_][\w.]*|\.?)$")
+_IMPORT_LINE = re.compile(r"^\s*(?:import\s+[\w.]*|from\s+[\w.]*)$")
+_FROM_IMPORT = re.compile(r"^\s*from\s+([\w.]+)\s+import\s+(?:.*,\s*)?\w*$")
+_ALIAS = re.compile(r"^[ \t]*import[ \t]+([\w.]+)[ \t]+as[ \t]+(\w+)|^[ \t]*import[ \t]+([\w.]+)", re.M)
+
+
+class CompletionIndex:
+	"""Completion candidates from builtins, the project, installed packages and the document
+
+	Every source is a sorted list, so a query is a bisect per source and stays well under
+	the 30 ms budget even with the whole stdlib and site-packages indexed.
+	"""
+	LIMIT = 200
+	WINDOW = 5000  # lines of the document scanned for names, around the cursor
+	STEP = 1000
+
+	def __init__(self):
+		self.builtins = sorted(set(dir(builtins)) | set(keyword.kwlist))
+		self.packages = None
+		self._project = {}  # path -> names
+		self._project_names = []
+		self._documents = {}  # key -> (version, first line scanned, sorted names, aliases)
+
+	def set_packages(self, packages):
+		self.packages = packages
+
+	def set_project_file(self, path, names):
+		self._project[path] = names
+		self._project_names = sorted(set().union(*self._project.values()))
+
+	def index_project(self, root, rules, max_files=5000):
+		"""Public names of every .py file under `root` that the ignore rules let through"""
+		project = {}
+		# Each folder inherits the rules of the folders above it
+		pending = [(root, rules)]
+		while pending and len(project) < max_files:
+			folder, parent_rules = pending.pop()
+			try:
+				folder_rules = parent_rules.for_directory(folder)
+				entries = scan_directory(folder, folder_rules)
+			except OSError:
+				continue
+			for name, is_dir in entries:
+				path = os.path.join(folder, name)
+				if is_dir:
+					pending.append((path, folder_rules))
+				elif name.endswith(".py"):
+					project[path] = public_names(path)
+		self._project = project
+		self._project_names = sorted(set().union(*project.values())) if project else []
+
+	def document_names(self, key, version, buffer, row=0):
+		"""Identifiers and import aliases of a document (a PieceTable snapshot) near `row`
+
+		Only WINDOW lines around the row and the imports at the top are scanned, so a query
+		costs the same in a 100k line file. The window moves in STEP lines and is cached
+		per version, typing on one line hits the cache until the next edit.
+		"""
+		lo = max(0, row // self.STEP * self.STEP - (self.WINDOW - self.STEP) // 2)
+		cached = self._documents.get(key)
+		if cached is None or cached[:2] != (version, lo):
+			count = buffer.line_count()
+			hi = lo + self.WINDOW
+			text = buffer.text(buffer.line_start(lo), buffer.line_start(hi) if hi < count else None)
+			aliases = {}
+			header = buffer.text(0, buffer.line_start(min(self.WINDOW, lo))) if lo else ""
+			for match in _ALIAS.finditer(header + "\n" + text):
+				if match.group(2):
+					aliases[match.group(2)] = match.group(1)
+				else:
+					aliases[match.group(3).split(".")[0]] = match.group(3).split(".")[0]
+			cached = self._documents[key] = (version, lo, sorted(set(_IDENTIFIER.findall(text))), aliases)
+		return cached[2], cached[3]
+
+	def forget_document(self, key):
+		self._documents.pop(key, None)
+
+	def complete(self, line, column, key=None, version=0, buffer=None, row=0):
+		"""(prefix, candidates) for the text before `column` on `line`, line `row` of `buffer`"""
+		before = line[:column]
+		word = _WORD_BEFORE.search(before).group(1)
+		names, aliases = self.document_names(key, version, buffer, row) if key is not None else ([], {})
+		modules = self.packages.modules if self.packages else {}
+		module_list = self.packages.module_list if self.packages else []
+
+		if _IMPORT_LINE.match(before):
+			# import a.b / from a.b: dotted module names
+			return word, _prefixed(module_list, word, self.LIMIT)
+		match = _FROM_IMPORT.match(before)
+		if match:
+			return word, _prefixed(modules.get(match.group(1), []), word, self.LIMIT)
+		if "." in word:
+			owner, _, prefix = word.rpartition(".")
+			head, _, rest = owner.partition(".")
+			module = aliases.get(head, head) + ("." + rest if rest else "")
+			if module in modules:
+				candidates = sorted(set(modules[module]) | {
+					name.rpartition(".")[2] for name in _prefixed(module_list, module + ".", 10_000)
+				})
+			else:
+				# Unknown object: words of the document are the best guess
+				candidates = names
+			return prefix, _prefixed(candidates, prefix, self.LIMIT)
+		if not word:
+			return word, []
+		found = set()
+		for source in (names, self.builtins, self._project_names):
+			found.update(_prefixed(source, word, self.LIMIT))
+		found.discard(word)
+		return word, sorted(found)[:self.LIMIT]
+
+
+def config_dir():
+	"""Per-user folder for settings and session state, so a read-only install still keeps them"""
+	if os.name == 'nt':
+		base = os.environ.get("APPDATA") or os.path.expanduser("~")
+	else:
+		base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+	path = os.path.join(base, "snakeide")
+	os.makedirs(path, exist_ok=True)
+	return path
+
+
+class ConfigStore:
+	"""Settings and per-project state as JSON sections, each in its own file, read on first use
+
+	The global settings are one section; a project has its own ("session", "editors",
+	"breakpoints", ...) in a folder named by the hash of its path. Sections are dicts that
+	callers change in place and then report with changed(); flush() serializes the changed
+	ones on the caller's thread and writes them on a background one, each atomically (temp
+	file, fsync, rename). A file that doesn't parse is set aside as .corrupt, not overwritten.
+
+	Files carry the store's VERSION. load() brings an older store up to date through
+	MIGRATIONS, version 1 being the single snakeide.conf of earlier releases.
+	"""
+	VERSION = 2
+	SETTINGS = "settings"
+
+	def __init__(self, folder, defaults, legacy_path=None):
+		self.folder = folder
+		self.defaults = defaults
+		self.legacy_path = legacy_path
+		self._sections = {}  # (project or None, name) -> dict
+		self._dirty = set()
+		self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snakeide-config")
+
+	def _path(self, project, name):
+		if project is None:
+			return os.path.join(self.folder, f"{name}.json")
+		key = hashlib.blake2b(os.path.abspath(project).encode() if project else b"", digest_size=8).hexdigest()
+		return os.path.join(self.folder, "projects", key, f"{name}.json")
+
+	def _read(self, path):
+		"""(version, data) of a section file, (None, {}) when there is none or it's damaged"""
+		try:
+			with open(path, 'r', encoding='utf-8') as f:
+				content = json.load(f)
+			if not isinstance(content, dict) or not isinstance(content.get("data"), dict):
+				raise ValueError("not a settings file")
+			return content.get("version", 1), content["data"]
+		except FileNotFoundError:
+			return None, {}
+		except (OSError, ValueError) as e:
+			print(f"Settings: {path} is unreadable ({e}), starting it over", file=sys.stderr)
+			try:
+				# Kept for whoever wants to recover it, and so the next write doesn't clobber it
+				os.replace(path, path + ".corrupt")
+			except OSError:
+				pass
+			return None, {}
+
+	def load(self):
+		"""The settings section, defaults filled in, after migrating an older store"""
+		version, data = self._read(self._path(None, self.SETTINGS))
+		if version is None and self.legacy_path and os.path.exists(self.legacy_path):
+			version = 1
+		settings = json.loads(json.dumps(self.defaults))
+		settings.update(data)
+		self._sections[(None, self.SETTINGS)] = settings
+		if version is not None and version < self.VERSION:
+			while version < self.VERSION:
+				self.MIGRATIONS[version](self)
+				version += 1
+			self.changed(self.SETTINGS)
+			self.flush(wait=True)
+		return settings
+
+	def section(self, name, project=None):
+		"""A section's dict, read from disk the first time it's asked for"""
+		key = (project, name)
+		data = self._sections.get(key)
+		if data is None:
+			data = self._sections[key] = self._read(self._path(project, name))[1]
+		return data
+
+	def changed(self, name, project=None):
+		self._dirty.add((project, name))
+
+	def flush(self, wait=False):
+		"""Write the changed sections, in the background unless `wait`"""
+		if not self._dirty:
+			return
+		jobs = [
+			(self._path(*key), json.dumps({"version": self.VERSION, "data": self._sections[key]}, indent=1))
+			for key in self._dirty if key in self._sections
+		]
+		self._dirty.clear()
+		future = self._writer.submit(self._write, jobs)
+		if wait:
+			future.result()
+
+	@staticmethod
+	def _write(jobs):
+		for path, text in jobs:
+			try:
+				os.makedirs(os.path.dirname(path), exist_ok=True)
+				tmp = path + ".tmp"
+				with open(tmp, 'w', encoding='utf-8') as f:
+					f.write(text)
+					f.flush()
+					os.fsync(f.fileno())
+				os.replace(tmp, path)
+			except OSError as e:
+				print(f"Settings: could not write {path} ({e})", file=sys.stderr)
+				raise
+
+	def _from_single_file(self):
+		"""Version 1: everything in one snakeide.conf next to the script"""
+		try:
+			with open(self.legacy_path, 'r', encoding='utf-8') as f:
+				legacy = json.load(f)
+		except (OSError, ValueError):
+			return
+		if not isinstance(legacy, dict):
+			return
+		project = legacy.get("current_project") or ""
+		session = {key: legacy.pop(key) for key in ("open_files", "current_file") if key in legacy}
+		sections = {(project, "session"): session, (project, "breakpoints"): legacy.pop("breakpoints", {})}
+		for root, entry in legacy.pop("run_configurations", {}).items():
+			sections[(root, "run_configurations")] = entry
+		self._sections[(None, self.SETTINGS)].update(legacy)
+		for (root, name), data in sections.items():
+			if data:
+				self.section(name, root).update(data)
+				self.changed(name, root)
+
+	MIGRATIONS = {1: _from_single_file}
+
+
+@lru_cache(maxsize=None)
+def get_python_executable():
+	if getattr(sys, 'frozen', False):
+		# We're in a PyInstaller-built executable
+		# Try to find a real Python interpreter
+		python = shutil.which("python")
+		if not python:
+			python = shutil.which("python3")
+		return python or "python"  # fallback to plain string if all else fails
+	else:
+		# Normal Python run
+		return sys.executable
+
+
+_LIMITED_LAUNCH = """\
+import json, os, sys
+limits = json.loads(sys.argv.pop(1))
+if limits.get("memory_mb"):
+    import resource
+    size = int(limits["memory_mb"]) << 20
+    resource.setrlimit(resource.RLIMIT_AS, (size, size))
+if limits.get("nice"):
+    os.nice(int(limits["nice"]))
+if limits.get("cpus") and hasattr(os, "sched_setaffinity"):
+    os.sched_setaffinity(0, limits["cpus"])
+os.execv(sys.executable, [sys.executable] + sys.argv[1:])
+"""
+
+
+def parse_cpu_list(text):
+	"""CPU numbers from "0,2-3" (the taskset format), raises ValueError for anything else"""
+	cpus = set()
+	for part in text.replace(" ", "").split(","):
+		if not part:
+			continue
+		first, _, last = part.partition("-")
+		first, last = int(first), int(last or first)
+		if first < 0 or last < first:
+			raise ValueError(f"bad CPU range: {part}")
+		cpus.update(range(first, last + 1))
+	return sorted(cpus)
+
+
+ResourceSample = namedtuple("ResourceSample", "time cpu rss threads read_rate write_rate processes")
+
+
+class ProcessTreeSampler:
+	"""CPU %, resident memory, threads and I/O of a process and everything it started
+
+	Read straight from /proc, so Linux only (see available()). CPU and I/O are rates over
+	the time since the previous sample, the first sample reports them as 0.
+	"""
+	def __init__(self, pid, proc="/proc"):
+		self.pid = pid
+		self.proc = proc
+		self._ticks = os.sysconf("SC_CLK_TCK")
+		self._page = os.sysconf("SC_PAGE_SIZE")
+		self._last = None  # (time, {pid: cpu ticks}, {pid: (read, written)})
+		self.peak = None
+
+	@staticmethod
+	def available(proc="/proc"):
+		return hasattr(os, "sysconf") and os.path.exists(os.path.join(proc, "self", "stat"))
+
+	def _stat(self, pid):
+		"""(ppid, cpu ticks, threads, rss pages), None once the process is gone"""
+		try:
+			with open(f"{self.proc}/{pid}/stat", 'rb') as f:
+				data = f.read()
+		except OSError:
+			return None
+		# The command name can hold spaces and parentheses, the fields start after the last ")"
+		fields = data[data.rindex(b")") + 2:].split()
+		return int(fields[1]), int(fields[11]) + int(fields[12]), int(fields[17]), int(fields[21])
+
+	def _io(self, pid):
+		read = written = 0
+		try:
+			with open(f"{self.proc}/{pid}/io", 'rb') as f:
+				for line in f:
+					# What it read and wrote, page cache hits included: read_bytes/write_bytes
+					# only count the disk and stay at 0 for a file read twice
+					if line.startswith(b"rchar:"):
+						read = int(line.split()[1])
+					elif line.startswith(b"wchar:"):
+						written = int(line.split()[1])
+		except (OSError, ValueError):
+			# Not ours to read (setuid children) or the kernel lacks task I/O accounting
+			pass
+		return read, written
+
+	def _children(self, pid):
+		try:
+			tasks = os.listdir(f"{self.proc}/{pid}/task")
+		except OSError:
+			return None
+		children = []
+		for task in tasks:
+			try:
+				with open(f"{self.proc}/{pid}/task/{task}/children", 'rb') as f:
+					children += [int(child) for child in f.read().split()]
+			except FileNotFoundError:
+				# Kernel built without the children file, ask pids() to scan instead
+				return None
+			except OSError:
+				continue
+		return children
+
+	def pids(self):
+		"""The process and all its descendants"""
+		tree, stack = [], [self.pid]
+		while stack:
+			pid = stack.pop()
+			children = self._children(pid)
+			if children is None:
+				return self._scan_tree()
+			tree.append(pid)
+			stack += children
+		return tree
+
+	def _scan_tree(self):
+		parents = defaultdict(list)
+		for name in os.listdir(self.proc):
+			if name.isdigit():
+				stat = self._stat(int(name))
+				if stat is not None:
+					parents[stat[0]].append(int(name))
+		tree, stack = [], [self.pid]
+		while stack:
+			pid = stack.pop()
+			tree.append(pid)
+			stack += parents.get(pid, ())
+		return tree
+
+	def sample(self):
+		now = time.monotonic()
+		ticks, io = {}, {}
+		rss = threads = 0
+		for pid in self.pids():
+			stat = self._stat(pid)
+			if stat is None:
+				continue
+			ticks[pid] = stat[1]
+			threads += stat[2]
+			rss += stat[3] * self._page
+			io[pid] = self._io(pid)
+		cpu = read_rate = write_rate = 0.0
+		if self._last is not None:
+			then, last_ticks, last_io = self._last
+			elapsed = max(now - then, 1e-6)
+			# Processes that appeared since the last sample count from their start
+			cpu = sum(max(0, value - last_ticks.get(pid, 0)) for pid, value in ticks.items())
+			cpu = 100.0 * cpu / self._ticks / elapsed
+			read_rate = sum(max(0, r - last_io.get(pid, (0, 0))[0]) for pid, (r, _) in io.items()) / elapsed
+			write_rate = sum(max(0, w - last_io.get(pid, (0, 0))[1]) for pid, (_, w) in io.items()) / elapsed
+		self._last = (now, ticks, io)
+		sample = ResourceSample(now, cpu, rss, threads, read_rate, write_rate, len(ticks))
+		if ticks:
+			self.peak = sample if self.peak is None else ResourceSample(
+				now, *(max(a, b) for a, b in zip(self.peak[1:], sample[1:]))
+			)
+		return sample
+
+	def kill(self, sig=signal.SIGTERM if os.name == 'nt' else signal.SIGKILL):
+		"""Kill the whole tree, children first so nothing gets re-parented and missed"""
+		for pid in reversed(self.pids()):
+			try:
+				os.kill(pid, sig)
+			except OSError:
+				pass
+
+
+def format_bytes(size):
+	for unit in ("B", "KB", "MB", "GB"):
+		if size < 1024 or unit == "GB":
+			return f"{size:.0f} {unit}" if unit in ("B", "KB") else f"{size:.1f} {unit}"
+		size /= 1024
+
+
+class RunManager:
+	"""Builds the command lines the IDE runs scripts and the debugger with"""
+	def __init__(self, workdir=None, interpreter=None):
+		self.workdir = workdir or os.path.dirname(os.path.abspath(__file__))
+		self.interpreter = interpreter
+		self._debug_copy = None
+
+	def python(self):
+		return self.interpreter or get_python_executable()
+
+	def run_command(self, path, limits=None, configuration=None, coverage=None):
+		"""`limits` ({"memory_mb", "nice", "cpus"}) are applied by a small launcher that then
+		execs the script in the same process, so they hold from its first instruction.
+		With `coverage` (a file name) the script runs under coverage_run.py, which writes
+		its line coverage there."""
+		python, script = self.python(), [path]
+		if coverage:
+			script = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "coverage_run.py"), coverage, path]
+		args = script
+		if configuration is not None:
+			python = configuration.python() or python
+			args = configuration.python_flags() + script + configuration.arguments()
+		if limits and any(limits.get(key) for key in ("memory_mb", "nice", "cpus")) and os.name == 'posix':
+			return python, ["-c", _LIMITED_LAUNCH, json.dumps(limits)] + args
+		return python, args
+
+	def debug_command(self, document, configuration=None):
+		"""Run a copy of the document under pdb, so unsaved edits are what gets debugged
+
+		The copy is a temp file of its own, the install folder may be read-only and two IDEs
+		would fight over one name; the previous one is removed. See debug_environment().
+		"""
+		if self._debug_copy:
+			try:
+				os.remove(self._debug_copy)
+			except OSError:
+				pass
+		import tempfile
+		fd, temp_file = tempfile.mkstemp(prefix="snakeide_debug_", suffix=".py")
+		# pdb reports frames under the real path, PdbSession compares against this one
+		temp_file = self._debug_copy = os.path.realpath(temp_file)
+		with open(fd, 'w', encoding='utf-8') as f:
+			document.buffer.write_to(f)
+		python, args = self.python(), ["-u", "-m", "pdb", temp_file]
+		if configuration is not None:
+			python = configuration.python() or python
+			args = configuration.python_flags() + args + configuration.arguments()
+		return python, args
+
+	@staticmethod
+	def debug_environment(env, path):
+		"""`env` with the folder of `path` (the file the debug copy was made from) on
+		PYTHONPATH, so the copy imports its neighbours like the file would"""
+		env = dict(os.environ if env is None else env)
+		if path:
+			env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(path)), env.get("PYTHONPATH")]))
+		return env
+
+	def kernel_command(self):
+		"""The console's kernel, kernel.py sits next to this file"""
+		return self.python(), ["-u", os.path.join(os.path.dirname(os.path.abspath(__file__)), "kernel.py")]
+
+	def test_command(self, configuration=None):
+		"""A test worker running under the project's interpreter, testrunner.py sits next to this file"""
+		python = (configuration.python() if configuration else None) or self.python()
+		return python, ["-u", os.path.join(os.path.dirname(os.path.abspath(__file__)), "testrunner.py")]
+
+
+def venv_python(folder):
+	"""The interpreter of the virtual environment in `folder`, None if it isn't one"""
+	if not os.path.isfile(os.path.join(folder, "pyvenv.cfg")):
+		return None
+	for name in (os.path.join("Scripts", "python.exe"), os.path.join("bin", "python3"), os.path.join("bin", "python")):
+		python = os.path.join(folder, name)
+		if os.path.isfile(python):
+			return python
+	return None
+
+
+class RunConfiguration:
+	"""A named way to run a script: interpreter or venv, arguments, environment, folder, -O/-X flags
+
+	Empty fields mean the IDE's defaults: the default interpreter, the open file as the script
+	and the project folder (or the script's own) as the working directory.
+	"""
+	FIELDS = ("name", "interpreter", "script", "args", "env", "cwd", "optimize", "x_options")
+
+	def __init__(self, name, interpreter="", script="", args="", env=None, cwd="", optimize=0, x_options=""):
+		self.name = name
+		self.interpreter = interpreter
+		self.script = script
+		self.args = args
+		self.env = dict(env or {})
+		self.cwd = cwd
+		self.optimize = optimize
+		self.x_options = x_options
+
+	def python(self):
+		"""The interpreter to run, a venv folder stands for its python"""
+		if self.interpreter and os.path.isdir(self.interpreter):
+			return venv_python(self.interpreter)
+		return self.interpreter or None
+
+	def python_flags(self):
+		flags = ["-" + "O" * self.optimize] if self.optimize else []
+		for option in self.x_options.split():
+			flags += ["-X", option]
+		return flags
+
+	def arguments(self):
+		return shlex.split(self.args, posix=os.name != 'nt')
+
+	def script_path(self, current, project=None):
+		if not self.script:
+			return current
+		return os.path.join(project or os.path.dirname(current or ""), os.path.expanduser(self.script))
+
+	def working_directory(self, script, project=None):
+		if self.cwd:
+			return os.path.join(project or os.path.dirname(script), os.path.expanduser(self.cwd))
+		return project or os.path.dirname(script)
+
+	def environment(self, base=None):
+		"""`base` (os.environ) with the configuration's variables, activated like its venv would be"""
+		env = dict(os.environ if base is None else base)
+		python = self.python()
+		if python:
+			folder = os.path.dirname(os.path.dirname(python))
+			if os.path.isfile(os.path.join(folder, "pyvenv.cfg")):
+				env["VIRTUAL_ENV"] = folder
+				env["PATH"] = os.path.dirname(python) + os.pathsep + env.get("PATH", "")
+				env.pop("PYTHONHOME", None)
+		for key, value in self.env.items():
+			env[key] = os.path.expandvars(value)
+		return env
+
+	def to_config(self):
+		return {field: getattr(self, field) for field in self.FIELDS}
+
+	@classmethod
+	def from_config(cls, entry):
+		return cls(**{field: entry[field] for field in cls.FIELDS if field in entry})
+
+
+class InterpreterFinder:
+	"""Python interpreters worth offering for a project: its venvs, pyenv's versions, the default
+
+	Asking an interpreter its version takes a subprocess, so versions are cached on disk by
+	path and mtime and only new or changed interpreters are asked.
+	"""
+	VENV_DEPTH = 2
+	SKIP = {".git", "node_modules", "__pycache__", ".mypy_cache", ".pytest_cache"}
+
+	def __init__(self, path=None):
+		self.path = path or os.path.join(cache_dir(), "interpreters.json")
+		self.versions = {}  # path -> [mtime, version]
+
+	def load(self):
+		try:
+			with open(self.path, 'r', encoding='utf-8') as f:
+				self.versions = json.load(f)
+		except (OSError, ValueError):
+			self.versions = {}
+		return self
+
+	def save(self):
+		tmp = self.path + ".tmp"
+		with open(tmp, 'w', encoding='utf-8') as f:
+			json.dump(self.versions, f)
+		os.replace(tmp, self.path)
+
+	def candidates(self, project=None):
+		found = []
+		if project:
+			found += self._venvs(project, 0)
+			try:
+				with open(os.path.join(project, ".python-version"), 'r') as f:
+					local = f.read().split()
+			except OSError:
+				local = []
+			found += [python for python in map(self._pyenv_python, local) if python]
+		root = os.environ.get("PYENV_ROOT") or os.path.join(os.path.expanduser("~"), ".pyenv")
+		try:
+			found += [python for python in map(self._pyenv_python, sorted(os.listdir(os.path.join(root, "versions")))) if python]
+		except OSError:
+			pass
+		found += [get_python_executable()] + [python for python in map(shutil.which, ("python3", "python")) if python]
+		seen = set()
+		return [python for python in found if not (python in seen or seen.add(python))]
+
+	def _venvs(self, folder, depth):
+		python = venv_python(folder)
+		if python:
+			return [python]
+		if depth >= self.VENV_DEPTH:
+			return []
+		found = []
+		try:
+			entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+		except OSError:
+			return found
+		for entry in entries:
+			if entry.name not in self.SKIP and entry.is_dir(follow_symlinks=False):
+				found += self._venvs(entry.path, depth + 1)
+		return found
+
+	@staticmethod
+	def _pyenv_python(version):
+		root = os.environ.get("PYENV_ROOT") or os.path.join(os.path.expanduser("~"), ".pyenv")
+		for name in ("python.exe", os.path.join("bin", "python")):
+			python = os.path.join(root, "versions", version, name)
+			if os.path.isfile(python):
+				return python
+		return None
+
+	def version(self, python):
+		try:
+			mtime = os.stat(python).st_mtime
+		except OSError:
+			return None
+		cached = self.versions.get(python)
+		if cached and cached[0] == mtime:
+			return cached[1]
+		import subprocess
+		try:
+			out = subprocess.run([python, "-c", "import sys; print(sys.version.split()[0])"],
+				capture_output=True, text=True, timeout=10).stdout.strip()
+		except (OSError, subprocess.SubprocessError):
+			return None
+		self.versions[python] = [mtime, out]
+		return out or None
+
+	def find(self, project=None):
+		"""[(path, version)] of the interpreters that answer, project venvs first"""
+		found = [(python, self.version(python)) for python in self.candidates(project)]
+		try:
+			self.save()
+		except OSError:
+			pass
+		return [(python, version) for python, version in found if version]
+
+
+_FRAME_HEADER = struct.Struct(">I")
+
+
+def encode_frame(message):
+	"""A message for kernel.py: 4-byte big-endian length, then UTF-8 JSON"""
+	data = json.dumps(message).encode("utf-8")
+	return _FRAME_HEADER.pack(len(data)) + data
+
+
+class FrameDecoder:
+	"""Messages out of a byte stream of frames, fed in whatever pieces the pipe delivers"""
+	def __init__(self):
+		self._buffer = bytearray()
+
+	def feed(self, data):
+		self._buffer += data
+		messages = []
+		pos = 0
+		size = len(self._buffer)
+		while size - pos >= _FRAME_HEADER.size:
+			(length,) = _FRAME_HEADER.unpack_from(self._buffer, pos)
+			end = pos + _FRAME_HEADER.size + length
+			if end > size:
+				break
+			messages.append(json.loads(self._buffer[pos + _FRAME_HEADER.size:end].decode("utf-8")))
+			pos = end
+		del self._buffer[:pos]
+		return messages
+
+
+class ReplHistory:
+	"""Console input history, newest last, with Up/Down style browsing and a file behind it"""
+	def __init__(self, path=None, limit=1000):
+		self.path = path
+		self.limit = limit
+		self.entries = []
+		self._index = 0
+		self._draft = ""
+
+	def load(self):
+		try:
+			with open(self.path, 'r', encoding='utf-8') as f:
+				self.entries = json.load(f)[-self.limit:]
+		except (OSError, ValueError, TypeError):
+			self.entries = []
+		self._index = len(self.entries)
+		return self
+
+	def save(self):
+		if not self.path:
+			return
+		os.makedirs(os.path.dirname(self.path), exist_ok=True)
+		with open(self.path, 'w', encoding='utf-8') as f:
+			json.dump(self.entries[-self.limit:], f)
+
+	def add(self, text):
+		if text.strip() and (not self.entries or self.entries[-1] != text):
+			self.entries.append(text)
+			del self.entries[:-self.limit]
+		self._index = len(self.entries)
+		self._draft = ""
+
+	def previous(self, current):
+		"""The entry before the one shown, `current` is kept as the draft when leaving it"""
+		if self._index == len(self.entries):
+			self._draft = current
+		if self._index > 0:
+			self._index -= 1
+			return self.entries[self._index]
+		return None
+
+	def next(self):
+		if self._index >= len(self.entries):
+			return None
+		self._index += 1
+		return self.entries[self._index] if self._index < len(self.entries) else self._draft
+
+
+TestCase = namedtuple("TestCase", "id path line")  # pytest node id, absolute path, 0-based def line
+
+OUTCOME_RANK = {"passed": 0, "skipped": 1, "failed": 2, "error": 3}
+
+_TEST_FILE = re.compile(r"^(test_.*|.*_test)\.py$")
+
+
+def is_test_file(name):
+	return _TEST_FILE.match(name) is not None
+
+
+def _collect_tests(body, prefix, path, tests):
+	for node in body:
+		if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+			tests.append(TestCase(f"{prefix}::{node.name}", path, node.lineno - 1))
+		elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+			# pytest skips classes with an __init__
+			if not any(isinstance(child, ast.FunctionDef) and child.name == "__init__" for child in node.body):
+				_collect_tests(node.body, f"{prefix}::{node.name}", path, tests)
+
+
+def file_tests(path, root):
+	"""Tests pytest would collect from `path` by its default rules, found in the source
+	without importing it. Parametrized tests are one entry, pytest expands them when it runs.
+
+	A file that doesn't parse is one entry with the file's id, so running it shows the error.
+	"""
+	file_id = os.path.relpath(path, root).replace(os.sep, "/")
+	try:
+		with open(path, 'r', encoding='utf-8', errors='replace') as f:
+			tree = ast.parse(f.read(), path)
+	except SyntaxError as e:
+		return [TestCase(file_id, path, max(0, (e.lineno or 1) - 1))]
+	except (OSError, ValueError):
+		return []
+	tests = []
+	_collect_tests(tree.body, file_id, path, tests)
+	return tests
+
+
+def discover_tests(root, rules, max_files=5000):
+	"""TestCases of every test file under `root` that the ignore rules let through"""
+	tests = []
+	pending = [(root, rules)]
+	files = 0
+	while pending and files < max_files:
+		folder, parent_rules = pending.pop()
+		try:
+			folder_rules = parent_rules.for_directory(folder)
+			entries = scan_directory(folder, folder_rules)
+		except OSError:
+			continue
+		for name, is_dir in entries:
+			path = os.path.join(folder, name)
+			if is_dir:
+				pending.append((path, folder_rules))
+			elif is_test_file(name):
+				files += 1
+				tests += file_tests(path, root)
+	return tests
+
+
+def base_test_id(test_id):
+	"""The id without its parametrization, t.py::test_x[1-2] -> t.py::test_x"""
+	return test_id.split("[", 1)[0]
+
+
+class TestFingerprints:
+	"""A key per test file that changes when it or any project module it imports changes
+
+	Imports are followed through the project (not installed packages), file hashes are
+	memoised by mtime and size so re-keying an unchanged project reads nothing.
+	"""
+	def __init__(self, root):
+		self.root = root
+		self._hashes = {}  # path -> (mtime_ns, size, hash, imported project files)
+
+	def _file(self, path):
+		try:
+			stat = os.stat(path)
+		except OSError:
+			return None
+		cached = self._hashes.get(path)
+		if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+			return cached
+		try:
+			with open(path, 'rb') as f:
+				data = f.read()
+		except OSError:
+			return None
+		digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+		cached = self._hashes[path] = (stat.st_mtime_ns, stat.st_size, digest, self._imports(path, data))
+		return cached
+
+	def _imports(self, path, data):
+		try:
+			tree = ast.parse(data, path)
+		except (SyntaxError, ValueError):
+			return ()
+		names = []
+		for node in ast.walk(tree):
+			if isinstance(node, ast.Import):
+				names += [(alias.name, 0) for alias in node.names]
+			elif isinstance(node, ast.ImportFrom):
+				module = node.module or ""
+				names.append((module, node.level))
+				# `from package import module` imports a file too
+				names += [(f"{module}.{alias.name}" if module else alias.name, node.level) for alias in node.names]
+		files = []
+		# Looked up like pytest's default rootdir/test-folder sys.path entries would
+		folders = (self.root, os.path.dirname(path))
+		for name, level in names:
+			if level:
+				base = path
+				for _ in range(level):
+					base = os.path.dirname(base)
+				bases = (base,)
+			else:
+				bases = folders
+			parts = name.split(".") if name else []
+			for base in bases:
+				stem = os.path.join(base, *parts)
+				# Importing a.b.c runs the __init__ of a and a.b on the way
+				candidates = [os.path.join(base, *parts[:count], "__init__.py") for count in range(1, len(parts))]
+				for candidate in candidates + [stem + ".py", os.path.join(stem, "__init__.py")]:
+					if os.path.isfile(candidate):
+						files.append(candidate)
+		return tuple(sorted(set(files)))
+
+	def key(self, path):
+		"""Hash over `path` and everything it imports from the project, transitively"""
+		seen, stack, parts = set(), [path], []
+		while stack:
+			current = stack.pop()
+			if current in seen:
+				continue
+			seen.add(current)
+			entry = self._file(current)
+			if entry is None:
+				continue
+			parts.append(f"{current}\0{entry[2]}")
+			stack += entry[3]
+		return hashlib.blake2b("\n".join(sorted(parts)).encode(), digest_size=8).hexdigest()
+
+
+def file_digest(path):
+	"""Short hash of a file's bytes, None when it can't be read"""
+	try:
+		with open(path, 'rb') as f:
+			return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+	except OSError:
+		return None
+
+
+class LineCoverage:
+	"""Coverage of one version of a file: a bit per line for "has code" and for "ran"
+
+	Bit n is 0-based line n, so the gutter reads a line's state with two byte lookups.
+	"""
+	__slots__ = ("hash", "executable", "executed")
+
+	def __init__(self, hash, executable=b"", executed=b""):
+		self.hash = hash
+		self.executable = bytearray(executable)
+		self.executed = bytearray(executed)
+
+	@staticmethod
+	def _set(bitmap, lines):
+		for line in lines:
+			index = line >> 3
+			if index >= len(bitmap):
+				bitmap.extend(bytes(index + 1 - len(bitmap)))
+			bitmap[index] |= 1 << (line & 7)
+
+	def add(self, executable, executed):
+		"""Merge a run's 1-based line numbers in"""
+		self._set(self.executable, (line - 1 for line in executable))
+		self._set(self.executed, (line - 1 for line in executed))
+
+	def state(self, line):
+		"""True if the line ran, False if it has code that didn't, None if there's no code on it"""
+		index = line >> 3
+		if index >= len(self.executable) or not self.executable[index] >> (line & 7) & 1:
+			return None
+		return index < len(self.executed) and bool(self.executed[index] >> (line & 7) & 1)
+
+	def counts(self):
+		"""(executed, executable) lines"""
+		return (
+			sum(bin(byte).count("1") for byte in self.executed),
+			sum(bin(byte).count("1") for byte in self.executable),
+		)
+
+	def to_config(self):
+		return {
+			"hash": self.hash,
+			"executable": base64.b64encode(bytes(self.executable)).decode("ascii"),
+			"executed": base64.b64encode(bytes(self.executed)).decode("ascii"),
+		}
+
+	@classmethod
+	def from_config(cls, data):
+		return cls(data["hash"], base64.b64decode(data["executable"]), base64.b64decode(data["executed"]))
+
+
+class CoverageData:
+	"""Line coverage of a project's files, merged over runs until a file's content changes"""
+	def __init__(self, path):
+		self.path = path
+		self.files = {}  # path -> LineCoverage
+
+	@classmethod
+	def for_project(cls, root):
+		name = hashlib.blake2b(os.path.abspath(root).encode(), digest_size=8).hexdigest()
+		return cls(os.path.join(cache_dir(), f"coverage-{name}.json")).load()
+
+	def load(self):
+		try:
+			with open(self.path, 'r', encoding='utf-8') as f:
+				self.files = {path: LineCoverage.from_config(data) for path, data in json.load(f).items()}
+		except (OSError, ValueError, TypeError, KeyError):
+			self.files = {}
+		return self
+
+	def save(self):
+		tmp = self.path + ".tmp"
+		with open(tmp, 'w', encoding='utf-8') as f:
+			json.dump({path: coverage.to_config() for path, coverage in self.files.items()}, f)
+		os.replace(tmp, self.path)
+
+	def merge_report(self, report):
+		"""Add a coverage_run.py report, returns the paths it covered"""
+		for path, data in report.items():
+			coverage = self.files.get(path)
+			if coverage is None or coverage.hash != data["hash"]:
+				# The file changed since the runs we have, they don't apply any more
+				coverage = self.files[path] = LineCoverage(data["hash"])
+			coverage.add(data["executable"], data["executed"])
+		return list(report)
+
+	def get(self, path):
+		"""Coverage of `path` as it is on disk now, dropped if the file changed since"""
+		coverage = self.files.get(path)
+		if coverage is not None and coverage.hash != file_digest(path):
+			del self.files[path]
+			coverage = None
+		return coverage
+
+	def clear(self):
+		self.files = {}
+
+
+class TestResultCache:
+	"""The last outcome and duration of every test id, with the key of its file at the time
+
+	A test whose file key changed since (see TestFingerprints) is affected; failed and
+	affected tests are what "run failed" and "run affected" pick.
+	"""
+	def __init__(self, path):
+		self.path = path
+		self.results = {}  # id -> {"outcome", "duration", "key", "text", "message", "crash"}
+
+	@classmethod
+	def for_project(cls, root):
+		name = hashlib.blake2b(os.path.abspath(root).encode(), digest_size=8).hexdigest()
+		return cls(os.path.join(cache_dir(), f"tests-{name}.json")).load()
+
+	def load(self):
+		try:
+			with open(self.path, 'r', encoding='utf-8') as f:
+				self.results = json.load(f)
+		except (OSError, ValueError, TypeError):
+			self.results = {}
+		return self
+
+	def save(self):
+		tmp = self.path + ".tmp"
+		with open(tmp, 'w', encoding='utf-8') as f:
+			json.dump(self.results, f)
+		os.replace(tmp, self.path)
+
+	def record(self, test_id, outcome, duration, key, text="", message="", crash=None):
+		self.results[test_id] = {
+			"outcome": outcome, "duration": duration, "key": key, "text": text, "message": message, "crash": crash
+		}
+
+	def forget(self, path_id):
+		"""Drop the results of a test file, by its id ("a/test_x.py"), before it's re-run"""
+		prefix = path_id + "::"
+		for test_id in [test_id for test_id in self.results if test_id == path_id or test_id.startswith(prefix)]:
+			del self.results[test_id]
+
+	def matching(self, test_id):
+		"""(id, result) of the test and each of its parametrizations"""
+		return list(self._matching(test_id))
+
+	def outcome(self, test_id):
+		"""Worst outcome of the test and its parametrizations, None if it never ran"""
+		worst = None
+		for _, result in self._matching(test_id):
+			if worst is None or OUTCOME_RANK[result["outcome"]] > OUTCOME_RANK[worst]:
+				worst = result["outcome"]
+		return worst
+
+	def _matching(self, test_id):
+		result = self.results.get(test_id)
+		if result is not None:
+			yield test_id, result
+		prefix = test_id + "["
+		for result_id, result in self.results.items():
+			if result_id.startswith(prefix):
+				yield result_id, result
+
+	def duration(self, test_id):
+		return sum(result["duration"] for _, result in self._matching(test_id))
+
+	def failed(self, tests):
+		return [test for test in tests if self.outcome(test.id) in ("failed", "error")]
+
+	def affected(self, tests, keys):
+		"""Tests that never ran or whose file key changed since they did, `keys` by path"""
+		affected = []
+		for test in tests:
+			results = [result for _, result in self._matching(test.id)]
+			if not results or any(result["key"] != keys.get(test.path) for result in results):
+				affected.append(test)
+		return affected
+
+
+class PdbSession:
+	"""pdb commands for a BreakpointSet and parsing of what pdb prints
+
+	The process itself is owned by the UI, this only turns breakpoints into commands and
+	output lines into events: ("stop", line, breakpoint or None), ("set", line, number),
+	("finished",) or ("output", text) for everything the program printed.
+	"""
+	PROMPT = "(Pdb) "
+	STOP = re.compile(r"^> (.+)\((\d+)\)")
+	SET = re.compile(r"^Breakpoint (\d+) at (.+):(\d+)$")
+	FINISHED = ("The program finished and will be restarted", "Running 'cont' or 'step' will restart the program")
+
+	def __init__(self, script, breakpoints):
+		self.script = script
+		self.breakpoints = breakpoints
+		self.numbers = {}  # line -> pdb breakpoint number
+		self.current = None
+		self._started = False
+		self._next_number = 1
+
+	def break_commands(self, line, breakpoint):
+		command = f"break {self.script}:{line + 1}"
+		if breakpoint.condition:
+			command += f", {breakpoint.condition}"
+		# pdb numbers breakpoints in the order they are set, the ignore count needs the number
+		# before the program runs on, so it's predicted here and corrected from pdb's reply
+		number = self.numbers[line] = self._next_number
+		self._next_number += 1
+		if breakpoint.ignore:
+			return [command, f"ignore {number} {breakpoint.ignore}"]
+		return [command]
+
+	def clear_commands(self, line):
+		number = self.numbers.pop(line, None)
+		return [f"clear {number}"] if number is not None else []
+
+	def start_commands(self):
+		self.breakpoints.reset_hits()
+		commands = []
+		for line, breakpoint in self.breakpoints.items():
+			commands += self.break_commands(line, breakpoint)
+		return commands + ["continue"]
+
+	def update_commands(self, line):
+		"""Commands that bring pdb in line with the breakpoint (or its absence) on `line`"""
+		commands = self.clear_commands(line)
+		breakpoint = self.breakpoints.get(line)
+		if breakpoint is not None:
+			commands += self.break_commands(line, breakpoint)
+		return commands
+
+	def feed(self, text):
+		"""Event for one line of pdb output, None for pdb chatter the console doesn't need"""
+		while text.startswith(self.PROMPT):
+			text = text[len(self.PROMPT):]
+		if not text:
+			return None
+		match = self.STOP.match(text)
+		if match and os.path.abspath(match.group(1)) == os.path.abspath(self.script):
+			line = int(match.group(2)) - 1
+			self.current = line
+			if not self._started:
+				# pdb stops on the first line before our `continue` is read
+				self._started = True
+				return None
+			breakpoint = self.breakpoints.get(line)
+			if breakpoint is not None:
+				breakpoint.hits += 1
+			return ("stop", line, breakpoint)
+		if match or text.startswith("-> "):
+			return ("location", text)
+		match = self.SET.match(text)
+		if match:
+			line, number = int(match.group(3)) - 1, int(match.group(1))
+			self.numbers[line] = number
+			self._next_number = number + 1
+			return ("set", line, number)
+		if text.startswith(self.FINISHED):
+			return ("finished",)
+		if text.startswith("Deleted breakpoint"):
+			return None
+		return ("output", text)
+
+
+AnsiStyle = namedtuple("AnsiStyle", "fg bg bold italic underline inverse")
+AnsiStyle.DEFAULT = AnsiStyle(None, None, False, False, False, False)
+
+# The 16 basic colours (normal then bright), as most dark terminal themes draw them
+ANSI_PALETTE = (
+	"#1E1E1E", "#F44747", "#A8CC7C", "#EBC88D", "#6CA0DC", "#E394DC", "#83D6C5", "#CCCCCC",
+	"#6D6D6D", "#FF6B6B", "#C3E88D", "#F8C762", "#87C3FF", "#F0A8EB", "#A8E8DC", "#FFFFFF",
+)
+
+
+def ansi_color(color):
+	"""'#rrggbb' for a palette index (0-255) or an (r, g, b) tuple"""
+	if isinstance(color, tuple):
+		return "#%02x%02x%02x" % color
+	if color < 16:
+		return ANSI_PALETTE[color]
+	if color < 232:
+		# 6x6x6 cube
+		r, g, b = (color - 16) // 36, (color - 16) // 6 % 6, (color - 16) % 6
+		return "#%02x%02x%02x" % tuple(0 if c == 0 else 55 + 40 * c for c in (r, g, b))
+	grey = 8 + 10 * (color - 232)
+	return "#%02x%02x%02x" % (grey, grey, grey)
+
+
+# CSI sequences (SGR is the `m` one), OSC strings and two-character escapes
+_ANSI_ESCAPE = re.compile(r"\x1b(?:\[([0-9;:?<=>]*)[ -/]*([@-~])|\][^\x07\x1b]*(?:\x07|\x1b\\)|[@-Z\\^_])")
+_TRACEBACK_FRAME = re.compile(r'^[ \t]*(File "([^"\n<][^"\n]*)", line (\d+))', re.M)
+
+
+class AnsiStreamParser:
+	"""Process output in, (text, AnsiStyle, link) runs out, one call per chunk as it arrives
+
+	Chunks can split anything: UTF-8 sequences are decoded incrementally, an unfinished
+	escape sequence waits for the next chunk and so does an unfinished line that may be a
+	traceback `File "...", line N` frame, whose (path, line) becomes the run's link. Other
+	unfinished lines (prompts) go out at once, a frame only counts at the start of a line.
+	A lone \r starts the line over, like a terminal's progress bar; a ("\r", style, None)
+	run asks the console to clear the line it already shows.
+	Output is runs, not characters: a chunk without escapes or frames is a single run.
+	"""
+	MAX_PENDING = 4096  # give up waiting for an escape or a frame line after this much
+
+	def __init__(self, encoding="utf-8"):
+		self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+		self._pending = ""
+		self._at_line_start = True  # whether the output so far ends with a newline
+		self.style = AnsiStyle.DEFAULT
+		self._transitions = {}  # (style, SGR parameters) -> style, programs repeat the same few
+
+	def feed(self, data):
+		if isinstance(data, bytes):
+			data = self._decoder.decode(data)
+		text = self._pending + data
+		held = ""
+		if "\r" in text:
+			text = text.replace("\r\n", "\n")
+			if text.endswith("\r"):
+				# May be the first half of a \r\n
+				text, held = text[:-1], "\r"
+		self._pending, text = self._split_pending(text)
+		self._pending += held
+		if len(self._pending) > self.MAX_PENDING:
+			self._pending, text = "", text + self._pending
+		return self._runs(text)
+
+	def flush(self):
+		"""Runs for whatever was held back, once the process has finished"""
+		text = self._pending + self._decoder.decode(b"", final=True)
+		self._pending = ""
+		return self._runs(text)
+
+	def _split_pending(self, text):
+		"""(held back, ready) parts of `text`"""
+		hold = len(text)
+		escape = text.rfind("\x1b")
+		if escape >= 0 and _ANSI_ESCAPE.match(text, escape) is None:
+			hold = escape
+		line = text.rfind("\n", 0, hold) + 1
+		if line < len(text):
+			tail = text[line:hold]
+			code = (_ANSI_ESCAPE.sub("", tail) if "\x1b" in tail else tail).lstrip(" \t")
+			if code.startswith('File "') or 'File "'.startswith(code):
+				hold = line
+		return text[hold:], text[:hold]
+
+	def _carriage_returns(self, text):
+		"""`text` with every line cut to what follows its last \r, and whether the console's
+		unfinished line is overwritten too"""
+		lines = text.split("\n")
+		clear = False
+		for i, line in enumerate(lines):
+			# A trailing \r moves the cursor but doesn't erase anything yet
+			line = line.rstrip("\r")
+			cut = line.rfind("\r")
+			if cut >= 0:
+				dropped = line[:cut]
+				# Colours set in the overwritten part still apply to what follows
+				escapes = "".join(m.group() for m in _ANSI_ESCAPE.finditer(dropped)) if "\x1b" in dropped else ""
+				line = escapes + line[cut + 1:]
+				clear = clear or (i == 0 and not self._at_line_start)
+			lines[i] = line
+		return "\n".join(lines), clear
+
+	def _runs(self, text):
+		if not text:
+			return []
+		clear = False
+		if "\r" in text:
+			text, clear = self._carriage_returns(text)
+		at_line_start = self._at_line_start or clear
+		tail = text[text.rfind("\n") + 1:]
+		self._at_line_start = not tail or ("\x1b" in tail and not _ANSI_ESCAPE.sub("", tail))
+		runs = self._style_runs(text)
+		if "File " in text:
+			plain = "".join(run for run, _, _ in runs)
+			# ^ is the start of the chunk too, a frame there only counts if it's a line's start
+			links = [
+				(m.start(1), m.end(1), (m.group(2), int(m.group(3))))
+				for m in _TRACEBACK_FRAME.finditer(plain) if m.start() or at_line_start
+			]
+			runs = self._link(runs, links)
+		return [("\r", self.style, None)] + runs if clear else runs
+
+	def _style_runs(self, text):
+		if not text:
+			return []
+		if "\x1b" not in text:
+			runs = [(text, self.style, None)]
+		else:
+			# split() keeps the two groups, so parts go text, parameters, final byte, text...
+			parts = _ANSI_ESCAPE.split(text)
+			style = self.style
+			runs = [(parts[0], style, None)] if parts[0] else []
+			transitions = self._transitions
+			for i in range(1, len(parts), 3):
+				if parts[i + 1] == "m":
+					key = (style, parts[i])
+					style = transitions.get(key)
+					if style is None:
+						style = transitions[key] = self._sgr(*key)
+				if parts[i + 2]:
+					runs.append((parts[i + 2], style, None))
+			self.style = style
+		return runs
+
+	@staticmethod
+	def _link(runs, links):
+		"""Split runs at the link spans (offsets into their joined text)"""
+		out = []
+		offset = 0
+		links = iter(links)
+		link = next(links, None)
+		for run, style, _ in runs:
+			end = offset + len(run)
+			pos = offset
+			while link is not None and link[0] < end:
+				start, stop, target = link
+				if start > pos:
+					out.append((run[pos - offset:start - offset], style, None))
+					pos = start
+				upto = min(stop, end)
+				out.append((run[pos - offset:upto - offset], style, target))
+				pos = upto
+				if stop > end:
+					break
+				link = next(links, None)
+			if pos < end:
+				out.append((run[pos - offset:], style, None))
+			offset = end
+		return out
+
+	@staticmethod
+	def _sgr(style, params):
+		"""The style after an SGR sequence's parameters"""
+		codes = [int(code) if code.isdigit() else 0 for code in params.replace(":", ";").split(";")]
+		i = 0
+		while i < len(codes):
+			code = codes[i]
+			if code == 0:
+				style = AnsiStyle.DEFAULT
+			elif code == 1:
+				style = style._replace(bold=True)
+			elif code == 22:
+				style = style._replace(bold=False)
+			elif code == 3:
+				style = style._replace(italic=True)
+			elif code == 23:
+				style = style._replace(italic=False)
+			elif code == 4:
+				style = style._replace(underline=True)
+			elif code == 24:
+				style = style._replace(underline=False)
+			elif code == 7:
+				style = style._replace(inverse=True)
+			elif code == 27:
+				style = style._replace(inverse=False)
+			elif 30 <= code <= 37 or 90 <= code <= 97:
+				style = style._replace(fg=code - 30 if code < 90 else code - 82)
+			elif 40 <= code <= 47 or 100 <= code <= 107:
+				style = style._replace(bg=code - 40 if code < 100 else code - 92)
+			elif code == 39:
+				style = style._replace(fg=None)
+			elif code == 49:
+				style = style._replace(bg=None)
+			elif code in (38, 48) and i + 1 < len(codes):
+				# 38;5;n (256 colours) or 38;2;r;g;b (true colour)
+				if codes[i + 1] == 5 and i + 2 < len(codes):
+					color = codes[i + 2] & 0xFF
+					i += 2
+				elif codes[i + 1] == 2 and i + 4 < len(codes):
+					color = tuple(c & 0xFF for c in codes[i + 2:i + 5])
+					i += 4
+				else:
+					break
+				style = style._replace(**{"fg" if code == 38 else "bg": color})
+			i += 1
+		return style
@@ -0,0 +1,130 @@
+"""Runs a script with line coverage, as `python coverage_run.py OUTPUT script.py args...`
+
+At exit OUTPUT gets {path: {"hash": ..., "executable": [lines], "executed": [lines]}} for
+every file outside the interpreter's own folders that ran. Lines are 1-based, the hash is
+of the file's bytes so the IDE can tell when coverage no longer matches the file.
+
+On 3.12+ lines are counted with sys.monitoring and each line's event is disabled after
+its first hit, so covered code runs at full speed afterwards. Older Pythons fall back to
+sys.settrace, which only traces frames of the files being measured.
+Stdlib only: it runs under whatever interpreter the project uses.
+"""
+import atexit
+import dis
+import hashlib
+import json
+import os
+import runpy
+import sys
+import sysconfig
+import threading
+
+_EXCLUDED = tuple({
+	os.path.join(os.path.abspath(path), "")
+	for path in (
+		sys.prefix, sys.base_prefix, sys.exec_prefix,
+		sysconfig.get_paths().get("stdlib", sys.prefix), sysconfig.get_paths().get("purelib", sys.prefix),
+	)
+})
+_SELF = os.path.abspath(__file__)
+
+
+class LineRecorder:
+	def __init__(self):
+		self.lines = {}  # path -> set of executed lines
+		self._wanted = {}  # co_filename -> path, or None when it isn't measured
+
+	def measured(self, filename):
+		"""The file's absolute path when its lines count, else None, decided once per name"""
+		try:
+			return self._wanted[filename]
+		except KeyError:
+			pass
+		path = os.path.abspath(filename)
+		if filename.startswith("<") or path.startswith(_EXCLUDED) or path == _SELF or "site-packages" in path:
+			path = None
+		self._wanted[filename] = path
+		return path
+
+	def start(self):
+		monitoring = getattr(sys, "monitoring", None)
+		if monitoring is not None:
+			tool = monitoring.COVERAGE_ID
+			monitoring.use_tool_id(tool, "snakeide")
+			monitoring.register_callback(tool, monitoring.events.LINE, self._on_line)
+			monitoring.set_events(tool, monitoring.events.LINE)
+		else:
+			sys.settrace(self._trace_call)
+			threading.settrace(self._trace_call)
+
+	def _on_line(self, code, line):
+		path = self.measured(code.co_filename)
+		if path is not None:
+			self.lines.setdefault(path, set()).add(line)
+		# Seen once is all coverage needs, the line runs untraced from now on
+		return sys.monitoring.DISABLE
+
+	def _trace_call(self, frame, event, arg):
+		path = self.measured(frame.f_code.co_filename)
+		if path is None:
+			return None
+		lines = self.lines.setdefault(path, set())
+
+		def trace_line(frame, event, arg):
+			if event == "line":
+				lines.add(frame.f_lineno)
+			return trace_line
+		return trace_line
+
+	def stop(self):
+		monitoring = getattr(sys, "monitoring", None)
+		if monitoring is not None:
+			monitoring.set_events(monitoring.COVERAGE_ID, 0)
+			monitoring.free_tool_id(monitoring.COVERAGE_ID)
+		else:
+			sys.settrace(None)
+			threading.settrace(None)
+
+	def write(self, output):
+		self.stop()
+		report = {}
+		for path, lines in self.lines.items():
+			try:
+				with open(path, 'rb') as f:
+					data = f.read()
+				executable = executable_lines(compile(data, path, "exec"))
+			except (OSError, SyntaxError, ValueError):
+				continue
+			report[path] = {
+				"hash": hashlib.blake2b(data, digest_size=8).hexdigest(),
+				"executable": sorted(executable),
+				"executed": sorted(lines & executable),
+			}
+		with open(output, 'w', encoding='utf-8') as f:
+			json.dump(report, f)
+
+
+def executable_lines(code):
+	"""Lines with bytecode in `code` and every function and class nested in it"""
+	lines = set()
+	stack = [code]
+	while stack:
+		code = stack.pop()
+		lines.update(line for _, line in dis.findlinestarts(code) if line)
+		stack += [const for const in code.co_consts if hasattr(const, "co_code")]
+	return lines
+
+
+def main():
+	output, script = sys.argv[1], sys.argv[2]
+	# The script sees the command line it would have had without us
+	sys.argv = sys.argv[2:]
+	sys.path[0] = os.path.dirname(os.path.abspath(script))
+	recorder = LineRecorder()
+	atexit.register(recorder.write, output)
+	recorder.start()
+	runpy.run_path(script, run_name="__main__")
+
+
+if __name__ == '__main__':
+	main()
@@ -1,160 +1,262 @@
-from PySide6.QtGui import QTextCharFormat, QColor, QFont, QSyntaxHighlighter
-from PySide6.QtCore import Qt
-from pygments.lexers import PythonLexer
-from pygments.token import Token, STANDARD_TYPES
-from pygments import lex
-
-class PythonHighlighter(QSyntaxHighlighter):
-    def __init__(self, document):
-        super().__init__(document)
-        self.lexer = PythonLexer()
-        self.formats = self._initialize_formats()
-
-    def _initialize_formats(self):
-        # Fleet Dark Modern theme colors
-        colors = {
-            # Core syntax
-            Token.Comment: "#6D6D6D",
-            Token.Keyword: "#83D6C5",
-            Token.Name: "#D6D6DD",
-            Token.String: "#E394DC",
-            Token.Number: "#EBC88D",
-            Token.Operator: "#D6D6DD",
-            Token.Punctuation: "#D6D6DD",
-            
-            # Keyword subtypes
-            Token.Keyword.Constant: "#82D2CE",     # True, False, None
-            Token.Keyword.Declaration: "#83D6C5",   # def, class
-            Token.Keyword.Namespace: "#83D6C5",     # import, from
-            Token.Keyword.Pseudo: "#83D6C5",        # self, cls
-            Token.Keyword.Reserved: "#83D6C5",      # reserved keywords
-            Token.Keyword.Type: "#EFB080",          # type annotations
-            
-            # Name subtypes
-            Token.Name.Attribute: "#AAA0FA",        # object.attribute
-            Token.Name.Builtin: "#AAA0FA",          # builtin functions
-            Token.Name.Builtin.Pseudo: ("#D6D6DD", False, True),   # __magic__ methods
-            Token.Name.Class: "#87C3FF",            # class names
-            Token.Name.Constant: "#F8C762",         # constants
-            Token.Name.Decorator: "#A8CC7C",        # decorators
-            Token.Name.Entity: "#EFB080",           # HTML entities
-            Token.Name.Exception: "#87C3FF",        # exceptions
-            Token.Name.Function: "#AAA0FA",         # function names
-            Token.Name.Function.Magic: ("#D6D6DD", True, False),   # __init__ etc.
-            Token.Name.Label: "#D6D6DD",            # labels
-            Token.Name.Namespace: "#D1D1D1",        # namespaces
-            Token.Name.Other: "#D6D6DD",            # other names
-            Token.Name.Property: "#AAA0FA",         # properties
-            Token.Name.Tag: "#87C3FF",              # HTML tags
-            Token.Name.Variable: "#D6D6DD",         # variables
-            Token.Name.Variable.Class: "#D6D6DD",   # class variables
-            Token.Name.Variable.Global: "#D6D6DD",  # global variables
-            Token.Name.Variable.Instance: "#D6D6DD",# instance variables
-            Token.Name.Variable.Magic: ("#D6D6DD", True, False),   # __name__ etc.
-            
-            # String subtypes
-            Token.String.Affix: "#E394DC",          # f-string prefixes
-            Token.String.Backtick: "#E394DC",        # backtick strings
-            Token.String.Char: "#E394DC",            # character literals
-            Token.String.Delimiter: "#D6D6DD",       # string delimiters
-            Token.String.Doc: "#E394DC",             # docstrings
-            Token.String.Double: "#E394DC",          # double-quoted strings
-            Token.String.Escape: "#D6D6DD",          # escape sequences
-            Token.String.Heredoc: "#E394DC",         # heredocs
-            Token.String.Interpol: "#83D6C5",        # f-string expressions
-            Token.String.Other: "#E394DC",           # other strings
-            Token.String.Regex: "#E394DC",           # regex patterns
-            Token.String.Single: "#E394DC",          # single-quoted strings
-            Token.String.Symbol: "#E394DC",          # symbols
-            
-            # Number subtypes
-            Token.Number.Bin: "#EBC88D",             # binary literals
-            Token.Number.Float: "#EBC88D",           # floats
-            Token.Number.Hex: "#EBC88D",             # hex literals
-            Token.Number.Integer: "#EBC88D",         # integers
-            Token.Number.Integer.Long: "#EBC88D",    # long integers
-            Token.Number.Oct: "#EBC88D",             # octal literals
-            
-            # Operator subtypes
-            Token.Operator.Word: "#83D6C5",          # and, or, not
-            
-            # Comment subtypes
-            Token.Comment.Hashbang: "#6D6D6D",       # hashbangs
-            Token.Comment.Multiline: "#6D6D6D",      # multiline comments
-            Token.Comment.Preproc: "#6D6D6D",        # preprocessor comments
-            Token.Comment.Single: "#6D6D6D",         # single-line comments
-            Token.Comment.Special: "#6D6D6D",        # special comments
-            
-            # Generic subtypes
-            Token.Generic.Deleted: "#F44747",        # deleted text
-            Token.Generic.Emph: "#D6D6DD",           # emphasis
-            Token.Generic.Error: "#F44747",          # errors
-            Token.Generic.Heading: "#87C3FF",        # headings
-            Token.Generic.Inserted: "#A8CC7C",       # inserted text
-            Token.Generic.Output: "#D6D6DD",         # output text
-            Token.Generic.Prompt: "#6D6D6D",         # prompts
-            Token.Generic.Strong: "#D6D6DD",         # strong emphasis
-            Token.Generic.Subheading: "#87C3FF",     # subheadings
-            Token.Generic.Traceback: "#D6D6DD",      # tracebacks
-            
-            # Text
-            Token.Text: "#CCCCCC",                   # plain text
-            Token.Text.Whitespace: "#3C3C3C",        # whitespace
-        }
-        
-        formats = {}
-        
-        # Create formats for all standard tokens
-        for token_type in STANDARD_TYPES:
-            # Get color or use default foreground
-            fmt = colors.get(token_type, "#CCCCCC")
-            if isinstance(fmt, str):
-                color = fmt
-                italic=False
-                bold=False
-            else:
-                color = fmt[0]
-                italic = fmt[1]
-                bold = fmt[2]
-            
-            # Comments should be italic
-            if token_type in Token.Comment.subtypes or token_type is Token.Comment:
-                italic = True
-            
-            # Decorators and type hints should be bold
-            if token_type in (Token.Name.Decorator, Token.Keyword.Type):
-                bold = True
-            
-            formats[token_type] = self._format(color, bold, italic)
-        
-        return formats
-
-    def _format(self, color, bold=False, italic=False):
-        fmt = QTextCharFormat()
-        fmt.setForeground(QColor(color))
-        if bold:
-            fmt.setFontWeight(QFont.Weight.Bold)
-        if italic:
-            fmt.setFontItalic(True)
-        return fmt
-
-    def _resolve_format(self, token_type):
-        """Resolve token format using Pygments' token hierarchy"""
-        while token_type not in self.formats and token_type.parent:
-            token_type = token_type.parent
-        return self.formats.get(token_type, None)
-
-    def highlightBlock(self, text):
-        # Tokenize with position tracking
-        tokens = list(lex(text, self.lexer))
-        index = 0
-        
-        for token, value in tokens:
-            length = len(value)
-            token_format = self._resolve_format(token)
-            
-            if token_format:
-                # Apply format to the exact token position
-                self.setFormat(index, length, token_format)
-            
-            index += length
\ No newline at end of file
+from PySide6.QtGui import QTextCharFormat, QColor, QFont, QSyntaxHighlighter
+from PySide6.QtCore import Qt, QTimer
+from pygments.token import Token, STANDARD_TYPES
+from core import python_lexer, tokenize_line, traced
+
+class PythonHighlighter(QSyntaxHighlighter):
+    # Lines lexed per event loop turn besides the ones in view. The rest of a big change (a
+    # file opening, a keystroke at thousands of carets) is left STALE and caught up when idle;
+    # lines are lexed on their own, so that's safe in any order
+    LEX_BUDGET = 300
+    STALE = -2
+
+    def __init__(self, document):
+        super().__init__(document)
+        self.lexer = python_lexer()
+        self.formats = self._initialize_formats()
+        self._resolved = {}
+        self._runs = {}
+        self._colors = {}
+        self.views = []  # editors showing the document, what they show never stays stale
+        self._budget = self.LEX_BUDGET
+        self._shown = None
+        self._stale = None  # (first, last) lines that may still be stale
+        self._turn = QTimer(self)
+        self._turn.setSingleShot(True)
+        self._turn.setInterval(0)
+        self._turn.timeout.connect(self._catch_up)
+
+    def add_view(self, editor):
+        self.views.append(editor)
+        # Scrolling can bring stale lines into view
+        editor.verticalScrollBar().valueChanged.connect(lambda _value: self._turn.start())
+        editor.destroyed.connect(lambda *_: self.views.remove(editor))
+
+    def _initialize_formats(self):
+        # Fleet Dark Modern theme colors
+        colors = {
+            # Core syntax
+            Token.Comment: "#6D6D6D",
+            Token.Keyword: "#83D6C5",
+            Token.Name: "#D6D6DD",
+            Token.String: "#E394DC",
+            Token.Number: "#EBC88D",
+            Token.Operator: "#D6D6DD",
+            Token.Punctuation: "#D6D6DD",
+            
+            # Keyword subtypes
+            Token.Keyword.Constant: "#82D2CE",     # True, False, None
+            Token.Keyword.Declaration: "#83D6C5",   # def, class
+            Token.Keyword.Namespace: "#83D6C5",     # import, from
+            Token.Keyword.Pseudo: "#83D6C5",        # self, cls
+            Token.Keyword.Reserved: "#83D6C5",      # reserved keywords
+            Token.Keyword.Type: "#EFB080",          # type annotations
+            
+            # Name subtypes
+            Token.Name.Attribute: "#AAA0FA",        # object.attribute
+            Token.Name.Builtin: "#AAA0FA",          # builtin functions
+            Token.Name.Builtin.Pseudo: ("#D6D6DD", False, True),   # __magic__ methods
+            Token.Name.Class: "#87C3FF",            # class names
+            Token.Name.Constant: "#F8C762",         # constants
+            Token.Name.Decorator: "#A8CC7C",        # decorators
+            Token.Name.Entity: "#EFB080",           # HTML entities
+            Token.Name.Exception: "#87C3FF",        # exceptions
+            Token.Name.Function: "#AAA0FA",         # function names
+            Token.Name.Function.Magic: ("#D6D6DD", True, False),   # __init__ etc.
+            Token.Name.Label: "#D6D6DD",            # labels
+            Token.Name.Namespace: "#D1D1D1",        # namespaces
+            Token.Name.Other: "#D6D6DD",            # other names
+            Token.Name.Property: "#AAA0FA",         # properties
+            Token.Name.Tag: "#87C3FF",              # HTML tags
+            Token.Name.Variable: "#D6D6DD",         # variables
+            Token.Name.Variable.Class: "#D6D6DD",   # class variables
+            Token.Name.Variable.Global: "#D6D6DD",  # global variables
+            Token.Name.Variable.Instance: "#D6D6DD",# instance variables
+            Token.Name.Variable.Magic: ("#D6D6DD", True, False),   # __name__ etc.
+            
+            # String subtypes
+            Token.String.Affix: "#E394DC",          # f-string prefixes
+            Token.String.Backtick: "#E394DC",        # backtick strings
+            Token.String.Char: "#E394DC",            # character literals
+            Token.String.Delimiter: "#D6D6DD",       # string delimiters
+            Token.String.Doc: "#E394DC",             # docstrings
+            Token.String.Double: "#E394DC",          # double-quoted strings
+            Token.String.Escape: "#D6D6DD",          # escape sequences
+            Token.String.Heredoc: "#E394DC",         # heredocs
+            Token.String.Interpol: "#83D6C5",        # f-string expressions
+            Token.String.Other: "#E394DC",           # other strings
+            Token.String.Regex: "#E394DC",           # regex patterns
+            Token.String.Single: "#E394DC",          # single-quoted strings
+            Token.String.Symbol: "#E394DC",          # symbols
+            
+            # Number subtypes
+            Token.Number.Bin: "#EBC88D",             # binary literals
+            Token.Number.Float: "#EBC88D",           # floats
+            Token.Number.Hex: "#EBC88D",             # hex literals
+            Token.Number.Integer: "#EBC88D",         # integers
+            Token.Number.Integer.Long: "#EBC88D",    # long integers
+            Token.Number.Oct: "#EBC88D",             # octal literals
+            
+            # Operator subtypes
+            Token.Operator.Word: "#83D6C5",          # and, or, not
+            
+            # Comment subtypes
+            Token.Comment.Hashbang: "#6D6D6D",       # hashbangs
+            Token.Comment.Multiline: "#6D6D6D",      # multiline comments
+            Token.Comment.Preproc: "#6D6D6D",        # preprocessor comments
+            Token.Comment.Single: "#6D6D6D",         # single-line comments
+            Token.Comment.Special: "#6D6D6D",        # special comments
+            
+            # Generic subtypes
+            Token.Generic.Deleted: "#F44747",        # deleted text
+            Token.Generic.Emph: "#D6D6DD",           # emphasis
+            Token.Generic.Error: "#F44747",          # errors
+            Token.Generic.Heading: "#87C3FF",        # headings
+            Token.Generic.Inserted: "#A8CC7C",       # inserted text
+            Token.Generic.Output: "#D6D6DD",         # output text
+            Token.Generic.Prompt: "#6D6D6D",         # prompts
+            Token.Generic.Strong: "#D6D6DD",         # strong emphasis
+            Token.Generic.Subheading: "#87C3FF",     # subheadings
+            Token.Generic.Traceback: "#D6D6DD",      # tracebacks
+            
+            # Text
+            Token.Text: "#CCCCCC",                   # plain text
+            Token.Text.Whitespace: "#3C3C3C",        # whitespace
+        }
+        
+        formats = {}
+        
+        # Create formats for all standard tokens
+        for token_type in STANDARD_TYPES:
+            # Get color or use default foreground
+            fmt = colors.get(token_type, "#CCCCCC")
+            if isinstance(fmt, str):
+                color = fmt
+                italic=False
+                bold=False
+            else:
+                color = fmt[0]
+                italic = fmt[1]
+                bold = fmt[2]
+            
+            # Comments should be italic
+            if token_type in Token.Comment.subtypes or token_type is Token.Comment:
+                italic = True
+            
+            # Decorators and type hints should be bold
+            if token_type in (Token.Name.Decorator, Token.Keyword.Type):
+                bold = True
+            
+            formats[token_type] = self._format(color, bold, italic)
+        
+        return formats
+
+    def _format(self, color, bold=False, italic=False):
+        fmt = QTextCharFormat()
+        fmt.setForeground(QColor(color))
+        if bold:
+            fmt.setFontWeight(QFont.Weight.Bold)
+        if italic:
+            fmt.setFontItalic(True)
+        return fmt
+
+    def _resolve_format(self, token_type):
+        """Resolve token format using Pygments' token hierarchy"""
+        try:
+            return self._resolved[token_type]
+        except KeyError:
+            pass
+        resolved = token_type
+        while resolved not in self.formats and resolved.parent:
+            resolved = resolved.parent
+        fmt = self._resolved[token_type] = self.formats.get(resolved, None)
+        return fmt
+
+    def _format_runs(self, code):
+        """(offset, length, format) runs for a line's code, neighbours with the same format merged"""
+        runs = self._runs.get(code)
+        if runs is None:
+            runs = []
+            index = 0
+            for token, length in tokenize_line(code):
+                token_format = self._resolve_format(token)
+                if runs and runs[-1][2] == token_format and runs[-1][0] + runs[-1][1] == index:
+                    runs[-1] = (runs[-1][0], runs[-1][1] + length, token_format)
+                elif token_format:
+                    runs.append((index, length, token_format))
+                index += length
+            if len(self._runs) > 1 << 18:
+                self._runs.clear()
+            self._runs[code] = runs
+        return runs
+
+    def color_runs(self, code):
+        """(offset, length, argb) for the non-blank runs of a line's code, for the minimap
+
+        Only reads caches and immutable formats, so the minimap can call it off the GUI thread.
+        """
+        runs = self._colors.get(code)
+        if runs is None:
+            runs = [
+                (offset, length, token_format.foreground().color().rgba())
+                for offset, length, token_format in self._format_runs(code)
+                if not code[offset:offset + length].isspace()
+            ]
+            if len(self._colors) > 1 << 16:
+                self._colors.clear()
+            self._colors[code] = runs
+        return runs
+
+    def _lex_now(self, line):
+        if not self._turn.isActive():
+            self._turn.start()
+        if self._budget > 0:
+            self._budget -= 1
+            return True
+        if self._shown is None:
+            self._shown = [view.visible_lines() for view in self.views]
+        return any(first <= line <= last for first, last in self._shown)
+
+    def _catch_up(self):
+        """Next turn: a new budget, spent on stale lines in view first, then the others"""
+        self._budget = self.LEX_BUDGET
+        self._shown = None
+        stale, self._stale = self._stale, None
+        ranges = [view.visible_lines() for view in self.views]
+        if stale is not None:
+            ranges.append(stale)
+        document = self.document()
+        for first, last in ranges:
+            block = document.findBlockByNumber(first)
+            line = first
+            while block.isValid() and line <= last and self._budget > 0:
+                if block.userState() == self.STALE:
+                    # Lexing one line goes on to the stale lines after it, while the budget lasts
+                    self.rehighlightBlock(block)
+                block = block.next()
+                line += 1
+        if stale is not None and block.isValid() and line <= stale[1]:
+            self._mark_stale(line, stale[1])
+            self._turn.start()
+
+    def _mark_stale(self, first, last):
+        stale = self._stale
+        self._stale = (first, last) if stale is None else (min(first, stale[0]), max(last, stale[1]))
+
+    @traced()
+    def highlightBlock(self, text):
+        code = text.lstrip()
+        if code not in self._runs:
+            line = self.currentBlock().blockNumber()
+            if not self._lex_now(line):
+                self.setCurrentBlockState(self.STALE)
+                self._mark_stale(line, line)
+                return
+        self.setCurrentBlockState(-1)
+        indent = len(text) - len(code)
+        if indent:
+            self.setFormat(0, indent, self._resolve_format(Token.Text))
+
+        for offset, length, token_format in self._format_runs(code):
+            # Apply format to the exact token position
+            self.setFormat(indent + offset, length, token_format)
@@ -0,0 +1,245 @@
+"""Long-lived Python kernel for the IDE's console, run as `python -u kernel.py`
+
+Talks to the IDE in frames on stdin/stdout: a 4-byte big-endian length, then a UTF-8
+JSON object. Requests:
+	{"type": "execute", "id": n, "code": "...", "filename": "<console 3>"}
+	{"type": "interrupt"}    KeyboardInterrupt in whatever is running, the kernel lives on
+	                         (on POSIX the IDE sends SIGINT instead, which also breaks blocking calls)
+	{"type": "shutdown"}
+Replies:
+	{"type": "ready", "pid": ..., "version": "..."}
+	{"type": "stream", "name": "stdout" | "stderr", "text": "..."}    as it's printed
+	{"type": "result", "id": n, "text": "repr of the last expression"}
+	{"type": "error", "id": n, "text": "formatted traceback"}
+	{"type": "done", "id": n, "status": "ok" | "error" | "interrupted", "elapsed": seconds}
+
+Stdlib only: it runs under whatever interpreter the project uses.
+"""
+import ast
+import builtins
+import json
+import linecache
+import os
+import queue
+import signal
+import struct
+import sys
+import threading
+import time
+import traceback
+import _thread
+
+_HEADER = struct.Struct(">I")
+
+
+class Channel:
+	"""Frames out through a private copy of the original stdout"""
+	def __init__(self, fd):
+		self._out = os.fdopen(fd, 'wb', buffering=0)
+		self._lock = threading.Lock()
+
+	def send(self, message):
+		data = json.dumps(message).encode("utf-8")
+		with self._lock:
+			self._out.write(_HEADER.pack(len(data)) + data)
+
+
+def read_frames(stream):
+	while True:
+		header = stream.read(_HEADER.size)
+		if len(header) < _HEADER.size:
+			return
+		(size,) = _HEADER.unpack(header)
+		yield json.loads(stream.read(size).decode("utf-8"))
+
+
+class StreamWriter:
+	"""sys.stdout / sys.stderr, batched into a stream frame every FLUSH_INTERVAL or 64 KB"""
+	encoding = "utf-8"
+	errors = "replace"
+	FLUSH_INTERVAL = 0.02
+	LIMIT = 1 << 16
+
+	def __init__(self, channel, name):
+		self.channel = channel
+		self.name = name
+		self._parts = []
+		self._size = 0
+		self._lock = threading.Lock()
+		threading.Thread(target=self._flush_periodically, daemon=True).start()
+
+	def write(self, text):
+		if text:
+			with self._lock:
+				self._parts.append(text)
+				self._size += len(text)
+			if self._size >= self.LIMIT:
+				self.flush()
+		return len(text)
+
+	def writelines(self, lines):
+		for line in lines:
+			self.write(line)
+
+	def flush(self):
+		with self._lock:
+			text = "".join(self._parts)
+			self._parts, self._size = [], 0
+		if text:
+			self.channel.send({"type": "stream", "name": self.name, "text": text})
+
+	def _flush_periodically(self):
+		while True:
+			time.sleep(self.FLUSH_INTERVAL)
+			if self._parts:
+				self.flush()
+
+	def isatty(self):
+		return False
+
+	def fileno(self):
+		return 1 if self.name == "stdout" else 2
+
+
+def forward_fd(fd, channel, name):
+	"""Point `fd` at a pipe and forward what lands there, for C code and child processes"""
+	read_end, write_end = os.pipe()
+	os.dup2(write_end, fd)
+	os.close(write_end)
+
+	def pump():
+		with os.fdopen(read_end, 'rb', buffering=0) as pipe:
+			while True:
+				data = pipe.read(65536)
+				if not data:
+					return
+				channel.send({"type": "stream", "name": name, "text": data.decode("utf-8", "replace")})
+
+	threading.Thread(target=pump, daemon=True).start()
+
+
+class Kernel:
+	def __init__(self, channel):
+		self.channel = channel
+		self.namespace = {"__name__": "__main__", "__builtins__": builtins}
+		self.requests = queue.Queue()
+		self.busy = False
+
+	def listen(self, stream):
+		"""Reader thread: queues work for the main thread, handles interrupts right away"""
+		for message in read_frames(stream):
+			if message["type"] == "interrupt":
+				_thread.interrupt_main()
+			else:
+				self.requests.put(message)
+		self.requests.put({"type": "shutdown"})
+
+	def on_interrupt(self, signum, frame):
+		# Between requests there's nothing to stop, and the kernel has to survive it
+		if self.busy:
+			raise KeyboardInterrupt
+
+	def serve(self):
+		while True:
+			try:
+				message = self.requests.get()
+				if message["type"] == "shutdown":
+					return
+				if message["type"] == "execute":
+					self.execute(message)
+			except KeyboardInterrupt:
+				continue
+
+	def execute(self, message):
+		request, code = message["id"], message["code"]
+		filename = message.get("filename") or "<console>"
+		# So tracebacks show the lines that ran, even for unsaved editor text
+		linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+		try:
+			tree = ast.parse(code, filename, "exec")
+		except SyntaxError as e:
+			# Didn't compile, there are no frames worth showing
+			self.channel.send({"type": "error", "id": request, "text": "".join(traceback.format_exception_only(type(e), e))})
+			self.channel.send({"type": "done", "id": request, "status": "error", "elapsed": 0.0})
+			return
+		if sys.stdin.closed:
+			# exit() closes it on its way out, input() should still just hit EOF
+			sys.stdin = open(os.devnull, 'r')
+		status = "ok"
+		start = time.perf_counter()
+		self.busy = True
+		try:
+			last = None
+			if tree.body and isinstance(tree.body[-1], ast.Expr):
+				last = ast.Expression(tree.body.pop().value)
+			if message.get("file"):
+				# Like `python script.py`: its folder is importable
+				self.namespace["__file__"] = filename
+				folder = os.path.dirname(os.path.abspath(filename))
+				if folder not in sys.path:
+					sys.path.insert(0, folder)
+			exec(compile(tree, filename, "exec"), self.namespace)
+			if last is not None:
+				value = eval(compile(last, filename, "eval"), self.namespace)
+				if value is not None:
+					self.namespace["_"] = value
+					self.flush_output()
+					self.channel.send({"type": "result", "id": request, "text": repr(value)})
+		except KeyboardInterrupt:
+			status = "interrupted"
+			self.flush_output()
+			self.channel.send({"type": "error", "id": request, "text": "KeyboardInterrupt\n"})
+		except BaseException as e:
+			# SystemExit included, sys.exit() in a script shouldn't take the kernel down
+			status = "error"
+			self.flush_output()
+			self.channel.send({"type": "error", "id": request, "text": self.format_error(e)})
+		finally:
+			self.busy = False
+		elapsed = time.perf_counter() - start
+		self.flush_output()
+		self.channel.send({"type": "done", "id": request, "status": status, "elapsed": elapsed})
+
+	@staticmethod
+	def flush_output():
+		# What was printed has to land before the result or traceback that follows it
+		sys.stdout.flush()
+		sys.stderr.flush()
+
+	@staticmethod
+	def format_error(error):
+		"""The traceback without the kernel's own frames"""
+		if isinstance(error, SystemExit):
+			return f"SystemExit: {error.code}\n"
+		frames = traceback.extract_tb(error.__traceback__)
+		while frames and frames[0].filename == __file__:
+			frames.pop(0)
+		lines = ["Traceback (most recent call last):\n"] if frames else []
+		lines += traceback.format_list(frames)
+		lines += traceback.format_exception_only(type(error), error)
+		return "".join(lines)
+
+
+def main():
+	# Frames get the real stdout to themselves, everything else printed goes through them too
+	channel = Channel(os.dup(1))
+	stdin = os.fdopen(os.dup(0), 'rb')
+	devnull = os.open(os.devnull, os.O_RDONLY)
+	os.dup2(devnull, 0)
+	forward_fd(1, channel, "stdout")
+	forward_fd(2, channel, "stderr")
+	sys.stdout = StreamWriter(channel, "stdout")
+	sys.stderr = StreamWriter(channel, "stderr")
+	sys.stdin = open(os.devnull, 'r')
+
+	# The working directory is importable, not the folder kernel.py happens to live in
+	sys.path[0] = os.getcwd()
+	kernel = Kernel(channel)
+	signal.signal(signal.SIGINT, kernel.on_interrupt)
+	threading.Thread(target=kernel.listen, args=(stdin,), daemon=True).start()
+	channel.send({"type": "ready", "pid": os.getpid(), "version": sys.version.split()[0]})
+	kernel.serve()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,52 @@
+import argparse
+import getpass
+import json
+import os
+import socket
+import tempfile
+
+# Kept free of Qt imports: a second launch has to hand its paths to the
+# running IDE and exit before paying for PySide6.
+
+
+def parse_args(argv):
+	parser = argparse.ArgumentParser(prog="snakeide", description="Snake IDE")
+	parser.add_argument("paths", nargs="*", help="files or a project folder to open")
+	parser.add_argument("--new-window", action="store_true",
+		help="start a separate IDE instead of handing the paths to the running one")
+	parser.add_argument("--profile-startup", action="store_true",
+		help="print a per-phase startup timing breakdown and exit (non-zero when over budget)")
+	parser.add_argument("--trace", action="store_true",
+		help="time the editor's hot paths for the performance HUD and trace export")
+	args, _ = parser.parse_known_args(argv[1:])
+	return args
+
+
+def instance_address():
+	"""Address the running IDE listens on (a QLocalServer name or socket path)"""
+	try:
+		user = getpass.getuser()
+	except Exception:
+		user = "default"
+	name = f"snakeide-{user}"
+	if os.name == 'nt':
+		return name
+	return os.path.join(tempfile.gettempdir(), name)
+
+
+def forward_to_running_instance(paths, timeout=0.5):
+	"""Send `paths` to a running IDE, returns False when there is nobody listening"""
+	payload = json.dumps([os.path.abspath(path) for path in paths]).encode("utf-8") + b"\n"
+	try:
+		if os.name == 'nt':
+			# QLocalServer is a named pipe on Windows, which opens like a file
+			with open(r"\\.\pipe" + "\\" + instance_address(), 'wb') as pipe:
+				pipe.write(payload)
+		else:
+			with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+				sock.settimeout(timeout)
+				sock.connect(instance_address())
+				sock.sendall(payload)
+	except OSError:
+		return False
+	return True
@@ -1,1697 +1,5659 @@
-import subprocess
-import sys
-import os
-import re
-import shutil
-import math
-
-from PySide6.QtWidgets import (
-	QApplication, QButtonGroup, QMainWindow, QSplitter, QTextEdit, QTreeView, QPlainTextEdit,
-	QFileSystemModel, QFileDialog, QMessageBox, QMenu, QStatusBar,
-	QToolBar, QLabel, QFrame, QVBoxLayout, QWidget, QHBoxLayout, 
-	QTabWidget, QTabBar, QPushButton, QScrollBar, QDialog,
-	QLineEdit, QDialogButtonBox, QInputDialog,
-	QFileIconProvider, QCheckBox, QListWidget, QListWidgetItem
-)
-from PySide6.QtGui import (
-	QFont, QKeyEvent, QKeySequence, QPalette, QColor, QAction, QIcon, QPixmap, QPainter, QShortcut,
-	QSyntaxHighlighter, QTextCharFormat, QFontMetrics, QTextCursor, QTextDocument
-)
-from PySide6.QtCore import (
-	QFileInfo, Qt, QModelIndex, QSize, QRect,
-	QThread, Signal, QProcess, QSortFilterProxyModel,
-	QPoint
-)
-from PySide6.QtSvg import QSvgRenderer
-from highlighter import PythonHighlighter
-from core import *
-import json
-
-
-def resource_path(relative):
-	return os.path.join(getattr(sys, '_MEIPASS', os.path.abspath(".")), relative).replace("\\", "/")
-
-def fix_qss_paths(qss: str) -> str:
-	def path(name):
-		return resource_path(f"icons/{name}").replace("\\", "/")
-
-	return qss.format(
-		close_tab=path("close_tab.svg"),
-		caret_right=path("caret-right.svg"),
-		caret_down=path("caret-down.svg")
-	)
-
-def get_python_executable():
-	if getattr(sys, 'frozen', False):
-		# We're in a PyInstaller-built executable
-		# Try to find a real Python interpreter
-		python = shutil.which("python")
-		if not python:
-			python = shutil.which("python3")
-		return python or "python"  # fallback to plain string if all else fails
-	else:
-		# Normal Python run
-		return sys.executable
-
-class FindDialog(QDialog):
-	def __init__(self, parent=None):
-		super().__init__(parent)
-		self.setWindowTitle("Find")
-		self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
-		
-		layout = QVBoxLayout(self)
-		self.search_input = QLineEdit(self)
-		self.search_input.setPlaceholderText("Enter text to find")
-		layout.addWidget(self.search_input)
-		
-		self.case_cb = QCheckBox("Case sensitive", self)
-		layout.addWidget(self.case_cb)
-		
-		btn_layout = QVBoxLayout()
-		self.next_btn = QPushButton("Find Next", self)
-		self.prev_btn = QPushButton("Find Previous", self)
-		btn_layout.addWidget(self.next_btn)
-		btn_layout.addWidget(self.prev_btn)
-		layout.addLayout(btn_layout)
-		
-		# signals
-		self.next_btn.clicked.connect(lambda: self.parent().find_next(
-			self.search_input.text(),
-			self.case_cb.isChecked()
-		))
-		self.prev_btn.clicked.connect(lambda: self.parent().find_previous(
-			self.search_input.text(),
-			self.case_cb.isChecked()
-		))
-
-class CommandPalette(QDialog):
-	def __init__(self, parent=None):
-		super().__init__(parent)
-		self.setWindowFlags(
-			Qt.Window | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint
-		)
-		self.setAttribute(Qt.WA_TranslucentBackground)
-		self.setFixedWidth(parent.width() * 0.8)
-		self.move(
-			parent.x() + parent.width() * 0.1,
-			parent.y() + 10
-		)
-
-		layout = QVBoxLayout(self)
-		layout.setContentsMargins(8, 8, 8, 8)
-
-		self.input = QLineEdit()
-		self.input.setPlaceholderText("Type a command...")
-		layout.addWidget(self.input)
-
-		self.list_widget = QListWidget()
-		layout.addWidget(self.list_widget)
-		self.list_widget.setObjectName("CommandPaletteList")
-
-		# Commands
-		self.IDE = parent
-		self.commands = [
-			"Build File",
-			"Debug File",
-			"Convert Tabs to Spaces",
-			"Convert Spaces to Tabs",
-			"Find"
-		]
-		self.update_list("")
-
-		# When user types and presses Enter, always execute the currently highlighted list item
-		self.input.returnPressed.connect(self.execute_current)
-		self.input.textChanged.connect(self.update_list)
-		self.list_widget.itemActivated.connect(self.execute_current)
-
-	def update_list(self, filter_text):
-		self.list_widget.clear()
-		filtered = [cmd for cmd in self.commands if filter_text.lower() in cmd.lower()]
-		for cmd in filtered:
-			self.list_widget.addItem(QListWidgetItem(cmd))
-		# Select the first item by default
-		if self.list_widget.count() > 0:
-			self.list_widget.setCurrentRow(0)
-
-	def execute_current(self):
-		current_item = self.list_widget.currentItem()
-		if current_item is None:
-			self.hide()
-			return
-		self.hide()
-		cmd = current_item.text()
-		editor = self.IDE.get_current_editor()
-		ts = getattr(self.IDE, 'tab_size', getattr(self.IDE, '_tab_size', 4))
-
-		# 1) Save state
-		cur = editor.textCursor()
-		saved_pos = cur.position()
-		v_scroll = editor.verticalScrollBar().value()
-		h_scroll = editor.horizontalScrollBar().value()
-
-		new_text = None
-
-		full_text = editor.toPlainText()
-		if cmd == "Build File":
-			self.IDE.build_file()
-		elif cmd == "Debug File":
-			self.IDE.debug_run()
-		elif cmd == "Find":
-			self.IDE.show_find()
-		elif cmd == "Convert Tabs to Spaces":
-			new_text = full_text.replace("\t", " " * ts)
-		elif cmd == "Convert Spaces to Tabs":
-			new_text = full_text.replace(" " * ts, "\t")
-
-		if new_text is not None:
-			# 2) Replace
-			editor.setPlainText(new_text)
-
-			# 3) Restore cursor
-			new_cursor = editor.textCursor()
-			new_cursor.setPosition(min(saved_pos, len(new_text)))
-			editor.setTextCursor(new_cursor)
-
-			# 4) Restore scrollbars
-			editor.verticalScrollBar().setValue(v_scroll)
-			editor.horizontalScrollBar().setValue(h_scroll)
-
-		
-
-
-	def keyPressEvent(self, event):
-		if event.key() == Qt.Key_Escape:
-			self.hide()
-		else:
-			super().keyPressEvent(event)
-
-class ConsoleWidget(QTextEdit):
-	enterPressed = Signal(str)  # Signal to emit command
-
-	def keyPressEvent(self, event):
-		if event.key() == Qt.Key_Return or event.key() == Qt.Key_Enter:
-			text = self.toPlainText().split('\n')[-1] + '\n'
-			self.enterPressed.emit(text)
-			self.insertPlainText('\n')  # optional: simulate new line
-		else:
-			super().keyPressEvent(event)
-
-class CustomInputDialog(QDialog):
-	"""Themed input dialog matching Snake IDE style"""
-	def __init__(self, parent, title, label, initial_text=""):
-		super().__init__(parent)
-		self.setWindowTitle(title)
-		self.setModal(True)
-		
-		layout = QVBoxLayout(self)
-		self.label = QLabel(label)
-		self.input = QLineEdit(initial_text)
-		buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-		
-		layout.addWidget(self.label)
-		layout.addWidget(self.input)
-		layout.addWidget(buttons)
-		
-		buttons.accepted.connect(self.accept)
-		buttons.rejected.connect(self.reject)
-		
-	def get_text(self):
-		return self.input.text().strip()
-
-class BuildThread(QProcess):
-	finished = Signal(str)
-
-	def __init__(self, console_output):
-		super().__init__()
-		self.console_output = console_output
-
-		# Connect signals
-		self.readyReadStandardOutput.connect(self.handle_stdout)
-		self.readyReadStandardError.connect(self.handle_stderr)
-
-	def start_build(self, program, arguments=[]):
-		"""Start the process with given program and arguments."""
-		self.setProgram(program)
-		self.setArguments(arguments)
-		self.setProcessChannelMode(QProcess.MergedChannels)  # Optional: merge stdout + stderr
-		self.stateChanged.connect(self.on_state_changed)
-		self.start()
-
-	def on_state_changed(self, state):
-		if state == QProcess.NotRunning:
-			self.finished.emit('finished')
-
-	def handle_stdout(self):
-		data = self.readAllStandardOutput().data().decode()
-		self.console_output.insertPlainText(data)
-		self.console_output.ensureCursorVisible()
-
-	def handle_stderr(self):
-		data = self.readAllStandardError().data().decode()
-		self.console_output.insertPlainText(data)
-		self.console_output.ensureCursorVisible()
-
-	def write(self, command):
-		"""Send command to the running process"""
-		if self.state() == QProcess.Running:
-			self.writeData(command, len(command))
-
-
-class DebugThread(QProcess):
-	finished = Signal(str)
-
-	def __init__(self, console_output, breakpoints):
-		super().__init__()
-		self.console_output = console_output
-		self.bps = breakpoints.get_breakpoints()
-
-		self.readyReadStandardOutput.connect(self.handle_stdout)
-
-	def start_build(self, program, arguments=[]):
-		"""Start the process with given program and arguments."""
-		self.setProgram(program)
-		self.setArguments(arguments)
-		self.setProcessChannelMode(QProcess.MergedChannels)  # Optional: merge stdout + stderr
-		self.stateChanged.connect(self.on_state_changed)
-		self.console_output.insertPlainText("Running Debugger.\n")
-		self.currentBP = 0
-		self.start()
-	def handle_stdout(self):
-		data = self.readAllStandardOutput().data().decode('utf-8')
-		for line in data.splitlines():
-			if line.startswith("-> "):
-				self.print_out(f"(BREAKPOINT) Line {self.bps[self.currentBP]+1}:\n\t" ,line.removeprefix("-> "))
-				self.get_variables()
-				self.currentBP += 1
-			elif line.startswith("__VARIABLES__"):
-				v =line.removeprefix("__VARIABLES__")
-				variables = eval(v)
-				for k,v in variables.items():
-					if k.startswith("__"):
-						continue
-					self.print_out(f"Variable: {k} Value: {v}")
-			else:
-				print(len(line), line)
-	def get_variables(self):
-		self.code = """__VARS__={}
-for __k, __v in list(locals().items()): __VARS__[__k]=str(__v)
-print('__VARIABLES__'+str(__VARS__))"""
-		for line in self.code.split("\n"):
-			self.write('!'+line+'\n', False)
-	def print_out(self, *args, end='\n'):
-		for arg in args:
-			self.console_output.insertPlainText(str(arg)+" ")
-		self.console_output.insertPlainText(end)
-	def on_state_changed(self, state):
-		if state == QProcess.NotRunning:
-			self.write("quit\n")
-			self.console_output.insertPlainText(f"\n-> quit\n")
-			self.finished.emit('finished')
-
-	def write(self, command, printout=True):
-		"""Send command to the running process"""
-		if self.state() == QProcess.Running:
-			if printout:
-				self.console_output.insertPlainText(f"-> {command}\n")
-			self.writeData(command, len(command))
-
-CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'snakeide.conf')
-
-class LineNumberArea(QWidget):
-	def __init__(self, editor):
-		super().__init__(editor)
-		self.editor = editor
-
-	def sizeHint(self):
-		return QSize(self.editor.line_number_area_width(), 0)
-
-	def paintEvent(self, event):
-		self.editor.line_number_area_paint_event(event)
-
-	def mousePressEvent(self, event):
-		"""Handle mouse clicks for setting breakpoints"""
-		if event.button() == Qt.LeftButton:
-			# Calculate clicked line number
-			block = self.editor.firstVisibleBlock()
-			block_number = block.blockNumber()
-			top = self.editor.blockBoundingGeometry(block).translated(
-				self.editor.contentOffset()).top()
-			
-			y = event.position().y()
-			while block.isValid():
-				bottom = top + self.editor.blockBoundingRect(block).height()
-				if top <= y <= bottom:
-					# Toggle breakpoint at this line
-					self.editor.toggle_breakpoint(block_number)
-					break
-				
-				block = block.next()
-				top = bottom
-				block_number += 1
-		super().mousePressEvent(event)
-
-class CodeEditor(QPlainTextEdit):
-	def __init__(self, parent=None):
-		super().__init__(parent)
-		# Editor font
-		self.efont = QFont("Cascadia Mono")
-		self.efont.setPointSize(13)
-		self.efont.setStyleStrategy(QFont.StyleStrategy.PreferMatch)
-		self.efont.setWeight(QFont.Weight.DemiBold)
-		self.efont.setHintingPreference(QFont.HintingPreference.PreferFullHinting)
-		self.setFont(self.efont)
-
-		# Whitespace markers
-		self.space_symbol = '·'  # U+00B7
-		self.tab_symbol   = '»'  # U+00BB
-		self.symbol_color = QColor('gray')
-
-		# Breakpoints
-		self.breakpoints = set()
-		# Line number area
-		self.line_number_area = LineNumberArea(self)
-		self.blockCountChanged.connect(self.update_line_number_area_width)
-		self.updateRequest.connect(self.update_line_number_area)
-		self.cursorPositionChanged.connect(self.highlight_current_line)
-		self.update_line_number_area_width()
-
-		# Auto-pairing
-		self.paired_chars = {'(': ')', '[': ']', '{': '}', '"': '"', "'": "'"}
-
-	def line_number_area_width(self):
-		digits = len(str(max(1, self.blockCount())))
-		space = 3 + self.fontMetrics().horizontalAdvance('9') * digits
-		return space + 14
-
-	def update_line_number_area_width(self):
-		self.setViewportMargins(self.line_number_area_width(), 0, 0, 0)
-
-	def update_line_number_area(self, rect, dy):
-		if dy:
-			self.line_number_area.scroll(0, dy)
-		else:
-			self.line_number_area.update(0, rect.y(), self.line_number_area.width(), rect.height())
-		if rect.contains(self.viewport().rect()):
-			self.update_line_number_area_width()
-
-	def resizeEvent(self, event):
-		super().resizeEvent(event)
-		cr = self.contentsRect()
-		self.line_number_area.setGeometry(
-			QRect(cr.left(), cr.top(), self.line_number_area_width(), cr.height())
-		)
-
-	def paintEvent(self, event):
-		super().paintEvent(event)
-		# Only draw markers when text is selected
-		cursor = self.textCursor()
-		sel_start = cursor.selectionStart()
-		sel_end = cursor.selectionEnd()
-		if sel_start == sel_end:
-			return
-
-		painter = QPainter(self.viewport())
-		painter.setPen(self.symbol_color)
-		metrics = self.fontMetrics()
-		tab_width = self.tabStopDistance()
-		block = self.firstVisibleBlock()
-		offset = self.contentOffset()
-		vis_rect = self.viewport().rect()
-
-		while block.isValid():
-			block_geom = self.blockBoundingGeometry(block).translated(offset)
-			if block_geom.bottom() < vis_rect.top():
-				block = block.next()
-				continue
-			if block_geom.top() > vis_rect.bottom():
-				break
-
-			text = block.text()
-			block_pos = block.position()
-			for i, ch in enumerate(text):
-				if ch in (' ', '\t'):
-					doc_index = block_pos + i
-					if not (sel_start <= doc_index < sel_end):
-						continue
-					# calculate x offset
-					x_offset = 0.0
-					for c in text[:i]:
-						x_offset += tab_width if c == '\t' else metrics.horizontalAdvance(c)
-					x = int(block_geom.left() + x_offset)
-					symbol = self.space_symbol if ch == ' ' else self.tab_symbol
-					painter.drawText(
-						QRect(x, block_geom.top(), metrics.horizontalAdvance(symbol), metrics.height()),
-						Qt.AlignLeft, symbol
-					)
-			block = block.next()
-
-	def keyPressEvent(self, event):
-		cursor = self.textCursor()
-		key, text = event.key(), event.text()
-		if text in self.paired_chars:
-			cursor.insertText(text + self.paired_chars[text])
-			cursor.movePosition(QTextCursor.Left)
-			self.setTextCursor(cursor)
-			return
-		if text in self.paired_chars.values() and self._next_char_right(cursor) == text:
-			cursor.movePosition(QTextCursor.Right)
-			self.setTextCursor(cursor)
-			return
-		if key == Qt.Key_Backspace:
-			left = self._next_char_left(cursor)
-			right = self._next_char_right(cursor)
-			if left in self.paired_chars and self.paired_chars[left] == right:
-				cursor.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor)
-				cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor)
-				cursor.removeSelectedText()
-				self.setTextCursor(cursor)
-				return
-		super().keyPressEvent(event)
-
-	def _next_char_right(self, cursor):
-		cursor.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor)
-		ch = cursor.selectedText()
-		cursor.movePosition(QTextCursor.Left)
-		return ch
-
-	def _next_char_left(self, cursor):
-		cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor)
-		ch = cursor.selectedText()
-		cursor.movePosition(QTextCursor.Right)
-		return ch
-
-	def highlight_current_line(self):
-		extra = QTextEdit.ExtraSelection()
-		extra.format.setBackground(QColor("#2A2A2A"))
-		extra.format.setProperty(QTextCharFormat.FullWidthSelection, True)
-		extra.cursor = self.textCursor()
-		extra.cursor.clearSelection()
-		self.setExtraSelections([extra])
-
-	def toggle_breakpoint(self, line):
-		if line in self.breakpoints:
-			self.breakpoints.remove(line)
-		else:
-			self.breakpoints.add(line)
-		self.line_number_area.update()
-
-	def get_breakpoints(self):
-		return sorted(self.breakpoints)
-
-	def line_number_area_paint_event(self, event):
-		painter = QPainter(self.line_number_area)
-		painter.fillRect(event.rect(), QColor("#3C3F41"))
-		block = self.firstVisibleBlock()
-		cur_line = self.textCursor().blockNumber()
-		top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
-		bottom = top + self.blockBoundingRect(block).height()
-		num = block.blockNumber()
-		icon = QSvgRenderer(resource_path("icons/breakpoint.svg"))
-		icon_size = 14
-		while block.isValid() and top <= event.rect().bottom():
-			if block.isVisible() and bottom >= event.rect().top():
-				if num == cur_line:
-					painter.fillRect(0, int(top), self.line_number_area.width(),
-									 int(bottom - top), QColor("#4C5052"))
-				if num in self.breakpoints:
-					y = math.floor(top + (bottom - top - icon_size) / 2)
-					icon.render(painter, QRect(0, y, icon_size, icon_size))
-				painter.setPen(QColor("#A9B7C6"))
-				painter.drawText(
-					0, int(top), self.line_number_area.width() - 3,
-								 self.fontMetrics().height(), Qt.AlignRight,
-								 str(num + 1)
-				)
-			block = block.next()
-			top = bottom
-			bottom = top + self.blockBoundingRect(block).height()
-			num += 1
-
-
-class snakeideEditor(QMainWindow):
-	def __init__(self):
-		super().__init__()
-		self.setWindowTitle("Snake IDE V1")
-		self.resize(1500,1500)
-		self.showMaximized()
-
-		self.find_dialog = None
-		self._tab_size = 4
-		self._current_file = None
-		self.default_Config = {"tab_size": 4, "current_project": None, "current_file": None, "open_files": []}
-		self.config = self.load_config()
-		self.console_process = None
-
-		# Load custom icons
-		self.folder_icon = self.load_folder_icon()
-		self.file_icon = self.load_file_icon()
-
-		self.open_files = {}
-		self._init_ui()
-		self._apply_snakeide_theme()
-
-		
-		# Apply UI font
-		ui_font = QFont("Segoe UI")
-		ui_font.setPointSize(9)
-		QApplication.setFont(ui_font)
-		
-		if len(sys.argv)>1:
-			self.open_files={}
-			self._open_folder(sys.argv[1])
-		else:
-			if self.config.get("current_project"):
-				self._open_folder(self.config.get("current_project"))
-			# Open files from last session
-			for file_path in self.config.get("open_files", []):
-				if file_path:
-					if os.path.exists(file_path):
-						self._open_file(file_path)
-			
-			# Set current tab
-			if self.config.get("current_file") and self.config["current_file"] in self.open_files:
-				index = self.editor_tabs.indexOf(self.open_files[self.config["current_file"]]["widget"])
-				self.editor_tabs.setCurrentIndex(index)
-
-		self._tab_size = self.config.get("tab_size", 4)
-		self.set_tab_size(self._tab_size)
-
-	def show_find(self):
-		if self.find_dialog is None:
-			self.find_dialog = FindDialog(self)
-		self.find_dialog.show()
-		self.find_dialog.raise_()
-		self.find_dialog.search_input.setFocus()
-
-	def find_next(self, text, case_sensitive=False):
-		editor = self.get_current_editor()
-		if not text:
-			return
-		flags = QTextDocument.FindFlags()
-		if case_sensitive:
-			flags |= QTextDocument.FindCaseSensitively
-		# start after the current cursor
-		if not editor.find(text, flags):
-			# wrap around
-			cursor = editor.textCursor()
-			cursor.movePosition(QTextCursor.Start)
-			editor.setTextCursor(cursor)
-			if not editor.find(text, flags):
-				self.find_dialog.hide()
-				QMessageBox.information(self, "Find",f"Find: Could not find {text}.")
-				self.find_dialog.show()
-
-	def find_previous(self, text, case_sensitive=False):
-		editor = self.get_current_editor()
-		if not text:
-			return
-		flags = QTextDocument.FindBackward
-		if case_sensitive:
-			flags |= QTextDocument.FindCaseSensitively
-		# start before the current cursor
-		if not editor.find(text, flags):
-			# wrap around
-			cursor = editor.textCursor()
-			cursor.movePosition(QTextCursor.End)
-			editor.setTextCursor(cursor)
-			if not editor.find(text, flags):
-				QMessageBox.information(self, "Find", f"‘{text}’ not found.")
-
-	def open_command_palette(self):
-		if not hasattr(self, 'command_palette'):
-			self.command_palette = CommandPalette(self)
-		self.command_palette.move(
-			self.x() + self.width() * 0.1,
-			self.y() + 10
-		)
-		self.command_palette.setObjectName("CommandPalette")
-		self.command_palette.show()
-		self.command_palette.input.setFocus()
-
-	
-	def load_folder_icon(self):
-		"""Load folder icon from file or use base64 fallback"""
-		icon_path = os.path.join(os.path.dirname(__file__), "icons/folder.svg")
-		return QIcon(icon_path)
-	
-	def load_file_icon(self):
-		"""Load file icon - using generic document icon"""
-		parent = os.path.join(os.path.dirname(__file__), "icons")
-		icons = {'general_file': QIcon(os.path.join(parent, "general_file.svg"))}
-		for icon in os.listdir(parent):
-			if icon.startswith("extension_"):
-				extension_name = icon.removeprefix("extension_").removesuffix(".svg")
-				icons[extension_name] = QIcon(os.path.join(parent, icon))
-		return icons
-		
-	def load_config(self):
-		if not os.path.exists(CONFIG_PATH):
-			return self.default_Config
-			
-		with open(CONFIG_PATH, 'r') as f:
-			try:
-				config = json.load(f)
-			except:
-				return self.default_Config
-		return config
-
-	def save_config(self):
-		# Update open files list
-		self.config["open_files"] = list(self.open_files.keys())
-		
-		# Update current file
-		current_widget = self.editor_tabs.currentWidget()
-		if current_widget:
-			for path, file_info in self.open_files.items():
-				if file_info["widget"] == current_widget:
-					self.config["current_file"] = path
-					break
-		
-		with open(CONFIG_PATH, 'w') as f:
-			json.dump(self.config, f, indent=4)
-
-	def _init_ui(self):
-		self._create_actions()
-		self._create_toolbar()
-		self._create_menus()
-		
-		# Main splitter
-		self.main_splitter = QSplitter(Qt.Horizontal)
-		
-		# Left panel with project tree
-		left_panel = self._create_left_panel()
-		
-		# Right panel with editor
-		right_panel = self._create_editor_panel()
-
-		self._create_status_bar()
-		
-		self.main_splitter.addWidget(left_panel)
-		self.main_splitter.addWidget(right_panel)
-		self.main_splitter.setSizes([280, 920])
-
-		self.console_output = QTextEdit()
-		self.console_output.setReadOnly(True)
-		self.console_output.setFixedHeight(150)
-		self.console_output.setObjectName("Console")
-
-		self.root_splitter = QSplitter(Qt.Vertical)
-		self.root_splitter.addWidget(self.main_splitter)
-		self.root_splitter.addWidget(self.console_output)
-		self.root_splitter.setStretchFactor(1, 1)  # Make top grow with window
-		
-		self.setCentralWidget(self.root_splitter)
-
-		# Initially hide project tree, stop button and console
-		left_panel.hide()
-		self.console_output.hide()
-		self.stop_button.hide()
-
-	def _create_left_panel(self):
-		"""Create the left project panel"""
-		panel = QFrame()
-		panel.setFrameStyle(QFrame.NoFrame)
-		layout = QVBoxLayout(panel)
-		layout.setContentsMargins(0, 0, 0, 0)
-		layout.setSpacing(0)
-		
-		# Project header
-		header = QLabel("Project")
-		header.setObjectName("panel_header")
-		header.setFixedHeight(24)
-		header.setContentsMargins(8, 4, 8, 4)
-		layout.addWidget(header)
-		
-		# Project tree with custom icons
-
-		folder_path = os.path.expanduser("~")
-
-		self.model = QFileSystemModel()
-		self.model.setIconProvider(FileIconProvider(self.folder_icon, self.file_icon))
-		
-		self.tree = QTreeView()
-		self.tree.setModel(self.model)
-		self.tree.setHeaderHidden(True)
-		self.tree.setRootIsDecorated(True)
-		self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
-		self.tree.customContextMenuRequested.connect(self._on_tree_context_menu)
-		self.tree.doubleClicked.connect(self._on_tree_double_click)
-		
-		# Hide all columns except name
-		for i in range(1, self.model.columnCount()):
-			self.tree.hideColumn(i)
-			
-		layout.addWidget(self.tree)
-		return panel
-
-	def _create_editor_panel(self):
-		"""Create the main editor panel"""
-		panel = QFrame()
-		panel.setFrameStyle(QFrame.NoFrame)
-		layout = QVBoxLayout(panel)
-		layout.setContentsMargins(0, 0, 0, 0)
-		layout.setSpacing(0)
-		
-		# Editor tabs
-		self.editor_tabs = QTabWidget()
-		self.editor_tabs.setObjectName("editor_tabs")
-		self.editor_tabs.setTabPosition(QTabWidget.North)
-		self.editor_tabs.setTabsClosable(True)
-		self.editor_tabs.setMovable(True)
-		self.editor_tabs.tabCloseRequested.connect(self.close_tab)
-		self.editor_tabs.currentChanged.connect(self._tab_changed)
-		
-		# Add new tab button
-		new_tab_btn = QPushButton("+")
-		new_tab_btn.setObjectName("new_tab_button")
-		new_tab_btn.setFixedSize(24, 24)
-		new_tab_btn.clicked.connect(self._create_new_tab)
-		self.editor_tabs.setCornerWidget(new_tab_btn, Qt.TopRightCorner)
-		
-		layout.addWidget(self.editor_tabs)
-		
-		return panel
-		
-	def _adjust_input_height(self):
-		"""Adjust input field height based on content"""
-		doc = self.console_input.document()
-		height = doc.size().height() + 10
-		self.console_input.setFixedHeight(min(int(height), 150))
-		
-	def run_command(self, cmdlet, args):
-		"""Execute a Python command and show output in console"""
-		# Clear previous process if any
-		if getattr(self, 'console_process') is not None:
-			self.console_process.kill()
-			self.console_process = None
-			
-		self.console_output.clear()
-		# Create and start process
-		self.console_process = BuildThread(self.console_output)
-		self.console_process.finished.connect(self._command_finished)
-		
-		# Start Python with the command
-		self.console_process.start_build(cmdlet, args)
-		self.console_output.show()
-	def _command_finished(self):
-		self.building_label.hide()
-		self.console_output.insertPlainText("Finished Build.")
-		self.run_button.setIcon(QIcon(resource_path("./icons/run_file.svg")))
-	def _create_toolbar(self):
-		toolbar = QToolBar()
-		toolbar.setObjectName("main_toolbar")
-		toolbar.setToolButtonStyle(Qt.ToolButtonStyle.ToolButtonIconOnly)
-		toolbar.setIconSize(QSize(16, 16))
-		toolbar.setFloatable(False)
-		toolbar.setMovable(False)
-		
-		# Add some common actions (icons would be loaded from resources in real app)
-		self.addToolBar(toolbar)
-
-	def _create_actions(self):
-		# File actions
-		self.new_file_act = QAction("New File", self)
-		self.new_file_act.setShortcut("Ctrl+N")
-		self.new_file_act.triggered.connect(self._create_new_tab)
-		
-		self.open_file_act = QAction("Open File...", self)
-		self.open_file_act.setShortcut("Ctrl+O")
-		self.open_file_act.triggered.connect(self.open_file)
-		
-		self.open_project_act = QAction("Open Project...", self)
-		self.open_project_act.triggered.connect(self.open_project)
-		
-		self.save_act = QAction("Save", self)
-		self.save_act.setShortcut("Ctrl+S")
-		self.save_act.triggered.connect(self.save_file)
-		
-		self.save_all_act = QAction("Save All", self)
-		self.save_all_act.setShortcut("Ctrl+Shift+S")
-		self.save_all_act.triggered.connect(self.save_all_files)
-		
-		self.close_tab_act = QAction("Close Tab", self)
-		self.close_tab_act.setShortcut("Ctrl+W")
-		self.close_tab_act.triggered.connect(self.close_current_tab)
-		
-		self.exit_act = QAction("Exit", self)
-		self.exit_act.triggered.connect(self.close)
-		
-		# View actions
-		self.toggle_project_act = QAction("Project", self)
-		self.toggle_project_act.setShortcut("Alt+1")
-		self.toggle_project_act.setCheckable(True)
-		self.toggle_project_act.triggered.connect(self.toggle_project_panel)
-		
-		# Tab size actions
-		self.tab2_act = QAction("2", self, checkable=True)
-		self.tab2_act.triggered.connect(lambda: self.set_tab_size(2))
-		self.tab4_act = QAction("4", self, checkable=True)
-		self.tab4_act.triggered.connect(lambda: self.set_tab_size(4))
-		self.tab8_act = QAction("8", self, checkable=True)
-		self.tab8_act.triggered.connect(lambda: self.set_tab_size(8))
-		self.tab_actions = [self.tab2_act, self.tab4_act, self.tab8_act]
-
-		self.build_file_act = QAction("Build", self)
-		self.build_file_act.setShortcut("Ctrl+B")
-		self.build_file_act.triggered.connect(self.build_file)
-
-		shortcut = QShortcut(QKeySequence("Ctrl+Shift+P"), self)
-		shortcut.activated.connect(self.open_command_palette)
-
-		
-	def build_file(self):
-		if getattr(self, 'console_process') is not None:
-			self.console_process.kill()
-			self.console_process = None
-		current_editor = self.get_current_editor()
-		self.run_button.hide()
-		self.debugrun_button.hide()
-		self.stop_button.show()
-		self.console_output.show()
-		if current_editor and hasattr(current_editor, 'file_path'):
-			file_path = current_editor.file_path
-
-			self.building_label.show()
-			self.run_command(get_python_executable(), (file_path,))
-
-	def _create_menus(self):
-		menu_bar = self.menuBar()
-		
-		# File menu
-		file_menu = menu_bar.addMenu("File")
-		file_menu.addAction(self.new_file_act)
-		file_menu.addAction(self.open_file_act)
-		file_menu.addAction(self.open_project_act)
-		file_menu.addSeparator()
-		file_menu.addAction(self.save_act)
-		file_menu.addAction(self.save_all_act)
-		file_menu.addSeparator()
-		file_menu.addAction(self.close_tab_act)
-		file_menu.addSeparator()
-		file_menu.addAction(self.exit_act)
-		
-		# Edit menu
-		edit_menu = menu_bar.addMenu("Edit")
-		
-		# View menu
-		view_menu = menu_bar.addMenu("View")
-		view_menu.addAction(self.toggle_project_act)
-		view_menu.addSeparator()
-		
-		# Code menu
-		code_menu = menu_bar.addMenu("Code")
-		tab_menu = code_menu.addMenu("Tab Size")
-		for action in self.tab_actions:
-			tab_menu.addAction(action)
-		self.tab4_act.setChecked(True)
-		
-		# Tools menu
-		build_menu = menu_bar.addMenu("Build")
-		build_menu.addAction(self.build_file_act)
-		
-		# Help menu
-		help_menu = menu_bar.addMenu("Help")
-
-	def _create_status_bar(self):
-		status = QStatusBar()
-		status.setObjectName("snakeide_statusbar")
-
-		status
-		
-		# Left side info
-		self.cursor_label = QLabel("Ln 1, Col 1")
-		self.cursor_label.setObjectName("status_label")
-		status.addWidget(self.cursor_label)
-		
-		self.encoding_label = QLabel("UTF-8")
-		self.encoding_label.setObjectName("status_label")
-		status.addWidget(self.encoding_label)
-
-		self.building_label = QLabel("Running File...")
-		self.building_label.setObjectName("building_label")
-		status.addWidget(self.building_label)
-		self.building_label.hide()
-		
-		build_icons_container = QWidget()
-		self.build_icons = QHBoxLayout()
-
-		build_icons_container.setLayout(self.build_icons)
-
-		self.run_button = QPushButton()
-		self.run_button.setObjectName("RunBTN")
-		self.run_button.setIcon(QIcon(resource_path("./icons/run_file.svg")))
-
-		self.run_button.clicked.connect(self.build_file)
-
-		self.stop_button = QPushButton()
-		self.stop_button.setObjectName("stopBTN")
-		self.stop_button.setIcon(QIcon(resource_path("./icons/stop_execution.svg")))
-
-		self.stop_button.clicked.connect(self.stop_execution)
-
-		self.debugrun_button = QPushButton()
-		self.debugrun_button.setObjectName("debugRunBTN")
-		self.debugrun_button.setIcon(QIcon(resource_path("./icons/debug_run.svg")))
-
-		self.debugrun_button.clicked.connect(self.debug_run)
-
-		self.continue_button = QPushButton()
-		self.continue_button.setObjectName("ContinueBTN")
-		self.continue_button.setIcon(QIcon(resource_path("./icons/resume_execution.svg")))
-
-		self.continue_button.clicked.connect(self.continue_run)
-
-		self.build_icons.addWidget(self.run_button)
-		self.build_icons.addWidget(self.stop_button)
-		self.build_icons.addWidget(self.debugrun_button)
-		self.build_icons.addWidget(self.continue_button)
-
-
-		# Right side info
-		status.addPermanentWidget(build_icons_container)
-		
-		self.setStatusBar(status)
-		
-		# Connect cursor position updates
-		self.editor_tabs.currentChanged.connect(self._connect_current_editor_signals)
-	def stop_execution(self):
-		if getattr(self, 'console_process') is not None:
-			self.console_process.kill()
-			self.console_process = None
-		self.run_button.show()
-		self.debugrun_button.show()
-		self.stop_button.hide()
-
-	def debug_run(self):
-		if getattr(self, 'console_process') is not None:
-			self.console_process.kill()
-			self.console_process = None
-		self.debugrun_button.hide()
-		self.run_button.hide()
-		self.stop_button.show()
-		self.console_output.show()
-		self.console_output.clear()
-		# Create and start process
-		self.console_process = DebugThread(self.console_output, self.get_current_editor())
-		self.console_process.finished.connect(self._command_finished)
-
-		breakpoints = self.get_current_editor().get_breakpoints()
-		if breakpoints:
-			# Create a temporary file with breakpoint commands
-			bp_file = os.path.join(os.path.dirname(__file__), "breakpoints.tmp")
-			with open(bp_file, 'w') as f:
-				for line in breakpoints:
-					f.write(f"__import__('pdb').set_trace()  # BREAKPOINT-LINE:{line}\n")
-			
-			# Inject breakpoints into the code
-			original_code = self.get_current_editor().toPlainText()
-			lines = original_code.split('\n')
-			for line_num in sorted(breakpoints, reverse=True):
-				if 0 <= line_num < len(lines):
-					lines.insert(line_num, f"__import__('pdb').set_trace()  # BREAKPOINT-LINE:{line_num}")
-			
-			modified_code = '\n'.join(lines)
-			
-			# Create a temporary file to run
-			temp_file = os.path.join(os.path.dirname(__file__), "temp_run.py")
-			with open(temp_file, 'w') as f:
-				f.write(modified_code)
-			
-			# Run the modified file
-			self.console_process.start_build(get_python_executable(), [temp_file])
-			return
-		else:
-			self.build_file()
-		
-	def _connect_current_editor_signals(self):
-		"""Connect signals for the current editor"""
-		editor = self.get_current_editor()
-		if editor:
-			editor.cursorPositionChanged.connect(self._update_cursor_position)
-			self._update_cursor_position()
-
-	def continue_run(self):
-		breakpoints = self.get_current_editor().get_breakpoints()
-		if self.console_process:
-			if breakpoints:
-				self.console_process.write('continue\n')
-		
-	def _update_cursor_position(self):
-		"""Update cursor position in status bar"""
-		editor = self.get_current_editor()
-		if editor:
-			cursor = editor.textCursor()
-			line = cursor.blockNumber() + 1
-			col = cursor.columnNumber() + 1
-			self.cursor_label.setText(f"Ln {line}, Col {col}")
-
-	def _apply_snakeide_theme(self):
-		# snakeide Darcula color scheme
-		snakeide_style = f"""
-		QMainWindow {{
-			background-color: #2B2B2B;
-			color: #A9B7C6;
-			font-family: "Segoe UI";
-		}}
-		
-		QDialog {{
-			background-color: #2B2B2B;
-			color: #A9B7C6;
-			font-family: "Segoe UI";
-		}}
-		
-		QLineEdit {{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			border: 1px solid #5E6060;
-			padding: 5px;
-			border-radius: 3px;
-		}}
-		
-		QLabel {{
-			color: #A9B7C6;
-		}}
-	
-		QPushButton {{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			border: 1px solid #5E6060;
-			padding: 5px 10px;
-			border-radius: 3px;
-		}}
-		
-		QPushButton:hover {{
-			background-color: #4C5052;
-		}}
-		
-		QPushButton:pressed {{
-			background-color: #2B2B2B;
-		}}
-		
-		QMenuBar {{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			border: none;
-			padding: 2px;
-		}}
-
-		QTextEdit[objectName="Console"]{{
-			font-family: 'Cascadia Mono';
-			font-size: 16px;
-			background-color: #2B2B2B;
-			color: #EEEEEE;
-			margin: 5px;
-			border: 1px solid #424242;
-		}}
-
-		QTextEdit[objectName="Console"]:focus{{
-			border: 1px solid #696969;
-		}}
-		
-		QMenuBar::item {{
-			background-color: transparent;
-			padding: 4px 8px;
-			margin: 0px;
-		}}
-		
-		QMenuBar::item:selected {{
-			background-color: #4C5052;
-		}}
-		
-		QMenuBar::item:pressed {{
-			background-color: #4C5052;
-		}}
-		
-		QMenu {{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			border: 1px solid #5E6060;
-			margin: 0px;
-		}}
-		
-		QMenu::item {{
-			padding: 4px 20px;
-			margin: 0px;
-		}}
-		
-		QMenu::item:selected {{
-			background-color: #4C5052;
-		}}
-		
-		QMenu::separator {{
-			height: 1px;
-			background-color: #5E6060;
-			margin: 2px 0px;
-		}}
-		
-		QToolBar {{
-			background-color: #3C3F41;
-			border: none;
-			spacing: 2px;
-			padding: 2px;
-		}}
-		
-		QSplitter {{
-			background-color: #2B2B2B;
-		}}
-		
-		QSplitter::handle {{
-			background-color: #3C3F41;
-			width: 1px;
-			height: 1px;
-		}}
-		
-		QSplitter::handle:hover {{
-			background-color: #4C5052;
-		}}
-		
-		QTabWidget::pane {{
-			background-color: #2B2B2B;
-			border: none;
-		}}
-		
-		QTabBar {{
-			background-color: #3C3F41;
-			border-bottom: 1px solid #323232;
-		}}
-		
-		QTabBar::tab {{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			padding: 4px 8px;
-			border: none;
-			min-width: 80px;
-		}}
-		
-		QTabBar::tab:selected {{
-			background-color: #4C5052;
-			border-bottom: 2px solid #6897BB;
-		}}
-		
-		QTabBar::tab:hover {{
-			background-color: #4C5052;
-		}}
-		
-		QTabBar::close-button {{
-			image: url('{resource_path('icons/close_tab.svg')}');
-			subcontrol-position: right;
-			padding: 2px;
-		}}
-		
-		QTabBar::close-button:hover {{
-			background-color: #5E6060;
-			border-radius: 3px;
-		}}
-		
-		QPushButton#new_tab_button {{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			border: none;
-			font-weight: bold;
-		}}
-		
-		QPushButton#new_tab_button:hover {{
-			background-color: #4C5052;
-		}}
-		
-		QLabel[objectName="panel_header"] {{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			font-weight: bold;
-			font-size: 11px;
-			border-bottom: 1px solid #323232;
-		}}
-
-		QLabel[objectName="building_label"] {{
-			color: #A9B7C6;
-			padding: 2px 4px;
-		}}
-		
-		QPlainTextEdit[objectName^="editor_"] {{
-			background-color: #2B2B2B;
-			color: #A9B7C6;
-			border: none;
-			selection-background-color: #214283;
-			selection-color: #A9B7C6;
-		}}
-		
-		QTreeView {{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			border: none;
-			outline: none;
-			show-decoration-selected: 0;
-		}}
-		
-		QTreeView::item {{
-			padding: 2px;
-		}}
-		
-		QTreeView::item:selected {{
-			background-color: #4C5052;
-		}}
-		
-		QTreeView::item:hover {{
-			background-color: #4C5052;
-		}}
-		
-		QTreeView::branch:has-children:!has-siblings:closed,
-		QTreeView::branch:closed:has-children:has-siblings {{
-			border-image: none;
-			margin: 2px;
-			image: url("{resource_path('icons/caret-right.svg')}");
-		}}
-		
-		QTreeView::branch:open:has-children:!has-siblings,
-		QTreeView::branch:open:has-children:has-siblings {{
-			border-image: none;
-			margin: 2px;
-			image: url("{resource_path('icons/caret-down.svg')}");
-		}}
-		
-		QStatusBar {{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			border-top: 1px solid #323232;
-		}}
-		
-		QStatusBar[objectName="snakeide_statusbar"] {{
-			font-size: 11px;
-		}}
-		
-		QLabel[objectName="status_label"] {{
-			color: #A9B7C6;
-			padding: 2px 4px;
-		}}
-		
-		QScrollBar:vertical {{
-			background-color: #3C3F41;
-			width: 12px;
-			border: none;
-		}}
-		
-		QScrollBar::handle:vertical {{
-			background-color: #5E6060;
-			min-height: 20px;
-			border-radius: 6px;
-			margin: 0px 2px;
-		}}
-		
-		QScrollBar::handle:vertical:hover {{
-			background-color: #7C7C7C;
-		}}
-		
-		QScrollBar::add-line:vertical,
-		QScrollBar::sub-line:vertical {{
-			height: 0px;
-		}}
-		
-		QScrollBar:horizontal {{
-			background-color: #3C3F41;
-			height: 12px;
-			border: none;
-		}}
-		
-		QScrollBar::handle:horizontal {{
-			background-color: #5E6060;
-			min-width: 20px;
-			border-radius: 6px;
-			margin: 2px 0px;
-		}}
-		
-		QScrollBar::handle:horizontal:hover {{
-			background-color: #7C7C7C;
-		}}
-		
-		QScrollBar::add-line:horizontal,
-		QScrollBar::sub-line:horizontal {{
-			width: 0px;
-		}}
-
-		QDialog[objectName="CommandPalette"]{{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			border-top: 1px solid #323232;
-		}}
-		QListWidget[objectName="CommandPaletteList"]{{
-			background-color: #3C3F41;
-			color: #A9B7C6;
-			border-top: 1px solid #323232;
-		}}
-		"""
-		self.setStyleSheet(snakeide_style)
-
-	def toggle_project_panel(self):
-		"""Toggle project panel visibility"""
-		left_panel = self.main_splitter.widget(0)
-		if left_panel.isVisible():
-			left_panel.hide()
-			self.toggle_project_act.setChecked(False)
-		else:
-			left_panel.show()
-			self.toggle_project_act.setChecked(True)
-
-	def set_tab_size(self, size):
-		"""Set tab size for editor"""
-		self._tab_size = size
-		for editor_info in self.open_files.values():
-			editor = editor_info["editor"]
-			fm = QFontMetrics(editor.font())
-			editor.setTabStopDistance(size * fm.horizontalAdvance(' '))
-		
-		for act in self.tab_actions:
-			act.setChecked(False)
-		getattr(self, f'tab{size}_act').setChecked(True)
-
-	def open_file(self):
-		"""Open a single file"""
-		path, _ = QFileDialog.getOpenFileName(
-			self, "Open File", "", 
-			"Python Files (*.py);;All Files (*.*)"
-		)
-		if path:
-			self._open_file(path)
-
-	def open_project(self):
-		path = QFileDialog.getExistingDirectory(self, "Open Project", "")
-		self._open_folder(path)
-
-	def _create_new_tab(self):
-		"""Create a new empty tab"""
-		self._open_file(None, "Untitled.py")
-
-	def _open_file(self, path, title="Untitled.py"):
-		"""Open a file in a new tab or switch to existing tab"""
-		# Check if file is already open
-		if path and path in self.open_files:
-			tab_index = self.editor_tabs.indexOf(self.open_files[path]["widget"])
-			self.editor_tabs.setCurrentIndex(tab_index)
-			return
-			
-		# Create new editor
-		editor = CodeEditor()
-		editor.setObjectName("editor_" + str(len(self.open_files)))
-		editor.file_path = path
-		
-		# Set tab size
-		fm = QFontMetrics(editor.font())
-		editor.setTabStopDistance(self._tab_size * fm.horizontalAdvance(' '))
-		editor.setLineWrapMode(QPlainTextEdit.NoWrap)
-		
-		# Create highlighter
-		highlighter = PythonHighlighter(editor.document())
-		
-		# Create container widget for editor
-		container = QWidget()
-		layout = QVBoxLayout(container)
-		layout.setContentsMargins(0, 0, 0, 0)
-		layout.addWidget(editor)
-		
-		# Add to tabs
-		tab_index = self.editor_tabs.addTab(container, title)
-		self.editor_tabs.setCurrentIndex(tab_index)
-		
-		# Store file info
-		self.open_files[path] = {
-			"editor": editor,
-			"highlighter": highlighter,
-			"widget": container
-		}
-		
-		# Load file if path exists
-		if path and os.path.exists(path):
-			try:
-				with open(path, 'r', encoding='utf-8') as f:
-					text = f.read()
-				editor.setPlainText(text)
-				
-				# Set tab title to filename
-				filename = os.path.basename(path)
-				self.editor_tabs.setTabText(tab_index, filename)
-				
-				self.statusBar().showMessage(f"Opened: {filename}", 2000)
-			except Exception as e:
-				QMessageBox.warning(self, "Error", f"Could not open file: {str(e)}")
-		
-		# Connect editor signals
-		editor.cursorPositionChanged.connect(self._update_cursor_position)
-		self._update_cursor_position()
-
-	def get_current_editor(self):
-		"""Get the current editor widget"""
-		current_widget = self.editor_tabs.currentWidget()
-		if current_widget:
-			# The editor is the first child of the container
-			return current_widget.findChild(CodeEditor)
-		return None
-
-	def save_file(self):
-		"""Save current file"""
-		editor = self.get_current_editor()
-		if not editor:
-			return
-			
-		path = editor.file_path
-		if path:
-			try:
-				with open(path, 'w', encoding='utf-8') as f:
-					f.write(editor.toPlainText())
-				self.statusBar().showMessage(f"Saved: {os.path.basename(path)}", 2000)
-			except Exception as e:
-				QMessageBox.warning(self, "Error", f"Could not save file: {str(e)}")
-		else:
-			# Save As dialog
-			self.save_file_as()
-
-	def save_file_as(self):
-		"""Save current file with a new name"""
-		editor = self.get_current_editor()
-		if not editor:
-			return
-			
-		path, _ = QFileDialog.getSaveFileName(
-			self, "Save File", "", 
-			"Python Files (*.py);;All Files (*.*)"
-		)
-		if path:
-			try:
-				with open(path, 'w', encoding='utf-8') as f:
-					f.write(editor.toPlainText())
-				
-				# Update tab info
-				editor.file_path = path
-				filename = os.path.basename(path)
-				tab_index = self.editor_tabs.currentIndex()
-				self.editor_tabs.setTabText(tab_index, filename)
-				
-				# Update open files
-				old_path = None
-				for p, info in self.open_files.items():
-					if info["editor"] == editor:
-						old_path = p
-						break
-				if old_path is not None:
-					del self.open_files[old_path]
-				self.open_files[path] = {
-					"editor": editor,
-					"highlighter": self.open_files[old_path]["highlighter"],
-					"widget": self.open_files[old_path]["widget"]
-				}
-				
-				self.statusBar().showMessage(f"Saved: {filename}", 2000)
-			except Exception as e:
-				QMessageBox.warning(self, "Error", f"Could not save file: {str(e)}")
-
-	def save_all_files(self):
-		"""Save all open files"""
-		for path, file_info in self.open_files.items():
-			if path:  # Skip untitled files
-				editor = file_info["editor"]
-				try:
-					with open(path, 'w', encoding='utf-8') as f:
-						f.write(editor.toPlainText())
-				except Exception as e:
-					QMessageBox.warning(self, "Error", f"Could not save {path}: {str(e)}")
-		self.statusBar().showMessage("All files saved", 2000)
-
-	def close_current_tab(self):
-		"""Close the current tab"""
-		current_index = self.editor_tabs.currentIndex()
-		if current_index >= 0:
-			self.close_tab(current_index)
-
-	def close_tab(self, index, confirmation=False):
-		"""Close a tab by index"""
-		widget = self.editor_tabs.widget(index)
-		
-		# Find the file path for this tab
-		path = None
-		for p, file_info in self.open_files.items():
-			if file_info["widget"] == widget:
-				path = p
-				break
-		
-		# Check if we need to save
-		if path:
-			editor = self.open_files[path]["editor"]
-			if confirmation:
-				if editor.document().isModified():
-					reply = QMessageBox.question(
-						self, "Save Changes?",
-						f"Do you want to save changes to {os.path.basename(path)}?",
-						QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel
-					)
-					if reply == QMessageBox.Save:
-						self.save_file()
-					elif reply == QMessageBox.Cancel:
-						return
-			self.save_file()
-		
-		# Remove the tab
-		self.editor_tabs.removeTab(index)
-		
-		# Remove from open files
-		if path in self.open_files:
-			del self.open_files[path]
-
-	def _tab_changed(self, index):
-		"""Handle tab change event"""
-		if index >= 0:
-			self._update_cursor_position()
-
-	def _open_folder(self, path=None):
-		if path:
-			path = os.path.abspath(path)
-
-			for tab_index in range(self.editor_tabs.count()-1, -1, -1):
-				self.close_tab(tab_index)
-
-			# Set model to parent so the folder is visible as a child
-			self.model.setRootPath(path)
-			self.tree.setRootIndex(self.model.index(path))
-
-			# UI updates
-			left_panel = self.main_splitter.widget(0)
-			left_panel.show()
-			self.toggle_project_act.setChecked(True)
-
-			project_name = os.path.basename(path)
-			self.config['current_project'] = path
-			self.setWindowTitle(f"{project_name} - Snake IDE")
-
-
-
-	def _on_tree_double_click(self, index: QModelIndex):
-		"""Handle tree double click"""
-		if not index.isValid():
-			return
-			
-		path = self.model.filePath(index)
-		if os.path.isfile(path):
-			self._open_file(path)
-
-	def _on_tree_context_menu(self, point):
-		"""Handle tree context menu"""
-		index = self.tree.indexAt(point)
-		if not index.isValid():
-			# If clicking on empty space, use root path
-			if self.model.rootPath():
-				path = self.model.rootPath()
-			else:
-				return
-		else:
-			path = self.model.filePath(index)
-			if not os.path.isdir(path):
-				path = os.path.dirname(path)
-				
-		menu = QMenu(self)
-		new_file = menu.addAction("New Python File")
-		new_folder = menu.addAction("New Directory")
-		rename = menu.addAction("Rename")
-		delete_selected = menu.addAction("Delete Selected")
-		menu.addSeparator()
-		
-		action = menu.exec_(self.tree.viewport().mapToGlobal(point))
-		
-		if action == new_file:
-			name, ok = QFileDialog.getSaveFileName(
-				self, "New Python File", 
-				os.path.join(path, "untitled.py"),
-				"Python Files (*.py)"
-			)
-			if ok and name:
-				try:
-					with open(name, 'w', encoding='utf-8') as f:
-						f.write("# New Python file\n")
-					self._open_file(name)
-				except Exception as e:
-					QMessageBox.warning(self, "Error", str(e))
-					
-		elif action == new_folder:
-			dialog = CustomInputDialog(self, "New Folder", "Folder name:")
-			if dialog.exec_() == QDialog.Accepted:
-				folder_name = dialog.get_text()
-				if folder_name:
-					try:
-						new_folder_path = os.path.join(path, folder_name)
-						os.makedirs(new_folder_path, exist_ok=True)
-					except Exception as e:
-						QMessageBox.warning(self, "Error", str(e))
-						
-		elif action == rename:
-			if index.isValid():
-				old_name = os.path.basename(path)
-				dialog = CustomInputDialog(self, "Rename", "New name:", old_name)
-				if dialog.exec_() == QDialog.Accepted:
-					new_name = dialog.get_text()
-					if new_name and new_name != old_name:
-						try:
-							parent_dir = os.path.dirname(path)
-							new_path = os.path.join(parent_dir, new_name)
-							os.rename(path, new_path)
-						except Exception as e:
-							QMessageBox.warning(self, "Error", str(e))
-			
-		elif action == delete_selected:
-			if index.isValid():
-				path = self.model.filePath(index)
-				reply = QMessageBox.question(
-					self, "Confirm Delete",
-					f"Are you sure you want to delete '{os.path.basename(path)}'?",
-					QMessageBox.Yes | QMessageBox.No
-				)
-				if reply == QMessageBox.Yes:
-					try:
-						if os.path.isfile(path):
-							os.remove(path)
-						else:
-							shutil.rmtree(path) 
-					except Exception as e:
-						QMessageBox.warning(self, "Error", str(e))
-					
-	def closeEvent(self, event):
-		self.save_config()
-		event.accept()
-
-class FileIconProvider(QFileIconProvider):
-	"""Custom icon provider for file system model"""
-	def __init__(self, folder_icon, file_icons):
-		super().__init__()
-		self.folder_icon = folder_icon
-		self.file_icons = file_icons
-		
-	def icon(self, type: QFileInfo):
-		if isinstance(type, QFileInfo):
-			if type.isDir():
-				return self.folder_icon
-
-			return self.file_icons.get(type.completeSuffix(), self.file_icons['general_file'])
-		return type
-
-if __name__ == '__main__':
-	app = QApplication(sys.argv)
-	app.setApplicationName("Snake IDE")	
-	window = snakeideEditor()
-	window.show()
-	
+import time
+_STARTUP_T0 = time.perf_counter()
+
+import sys
+import os
+from launcher import parse_args, instance_address, forward_to_running_instance
+
+if __name__ == '__main__':
+	_args = parse_args(sys.argv)
+	# A running IDE takes the paths over before we pay for the Qt imports
+	if not (_args.new_window or _args.profile_startup) and forward_to_running_instance(_args.paths):
+		sys.exit(0)
+	if _args.trace:
+		# Read by core when it's imported, the instrumentation is only wrapped in when on
+		os.environ["SNAKEIDE_TRACE"] = "1"
+
+import re
+import shutil
+import math
+import bisect
+import queue
+import threading
+import codeop
+import textwrap
+import signal
+from functools import lru_cache
+
+from PySide6.QtWidgets import (
+	QApplication, QButtonGroup, QMainWindow, QSplitter, QTextEdit, QTreeView, QPlainTextEdit,
+	QFileSystemModel, QFileDialog, QMessageBox, QMenu, QStatusBar,
+	QToolBar, QLabel, QFrame, QVBoxLayout, QWidget, QHBoxLayout, 
+	QTabWidget, QTabBar, QPushButton, QScrollBar, QDialog,
+	QLineEdit, QDialogButtonBox, QInputDialog,
+	QFileIconProvider, QCheckBox, QListWidget, QListWidgetItem, QToolTip, QTextBrowser, QFormLayout,
+	QComboBox, QTreeWidget, QTreeWidgetItem
+)
+from PySide6.QtGui import (
+	QFont, QKeyEvent, QKeySequence, QPalette, QColor, QAction, QIcon, QPixmap, QPainter, QShortcut, QImage,
+	QSyntaxHighlighter, QTextCharFormat, QFontMetrics, QTextCursor, QTextDocument
+)
+from PySide6.QtCore import (
+	QFileInfo, Qt, QModelIndex, QSize, QRect,
+	QThread, Signal, QProcess, QProcessEnvironment, QSortFilterProxyModel,
+	QPoint, QTimer, QObject, QAbstractItemModel, QFileSystemWatcher, QEvent, QUrl
+)
+from core import *
+import json
+
+# The cold start (imports up to the first painted frame) has to fit in this budget;
+# `--profile-startup` exits non-zero when it doesn't, so CI can guard it.
+STARTUP_BUDGET_MS = 300
+startup_profiler = StartupProfiler(_STARTUP_T0)
+startup_profiler.mark("imports")
+
+
+def resource_path(relative):
+	base = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+	return os.path.join(base, relative).replace("\\", "/")
+
+def fix_qss_paths(qss: str) -> str:
+	def path(name):
+		return resource_path(f"icons/{name}").replace("\\", "/")
+
+	return qss.format(
+		close_tab=path("close_tab.svg"),
+		caret_right=path("caret-right.svg"),
+		caret_down=path("caret-down.svg")
+	)
+
+_breakpoint_icon = None
+
+def breakpoint_icon():
+	"""Shared breakpoint renderer; QtSvg is only imported once a gutter needs it"""
+	global _breakpoint_icon
+	if _breakpoint_icon is None:
+		from PySide6.QtSvg import QSvgRenderer
+		_breakpoint_icon = QSvgRenderer(resource_path("icons/breakpoint.svg"))
+	return _breakpoint_icon
+
+class FindDialog(QDialog):
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self.setWindowTitle("Find")
+		self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
+		
+		layout = QVBoxLayout(self)
+		self.search_input = QLineEdit(self)
+		self.search_input.setPlaceholderText("Enter text to find")
+		layout.addWidget(self.search_input)
+		
+		self.case_cb = QCheckBox("Case sensitive", self)
+		layout.addWidget(self.case_cb)
+		
+		btn_layout = QVBoxLayout()
+		self.next_btn = QPushButton("Find Next", self)
+		self.prev_btn = QPushButton("Find Previous", self)
+		btn_layout.addWidget(self.next_btn)
+		btn_layout.addWidget(self.prev_btn)
+		layout.addLayout(btn_layout)
+		
+		# signals
+		self.next_btn.clicked.connect(lambda: self.parent().find_next(
+			self.search_input.text(),
+			self.case_cb.isChecked()
+		))
+		self.prev_btn.clicked.connect(lambda: self.parent().find_previous(
+			self.search_input.text(),
+			self.case_cb.isChecked()
+		))
+		# Closing the dialog (not find_next hiding it around its message box) drops the marks
+		self.finished.connect(lambda _: self.parent().clear_search_highlights())
+
+class CommandPalette(QDialog):
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self.setWindowFlags(
+			Qt.Window | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint
+		)
+		self.setAttribute(Qt.WA_TranslucentBackground)
+		self.setFixedWidth(parent.width() * 0.8)
+		self.move(
+			parent.x() + parent.width() * 0.1,
+			parent.y() + 10
+		)
+
+		layout = QVBoxLayout(self)
+		layout.setContentsMargins(8, 8, 8, 8)
+
+		self.input = QLineEdit()
+		self.input.setPlaceholderText("Type a command...")
+		layout.addWidget(self.input)
+
+		self.list_widget = QListWidget()
+		layout.addWidget(self.list_widget)
+		self.list_widget.setObjectName("CommandPaletteList")
+
+		# Commands
+		self.IDE = parent
+		self.commands = [
+			"Build File",
+			"Run with Coverage",
+			"Toggle Coverage Overlay",
+			"Clear Coverage",
+			"Edit Run Configurations",
+			"Run Settings",
+			"Debug File",
+			"Convert Tabs to Spaces",
+			"Convert Spaces to Tabs",
+			"Find",
+			"Add Next Occurrence",
+			"Select All Occurrences",
+			"Split Right",
+			"Split Down",
+			"Unsplit",
+			"Toggle Performance HUD",
+			"Export Performance Trace",
+			"Fold",
+			"Unfold",
+			"Fold All",
+			"Unfold All",
+			"Python Console",
+			"Run Selection in Console",
+			"Run File in Console",
+			"Run Cell",
+			"Run Cell and Advance",
+			"Interrupt Kernel",
+			"Restart Kernel",
+			"Tests",
+			"Run All Tests",
+			"Run Failed Tests",
+			"Run Affected Tests"
+		]
+		self.update_list("")
+
+		# When user types and presses Enter, always execute the currently highlighted list item
+		self.input.returnPressed.connect(self.execute_current)
+		self.input.textChanged.connect(self.update_list)
+		self.list_widget.itemActivated.connect(self.execute_current)
+
+	def update_list(self, filter_text):
+		self.list_widget.clear()
+		configurations, _ = self.IDE.run_configurations()
+		commands = self.commands + [f"Run Configuration: {c.name}" for c in configurations]
+		filtered = [cmd for cmd in commands if filter_text.lower() in cmd.lower()]
+		for cmd in filtered:
+			self.list_widget.addItem(QListWidgetItem(cmd))
+		# Select the first item by default
+		if self.list_widget.count() > 0:
+			self.list_widget.setCurrentRow(0)
+
+	def execute_current(self):
+		current_item = self.list_widget.currentItem()
+		if current_item is None:
+			self.hide()
+			return
+		self.hide()
+		cmd = current_item.text()
+		editor = self.IDE.get_current_editor()
+		ts = getattr(self.IDE, 'tab_size', getattr(self.IDE, '_tab_size', 4))
+
+		if cmd == "Build File":
+			self.IDE.build_file()
+		elif cmd == "Run with Coverage":
+			self.IDE.build_file(coverage=True)
+		elif cmd == "Toggle Coverage Overlay":
+			self.IDE.coverage_act.trigger()
+		elif cmd == "Clear Coverage":
+			self.IDE.clear_coverage()
+		elif cmd == "Edit Run Configurations":
+			self.IDE.edit_run_configurations()
+		elif cmd.startswith("Run Configuration: "):
+			self.IDE.select_run_configuration(cmd.removeprefix("Run Configuration: "))
+		elif cmd == "Run Settings":
+			self.IDE.edit_run_settings()
+		elif cmd == "Debug File":
+			self.IDE.debug_run()
+		elif cmd == "Find":
+			self.IDE.show_find()
+		elif cmd == "Split Right":
+			self.IDE.split_editor(Qt.Horizontal)
+		elif cmd == "Split Down":
+			self.IDE.split_editor(Qt.Vertical)
+		elif cmd == "Unsplit":
+			self.IDE.unsplit_editor()
+		elif cmd == "Toggle Performance HUD":
+			self.IDE.perf_hud_act.trigger()
+		elif cmd == "Export Performance Trace":
+			self.IDE.export_trace()
+		elif cmd == "Python Console":
+			self.IDE.show_repl().input.setFocus()
+		elif cmd == "Run Selection in Console":
+			self.IDE.run_selection_in_console()
+		elif cmd == "Run File in Console":
+			self.IDE.run_file_in_console()
+		elif cmd == "Run Cell":
+			self.IDE.run_cell()
+		elif cmd == "Run Cell and Advance":
+			self.IDE.run_cell(advance=True)
+		elif cmd == "Interrupt Kernel":
+			self.IDE.kernel.interrupt()
+		elif cmd == "Restart Kernel":
+			self.IDE.restart_kernel_act.trigger()
+		elif cmd == "Tests":
+			self.IDE.show_tests()
+		elif cmd == "Run All Tests":
+			self.IDE.run_tests("all")
+		elif cmd == "Run Failed Tests":
+			self.IDE.run_tests("failed")
+		elif cmd == "Run Affected Tests":
+			self.IDE.run_tests("affected")
+		elif cmd == "Fold" and editor:
+			editor.fold()
+		elif cmd == "Unfold" and editor:
+			editor.unfold()
+		elif cmd == "Fold All" and editor:
+			editor.fold_all()
+		elif cmd == "Unfold All" and editor:
+			editor.unfold_all()
+		elif cmd == "Add Next Occurrence" and editor:
+			editor.add_next_occurrence()
+		elif cmd == "Select All Occurrences" and editor:
+			editor.select_all_occurrences()
+		elif cmd == "Convert Tabs to Spaces" and editor:
+			editor.convert_indentation(ts, to_tabs=False)
+		elif cmd == "Convert Spaces to Tabs" and editor:
+			editor.convert_indentation(ts, to_tabs=True)
+
+	def keyPressEvent(self, event):
+		if event.key() == Qt.Key_Escape:
+			self.hide()
+		else:
+			super().keyPressEvent(event)
+
+class ConsoleWidget(QPlainTextEdit):
+	"""Python console input: Enter runs it once it's a complete statement, Up/Down walk the history"""
+	enterPressed = Signal(str)  # Signal to emit command
+
+	def __init__(self, history, parent=None):
+		super().__init__(parent)
+		self.history = history
+		self.setObjectName("Console")
+		self.setPlaceholderText(">>> ")
+		self.setLineWrapMode(QPlainTextEdit.NoWrap)
+
+	def keyPressEvent(self, event):
+		key = event.key()
+		cursor = self.textCursor()
+		if key in (Qt.Key_Return, Qt.Key_Enter) and not event.modifiers() & Qt.ShiftModifier:
+			text = self.toPlainText()
+			if self._complete(text):
+				text = text.rstrip()
+				self.history.add(text)
+				self.clear()
+				self.enterPressed.emit(text)
+				return
+			# Like the standard REPL, a block continues until an empty line
+			line = cursor.block().text()
+			indent = line[:len(line) - len(line.lstrip())]
+			if line.rstrip().endswith(":"):
+				indent += "    "
+			self.insertPlainText("\n" + indent)
+		elif key == Qt.Key_Up and not cursor.block().previous().isValid():
+			self._show_entry(self.history.previous(self.toPlainText()))
+		elif key == Qt.Key_Down and not cursor.block().next().isValid():
+			self._show_entry(self.history.next())
+		else:
+			super().keyPressEvent(event)
+
+	def _show_entry(self, text):
+		if text is not None:
+			self.setPlainText(text)
+			self.moveCursor(QTextCursor.End)
+
+	@staticmethod
+	def _complete(text):
+		if not text.strip():
+			return False
+		if "\n" in text and not text.rsplit("\n", 1)[1].strip():
+			# Only an empty line closes a block
+			return True
+		try:
+			return codeop.compile_command(text, "<console>", "single") is not None
+		except (SyntaxError, ValueError, OverflowError):
+			# Several statements at once (a paste) or a real error the kernel will report
+			return True
+
+class CustomInputDialog(QDialog):
+	"""Themed input dialog matching Snake IDE style"""
+	def __init__(self, parent, title, label, initial_text=""):
+		super().__init__(parent)
+		self.setWindowTitle(title)
+		self.setModal(True)
+		
+		layout = QVBoxLayout(self)
+		self.label = QLabel(label)
+		self.input = QLineEdit(initial_text)
+		buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+		
+		layout.addWidget(self.label)
+		layout.addWidget(self.input)
+		layout.addWidget(buttons)
+		
+		buttons.accepted.connect(self.accept)
+		buttons.rejected.connect(self.reject)
+		
+	def get_text(self):
+		return self.input.text().strip()
+
+class RunSettingsDialog(QDialog):
+	"""Resource limits for runs and how often the resource monitor samples"""
+	def __init__(self, parent, limits, interval_ms):
+		super().__init__(parent)
+		self.setWindowTitle("Run Settings")
+		self.setModal(True)
+
+		layout = QFormLayout(self)
+		self.interval = QLineEdit(str(interval_ms))
+		self.memory = QLineEdit(str(limits.get("memory_mb") or ""))
+		self.memory.setPlaceholderText("no limit")
+		self.nice = QLineEdit(str(limits.get("nice") or ""))
+		self.nice.setPlaceholderText("0")
+		self.cpus = QLineEdit(",".join(map(str, limits.get("cpus") or [])))
+		self.cpus.setPlaceholderText("all, or e.g. 0,2-3")
+		layout.addRow("Sample every (ms)", self.interval)
+		layout.addRow("Memory limit (MB)", self.memory)
+		layout.addRow("Niceness (0-19)", self.nice)
+		layout.addRow("CPUs", self.cpus)
+		buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+		layout.addRow(buttons)
+		buttons.accepted.connect(self.accept)
+		buttons.rejected.connect(self.reject)
+
+	def values(self):
+		"""(limits, interval_ms), raises ValueError for anything that doesn't parse"""
+		interval = int(self.interval.text() or 500)
+		memory = int(self.memory.text() or 0)
+		nice = int(self.nice.text() or 0)
+		if interval < 50 or memory < 0 or not 0 <= nice <= 19:
+			raise ValueError("sample every 50 ms or more, a memory limit of 0 or more and a niceness of 0-19")
+		return {"memory_mb": memory, "nice": nice, "cpus": parse_cpu_list(self.cpus.text())}, interval
+
+class RunConfigurationsDialog(QDialog):
+	"""Add, remove and edit the project's run configurations"""
+	OPTIMIZE = ("None", "-O", "-OO")
+
+	def __init__(self, parent, configurations, interpreters):
+		super().__init__(parent)
+		self.setWindowTitle("Run Configurations")
+		self.setModal(True)
+		self.resize(720, 380)
+		self.configurations = [RunConfiguration.from_config(c.to_config()) for c in configurations]
+		self._current = None
+
+		layout = QHBoxLayout(self)
+		left = QVBoxLayout()
+		self.list = QListWidget()
+		left.addWidget(self.list)
+		buttons = QHBoxLayout()
+		for name, slot in (("Add", self.add), ("Copy", self.copy), ("Remove", self.remove)):
+			button = QPushButton(name)
+			button.clicked.connect(slot)
+			buttons.addWidget(button)
+		left.addLayout(buttons)
+		layout.addLayout(left, 1)
+
+		form = QFormLayout()
+		self.name = QLineEdit()
+		self.interpreter = QComboBox()
+		self.interpreter.setEditable(True)
+		self.interpreter.addItem("", "")
+		for path, version in interpreters:
+			self.interpreter.addItem(f"Python {version}  {path}", path)
+		self.interpreter.lineEdit().setPlaceholderText("default interpreter, or a path / venv folder")
+		self.script = QLineEdit()
+		self.script.setPlaceholderText("the current file")
+		self.args = QLineEdit()
+		self.env = QPlainTextEdit()
+		self.env.setPlaceholderText("KEY=value, one per line")
+		self.env.setFixedHeight(80)
+		self.cwd = QLineEdit()
+		self.cwd.setPlaceholderText("the project folder")
+		self.optimize = QComboBox()
+		self.optimize.addItems(self.OPTIMIZE)
+		self.x_options = QLineEdit()
+		self.x_options.setPlaceholderText("e.g. dev importtime")
+		form.addRow("Name", self.name)
+		form.addRow("Interpreter", self.interpreter)
+		form.addRow("Script", self.script)
+		form.addRow("Arguments", self.args)
+		form.addRow("Environment", self.env)
+		form.addRow("Working directory", self.cwd)
+		form.addRow("Optimize", self.optimize)
+		form.addRow("-X options", self.x_options)
+		box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+		box.accepted.connect(self.accept)
+		box.rejected.connect(self.reject)
+		form.addRow(box)
+		layout.addLayout(form, 2)
+
+		self.list.currentRowChanged.connect(self._show)
+		self.name.textEdited.connect(lambda text: self.list.currentItem() and self.list.currentItem().setText(text))
+		for configuration in self.configurations:
+			self.list.addItem(configuration.name)
+		self.list.setCurrentRow(0)
+
+	def _show(self, row):
+		self._store()
+		self._current = self.configurations[row] if 0 <= row < len(self.configurations) else None
+		configuration = self._current or RunConfiguration("")
+		self.name.setText(configuration.name)
+		index = self.interpreter.findData(configuration.interpreter)
+		if index >= 0:
+			self.interpreter.setCurrentIndex(index)
+		else:
+			self.interpreter.setEditText(configuration.interpreter)
+		self.script.setText(configuration.script)
+		self.args.setText(configuration.args)
+		self.env.setPlainText("\n".join(f"{key}={value}" for key, value in configuration.env.items()))
+		self.cwd.setText(configuration.cwd)
+		self.optimize.setCurrentIndex(configuration.optimize)
+		self.x_options.setText(configuration.x_options)
+
+	def _store(self):
+		"""Form fields back into the configuration being shown"""
+		configuration = self._current
+		if configuration is None:
+			return
+		configuration.name = self.name.text().strip() or "Unnamed"
+		index = self.interpreter.currentIndex()
+		text = self.interpreter.currentText().strip()
+		configuration.interpreter = self.interpreter.itemData(index) if index >= 0 and self.interpreter.itemText(index) == text else text
+		configuration.script = self.script.text().strip()
+		configuration.args = self.args.text().strip()
+		configuration.env = dict(
+			line.split("=", 1) for line in self.env.toPlainText().splitlines() if "=" in line
+		)
+		configuration.cwd = self.cwd.text().strip()
+		configuration.optimize = self.optimize.currentIndex()
+		configuration.x_options = self.x_options.text().strip()
+
+	def add(self, configuration=None):
+		configuration = configuration or RunConfiguration(f"Configuration {len(self.configurations) + 1}")
+		self.configurations.append(configuration)
+		self.list.addItem(configuration.name)
+		self.list.setCurrentRow(len(self.configurations) - 1)
+
+	def copy(self):
+		self._store()
+		if self._current is not None:
+			configuration = RunConfiguration.from_config(self._current.to_config())
+			configuration.name += " (copy)"
+			self.add(configuration)
+
+	def remove(self):
+		row = self.list.currentRow()
+		if 0 <= row < len(self.configurations):
+			self._current = None
+			del self.configurations[row]
+			self.list.takeItem(row)
+
+	def values(self):
+		self._store()
+		return self.configurations
+
+
+class InterpreterScanner(QObject):
+	"""Runs InterpreterFinder for a project on a background thread"""
+	found = Signal(str, list)  # project, [(path, version)]
+
+	def scan(self, project):
+		def find():
+			try:
+				self.found.emit(project, InterpreterFinder().load().find(project or None))
+			except Exception as e:
+				print(f"Interpreter discovery: {e}", file=sys.stderr)
+		threading.Thread(target=find, name="snakeide-interpreters", daemon=True).start()
+
+
+CONSOLE_COLORS = {"foreground": "#EEEEEE", "background": "#2B2B2B", "link": "#87C3FF"}
+CONSOLE_MAX_LINES = 20000
+
+
+@lru_cache(maxsize=512)
+def console_format(style, link=None):
+	"""Char format for an AnsiStyle (and traceback link), one per distinct style"""
+	fmt = QTextCharFormat()
+	fg = None if style.fg is None else ansi_color(style.fg)
+	bg = None if style.bg is None else ansi_color(style.bg)
+	if style.inverse:
+		fg, bg = bg or CONSOLE_COLORS["background"], fg or CONSOLE_COLORS["foreground"]
+	if link is not None:
+		path, line = link
+		fmt.setAnchor(True)
+		fmt.setAnchorHref(f"{QUrl.fromLocalFile(os.path.abspath(path)).toString()}#{line}")
+		fmt.setFontUnderline(True)
+		fg = fg or CONSOLE_COLORS["link"]
+	if fg:
+		fmt.setForeground(QColor(fg))
+	if bg:
+		fmt.setBackground(QColor(bg))
+	if style.bold:
+		fmt.setFontWeight(QFont.Weight.Bold)
+	if style.italic:
+		fmt.setFontItalic(True)
+	if style.underline:
+		fmt.setFontUnderline(True)
+	return fmt
+
+
+class ConsoleStream(QObject):
+	"""Process output into the console: ANSI colours become formats, traceback frames links
+
+	Chunks go through an AnsiStreamParser as they arrive and the runs are inserted once per
+	frame, merged where neighbours share a format, so fast output costs a few inserts.
+	"""
+	FLUSH_MS = 16
+
+	def __init__(self, console, parent=None):
+		super().__init__(parent)
+		self.console = console
+		self.parser = AnsiStreamParser()
+		self._runs = []
+		self._timer = QTimer(self)
+		self._timer.setSingleShot(True)
+		self._timer.setInterval(self.FLUSH_MS)
+		self._timer.timeout.connect(self.flush)
+
+	def write(self, data):
+		self._runs += self.parser.feed(data)
+		if self._runs and not self._timer.isActive():
+			self._timer.start()
+
+	def close(self):
+		self._runs += self.parser.flush()
+		self.flush()
+
+	@traced()
+	def flush(self):
+		self._timer.stop()
+		if not self._runs:
+			return
+		runs, self._runs = self._runs, []
+		cursor = QTextCursor(self.console.document())
+		cursor.movePosition(QTextCursor.End)
+		cursor.beginEditBlock()
+		pending, style, link = [], None, None
+		for text, run_style, run_link in runs:
+			if pending and (run_style != style or run_link != link or text == "\r"):
+				cursor.insertText("".join(pending), console_format(style, link))
+				pending = []
+			if text == "\r":
+				# A carriage return, what follows replaces the last line
+				cursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+				cursor.removeSelectedText()
+				continue
+			pending.append(text)
+			style, link = run_style, run_link
+		if pending:
+			cursor.insertText("".join(pending), console_format(style, link))
+		cursor.endEditBlock()
+		# So the plain insertPlainText messages that follow don't pick up the last format
+		self.console.moveCursor(QTextCursor.End)
+		self.console.setCurrentCharFormat(QTextCharFormat())
+		self.console.ensureCursorVisible()
+
+
+class BuildThread(QProcess):
+	finished = Signal(str)
+
+	def __init__(self, console_output):
+		super().__init__()
+		self.console_output = console_output
+		self.stream = ConsoleStream(console_output, self)
+
+		# Connect signals
+		self.readyReadStandardOutput.connect(self.handle_stdout)
+		self.readyReadStandardError.connect(self.handle_stderr)
+
+	def start_build(self, program, arguments=[]):
+		"""Start the process with given program and arguments."""
+		self.setProgram(program)
+		self.setArguments(arguments)
+		self.setProcessChannelMode(QProcess.MergedChannels)  # Optional: merge stdout + stderr
+		self.stateChanged.connect(self.on_state_changed)
+		self.start()
+
+	def on_state_changed(self, state):
+		if state == QProcess.NotRunning:
+			self.handle_stdout()
+			self.stream.close()
+			self.finished.emit('finished')
+
+	@traced()
+	def handle_stdout(self):
+		self.stream.write(self.readAllStandardOutput().data())
+
+	def handle_stderr(self):
+		self.stream.write(self.readAllStandardError().data())
+
+	def write(self, command):
+		"""Send command to the running process"""
+		if self.state() == QProcess.Running:
+			self.writeData(command, len(command))
+
+
+class DebugThread(QProcess):
+	finished = Signal(str)
+	# pdb commands that let the program run on, until the next stop anything written goes to it
+	RESUME = {"c", "cont", "continue", "s", "step", "n", "next", "r", "return", "unt", "until", "j", "jump", "q", "quit", "restart", "run"}
+
+	def __init__(self, console_output, editor):
+		super().__init__()
+		self.console_output = console_output
+		self.editor = editor
+		self.session = None
+		self._stopped = False
+		self._queued = []  # breakpoint commands waiting for pdb to stop
+
+		self.readyReadStandardOutput.connect(self.handle_stdout)
+
+	def start_build(self, program, arguments=[]):
+		"""Start pdb on the script (the argument after `-m pdb`) and hand it the breakpoints"""
+		self.setProgram(program)
+		self.setArguments(arguments)
+		self.setProcessChannelMode(QProcess.MergedChannels)  # Optional: merge stdout + stderr
+		self.stateChanged.connect(self.on_state_changed)
+		self.console_output.insertPlainText("Running Debugger.\n")
+		self.session = PdbSession(arguments[arguments.index("pdb") + 1], self.editor.breakpoints)
+		self._at_breakpoint = False
+		self.start()
+		for command in self.session.start_commands():
+			self.write(command + "\n", False)
+
+	def push_breakpoint(self, line):
+		"""Send a breakpoint that changed in the editor to the running pdb, once it's stopped"""
+		if self.session is not None:
+			self._queued += self.session.update_commands(line)
+			if self._stopped:
+				self._send_queued()
+
+	def _send_queued(self):
+		queued, self._queued = self._queued, []
+		for command in queued:
+			self.write(command + "\n", False)
+
+	@traced()
+	def handle_stdout(self):
+		data = self.readAllStandardOutput().data().decode('utf-8')
+		for line in data.splitlines():
+			event = self.session.feed(line)
+			if event is None:
+				continue
+			kind = event[0]
+			if kind == "stop" or kind == "location" and event[1].startswith("> "):
+				# pdb is waiting for a command now, wherever it stopped
+				self._stopped = True
+				self._send_queued()
+			if kind == "stop":
+				_, line_num, breakpoint = event
+				self._at_breakpoint = breakpoint is not None
+				if breakpoint is not None:
+					self.print_out(f"(BREAKPOINT) Line {line_num + 1}, hit {breakpoint.hits}:")
+					self.editor._update_gutters()
+			elif kind == "location":
+				if self._at_breakpoint and event[1].startswith("-> "):
+					self.print_out("\t", event[1].removeprefix("-> "))
+					self.get_variables()
+			elif kind == "set":
+				continue
+			elif kind == "finished":
+				self.write("quit\n", False)
+			elif event[1].startswith("__VARIABLES__"):
+				v = event[1].removeprefix("__VARIABLES__")
+				variables = eval(v)
+				for k,v in variables.items():
+					if k.startswith("__"):
+						continue
+					self.print_out(f"Variable: {k} Value: {v}")
+			else:
+				self.console_output.insertPlainText(event[1] + "\n")
+		self.console_output.ensureCursorVisible()
+	def get_variables(self):
+		self.code = """__VARS__={}
+for __k, __v in list(locals().items()): __VARS__[__k]=str(__v)
+print('__VARIABLES__'+str(__VARS__))"""
+		for line in self.code.split("\n"):
+			self.write('!'+line+'\n', False)
+	def print_out(self, *args, end='\n'):
+		for arg in args:
+			self.console_output.insertPlainText(str(arg)+" ")
+		self.console_output.insertPlainText(end)
+	def on_state_changed(self, state):
+		if state == QProcess.NotRunning:
+			self.write("quit\n")
+			self.console_output.insertPlainText("\n-> quit\n")
+			self.session = None
+			self.finished.emit('finished')
+
+	def write(self, command, printout=True):
+		"""Send command to the running process"""
+		if self.state() in (QProcess.Running, QProcess.Starting):
+			words = command.split()
+			if words and words[0] in self.RESUME:
+				self._stopped = False
+			if printout:
+				self.console_output.insertPlainText(f"-> {command}\n")
+			self.writeData(command, len(command))
+
+class KernelClient(QObject):
+	"""The Python console's kernel (kernel.py), started on first use and kept warm
+
+	Requests go out as frames, replies come back as signals carrying the request id, so
+	anything that runs code in the kernel can tell its own results apart.
+	"""
+	ready = Signal(str)  # Python version
+	stream = Signal(str, str)  # stdout / stderr, text
+	result = Signal(int, str)
+	error = Signal(int, str)
+	done = Signal(int, str, float)  # id, ok / error / interrupted / exited, seconds
+	exited = Signal(int)
+
+	def __init__(self, run_manager, parent=None):
+		super().__init__(parent)
+		self.run_manager = run_manager
+		self.working_directory = os.getcwd()
+		self.process = None
+		self.pending = set()
+		self._decoder = FrameDecoder()
+		self._next_id = 0
+
+	def is_running(self):
+		return self.process is not None and self.process.state() != QProcess.NotRunning
+
+	def is_busy(self):
+		return bool(self.pending)
+
+	@property
+	def current(self):
+		"""Id of the request running now, the kernel works through them in order"""
+		return min(self.pending) if self.pending else None
+
+	def start(self):
+		if self.is_running():
+			return
+		self._decoder = FrameDecoder()
+		self.process = QProcess(self)
+		self.process.setProcessChannelMode(QProcess.SeparateChannels)
+		self.process.setWorkingDirectory(self.working_directory)
+		self.process.readyReadStandardOutput.connect(self._read)
+		# Only the kernel's own failures end up here, user output comes framed
+		self.process.readyReadStandardError.connect(
+			lambda process=self.process: self.stream.emit(
+				"stderr", process.readAllStandardError().data().decode("utf-8", "replace")
+			)
+		)
+		self.process.finished.connect(lambda code, _status, process=self.process: self._finished(process, code))
+		program, args = self.run_manager.kernel_command()
+		self.process.start(program, args)
+
+	def execute(self, code, filename=None, file=False):
+		"""Queue `code` in the kernel, returns the request id"""
+		self.start()
+		self._next_id += 1
+		self.pending.add(self._next_id)
+		message = {"type": "execute", "id": self._next_id, "code": code, "filename": filename or f"<console {self._next_id}>"}
+		if file:
+			message["file"] = True
+		self.process.write(encode_frame(message))
+		return self._next_id
+
+	def interrupt(self):
+		if not (self.is_running() and self.pending):
+			return
+		if os.name == 'posix':
+			# A real SIGINT also breaks out of sleeps and blocking reads
+			os.kill(self.process.processId(), signal.SIGINT)
+		else:
+			self.process.write(encode_frame({"type": "interrupt"}))
+
+	def restart(self):
+		self.shutdown()
+		self.start()
+
+	def shutdown(self):
+		if not self.is_running():
+			return
+		process, self.process = self.process, None
+		process.write(encode_frame({"type": "shutdown"}))
+		process.closeWriteChannel()
+		# Code that's still running doesn't get to hold the IDE up
+		if not process.waitForFinished(500):
+			process.kill()
+			process.waitForFinished(500)
+		self._finished(process, process.exitCode())
+
+	def _read(self):
+		for message in self._decoder.feed(self.process.readAllStandardOutput().data()):
+			kind = message["type"]
+			if kind == "stream":
+				self.stream.emit(message["name"], message["text"])
+			elif kind == "result":
+				self.result.emit(message["id"], message["text"])
+			elif kind == "error":
+				self.error.emit(message["id"], message["text"])
+			elif kind == "done":
+				self.pending.discard(message["id"])
+				self.done.emit(message["id"], message["status"], message["elapsed"])
+			elif kind == "ready":
+				self.ready.emit(message["version"])
+
+	def _finished(self, process, code):
+		if process is not self.process and self.process is not None:
+			# A restart already replaced it
+			return
+		self.process = None
+		pending, self.pending = sorted(self.pending), set()
+		for request in pending:
+			self.done.emit(request, "exited", 0.0)
+		if pending or code:
+			self.exited.emit(code)
+
+
+class ReplPanel(QWidget):
+	"""The Python console: output on top, input below, on a KernelClient"""
+	def __init__(self, kernel, history, parent=None):
+		super().__init__(parent)
+		self.kernel = kernel
+		layout = QVBoxLayout(self)
+		layout.setContentsMargins(0, 0, 0, 0)
+		layout.setSpacing(0)
+
+		header = QHBoxLayout()
+		title = QLabel("Python Console")
+		title.setObjectName("panel_header")
+		header.addWidget(title, 1)
+		self.status_label = QLabel("")
+		self.status_label.setObjectName("panel_header")
+		header.addWidget(self.status_label)
+		for name, slot in (("Interrupt", self.interrupt), ("Restart", self.restart), ("Clear", self.clear)):
+			button = QPushButton(name)
+			button.setFlat(True)
+			button.clicked.connect(slot)
+			header.addWidget(button)
+		layout.addLayout(header)
+
+		self.output = QTextBrowser()
+		self.output.setOpenLinks(False)
+		self.output.document().setMaximumBlockCount(CONSOLE_MAX_LINES)
+		self.output.setObjectName("Console")
+		self.stream = ConsoleStream(self.output, self)
+		layout.addWidget(self.output, 1)
+
+		self.input = ConsoleWidget(history)
+		self.input.setFixedHeight(60)
+		self.input.enterPressed.connect(lambda code: self.execute(code))
+		layout.addWidget(self.input)
+
+		kernel.ready.connect(lambda version: self.status_label.setText(f"Python {version}"))
+		kernel.stream.connect(lambda _name, text: self.stream.write(text))
+		kernel.result.connect(lambda _id, text: self.stream.write(text + "\n"))
+		kernel.error.connect(lambda _id, text: self.stream.write(f"\x1b[31m{text}\x1b[0m"))
+		kernel.done.connect(self._done)
+		kernel.exited.connect(
+			lambda code: self.stream.write(f"\x1b[90mKernel exited ({code}), it starts again on the next run\x1b[0m\n")
+		)
+
+	@staticmethod
+	def prompted(code):
+		lines = code.rstrip().splitlines() or [""]
+		return "\n".join([">>> " + lines[0]] + ["... " + line for line in lines[1:]])
+
+	def execute(self, code, filename=None, file=False, echo=None):
+		"""Run `code` in the kernel, echoed like it was typed unless `echo` says otherwise"""
+		if echo is None:
+			echo = self.prompted(code)
+		self.stream.write(f"\x1b[90m{echo}\x1b[0m\n")
+		self.status_label.setText("Running...")
+		return self.kernel.execute(code, filename, file)
+
+	def interrupt(self):
+		self.kernel.interrupt()
+
+	def restart(self):
+		self.kernel.restart()
+		self.stream.write("\x1b[90m--- Restarted ---\x1b[0m\n")
+
+	def clear(self):
+		self.stream.flush()
+		self.output.clear()
+
+	def _done(self, _id, status, elapsed):
+		if not self.kernel.is_busy():
+			self.status_label.setText(f"{status}, {elapsed * 1000:.0f} ms")
+
+
+class CellRunner(QObject):
+	"""Runs an editor's `# %%` cells in the console's kernel and reports each one back inline"""
+	def __init__(self, kernel, parent=None):
+		super().__init__(parent)
+		self.kernel = kernel
+		self.requests = {}  # id -> [editor, cursor at the cell's first line, last output]
+		kernel.stream.connect(lambda _name, text: self._output(self.kernel.current, text))
+		kernel.result.connect(self._output)
+		kernel.error.connect(self._output)
+		kernel.done.connect(self._done)
+
+	def run(self, panel, editor, line):
+		"""Send the cell holding `line` to `panel`'s kernel, returns its (first, last) lines"""
+		buffer = editor.doc.buffer
+		line_count = buffer.line_count()
+		first, last = editor.doc.cells.cell(line, line_count)
+		end = buffer.line_start(last + 1) - 1 if last + 1 < line_count else len(buffer)
+		code = buffer.text(buffer.line_start(first), end)
+		if not code.strip():
+			return first, last
+		title = buffer.line(first).strip() if editor.doc.cells.is_marker(first) else "# %%"
+		# Padded so tracebacks point at the file's own lines
+		request = panel.execute(
+			"\n" * first + code, getattr(editor, 'file_path', None),
+			echo=f">>> {title}  (lines {first + 1}-{last + 1})"
+		)
+		cursor = QTextCursor(editor.document().findBlockByNumber(first))
+		self.requests[request] = [editor, cursor, ""]
+		editor.set_cell_result(cursor, "running", "")
+		return first, last
+
+	def forget(self, editor):
+		for request, entry in list(self.requests.items()):
+			if entry[0] is editor:
+				del self.requests[request]
+
+	def _output(self, request, text):
+		entry = self.requests.get(request)
+		lines = text.strip().splitlines()
+		if entry is not None and lines:
+			entry[2] = lines[-1]
+
+	def _done(self, request, status, elapsed):
+		entry = self.requests.pop(request, None)
+		if entry is None:
+			return
+		editor, cursor, output = entry
+		timing = f"{elapsed * 1000:.0f} ms" if elapsed < 1 else f"{elapsed:.2f} s"
+		editor.set_cell_result(cursor, status, timing + (f"  {output}" if output else ""))
+
+
+TEST_COLORS = {"passed": "#A8CC7C", "failed": "#F44747", "error": "#F44747", "skipped": "#6D6D6D", "running": "#EBC88D"}
+TEST_SYMBOLS = {"passed": "✓", "failed": "✗", "error": "✗", "skipped": "○", "running": "…"}
+
+
+class TestScanner(QObject):
+	"""Finds a project's tests and their file keys on a background thread"""
+	found = Signal(str, list, dict)  # root, [TestCase], {path: key}
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self._lock = threading.Lock()
+		self._fingerprints = None
+
+	def scan(self, root):
+		def discover():
+			try:
+				with self._lock:
+					if self._fingerprints is None or self._fingerprints.root != root:
+						self._fingerprints = TestFingerprints(root)
+					tests = discover_tests(root, IgnoreRules.from_globs(DEFAULT_EXCLUDE_GLOBS, root))
+					keys = {path: self._fingerprints.key(path) for path in {test.path for test in tests}}
+				self.found.emit(root, tests, keys)
+			except Exception as e:
+				print(f"Test discovery: {e}", file=sys.stderr)
+		threading.Thread(target=discover, name="snakeide-tests", daemon=True).start()
+
+
+class TestRunner(QObject):
+	"""A pool of testrunner.py workers, one per core, sharing a run a file at a time
+
+	Every worker collects the selection, the first collection becomes a queue of per-file
+	batches, longest (by the last run) first, handed to whichever worker asks next.
+	"""
+	result = Signal(dict)
+	output = Signal(str)
+	finished = Signal(float)
+
+	def __init__(self, run_manager, parent=None):
+		super().__init__(parent)
+		self.run_manager = run_manager
+		self.workers = {}  # QProcess -> {"decoder", "batch": ids handed out, "stderr", "done"}
+		self.queue = None
+		self.durations = {}
+		self._errors = set()
+		self._start = 0.0
+
+	def is_running(self):
+		return bool(self.workers)
+
+	def run(self, root, ids, configuration, durations, workers):
+		"""Run node ids (files or tests) in `root`, `durations` by file id for the ordering"""
+		self.stop()
+		self.queue = None
+		self.durations = durations
+		self._errors = set()
+		self._start = time.perf_counter()
+		program, args = self.run_manager.test_command(configuration)
+		environment = QProcessEnvironment()
+		for key, value in configuration.environment().items():
+			environment.insert(key, value)
+		for _ in range(max(1, workers)):
+			process = QProcess(self)
+			process.setProcessChannelMode(QProcess.SeparateChannels)
+			process.setWorkingDirectory(root)
+			process.setProcessEnvironment(environment)
+			self.workers[process] = {"decoder": FrameDecoder(), "batch": set(), "stderr": [], "done": False}
+			process.readyReadStandardOutput.connect(lambda process=process: self._read(process))
+			process.readyReadStandardError.connect(lambda process=process: self._read_stderr(process))
+			process.finished.connect(lambda code, _status, process=process: self._finished(process, code))
+			process.start(program, args)
+			process.write(encode_frame({"type": "collect", "ids": ids}))
+
+	def stop(self):
+		workers, self.workers = self.workers, {}
+		for process in workers:
+			process.kill()
+			process.waitForFinished(500)
+			process.deleteLater()
+		if workers:
+			self.finished.emit(time.perf_counter() - self._start)
+
+	def _batches(self, ids):
+		files = {}
+		for node_id in ids:
+			files.setdefault(node_id.split("::", 1)[0], []).append(node_id)
+		order = sorted(files, key=lambda file_id: -self.durations.get(file_id, 0.0))
+		return deque(files[file_id] for file_id in order)
+
+	def _read(self, process):
+		state = self.workers.get(process)
+		if state is None:
+			return
+		for message in state["decoder"].feed(process.readAllStandardOutput().data()):
+			kind = message["type"]
+			if kind == "result":
+				state["batch"].discard(message["id"])
+				self.result.emit(message)
+			elif kind == "next":
+				# Whatever's left of the last batch wasn't in this worker's collection
+				self._abandon(state, "Not collected by the test worker")
+				batch = self.queue.popleft() if self.queue else []
+				state["batch"] = set(batch)
+				process.write(encode_frame({"type": "run", "ids": batch}))
+				if not batch:
+					process.closeWriteChannel()
+			elif kind == "collected" and self.queue is None:
+				self.queue = self._batches(message["ids"])
+			elif kind == "collect_error" and message["id"] not in self._errors:
+				# Every worker collects, the error only needs showing once
+				self._errors.add(message["id"])
+				self.result.emit({
+					"type": "result", "id": message["id"], "outcome": "error", "duration": 0.0,
+					"path": message["id"].split("::", 1)[0], "line": 0, "text": message["text"],
+					"message": "Collection failed", "crash": None,
+				})
+			elif kind == "done":
+				state["done"] = True
+
+	def _read_stderr(self, process):
+		state = self.workers.get(process)
+		if state is not None:
+			state["stderr"].append(process.readAllStandardError().data().decode("utf-8", "replace"))
+
+	def _abandon(self, state, message):
+		for node_id in sorted(state["batch"]):
+			self.result.emit({
+				"type": "result", "id": node_id, "outcome": "error", "duration": 0.0,
+				"path": node_id.split("::", 1)[0], "line": 0, "text": message, "message": message, "crash": None,
+			})
+		state["batch"] = set()
+
+	def _finished(self, process, code):
+		state = self.workers.pop(process, None)
+		if state is None:
+			return
+		self._abandon(state, f"The test worker exited ({code})")
+		if not state["done"]:
+			# pytest missing, a crash, a conftest that called exit(): its stderr says which
+			self.output.emit("".join(state["stderr"]) or f"The test worker exited ({code})\n")
+		process.deleteLater()
+		if not self.workers:
+			self.finished.emit(time.perf_counter() - self._start)
+
+
+class TestSession(QObject):
+	"""A project's tests: discovered in the background, run on a TestRunner, results cached
+
+	Runs start with a rescan, so they see new tests and the current file keys, and the
+	cache tells which tests failed last time or are affected by changes since they ran.
+	"""
+	testsChanged = Signal()
+	resultsChanged = Signal(object)  # set of absolute paths whose marks changed
+	runStarted = Signal(list)  # [TestCase] selected
+	result = Signal(dict)
+	output = Signal(str)
+	runFinished = Signal(float)
+	RESCAN_MS = 500
+
+	def __init__(self, run_manager, parent=None):
+		super().__init__(parent)
+		self.root = None
+		self.tests = []
+		self.keys = {}
+		self.cache = None
+		self.running = set()  # ids (as discovered) queued or running
+		self.configuration = lambda: RunConfiguration("Default")  # set by the IDE
+		self._pending_run = None
+		self.scanner = TestScanner(self)
+		self.scanner.found.connect(self._on_found)
+		self.runner = TestRunner(run_manager, self)
+		self.runner.result.connect(self._on_result)
+		self.runner.output.connect(self.output)
+		self.runner.finished.connect(self._on_finished)
+		self._rescan = QTimer(self)
+		self._rescan.setSingleShot(True)
+		self._rescan.setInterval(self.RESCAN_MS)
+		self._rescan.timeout.connect(self.scan)
+
+	def set_root(self, root):
+		self.stop()
+		self.root = root
+		self.tests, self.keys = [], {}
+		self.cache = TestResultCache.for_project(root)
+		self.testsChanged.emit()
+		self.scan()
+
+	def scan(self):
+		if self.root:
+			self.scanner.scan(self.root)
+
+	def file_saved(self, path):
+		if self.root and path.endswith(".py") and os.path.abspath(path).startswith(self.root + os.sep):
+			self._rescan.start()
+
+	def path_of(self, test_id):
+		return os.path.normpath(os.path.join(self.root, test_id.split("::", 1)[0]))
+
+	def _on_found(self, root, tests, keys):
+		if root != self.root:
+			return
+		self.tests, self.keys = tests, keys
+		self.testsChanged.emit()
+		self.resultsChanged.emit({test.path for test in tests})
+		if self._pending_run is not None:
+			which, self._pending_run = self._pending_run, None
+			self._start(which)
+
+	def run(self, which="all"):
+		"""Run "all", "failed" or "affected" tests, or a list of test ids, after a rescan"""
+		if not self.root:
+			return
+		self._pending_run = which
+		self.scan()
+
+	def _start(self, which):
+		if which == "all":
+			selected = self.tests
+		elif which == "failed":
+			selected = self.cache.failed(self.tests)
+		elif which == "affected":
+			selected = self.cache.affected(self.tests, self.keys)
+		else:
+			wanted = set(which)
+			selected = [test for test in self.tests if test.id in wanted]
+		self.runStarted.emit(selected)
+		if not selected:
+			self.runFinished.emit(0.0)
+			return
+		# Files whose tests all run are collected whole, so tests discovery missed run too
+		by_file = {}
+		for test in self.tests:
+			by_file.setdefault(test.id.split("::", 1)[0], []).append(test)
+		chosen = {test.id for test in selected}
+		ids = []
+		for file_id, tests in by_file.items():
+			picked = [test.id for test in tests if test.id in chosen]
+			if len(picked) == len(tests):
+				self.cache.forget(file_id)
+				ids.append(file_id)
+			else:
+				ids += picked
+		self.running = chosen
+		self.resultsChanged.emit({test.path for test in selected})
+		durations = {file_id: sum(self.cache.duration(test.id) for test in tests) for file_id, tests in by_file.items()}
+		workers = min(os.cpu_count() or 1, len({test.path for test in selected}))
+		self.runner.run(self.root, ids, self.configuration(), durations, workers)
+
+	def stop(self):
+		self._pending_run = None
+		self.runner.stop()
+
+	def shutdown(self):
+		self.stop()
+		if self.cache is not None:
+			try:
+				self.cache.save()
+			except OSError:
+				pass
+
+	def _on_result(self, message):
+		path = self.path_of(message["id"])
+		self.cache.record(
+			message["id"], message["outcome"], message["duration"], self.keys.get(path),
+			message["text"], message.get("message", ""), message.get("crash")
+		)
+		self.running.discard(base_test_id(message["id"]))
+		self.result.emit(message)
+		self.resultsChanged.emit({path})
+
+	def _on_finished(self, elapsed):
+		paths = {self.path_of(test_id) for test_id in self.running}
+		self.running = set()
+		try:
+			self.cache.save()
+		except OSError as e:
+			print(f"Test results: {e}", file=sys.stderr)
+		self.resultsChanged.emit(paths)
+		self.runFinished.emit(elapsed)
+
+	def marks(self, path):
+		"""(line, outcome, tooltip) of the tests in `path` that ran or are running"""
+		if self.cache is None:
+			return []
+		marks = []
+		for test in self.tests:
+			if test.path != path:
+				continue
+			name = test.id.split("::", 1)[-1]
+			if test.id in self.running:
+				marks.append((test.line, "running", f"{name}: running"))
+				continue
+			outcome = self.cache.outcome(test.id)
+			if outcome is None:
+				continue
+			results = self.cache.matching(test.id)
+			tooltip = f"{name}: {outcome}"
+			if len(results) > 1:
+				bad = sum(1 for _, result in results if result["outcome"] in ("failed", "error"))
+				tooltip += f" ({len(results) - bad} of {len(results)} passed)"
+			message = next((result["message"] for _, result in results if result.get("message")), "")
+			marks.append((test.line, outcome, tooltip + (f"\n{message}" if message else "")))
+		return marks
+
+
+class TestPanel(QWidget):
+	"""Tests of the project in a tree by file, with the output of the selected one"""
+	openLocation = Signal(str, int)  # path, 0-based line
+
+	def __init__(self, session, parent=None):
+		super().__init__(parent)
+		self.session = session
+		self.items = {}  # test / result / file id -> QTreeWidgetItem
+		self.counts = {}
+		layout = QVBoxLayout(self)
+		layout.setContentsMargins(0, 0, 0, 0)
+		layout.setSpacing(0)
+
+		header = QHBoxLayout()
+		title = QLabel("Tests")
+		title.setObjectName("panel_header")
+		header.addWidget(title, 1)
+		self.summary_label = QLabel("")
+		self.summary_label.setObjectName("panel_header")
+		header.addWidget(self.summary_label)
+		for name, slot in (
+			("Run All", lambda: session.run("all")),
+			("Run Failed", lambda: session.run("failed")),
+			("Run Affected", lambda: session.run("affected")),
+			("Stop", session.stop),
+			("Refresh", session.scan),
+		):
+			button = QPushButton(name)
+			button.setFlat(True)
+			button.clicked.connect(slot)
+			header.addWidget(button)
+		layout.addLayout(header)
+
+		splitter = QSplitter(Qt.Horizontal)
+		self.tree = QTreeWidget()
+		self.tree.setColumnCount(2)
+		self.tree.setHeaderLabels(["Test", "Time"])
+		self.tree.setUniformRowHeights(True)
+		self.tree.currentItemChanged.connect(lambda item, _previous: self._show_details(item))
+		self.tree.itemDoubleClicked.connect(lambda item, _column: self._open(item))
+		splitter.addWidget(self.tree)
+		self.details = QTextBrowser()
+		self.details.setOpenLinks(False)
+		self.details.setObjectName("Console")
+		self.stream = ConsoleStream(self.details, self)
+		splitter.addWidget(self.details)
+		splitter.setSizes([400, 600])
+		layout.addWidget(splitter, 1)
+
+		session.testsChanged.connect(self.rebuild)
+		session.runStarted.connect(self._run_started)
+		session.result.connect(self._on_result)
+		session.output.connect(self._on_output)
+		session.runFinished.connect(self._run_finished)
+		self.rebuild()
+
+	def rebuild(self):
+		"""The tree from the last discovery, with the cached outcome of each test"""
+		self.tree.clear()
+		self.items = {}
+		cache = self.session.cache
+		for test in self.session.tests:
+			# Files that don't parse are a test of their own, their item is the file's
+			self._item(test.id)
+			if cache is not None:
+				for result_id, result in cache.matching(test.id):
+					self._set_outcome(self._item(result_id), result["outcome"], result["duration"])
+		if cache is not None:
+			for file_id in {test.id.split("::", 1)[0] for test in self.session.tests}:
+				self._update_file(file_id)
+
+	def _item(self, test_id):
+		"""The tree item of a test id, made on first use: files at the top, their tests below
+		and parametrizations under their test"""
+		item = self.items.get(test_id)
+		if item is not None:
+			return item
+		file_id = test_id.split("::", 1)[0]
+		if test_id == file_id:
+			parent, name = self.tree, file_id
+		else:
+			base = base_test_id(test_id)
+			parent_id = base if base != test_id and base in self.items else file_id
+			parent, name = self._item(parent_id), test_id[len(parent_id):].lstrip(":")
+		item = self.items[test_id] = QTreeWidgetItem(parent, [name, ""])
+		item.setData(0, Qt.UserRole, test_id)
+		return item
+
+	@staticmethod
+	def _set_outcome(item, outcome, duration=None):
+		item.setForeground(0, QColor(TEST_COLORS[outcome]))
+		item.setText(1, "" if duration is None else (f"{duration * 1000:.0f} ms" if duration < 1 else f"{duration:.2f} s"))
+		item.setToolTip(0, outcome)
+
+	def _run_started(self, tests):
+		self.counts = {}
+		self.stream.flush()
+		self.details.clear()
+		for test in tests:
+			item = self.items.get(test.id)
+			if item is not None:
+				self._set_outcome(item, "running")
+		self.summary_label.setText(f"Running {len(tests)} tests..." if tests else "No tests to run")
+
+	def _on_result(self, message):
+		outcome = message["outcome"]
+		self.counts[outcome] = self.counts.get(outcome, 0) + 1
+		self._set_outcome(self._item(message["id"]), outcome, message["duration"])
+		base = self.items.get(base_test_id(message["id"]))
+		if base is not None and base.data(0, Qt.UserRole) != message["id"]:
+			outcome = self.session.cache.outcome(base.data(0, Qt.UserRole))
+			self._set_outcome(base, outcome, self.session.cache.duration(base.data(0, Qt.UserRole)))
+		self._update_file(message["id"].split("::", 1)[0])
+		self.summary_label.setText(self._summary())
+
+	def _update_file(self, file_id):
+		"""A file's row takes the worst outcome of its tests"""
+		item = self.items.get(file_id)
+		results = [result for result_id, result in self.session.cache.results.items()
+			if result_id == file_id or result_id.startswith(file_id + "::")]
+		if item is not None and results:
+			worst = max((result["outcome"] for result in results), key=OUTCOME_RANK.get)
+			self._set_outcome(item, worst, sum(result["duration"] for result in results))
+
+	def _on_output(self, text):
+		self.stream.write(f"\x1b[31m{text}\x1b[0m")
+
+	def _run_finished(self, elapsed):
+		if self.counts:
+			self.summary_label.setText(f"{self._summary()} in {elapsed:.2f} s")
+		current = self.tree.currentItem()
+		if current is not None:
+			self._show_details(current)
+
+	def _summary(self):
+		return ", ".join(f"{self.counts[outcome]} {outcome}" for outcome in TEST_COLORS if self.counts.get(outcome))
+
+	def _show_details(self, item):
+		if item is None or self.session.cache is None:
+			return
+		test_id = item.data(0, Qt.UserRole)
+		self.stream.flush()
+		self.details.clear()
+		if "::" in test_id:
+			results = self.session.cache.matching(test_id)
+		else:
+			# A file: its collection error, if it had one
+			result = self.session.cache.results.get(test_id)
+			results = [(test_id, result)] if result else []
+		for result_id, result in results:
+			self.stream.write(f"\x1b[1m{result_id}\x1b[0m  {result['outcome']}\n")
+			if result.get("crash"):
+				# The same location as pytest's "path:line:" line, as a link
+				path, line = result["crash"]
+				self.stream.write(f'  File "{path}", line {line}\n')
+			if result.get("text"):
+				self.stream.write(result["text"].rstrip() + "\n")
+			self.stream.write("\n")
+		self.stream.flush()
+		self.details.moveCursor(QTextCursor.Start)
+
+	def _open(self, item):
+		test_id = item.data(0, Qt.UserRole)
+		test = next((test for test in self.session.tests if test.id == base_test_id(test_id)), None)
+		if test is not None:
+			self.openLocation.emit(test.path, test.line)
+		else:
+			self.openLocation.emit(self.session.path_of(test_id), 0)
+
+
+# Where releases before the versioned store kept everything, read once to migrate it
+LEGACY_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'snakeide.conf')
+CONFIG_FLUSH_MS = 1000  # changed settings are written this long after the last change
+EDITOR_STATES_KEPT = 500  # files whose cursor and folds a project remembers
+
+DIAGNOSTIC_COLORS = {"error": "#F44747", "warning": "#EBC88D"}
+
+
+class CompletionController(QObject):
+	"""Completion queries on a worker thread, each keystroke cancels the request before it
+
+	The package index (stdlib + site-packages, cached on disk per interpreter) and the
+	project index are built on a second thread so a cold build never delays completions.
+	"""
+	resultReady = Signal(object, int, str, list)  # editor, generation, prefix, candidates
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self.index = CompletionIndex()
+		self._generation = 0
+		self._requests = queue.Queue()
+		self._jobs = queue.Queue()
+		threading.Thread(target=self._serve, name="snakeide-completion", daemon=True).start()
+		threading.Thread(target=self._index, name="snakeide-completion-index", daemon=True).start()
+		self.resultReady.connect(self._deliver)
+
+	def load_packages(self, python=None):
+		self._jobs.put(lambda: self.index.set_packages(PackageIndex(python).load()))
+
+	def index_project(self, root):
+		rules = IgnoreRules.from_globs(DEFAULT_EXCLUDE_GLOBS, root)
+		self._jobs.put(lambda: self.index.index_project(root, rules))
+
+	def update_file(self, path):
+		if path and path.endswith(".py"):
+			self._jobs.put(lambda: self.index.set_project_file(path, public_names(path)))
+
+	def forget(self, editor):
+		self.index.forget_document(editor)
+
+	def request(self, editor):
+		self._generation += 1
+		cursor = editor.textCursor()
+		self._requests.put((
+			self._generation, editor, cursor.block().text(), cursor.positionInBlock(),
+			cursor.blockNumber(), editor.doc.version, editor.doc.buffer.snapshot()
+		))
+
+	def cancel(self):
+		self._generation += 1
+
+	def _serve(self):
+		while True:
+			request = self._requests.get()
+			# Only the newest request is worth answering
+			while not self._requests.empty():
+				request = self._requests.get_nowait()
+			generation, editor, line, column, row, version, snapshot = request
+			if generation != self._generation:
+				continue
+			with tracer.span("completion"):
+				prefix, candidates = self.index.complete(line, column, editor, version, snapshot, row)
+			self.resultReady.emit(editor, generation, prefix, candidates)
+
+	def _index(self):
+		while True:
+			job = self._jobs.get()
+			try:
+				job()
+			except Exception as e:
+				print(f"Completion index: {e}", file=sys.stderr)
+
+	def _deliver(self, editor, generation, prefix, candidates):
+		if generation == self._generation:
+			editor.show_completions(prefix, candidates)
+
+
+class CompletionPopup(QListWidget):
+	"""Completion list under the cursor, narrowed in place while the word grows"""
+	def __init__(self, editor):
+		super().__init__(editor)
+		self.editor = editor
+		self.setObjectName("completion_popup")
+		self.setFocusPolicy(Qt.NoFocus)
+		self.setFont(editor.font())
+		self.prefix = ""
+		self.candidates = []
+		self.truncated = False
+		self.itemClicked.connect(lambda _: self.editor.accept_completion())
+		self.hide()
+
+	def show_candidates(self, prefix, candidates, truncated=None):
+		self.prefix = prefix
+		self.candidates = candidates
+		# A full page means the index had more than it gave
+		self.truncated = len(candidates) >= CompletionIndex.LIMIT if truncated is None else truncated
+		self._fill()
+
+	def narrow(self, prefix):
+		"""The word got longer: filter what's shown, and ask the index again when that was cut short"""
+		truncated = self.truncated
+		self.show_candidates(prefix, narrow_completions(self.candidates, prefix), truncated)
+		if truncated:
+			self.editor.completer.request(self.editor)
+
+	def _fill(self):
+		self.clear()
+		if not self.candidates:
+			self.hide()
+			return
+		self.addItems(self.candidates)
+		self.setCurrentRow(0)
+		rows = min(len(self.candidates), 10)
+		width = max(self.fontMetrics().horizontalAdvance(c) for c in self.candidates[:200]) + 32
+		self.resize(min(width, 480), rows * self.sizeHintForRow(0) + 6)
+		rect = self.editor.cursorRect()
+		pos = self.editor.viewport().mapTo(self.editor, rect.bottomLeft())
+		self.move(pos.x() - self.fontMetrics().horizontalAdvance(self.prefix), pos.y() + 2)
+		self.show()
+		self.raise_()
+
+	def current(self):
+		item = self.currentItem()
+		return item.text() if item else None
+
+	def step(self, delta):
+		self.setCurrentRow((self.currentRow() + delta) % self.count())
+
+
+class DiagnosticsController(QObject):
+	"""Runs the DiagnosticsEngine for open Python editors a moment after typing stops"""
+	resultReady = Signal(object, int, list)  # editor, document version, diagnostics
+
+	DEBOUNCE_MS = 400
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self.engine = DiagnosticsEngine()
+		self._dirty = set()
+		self._seen = set()
+		self.timer = QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.timeout.connect(self._submit)
+		self.resultReady.connect(self._apply)
+
+	def schedule(self, editor):
+		path = editor.file_path
+		if path and not path.endswith((".py", ".pyw")):
+			return
+		self._dirty.add(editor)
+		# A freshly opened file is checked straight away (and is often a cache hit)
+		self.timer.start(0 if editor not in self._seen else self.DEBOUNCE_MS)
+		self._seen.add(editor)
+
+	def forget(self, editor):
+		self._dirty.discard(editor)
+		self._seen.discard(editor)
+		self.engine.cancel(editor)
+
+	def _submit(self):
+		dirty, self._dirty = self._dirty, set()
+		for editor in dirty:
+			# The snapshot is cheap and immutable, the worker builds the text from it
+			self.engine.submit(editor, editor.doc.version, editor.doc.buffer.snapshot(),
+				editor.file_path or "<untitled>", self.resultReady.emit)
+
+	def _apply(self, editor, version, diagnostics):
+		if editor in self._seen and editor.doc.version == version:
+			for view in editor.shared.views:
+				view.set_diagnostics(diagnostics)
+
+	def shutdown(self):
+		self.engine.shutdown()
+
+
+class ExtraSelectionManager(QObject):
+	"""Extra selections of one editor in named layers, merged into setExtraSelections once per frame
+
+	Layers only replace their own selections, so the current line, bracket matches, search
+	hits and diagnostics don't wipe each other out. Unchanged selections are handed back to
+	Qt as they were, which then only repaints the rects that actually changed.
+	"""
+	LAYERS = ("current_line", "search", "diagnostics", "brackets")
+
+	def __init__(self, editor):
+		super().__init__(editor)
+		self.editor = editor
+		self.layers = {name: [] for name in self.LAYERS}
+		self.timer = QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.setInterval(0)
+		self.timer.timeout.connect(self.apply)
+
+	def set_layer(self, name, selections):
+		self.layers[name] = selections
+		if not self.timer.isActive():
+			self.timer.start()
+
+	def clear_layer(self, name):
+		if self.layers[name]:
+			self.set_layer(name, [])
+
+	def apply(self):
+		self.editor.setExtraSelections([
+			selection for name in self.LAYERS for selection in self.layers[name]
+		])
+
+
+class MinimapRenderer(QObject):
+	"""Renders minimap tiles on a worker thread, shared by every open editor's Minimap
+
+	Colours come from a PythonHighlighter of its own, created once Pygments is loaded
+	after the first frame (`enable`); until then minimaps just show their background.
+	"""
+	tileReady = Signal(object, int, int, object)  # minimap, tile, document version, QImage
+	ready = Signal()
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self._highlighter = None
+		self._latest = {}
+		self._requests = queue.Queue()
+		threading.Thread(target=self._serve, name="snakeide-minimap", daemon=True).start()
+
+	def enable(self):
+		from highlighter import PythonHighlighter
+		self._highlighter = PythonHighlighter(QTextDocument(self))
+		self.ready.emit()
+
+	def is_ready(self):
+		return self._highlighter is not None
+
+	def request(self, minimap, tile, version, snapshot):
+		self._latest[(id(minimap), tile)] = version
+		self._requests.put((minimap, tile, version, snapshot))
+
+	def forget(self, minimap):
+		for key in [key for key in self._latest if key[0] == id(minimap)]:
+			del self._latest[key]
+
+	def _serve(self):
+		while True:
+			minimap, tile, version, snapshot = self._requests.get()
+			if self._latest.get((id(minimap), tile)) != version:
+				continue  # the tile was asked for again since
+			with tracer.span("minimap tile"):
+				image = self.render(snapshot, tile * Minimap.TILE_LINES, min(Minimap.TILE_LINES, snapshot.line_count() - tile * Minimap.TILE_LINES))
+			self.tileReady.emit(minimap, tile, version, image)
+
+	def render(self, snapshot, first, count):
+		"""One tile: a LINE_HEIGHT-tall bar per line, one pixel per character"""
+		width = Minimap.WIDTH - Minimap.RULER
+		height = Minimap.LINE_HEIGHT
+		image = QImage(width, Minimap.TILE_LINES * height, QImage.Format_ARGB32_Premultiplied)
+		image.fill(QColor(Minimap.BACKGROUND))
+		if count <= 0:
+			return image
+		painter = QPainter(image)
+		colors = {}
+		for n, text in zip(range(count), snapshot.lines(first)):
+			code = text.lstrip()
+			indent = len(text[:len(text) - len(code)].expandtabs(4))
+			y = n * height
+			for offset, length, argb in self._highlighter.color_runs(code):
+				x = indent + offset
+				if x >= width:
+					break
+				color = colors.get(argb)
+				if color is None:
+					color = colors[argb] = QColor.fromRgba(argb)
+				painter.fillRect(x, y, min(length, width - x), height, color)
+		painter.end()
+		return image
+
+
+class Minimap(QWidget):
+	"""Scaled-down document beside an editor, with an overview ruler of breakpoints, problems and search hits
+
+	The text is drawn from tiles of TILE_LINES lines rendered off the GUI thread. An edit only
+	marks the tiles it touched as stale (they're shown until the new one arrives) and only
+	tiles in view are ever rendered. Click or drag to scroll the editor.
+	"""
+	WIDTH = 110
+	RULER = 6  # overview strip on the right, the whole document scaled to the height
+	LINE_HEIGHT = 2
+	TILE_LINES = 256
+	MAX_TILES = 48
+	BACKGROUND = "#1E1E1E"
+
+	def __init__(self, editor, renderer):
+		super().__init__()
+		self.editor = editor
+		self.renderer = renderer
+		self.setObjectName("minimap")
+		self.setFixedWidth(self.WIDTH)
+		self._tiles = OrderedDict()  # tile -> QImage, least recently painted first
+		self._stale = set()
+		self._pending = set()
+		self._line_count = editor.blockCount()
+		self._drag = None
+		self.search_lines = []
+		editor.minimap = self
+		editor.document().contentsChange.connect(self._contents_changed)
+		editor.verticalScrollBar().valueChanged.connect(self.update)
+		editor.breakpointsChanged.connect(self.update)
+		renderer.tileReady.connect(self._tile_ready)
+		renderer.ready.connect(self.update)
+
+	def set_search_hits(self, lines):
+		self.search_lines = lines
+		self.update()
+
+	def _contents_changed(self, position, removed, added):
+		doc = self.editor.document()
+		first = doc.findBlock(position).blockNumber() // self.TILE_LINES
+		if doc.blockCount() != self._line_count:
+			# Lines came or went, everything below moved
+			self._line_count = doc.blockCount()
+			last = max(self._tiles.keys() | self._pending, default=first)
+		else:
+			last = doc.findBlock(position + added).blockNumber() // self.TILE_LINES
+		self._stale.update(tile for tile in self._tiles.keys() | self._pending if first <= tile <= last)
+		self.update()
+
+	def _tile_ready(self, minimap, tile, version, image):
+		if minimap is not self:
+			return
+		self._pending.discard(tile)
+		self._tiles[tile] = image
+		self._tiles.move_to_end(tile)
+		if version == self.editor.doc.version:
+			self._stale.discard(tile)
+		while len(self._tiles) > self.MAX_TILES:
+			self._stale.discard(self._tiles.popitem(last=False)[0])
+		self.update()
+
+	def _request(self, tile):
+		if tile in self._pending or not self.renderer.is_ready():
+			return
+		self._pending.add(tile)
+		self.renderer.request(self, tile, self.editor.doc.version, self.editor.doc.buffer.snapshot())
+
+	def _layout(self):
+		"""(first line shown, lines that fit, editor's first line, lines the editor shows)"""
+		lines = self.editor.blockCount()
+		fit = max(1, self.height() // self.LINE_HEIGHT)
+		bar = self.editor.verticalScrollBar()
+		first = self.editor.firstVisibleBlock().blockNumber()
+		top = 0
+		if lines > fit:
+			# Scrolls along with the editor so both ends of the document can be reached
+			top = round(min(first, bar.maximum()) * (lines - fit) / max(1, bar.maximum()))
+		return top, fit, first, bar.pageStep()
+
+	def paintEvent(self, event):
+		painter = QPainter(self)
+		painter.fillRect(self.rect(), QColor(self.BACKGROUND))
+		top, fit, first, shown = self._layout()
+		lines = self.editor.blockCount()
+		last = min(lines, top + fit) - 1
+		for tile in range(top // self.TILE_LINES, last // self.TILE_LINES + 1):
+			image = self._tiles.get(tile)
+			if image is not None:
+				self._tiles.move_to_end(tile)
+				painter.drawImage(0, (tile * self.TILE_LINES - top) * self.LINE_HEIGHT, image)
+			if image is None or tile in self._stale:
+				self._request(tile)
+		painter.fillRect(0, (first - top) * self.LINE_HEIGHT, self.WIDTH - self.RULER,
+			shown * self.LINE_HEIGHT, QColor(255, 255, 255, 28))
+		self._paint_ruler(painter, lines)
+
+	def _paint_ruler(self, painter, lines):
+		x = self.WIDTH - self.RULER
+		scale = self.height() / max(1, lines)
+		painter.fillRect(x, 0, self.RULER, self.height(), QColor("#252526"))
+		def mark(line, color, left, width):
+			painter.fillRect(x + left, int(line * scale), width, max(2, int(scale)), color)
+		search = QColor("#C8B46E")
+		for line in self.search_lines:
+			mark(line, search, 0, self.RULER)
+		for line, problems in self.editor.diagnostics.items():
+			mark(line, QColor(DIAGNOSTIC_COLORS[problems[0].severity]), self.RULER // 2, self.RULER - self.RULER // 2)
+		breakpoint = QColor("#E05555")
+		for line in self.editor.breakpoints:
+			mark(line, breakpoint, 0, self.RULER // 2)
+
+	def _scroll_to(self, line):
+		self.editor.verticalScrollBar().setValue(max(0, line))
+
+	def mousePressEvent(self, event):
+		if event.button() != Qt.LeftButton:
+			return
+		top, fit, first, shown = self._layout()
+		y = event.position().y()
+		if event.position().x() >= self.WIDTH - self.RULER:
+			# The ruler is the whole document
+			line = int(y * self.editor.blockCount() / max(1, self.height()))
+		else:
+			line = top + int(y) // self.LINE_HEIGHT
+		if not first <= line < first + shown:
+			self._scroll_to(line - shown // 2)
+			first = self.editor.firstVisibleBlock().blockNumber()
+		self._drag = (y, first)
+
+	def mouseMoveEvent(self, event):
+		if self._drag is None:
+			return
+		y, first = self._drag
+		lines = self.editor.blockCount()
+		fit = max(1, self.height() // self.LINE_HEIGHT)
+		maximum = max(1, self.editor.verticalScrollBar().maximum())
+		# How far the viewport box moves per line scrolled, it has to stay under the pointer
+		step = self.LINE_HEIGHT * (1 - (lines - fit) / maximum) if lines > fit else self.LINE_HEIGHT
+		if step <= 0:
+			step = self.height() / maximum
+		self._scroll_to(first + round((event.position().y() - y) / step))
+
+	def mouseReleaseEvent(self, event):
+		self._drag = None
+
+	def wheelEvent(self, event):
+		QApplication.sendEvent(self.editor.viewport(), event)
+
+
+FOLD_MARGIN = 12  # gutter column with the fold arrows
+TEST_MARGIN = 8  # gutter column with test outcomes, after the breakpoints
+COVERAGE_MARGIN = 4  # gutter stripe with line coverage, after the test outcomes
+COVERAGE_COLORS = {True: "#6A8759", False: "#BC3F3C"}  # ran, has code that didn't
+
+
+class LineNumberArea(QWidget):
+	def __init__(self, editor):
+		super().__init__(editor)
+		self.editor = editor
+
+	def sizeHint(self):
+		return QSize(self.editor.line_number_area_width(), 0)
+
+	def paintEvent(self, event):
+		self.editor.line_number_area_paint_event(event)
+
+	def line_at(self, y):
+		"""Block number under the y coordinate, or -1 below the last line"""
+		block = self.editor.firstVisibleBlock()
+		top = self.editor.blockBoundingGeometry(block).translated(self.editor.contentOffset()).top()
+		while block.isValid():
+			bottom = top + self.editor.blockBoundingRect(block).height()
+			if top <= y <= bottom:
+				return block.blockNumber()
+			block = self.editor.next_visible_block(block)
+			top = bottom
+		return -1
+
+	def mousePressEvent(self, event):
+		"""Clicks on the fold column fold, on a test mark re-run it, anywhere else set breakpoints"""
+		if event.button() == Qt.LeftButton:
+			line = self.line_at(event.position().y())
+			if line >= 0:
+				fold_column = self.width() - 3 - FOLD_MARGIN
+				x = event.position().x()
+				if x >= fold_column and self.editor.folds.region(line) is not None:
+					self.editor.toggle_fold(line)
+				elif 14 <= x < 14 + TEST_MARGIN and line in self.editor.test_marks_by_line():
+					self.editor.testMarkClicked.emit(line)
+				else:
+					self.editor.toggle_breakpoint(line)
+		super().mousePressEvent(event)
+
+	def contextMenuEvent(self, event):
+		line = self.line_at(event.pos().y())
+		if line < 0:
+			return
+		editor = self.editor
+		menu = QMenu(self)
+		if line in editor.breakpoints:
+			menu.addAction("Edit Condition...", lambda: editor.edit_breakpoint(line, "condition"))
+			menu.addAction("Break After Hits...", lambda: editor.edit_breakpoint(line, "ignore"))
+			menu.addAction("Remove Breakpoint", lambda: editor.toggle_breakpoint(line))
+		else:
+			menu.addAction("Add Breakpoint", lambda: editor.toggle_breakpoint(line))
+			menu.addAction("Add Conditional Breakpoint...", lambda: editor.edit_breakpoint(line, "condition"))
+		menu.exec(event.globalPos())
+
+	def event(self, event):
+		if event.type() == QEvent.ToolTip:
+			line = self.line_at(event.pos().y())
+			breakpoint = self.editor.breakpoints.get(line)
+			lines = [breakpoint.describe(line)] if breakpoint is not None else []
+			lines += [d.message for d in self.editor.diagnostics.get(line, ())]
+			test = self.editor.test_marks_by_line().get(line)
+			if test is not None:
+				lines.append(test[1])
+			if lines:
+				QToolTip.showText(event.globalPos(), "\n".join(lines), self)
+			else:
+				QToolTip.hideText()
+			return True
+		return super().event(event)
+
+class SharedDocument(QObject):
+	"""The text behind one or more CodeEditor views of a file
+
+	Owned by the QTextDocument, so the views, the highlighter and the Document mirror
+	all hang off one copy of the text. Each view keeps its own scroll, cursor and gutter.
+	"""
+	activeChanged = Signal(object)  # the view last focused
+
+	def __init__(self, document):
+		super().__init__(document)
+		self.document = document
+		# Widget-free copy of the text kept in step with every edit, so saving, running
+		# and searching never need toPlainText()'s full-document string
+		self.doc = Document()
+		self.find_engine = FindEngine(self.doc)
+		self.views = []
+		self.active = None
+		self.folds_hidden = False  # whether some block may be hidden by a fold
+		self.owner = None  # what keeps the document alive once there's more than one view
+		# Edits of a multi-cursor keystroke, set by the view making them
+		self.pending_edits = None
+		document.contentsChange.connect(self._mirror_contents_change)
+
+	def set_owner(self, owner):
+		self.owner = owner
+		self.document.setParent(owner)
+
+	def add_view(self, view):
+		self.views.append(view)
+		if self.active is None:
+			self.active = view
+		view.destroyed.connect(lambda *_: self._remove_view(view))
+
+	def _remove_view(self, view):
+		if view in self.views:
+			self.views.remove(view)
+		if self.active is view:
+			self.active = self.views[0] if self.views else None
+
+	def set_active(self, view):
+		if view is not self.active:
+			self.active = view
+			self.activeChanged.emit(view)
+
+	def _mirror_contents_change(self, position, removed, added):
+		# Qt counts UTF-16 units, the mirror code points; they differ once there's an emoji
+		doc = self.doc
+		size = self.document.characterCount() - 1
+		edits, self.pending_edits = self.pending_edits, None
+		try:
+			if edits is not None:
+				# A multi-cursor keystroke arrives as one change over all its carets, we know the edits
+				doc.apply_edits(edits)
+			else:
+				# Whole-document changes (setPlainText) count the final paragraph separator too
+				start = doc.from_utf16(position)
+				removed = max(0, min(doc.from_utf16(position + removed), len(doc)) - start)
+				added = min(added, size - position)
+				text = ""
+				if added > 0:
+					cursor = QTextCursor(self.document)
+					cursor.setPosition(position)
+					cursor.setPosition(position + added, QTextCursor.KeepAnchor)
+					text = cursor.selectedText().replace("\u2029", "\n")
+				if removed or text:
+					doc.apply(start, removed, text)
+			mapped = doc.utf16_length() == size
+		except IndexError:
+			# The piece table refusing an offset past its end, the mirror was already behind
+			mapped = False
+		if not mapped:
+			# A change we couldn't map, start over from the document rather than save a stale copy
+			doc.reset(self.document.toPlainText())
+
+
+class CodeEditor(QPlainTextEdit):
+	breakpointsChanged = Signal(int)
+	testMarkClicked = Signal(int)  # line
+	FOLD_REFRESH_MS = 150
+	FOLD_SCAN_BUDGET = 5000  # lines rescanned per event loop turn, so big files open smoothly
+
+	def __init__(self, parent=None, shared=None):
+		super().__init__(parent)
+		if shared is not None:
+			# Another view of a file already open, see split(). setDocument makes this view
+			# the document's owner, it goes back to the one the caller chose so that closing
+			# this pane doesn't take the document of the others with it
+			self.setDocument(shared.document)
+			if shared.owner is not None:
+				shared.document.setParent(shared.owner)
+		# Editor font
+		self.efont = QFont("Cascadia Mono")
+		self.efont.setPointSize(13)
+		self.efont.setStyleStrategy(QFont.StyleStrategy.PreferMatch)
+		self.efont.setWeight(QFont.Weight.DemiBold)
+		self.efont.setHintingPreference(QFont.HintingPreference.PreferFullHinting)
+		self.setFont(self.efont)
+
+		# Whitespace markers
+		self.space_symbol = '·'  # U+00B7
+		self.tab_symbol   = '»'  # U+00BB
+		self.symbol_color = QColor('gray')
+
+		# The text, its mirror and everything that lives with it are shared by every view
+		self.shared = shared or SharedDocument(self.document())
+		self.shared.add_view(self)
+		self.doc = self.shared.doc
+		self.buffer = self.doc.buffer
+
+		# Breakpoints, shifted by the document as lines come and go
+		self.breakpoints = self.doc.breakpoints
+		self.find_engine = self.shared.find_engine
+		# Fold regions follow edits straight away and are rescanned once typing pauses
+		self.folds = self.doc.folds
+		self._fold_timer = QTimer(self)
+		self._fold_timer.setSingleShot(True)
+		self._fold_timer.setInterval(self.FOLD_REFRESH_MS)
+		self._fold_timer.timeout.connect(self._refresh_folds)
+		# A method rather than a lambda, so a view closed before its document disconnects
+		self.document().contentsChange.connect(self._restart_fold_timer)
+		# Line number area
+		self.line_number_area = LineNumberArea(self)
+		self.blockCountChanged.connect(self.update_line_number_area_width)
+		self.updateRequest.connect(self.update_line_number_area)
+		self.update_line_number_area_width()
+
+		self._cursor_block = -1
+		self._bracket_match = None
+		self.selections = ExtraSelectionManager(self)
+		# Set by the IDE, editors without them (benchmarks) just don't complete or have a minimap
+		self.completer = None
+		self.minimap = None
+		self.completion_popup = CompletionPopup(self)
+		self.diagnostics = {}  # line -> [Diagnostic], errors first
+		# (cursor on the cell's first line, status, text) of the last run of each `# %%` cell,
+		# cursors so they move with the text
+		self.cell_results = []
+		# (cursor on the test's def line, outcome, tooltip) from the test runner
+		self.test_marks = []
+		self.coverage = None  # LineCoverage of the file as saved, when the overlay is on
+		# The other carets while there's more than one: a CursorSet, plain offsets, with the
+		# main cursor among them. Edits or moves from anywhere else drop them
+		self.multi = None
+		self._multi_editing = False
+		self._box_start = None  # (line, screen column) an Alt+drag started at
+		self._box_dragged = False
+		self.document().contentsChange.connect(self._drop_cursors)
+		self.cursorPositionChanged.connect(self._drop_cursors)
+
+		# Auto-pairing
+		self.paired_chars = {'(': ')', '[': ']', '{': '}', '"': '"', "'": "'"}
+
+	def line_number_area_width(self):
+		digits = len(str(max(1, self.blockCount())))
+		space = 3 + self.fontMetrics().horizontalAdvance('9') * digits
+		return space + 14 + TEST_MARGIN + COVERAGE_MARGIN + FOLD_MARGIN
+
+	def update_line_number_area_width(self):
+		self.setViewportMargins(self.line_number_area_width(), 0, 0, 0)
+
+	def update_line_number_area(self, rect, dy):
+		if dy:
+			self.line_number_area.scroll(0, dy)
+		else:
+			self.line_number_area.update(0, rect.y(), self.line_number_area.width(), rect.height())
+		if rect.contains(self.viewport().rect()):
+			self.update_line_number_area_width()
+
+	def resizeEvent(self, event):
+		super().resizeEvent(event)
+		cr = self.contentsRect()
+		self.line_number_area.setGeometry(
+			QRect(cr.left(), cr.top(), self.line_number_area_width(), cr.height())
+		)
+
+	@traced()
+	def paintEvent(self, event):
+		super().paintEvent(event)
+		if self.multi is not None:
+			self._paint_cursors()
+		# Whitespace markers are only drawn when text is selected, plus the folded line marks
+		cursor = self.textCursor()
+		sel_start = cursor.selectionStart()
+		sel_end = cursor.selectionEnd()
+		cells = self.doc.cells
+		if sel_start == sel_end and not self.folds.has_folded() and not cells.lines and not self.cell_results:
+			return
+		results = self._cell_results_by_line()
+
+		painter = QPainter(self.viewport())
+		painter.setPen(self.symbol_color)
+		metrics = self.fontMetrics()
+		tab_width = self.tabStopDistance()
+		block = self.firstVisibleBlock()
+		offset = self.contentOffset()
+		vis_rect = self.viewport().rect()
+
+		while block.isValid():
+			block_geom = self.blockBoundingGeometry(block).translated(offset)
+			if block_geom.bottom() < vis_rect.top():
+				block = self.next_visible_block(block)
+				continue
+			if block_geom.top() > vis_rect.bottom():
+				break
+
+			text = block.text()
+			block_pos = block.position()
+			number = block.blockNumber()
+			folded = self.folds.is_folded(number)
+			if folded:
+				self._paint_fold_mark(painter, block, block_geom)
+			if cells.lines and cells.is_marker(number):
+				painter.setPen(QColor("#4E5254"))
+				painter.drawLine(0, int(block_geom.top()), vis_rect.right(), int(block_geom.top()))
+			if number in results:
+				self._paint_cell_result(painter, block, block_geom, folded, *results[number])
+			painter.setPen(self.symbol_color)
+			if sel_start == sel_end:
+				block = self.next_visible_block(block)
+				continue
+			for i, ch in enumerate(text):
+				if ch in (' ', '\t'):
+					doc_index = block_pos + i
+					if not (sel_start <= doc_index < sel_end):
+						continue
+					# calculate x offset
+					x_offset = 0.0
+					for c in text[:i]:
+						x_offset += tab_width if c == '\t' else metrics.horizontalAdvance(c)
+					x = int(block_geom.left() + x_offset)
+					symbol = self.space_symbol if ch == ' ' else self.tab_symbol
+					painter.drawText(
+						QRect(x, block_geom.top(), metrics.horizontalAdvance(symbol), metrics.height()),
+						Qt.AlignLeft, symbol
+					)
+			block = self.next_visible_block(block)
+
+	def _paint_cursors(self):
+		"""Carets and selections of the cursors besides the main one, just those in view"""
+		document = self.document()
+		offset = self.contentOffset()
+		first = self.firstVisibleBlock().position()
+		last_block = self.cursorForPosition(QPoint(0, self.viewport().height())).block()
+		last = last_block.position() + last_block.length()
+		painter = QPainter(self.viewport())
+		selection = QColor(self.palette().highlight().color())
+		selection.setAlpha(120)
+		caret = self.palette().text().color()
+		space = self.fontMetrics().horizontalAdvance(" ")
+		main = self.multi.primary
+		block = document.findBlock(first)
+		to_utf16 = self.doc.to_utf16
+		for index, (anchor, position) in self.multi.between(self.doc.from_utf16(first), self.doc.from_utf16(last)):
+			anchor, position = to_utf16(anchor), to_utf16(position)
+			start, end = min(anchor, position), max(anchor, position)
+			if not block.position() <= start < block.position() + block.length():
+				block = document.findBlock(max(start, first))
+			while block.isValid() and block.position() <= min(end, last):
+				layout = block.layout()
+				if block.isVisible() and layout.lineCount():
+					line = layout.lineAt(0)
+					block_pos, length = block.position(), block.length() - 1
+					geom = self.blockBoundingGeometry(block).translated(offset)
+					top, height = int(geom.top() + line.y()), int(line.height())
+					if start != end and index != main:
+						left = line.cursorToX(max(start - block_pos, 0))[0]
+						right = line.cursorToX(min(end - block_pos, length))[0]
+						if end > block_pos + length:
+							right += space  # the line break is selected too
+						painter.fillRect(int(geom.left() + left), top, int(right - left), height, selection)
+					if index != main and block_pos <= position <= block_pos + length:
+						x = geom.left() + line.cursorToX(position - block_pos)[0]
+						painter.fillRect(int(x), top, max(2, self.cursorWidth()), height, caret)
+				if block.position() + block.length() > end:
+					break
+				block = block.next()
+		painter.end()
+
+	def _paint_fold_mark(self, painter, block, block_geom):
+		"""A "⋯" box after a folded line's text"""
+		layout = block.layout()
+		right = layout.lineAt(layout.lineCount() - 1).naturalTextRect().right() if layout.lineCount() else 0
+		metrics = self.fontMetrics()
+		rect = QRect(int(block_geom.left() + right) + 6, int(block_geom.top()) + 1,
+					 metrics.horizontalAdvance("⋯") + 8, metrics.height() - 2)
+		painter.setPen(QColor("#6D6D6D"))
+		painter.setBrush(QColor("#3C3F41"))
+		painter.drawRoundedRect(rect, 3, 3)
+		painter.drawText(rect, Qt.AlignCenter, "⋯")
+
+	CELL_STATUS = {
+		"running": ("#6D6D6D", "… running"),
+		"ok": ("#A8CC7C", "✓"),
+		"error": ("#F44747", "✗"),
+		"interrupted": ("#EBC88D", "■"),
+		"exited": ("#F44747", "✗ kernel exited"),
+	}
+
+	def set_cell_result(self, cursor, status, text):
+		"""Show how the cell starting at `cursor`'s line last ran, replacing what it showed before"""
+		block = cursor.block()
+		for view in self.shared.views:
+			view.cell_results = [entry for entry in view.cell_results if entry[0].block() != block]
+			view.cell_results.append((cursor, status, text))
+			view.viewport().update()
+
+	def set_test_marks(self, marks):
+		"""Test outcomes in the gutter, [(line, outcome, tooltip)], replacing the previous ones"""
+		document = self.document()
+		test_marks = [
+			(QTextCursor(document.findBlockByNumber(line)), outcome, tooltip)
+			for line, outcome, tooltip in marks if line < document.blockCount()
+		]
+		for view in self.shared.views:
+			view.test_marks = test_marks
+		self._update_gutters()
+
+	def set_coverage(self, coverage):
+		for view in self.shared.views:
+			view.coverage = coverage
+		self._update_gutters()
+
+	def test_marks_by_line(self):
+		return {cursor.blockNumber(): (outcome, tooltip) for cursor, outcome, tooltip in self.test_marks}
+
+	def _cell_results_by_line(self):
+		results = {}
+		if not self.cell_results:
+			return results
+		line_count = self.doc.buffer.line_count()
+		kept = []
+		for entry in self.cell_results:
+			line = entry[0].blockNumber()
+			# The marker was deleted or the lines merged into another cell
+			if line < line_count and self.doc.cells.cell(line, line_count)[0] == line and line not in results:
+				results[line] = entry[1:]
+				kept.append(entry)
+		self.cell_results = kept
+		return results
+
+	def _paint_cell_result(self, painter, block, block_geom, folded, status, text):
+		"""The status, timing and last output of a cell, after its first line's text"""
+		layout = block.layout()
+		right = layout.lineAt(layout.lineCount() - 1).naturalTextRect().right() if layout.lineCount() else 0
+		metrics = self.fontMetrics()
+		left = int(block_geom.left() + right) + 16
+		if folded:
+			left += metrics.horizontalAdvance("⋯") + 14
+		color, mark = self.CELL_STATUS.get(status, self.CELL_STATUS["error"])
+		width = self.viewport().width() - left - 4
+		if width <= 0:
+			return
+		painter.setPen(QColor(color))
+		label = metrics.elidedText(f"{mark} {text}".rstrip(), Qt.ElideRight, width)
+		painter.drawText(QRect(left, int(block_geom.top()), width, metrics.height()), Qt.AlignLeft, label)
+
+	def next_visible_block(self, block):
+		"""Block after `block` in view, jumping over a folded region rather than walking it"""
+		following = block.next()
+		if not following.isValid() or following.isVisible():
+			return following
+		end = self.folds.region(block.blockNumber()) if self.folds.is_folded(block.blockNumber()) else None
+		if end is not None:
+			target = self.document().findBlockByNumber(end + 1)
+			# Regions can lag the text until the next rescan, only trust ones that match
+			if not target.isValid() or not target.previous().isVisible():
+				following = target
+		while following.isValid() and not following.isVisible():
+			following = following.next()
+		return following
+
+	def _restart_fold_timer(self, *_):
+		self._fold_timer.start()
+
+	@traced()
+	def _refresh_folds(self):
+		span = self.folds.refresh(self.doc.buffer, self.FOLD_SCAN_BUDGET)
+		if span is not None:
+			self._sync_fold_visibility(*span)
+			self._update_gutters()
+		if self.folds.pending:
+			QTimer.singleShot(0, self._refresh_folds)
+
+	def _ensure_folds(self):
+		"""Bring the regions up to date before a fold command uses them"""
+		self._fold_timer.stop()
+		while self.folds.pending:
+			self._sync_fold_visibility(*self.folds.refresh(self.doc.buffer))
+
+	def _sync_fold_visibility(self, first, last):
+		"""Show or hide the blocks in first..last to match the folded regions"""
+		hidden = self.folds.hidden(first, last)
+		if not hidden and not self.shared.folds_hidden:
+			return
+		doc = self.document()
+		block = doc.findBlockByNumber(first)
+		start = block.position()
+		spans = iter(hidden)
+		span = next(spans, None)
+		changed = False
+		for line in range(first, last + 1):
+			while span is not None and span[1] < line:
+				span = next(spans, None)
+			visible = span is None or line < span[0]
+			if block.isVisible() != visible:
+				block.setVisible(visible)
+				changed = True
+			block = block.next()
+		if hidden:
+			self.shared.folds_hidden = True
+		elif first == 0 and last >= doc.blockCount() - 1:
+			self.shared.folds_hidden = self.folds.has_folded()
+		if changed:
+			end = block.position() if block.isValid() else doc.characterCount()
+			doc.markContentsDirty(start, end - start)
+			# Block visibility lives in the document, every view of it folds
+			for view in self.shared.views:
+				view.viewport().update()
+				view.line_number_area.update()
+
+	def _update_gutters(self):
+		"""Repaint the gutter of every view, for what they all show (folds, breakpoints, marks)"""
+		for view in self.shared.views:
+			view.line_number_area.update()
+
+	def toggle_fold(self, line):
+		if self.folds.is_folded(line):
+			self.unfold(line)
+		else:
+			self.fold(line)
+
+	def fold(self, line=None):
+		"""Fold the region starting on `line` (the cursor line by default) or the one around it"""
+		self._ensure_folds()
+		if line is None:
+			line = self.textCursor().blockNumber()
+		region = self.folds.enclosing(line)
+		if region is None:
+			return
+		start, end = region
+		self.folds.fold(start)
+		self._sync_fold_visibility(start, end)
+		cursor = self.textCursor()
+		if start < cursor.blockNumber() <= end:
+			cursor = QTextCursor(self.document().findBlockByNumber(start))
+			cursor.movePosition(QTextCursor.EndOfBlock)
+			self.setTextCursor(cursor)
+
+	def unfold(self, line=None):
+		"""Unfold the region starting on `line` and any folds hiding it"""
+		self._ensure_folds()
+		if line is None:
+			line = self.textCursor().blockNumber()
+		starts = self.folds.revealing(line)
+		if self.folds.is_folded(line):
+			starts.append(line)
+		for start in starts:
+			self.folds.unfold(start)
+		if starts:
+			self._sync_fold_visibility(min(starts), max(self.folds.region(start) for start in starts))
+
+	def fold_all(self):
+		self._ensure_folds()
+		self.folds.fold_all()
+		self._sync_fold_visibility(0, self.blockCount() - 1)
+		self.unfold(self.textCursor().blockNumber())
+
+	def unfold_all(self):
+		self._ensure_folds()
+		self.folds.unfold_all()
+		self._sync_fold_visibility(0, self.blockCount() - 1)
+
+	def visible_lines(self):
+		"""First and last line in view"""
+		first = self.firstVisibleBlock().blockNumber()
+		return first, max(first, self.cursorForPosition(QPoint(0, self.viewport().height())).blockNumber())
+
+	def view_state(self):
+		"""Cursor, scroll position and folds, for the session to bring back"""
+		return {
+			"cursor": self.textCursor().position(),
+			"scroll": self.verticalScrollBar().value(),
+			"folds": [start for start, _ in self.folds.folded()],
+		}
+
+	def restore_view_state(self, state):
+		if state.get("folds"):
+			self._ensure_folds()
+			for start in state["folds"]:
+				self.folds.fold(start)
+			self._sync_fold_visibility(0, self.blockCount() - 1)
+		cursor = self.textCursor()
+		cursor.setPosition(min(state.get("cursor", 0), self.document().characterCount() - 1))
+		self.setTextCursor(cursor)
+		self.verticalScrollBar().setValue(state.get("scroll", 0))
+
+	def split(self, parent=None):
+		"""Another view of this text, starting where this one is
+
+		It shares the document, the highlighter's formats, breakpoints and folds, the scroll,
+		cursor and gutter are its own. The caller keeps the document alive if this view goes,
+		see SharedDocument.set_owner().
+		"""
+		view = CodeEditor(parent, self.shared)
+		view.setTabStopDistance(self.tabStopDistance())
+		view.setLineWrapMode(self.lineWrapMode())
+		view.completer = self.completer
+		view.coverage = self.coverage
+		view.test_marks = self.test_marks
+		view.cell_results = list(self.cell_results)
+		view.set_diagnostics([d for diagnostics in self.diagnostics.values() for d in diagnostics])
+		view.setTextCursor(self.textCursor())
+		view.verticalScrollBar().setValue(self.verticalScrollBar().value())
+		return view
+
+	def document(self):
+		# PySide parents the wrapper it returns to the view that asked, and invalidates it
+		# when that view goes; the panes of a file all use the one SharedDocument keeps
+		shared = getattr(self, "shared", None)
+		return shared.document if shared is not None else super().document()
+
+	def focusInEvent(self, event):
+		super().focusInEvent(event)
+		self.shared.set_active(self)
+
+	def tab_size(self):
+		return max(1, round(self.tabStopDistance() / max(1, self.fontMetrics().horizontalAdvance(" "))))
+
+	def set_cursors(self, cursors, primary=-1):
+		"""Edit at every (anchor, position) at once, the view following the `primary` one"""
+		if not isinstance(cursors, CursorSet):
+			cursors = CursorSet(cursors, primary)
+		self.multi = cursors if len(cursors) > 1 else None
+		anchor, position = cursors.main()
+		cursor = self.textCursor()
+		cursor.setPosition(self.doc.to_utf16(anchor))
+		cursor.setPosition(self.doc.to_utf16(position), QTextCursor.KeepAnchor)
+		self._multi_editing = True
+		try:
+			self.setTextCursor(cursor)
+		finally:
+			self._multi_editing = False
+		self.viewport().update()
+
+	def clear_cursors(self):
+		"""Back to just the main cursor"""
+		if self.multi is not None:
+			self.multi = None
+			self.viewport().update()
+
+	def _drop_cursors(self, *_):
+		# Something else edited the text or moved the caret, the offsets no longer mean anything
+		if self.multi is not None and not self._multi_editing:
+			self.clear_cursors()
+
+	def _cursors(self):
+		if self.multi is not None:
+			return self.multi
+		cursor = self.textCursor()
+		return CursorSet([(self.doc.from_utf16(cursor.anchor()), self.doc.from_utf16(cursor.position()))])
+
+	@traced()
+	def _apply_cursor_edits(self, cursors, edits):
+		"""One keystroke at every caret, as one edit block: one undo step, and one contentsChange
+		covering all the carets, so the highlighter runs once over the lines they touched"""
+		self._apply_edits(edits)
+		self.set_cursors(cursors)
+
+	def _apply_edits(self, edits):
+		"""Sorted, non-overlapping (start, end, text) edits as one undo step, the mirror told
+		them directly rather than reading back the union they cover"""
+		if not edits:
+			return
+		self._multi_editing = True
+		try:
+			edit = QTextCursor(self.document())
+			to_utf16 = self.doc.to_utf16
+			edit.beginEditBlock()
+			# Back to front, each edit leaves the offsets of the ones before it alone
+			for start, end, text in reversed(edits):
+				edit.setPosition(to_utf16(start))
+				edit.setPosition(to_utf16(end), QTextCursor.KeepAnchor)
+				edit.insertText(text)
+			self.shared.pending_edits = edits
+			edit.endEditBlock()
+		finally:
+			self.shared.pending_edits = None
+			self._multi_editing = False
+
+	def _select_words(self, cursors):
+		self.set_cursors(CursorSet(
+			[word_at(self.buffer, position) or (anchor, position) for anchor, position in cursors],
+			cursors.primary,
+		))
+
+	def add_next_occurrence(self):
+		"""Select the word at the caret, after that add a cursor on the next match of the selection"""
+		cursors = self._cursors()
+		if not cursors.has_selection():
+			self._select_words(cursors)
+			return
+		start, end = sorted(cursors.main())
+		needle = self.buffer.text(start, end)
+		taken = set(cursors.spans())
+		match = self.find_engine.find(needle, end, case_sensitive=True)
+		seen = set()
+		# Wrapping around, past the matches that already have a cursor
+		while match is not None and match in taken and match not in seen:
+			seen.add(match)
+			match = self.find_engine.find(needle, match[1], case_sensitive=True)
+		if match is None or match in taken:
+			return
+		cursors.add(*match)
+		self.set_cursors(cursors)
+
+	def select_all_occurrences(self):
+		"""A cursor on every match of the selection, or of the word at the caret"""
+		anchor, position = self._cursors().main()
+		start, end = sorted((anchor, position)) if anchor != position else (word_at(self.buffer, position) or (0, 0))
+		if start == end:
+			return
+		matches = self.find_engine.find_all(self.buffer.text(start, end), case_sensitive=True, limit=len(self.doc) + 1)
+		self.set_cursors(matches, matches.index((start, end)) if (start, end) in matches else -1)
+
+	CURSOR_MOVES = {
+		Qt.Key_Left: ("char", -1), Qt.Key_Right: ("char", 1), Qt.Key_Up: ("line", -1), Qt.Key_Down: ("line", 1),
+		Qt.Key_Home: ("edge", -1), Qt.Key_End: ("edge", 1),
+	}
+
+	def _multi_cursor_key(self, event):
+		"""A keystroke with several cursors, False for the ones only the main cursor should get"""
+		cursors = self.multi
+		key, text, modifiers = event.key(), event.text(), event.modifiers()
+		if key in (Qt.Key_Shift, Qt.Key_Control, Qt.Key_Alt, Qt.Key_Meta):
+			return True
+		if key == Qt.Key_Escape:
+			self.clear_cursors()
+			return True
+		if key in self.CURSOR_MOVES and not modifiers & Qt.AltModifier:
+			unit, direction = self.CURSOR_MOVES[key]
+			if unit == "char" and modifiers & Qt.ControlModifier:
+				unit = "word"
+			cursors.move_by(self.buffer, unit, direction, bool(modifiers & Qt.ShiftModifier), self.tab_size())
+			self.set_cursors(cursors)
+			return True
+		clipboard = QApplication.clipboard()
+		if event.matches(QKeySequence.Copy) or event.matches(QKeySequence.Cut):
+			if cursors.has_selection():
+				clipboard.setText("\n".join(cursors.selected_text(self.buffer)))
+				if event.matches(QKeySequence.Cut):
+					self._apply_cursor_edits(cursors, cursors.delete(len(self.doc)))
+			return True
+		if event.matches(QKeySequence.Paste):
+			pasted = clipboard.text().replace("\r\n", "\n")
+			lines = pasted.split("\n")
+			# A copied column goes back one line per cursor
+			edits = cursors.replace(lines if len(lines) == len(cursors) else pasted)
+		elif key == Qt.Key_Backspace:
+			edits = cursors.delete(len(self.doc))
+		elif key == Qt.Key_Delete:
+			edits = cursors.delete(len(self.doc), forward=True)
+		elif key in (Qt.Key_Return, Qt.Key_Enter):
+			edits = cursors.replace("\n")
+		elif text in self.paired_chars and not cursors.has_selection():
+			edits = cursors.replace(text + self.paired_chars[text], caret=1)
+		elif text and (text.isprintable() or text == "\t"):
+			edits = cursors.replace(text)
+		else:
+			return False
+		self._apply_cursor_edits(cursors, edits)
+		return True
+
+	def _line_column_at(self, point):
+		"""(line, screen column) under a viewport point, counting on past the end of the line"""
+		cursor = self.cursorForPosition(point)
+		block = cursor.block()
+		text = block.text()
+		index = self.doc.from_utf16(cursor.position()) - self.buffer.line_start(block.blockNumber())
+		column = visual_column(text, index, self.tab_size())
+		layout = block.layout()
+		if index == len(text) and layout.lineCount():
+			line = layout.lineAt(0)
+			right = self.blockBoundingGeometry(block).translated(self.contentOffset()).left() + line.x() + line.naturalTextWidth()
+			column += max(0, round((point.x() - right) / self.fontMetrics().horizontalAdvance(" ")))
+		return block.blockNumber(), column
+
+	def mousePressEvent(self, event):
+		# Alt+click adds (or removes) a caret, Alt+drag selects a box, one cursor per line
+		if event.button() == Qt.LeftButton and event.modifiers() & Qt.AltModifier:
+			self._box_start = self._line_column_at(event.position().toPoint())
+			self._box_dragged = False
+			return
+		self.clear_cursors()
+		super().mousePressEvent(event)
+
+	def mouseMoveEvent(self, event):
+		if self._box_start is None:
+			super().mouseMoveEvent(event)
+			return
+		line, column = self._line_column_at(event.position().toPoint())
+		if (line, column) == self._box_start and not self._box_dragged:
+			return
+		self._box_dragged = True
+		self.set_cursors(CursorSet.box(self.buffer, *self._box_start, line, column, self.tab_size()))
+
+	def mouseReleaseEvent(self, event):
+		if self._box_start is None:
+			super().mouseReleaseEvent(event)
+			return
+		if not self._box_dragged:
+			position = self.doc.from_utf16(self.cursorForPosition(event.position().toPoint()).position())
+			cursors = self._cursors()
+			if not cursors.remove_at(position):
+				cursors.add(position, position)
+			self.set_cursors(cursors)
+		self._box_start = None
+
+	def event(self, event):
+		# Shift+Enter would insert a soft line break, leave it to the Run Cell and Advance shortcut
+		if (event.type() == QEvent.ShortcutOverride and event.key() in (Qt.Key_Return, Qt.Key_Enter)
+				and event.modifiers() == Qt.ShiftModifier):
+			event.ignore()
+			return True
+		return super().event(event)
+
+	def keyPressEvent(self, event):
+		if self.multi is not None:
+			if self._multi_cursor_key(event):
+				self.hide_completions()
+				return
+			# Undo, paging, select all and the like are for the main cursor alone
+			self.clear_cursors()
+		cursor = self.textCursor()
+		key, text = event.key(), event.text()
+		if self.completion_popup.isVisible():
+			if key in (Qt.Key_Up, Qt.Key_Down):
+				self.completion_popup.step(-1 if key == Qt.Key_Up else 1)
+				return
+			if key in (Qt.Key_Return, Qt.Key_Enter, Qt.Key_Tab):
+				self.accept_completion()
+				return
+			if key == Qt.Key_Escape:
+				self.hide_completions()
+				return
+		self._insert_key(event, cursor, key, text)
+		self._update_completions(key, text)
+
+	def _update_completions(self, key, text):
+		if self.completer is None:
+			return
+		popup = self.completion_popup
+		if text and (text.isalnum() or text == "_"):
+			if popup.isVisible() and popup.prefix:
+				popup.narrow(popup.prefix + text)
+			else:
+				self.completer.request(self)
+		elif text == "." or (key == Qt.Key_Backspace and popup.isVisible()):
+			self.completer.request(self)
+		elif text or key not in (Qt.Key_Shift, Qt.Key_Control, Qt.Key_Alt, Qt.Key_Meta):
+			self.hide_completions()
+
+	def show_completions(self, prefix, candidates):
+		# The answer is for the cursor as it was, drop it if the word has moved on since
+		cursor = self.textCursor()
+		before = cursor.block().text()[:cursor.positionInBlock()]
+		if not before.endswith(prefix):
+			return
+		self.completion_popup.show_candidates(prefix, candidates)
+
+	def hide_completions(self):
+		if self.completer is not None:
+			self.completer.cancel()
+		self.completion_popup.hide()
+
+	def accept_completion(self):
+		popup = self.completion_popup
+		choice = popup.current()
+		if choice:
+			cursor = self.textCursor()
+			cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor, len(popup.prefix))
+			cursor.insertText(choice)
+			self.setTextCursor(cursor)
+		self.hide_completions()
+
+	def _insert_key(self, event, cursor, key, text):
+		if text in self.paired_chars:
+			cursor.insertText(text + self.paired_chars[text])
+			cursor.movePosition(QTextCursor.Left)
+			self.setTextCursor(cursor)
+			return
+		if text in self.paired_chars.values() and self._next_char_right(cursor) == text:
+			cursor.movePosition(QTextCursor.Right)
+			self.setTextCursor(cursor)
+			return
+		if key == Qt.Key_Backspace:
+			left = self._next_char_left(cursor)
+			right = self._next_char_right(cursor)
+			if left in self.paired_chars and self.paired_chars[left] == right:
+				cursor.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor)
+				cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor)
+				cursor.removeSelectedText()
+				self.setTextCursor(cursor)
+				return
+		super().keyPressEvent(event)
+
+	def _next_char_right(self, cursor):
+		cursor.movePosition(QTextCursor.Right, QTextCursor.KeepAnchor)
+		ch = cursor.selectedText()
+		cursor.movePosition(QTextCursor.Left)
+		return ch
+
+	def _next_char_left(self, cursor):
+		cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor)
+		ch = cursor.selectedText()
+		cursor.movePosition(QTextCursor.Right)
+		return ch
+
+	def convert_indentation(self, tab_size, to_tabs):
+		"""Rewrite the indentation of the selected lines (or the whole file) as a single undo step
+
+		Only leading whitespace that actually changes is replaced, so the cursor, breakpoints
+		and the rest of each line stay put and the highlighter only re-lexes the edited range.
+		"""
+		doc = self.document()
+		cursor = self.textCursor()
+		if cursor.hasSelection():
+			first = doc.findBlock(cursor.selectionStart())
+			last = doc.findBlock(cursor.selectionEnd())
+			# A selection ending at the start of a line doesn't include that line
+			if last != first and cursor.selectionEnd() == last.position():
+				last = last.previous()
+			first, last = first.blockNumber(), last.blockNumber()
+		else:
+			first, last = 0, doc.blockCount() - 1
+		# Worked out from the mirror, and applied like a multi-cursor keystroke: one
+		# contentsChange, one splice of the piece table
+		edits = reindent_edits(self.buffer, first, last, tab_size, to_tabs)
+		self._apply_edits(edits)
+		return len(edits)
+
+	def on_cursor_moved(self):
+		"""Coalesced cursor event from the EditorEventBus, at most once per frame"""
+		block = self.textCursor().blockNumber()
+		if not self.textCursor().block().isVisible():
+			# Find, go to line and the debugger can land inside a fold
+			self.unfold(block)
+		if block != self._cursor_block:
+			# The gutter shades the current line number
+			self._cursor_block = block
+			self.highlight_current_line()
+			self.line_number_area.update()
+		self.highlight_matching_bracket()
+
+	def highlight_current_line(self):
+		extra = QTextEdit.ExtraSelection()
+		extra.format.setBackground(QColor("#2A2A2A"))
+		extra.format.setProperty(QTextCharFormat.FullWidthSelection, True)
+		# Anchored at the line start, so moving along the line leaves the selection (and
+		# the painted area) unchanged
+		extra.cursor = QTextCursor(self.textCursor().block())
+		self.selections.set_layer("current_line", [extra])
+
+	def highlight_matching_bracket(self):
+		match = match_bracket(self.doc, self.doc.from_utf16(self.textCursor().position()))
+		if match == self._bracket_match:
+			return
+		self._bracket_match = match
+		selections = []
+		if match is not None:
+			bracket, partner = match
+			for position in (bracket, partner):
+				extra = QTextEdit.ExtraSelection()
+				if partner is None:
+					extra.format.setForeground(QColor("#F44747"))
+				else:
+					extra.format.setBackground(QColor("#3B4754"))
+					extra.format.setForeground(QColor("#FFEF28"))
+				if position is None:
+					continue
+				extra.cursor = QTextCursor(self.document())
+				extra.cursor.setPosition(self.doc.to_utf16(position))
+				extra.cursor.setPosition(self.doc.to_utf16(position + 1), QTextCursor.KeepAnchor)
+				selections.append(extra)
+		self.selections.set_layer("brackets", selections)
+
+	def set_diagnostics(self, diagnostics):
+		"""Squiggles in the diagnostics layer plus a gutter mark, for results of the current text"""
+		self.diagnostics = {}
+		selections = []
+		document = self.document()
+		for diagnostic in sorted(diagnostics, key=lambda d: d.severity != "error"):
+			self.diagnostics.setdefault(diagnostic.line, []).append(diagnostic)
+			block = document.findBlockByNumber(diagnostic.line)
+			if not block.isValid():
+				continue
+			text = block.text()
+			start = min(diagnostic.column, max(len(text) - 1, 0))
+			end = max(diagnostic.end_column, start + 1)
+			if end == start + 1:
+				# Point diagnostics underline the whole word they point at
+				while end < len(text) and (text[end].isalnum() or text[end] == "_"):
+					end += 1
+			extra = QTextEdit.ExtraSelection()
+			extra.format.setUnderlineStyle(QTextCharFormat.WaveUnderline)
+			extra.format.setUnderlineColor(QColor(DIAGNOSTIC_COLORS[diagnostic.severity]))
+			extra.format.setToolTip(diagnostic.message)
+			extra.cursor = QTextCursor(block)
+			extra.cursor.setPosition(block.position() + start)
+			extra.cursor.setPosition(block.position() + min(end, max(len(text), start + 1)), QTextCursor.KeepAnchor)
+			selections.append(extra)
+		self.selections.set_layer("diagnostics", selections)
+		self.line_number_area.update()
+		if self.minimap:
+			self.minimap.update()
+
+	def toggle_breakpoint(self, line):
+		self.breakpoints.toggle(line)
+		self._update_gutters()
+		self.breakpointsChanged.emit(line)
+
+	def edit_breakpoint(self, line, field):
+		"""Ask for a breakpoint's condition or ignore count, adding the breakpoint if needed"""
+		breakpoint = self.breakpoints.get(line)
+		if field == "condition":
+			dialog = CustomInputDialog(self, "Breakpoint Condition",
+				f"Stop on line {line + 1} when:", breakpoint.condition if breakpoint else "")
+		else:
+			dialog = CustomInputDialog(self, "Break After Hits",
+				f"Pass line {line + 1} this many times before stopping:", str(breakpoint.ignore if breakpoint else 0))
+		if dialog.exec() != QDialog.Accepted:
+			return
+		value = dialog.get_text()
+		breakpoint = breakpoint or self.breakpoints.add(line)
+		if field == "condition":
+			breakpoint.condition = value
+		else:
+			breakpoint.ignore = int(value) if value.isdigit() else 0
+		self._update_gutters()
+		self.breakpointsChanged.emit(line)
+
+	def get_breakpoints(self):
+		return self.breakpoints.lines()
+
+	@traced()
+	def line_number_area_paint_event(self, event):
+		painter = QPainter(self.line_number_area)
+		painter.fillRect(event.rect(), QColor("#3C3F41"))
+		block = self.firstVisibleBlock()
+		cur_line = self.textCursor().blockNumber()
+		top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
+		bottom = top + self.blockBoundingRect(block).height()
+		num = block.blockNumber()
+		icon = breakpoint_icon()
+		icon_size = 14
+		# Only the breakpoints in view, looked up once per paint
+		visible_lines = self.viewport().height() // max(1, self.fontMetrics().height()) + 2
+		marks = dict(self.breakpoints.items(num, self.folds.skip_visible(num, visible_lines)))
+		folds = dict(self.folds.regions(num, self.folds.skip_visible(num, visible_lines)))
+		tests = self.test_marks_by_line()
+		coverage = self.coverage
+		coverage_x = icon_size + TEST_MARGIN
+		fold_x = self.line_number_area.width() - 3 - FOLD_MARGIN
+		while block.isValid() and top <= event.rect().bottom():
+			if block.isVisible() and bottom >= event.rect().top():
+				if num == cur_line:
+					painter.fillRect(0, int(top), self.line_number_area.width(),
+									 int(bottom - top), QColor("#4C5052"))
+				breakpoint = marks.get(num)
+				if breakpoint is not None:
+					y = math.floor(top + (bottom - top - icon_size) / 2)
+					icon.render(painter, QRect(0, y, icon_size, icon_size))
+					if breakpoint.condition or breakpoint.ignore:
+						# Conditional breakpoints get a dot in the corner
+						painter.setBrush(QColor("#EBC88D"))
+						painter.setPen(Qt.NoPen)
+						painter.drawEllipse(icon_size - 6, y + icon_size - 6, 6, 6)
+				test = tests.get(num)
+				if test is not None:
+					painter.setBrush(QColor(TEST_COLORS[test[0]]))
+					painter.setPen(Qt.NoPen)
+					painter.drawEllipse(icon_size + 1, math.floor(top + (bottom - top - 6) / 2), 6, 6)
+				if coverage is not None:
+					ran = coverage.state(num)
+					if ran is not None:
+						painter.fillRect(coverage_x, int(top), 3, int(bottom - top), QColor(COVERAGE_COLORS[ran]))
+				problems = self.diagnostics.get(num)
+				if problems:
+					painter.fillRect(self.line_number_area.width() - 3, int(top), 3, int(bottom - top),
+						QColor(DIAGNOSTIC_COLORS[problems[0].severity]))
+				painter.setPen(QColor("#A9B7C6"))
+				painter.drawText(
+					0, int(top), fold_x,
+								 self.fontMetrics().height(), Qt.AlignRight,
+								 str(num + 1)
+				)
+				if num in folds:
+					painter.setPen(QColor("#8C8C8C"))
+					painter.drawText(fold_x, int(top), FOLD_MARGIN, self.fontMetrics().height(),
+						Qt.AlignCenter, "▸" if self.folds.is_folded(num) else "▾")
+			block = self.next_visible_block(block)
+			top = bottom
+			bottom = top + self.blockBoundingRect(block).height()
+			num = block.blockNumber()
+
+
+class snakeideEditor(QMainWindow):
+	def __init__(self, paths=None, profiler=None):
+		super().__init__()
+		self.profiler = profiler or StartupProfiler()
+		self.setWindowTitle("Snake IDE V1")
+		self.resize(1500,1500)
+
+		self.find_dialog = None
+		self.perf_hud = None
+		self.editor_bus = EditorEventBus(self)
+		self.editor_bus.cursorMoved.connect(self._on_editor_cursor_moved)
+		self.editor_bus.selectionChanged.connect(self._on_editor_selection_changed)
+		self.diagnostics = DiagnosticsController(self)
+		self.completions = CompletionController(self)
+		self.minimap_renderer = MinimapRenderer(self)
+		self.editor_bus.contentsChanged.connect(self.diagnostics.schedule)
+		self._tab_size = 4
+		self._current_file = None
+		self.default_Config = {
+			"tab_size": 4, "current_project": None,
+			"run_limits": {"memory_mb": 0, "nice": 0, "cpus": []}, "monitor_interval_ms": 500
+		}
+		self.config_store = ConfigStore(config_dir(), self.default_Config, LEGACY_CONFIG_PATH)
+		self.config = self.load_config()
+		self._config_flush = QTimer(self)
+		self._config_flush.setSingleShot(True)
+		self._config_flush.setInterval(CONFIG_FLUSH_MS)
+		self._config_flush.timeout.connect(self.config_store.flush)
+		self.console_process = None
+		self.run_manager = RunManager(os.path.dirname(os.path.abspath(__file__)))
+		self.kernel = KernelClient(self.run_manager, self)
+		self.interpreters = []  # [(path, version)] for the project, filled in the background
+		self.interpreter_scanner = InterpreterScanner(self)
+		self.interpreter_scanner.found.connect(self._on_interpreters_found)
+		self.cell_runner = CellRunner(self.kernel, self)
+		self.repl_history = ReplHistory(os.path.join(cache_dir(), "console_history.json"))
+		self.tests = TestSession(self.run_manager, self)
+		self.tests.configuration = self.current_run_configuration
+		self.tests.resultsChanged.connect(self._refresh_test_marks)
+		self.coverage = None  # CoverageData of the project, loaded with it
+		self._coverage_runs = 0
+		self._closing_project = False  # tabs closing for a project switch don't change its session
+		self.profiler.mark("config")
+
+		# Load custom icons
+		self.folder_icon = self.load_folder_icon()
+		self.file_icon = self.load_file_icon()
+
+		self.open_files = {}
+		self.file_watcher = OpenFileWatcher(self)
+		self.file_watcher.filesChanged.connect(self._on_files_changed_on_disk)
+		# Work that the first frame doesn't need (highlighting, project tree, other tabs)
+		# is queued here and run by _finish_startup once the window is up
+		self._startup_done = False
+		self._deferred_startup = []
+		self._init_ui()
+		self.profiler.mark("ui")
+		self._apply_snakeide_theme()
+
+		
+		# Apply UI font
+		ui_font = QFont("Segoe UI")
+		ui_font.setPointSize(9)
+		QApplication.setFont(ui_font)
+		self.profiler.mark("theme")
+
+		self._tab_size = self.config.get("tab_size", 4)
+		self.set_tab_size(self._tab_size)
+		
+		if paths:
+			self.open_paths(paths)
+		else:
+			self._restore_session()
+		self.profiler.mark("first editor")
+
+	def _restore_session(self):
+		"""Reopen the last session: the current tab right away, everything else after the first frame"""
+		project = self.config.get("current_project")
+		if project:
+			self._deferred_startup.append(lambda: self._set_project_root(project))
+
+		session = self.project_state("session")
+		files = [path for path in session.get("open_files", []) if path and os.path.exists(path)]
+		current = session.get("current_file")
+		if current not in files:
+			current = files[0] if files else None
+		if current:
+			self._open_file(current)
+
+		def open_remaining():
+			for file_path in files:
+				if file_path != current:
+					self._open_file(file_path)
+			# Put the tabs back in their saved order
+			tab_bar = self.editor_tabs.tabBar()
+			for i, file_path in enumerate(files):
+				tab_bar.moveTab(self.editor_tabs.indexOf(self.open_files[file_path]["widget"]), i)
+			if current:
+				self.editor_tabs.setCurrentWidget(self.open_files[current]["widget"])
+		self._deferred_startup.append(open_remaining)
+
+	def open_paths(self, paths):
+		"""Open files and a project folder given on the command line"""
+		folders = [path for path in paths if os.path.isdir(path)]
+		if folders:
+			if self._startup_done:
+				self._open_folder(folders[-1])
+			else:
+				# No tabs to close yet, the tree can load after the first frame
+				self._deferred_startup.append(lambda: self._set_project_root(folders[-1]))
+		for path in paths:
+			if not os.path.isdir(path):
+				path = os.path.abspath(path)
+				self._open_file(path, os.path.basename(path))
+
+	def open_forwarded_paths(self, paths):
+		"""Open paths handed over by a later launch and bring the window forward"""
+		self.open_paths(paths)
+		self.setWindowState(self.windowState() & ~Qt.WindowMinimized | Qt.WindowActive)
+		self.raise_()
+		self.activateWindow()
+
+	def _finish_startup(self):
+		"""Runs once the first frame is on screen and loads what startup skipped"""
+		self.profiler.mark("first frame")
+		self._startup_done = True
+		deferred, self._deferred_startup = self._deferred_startup, []
+		for job in deferred:
+			job()
+		self.profiler.mark("deferred loading")
+		self.minimap_renderer.enable()
+		if not hasattr(self, 'command_palette'):
+			self.command_palette = CommandPalette(self)
+		self.profiler.mark("dialogs")
+		self.completions.load_packages(self.run_manager.python())
+		self.interpreter_scanner.scan(self.config.get("current_project") or "")
+		self._load_coverage()
+		if tracer.enabled:
+			self.lag_monitor = EventLoopLagMonitor(self)
+			self.lag_monitor.start()
+
+	def show_find(self):
+		if self.find_dialog is None:
+			self.find_dialog = FindDialog(self)
+		self.find_dialog.show()
+		self.find_dialog.raise_()
+		self.find_dialog.search_input.setFocus()
+
+	def _select_match(self, editor, match):
+		cursor = editor.textCursor()
+		cursor.setPosition(editor.doc.to_utf16(match[0]))
+		cursor.setPosition(editor.doc.to_utf16(match[1]), QTextCursor.KeepAnchor)
+		editor.setTextCursor(cursor)
+
+	def _highlight_matches(self, editor, text, case_sensitive):
+		"""Mark every match in the search layer (capped, a huge file only gets the first ones)"""
+		selections = []
+		matches = editor.find_engine.find_all(text, case_sensitive)
+		for start, end in matches:
+			extra = QTextEdit.ExtraSelection()
+			extra.format.setBackground(QColor("#4B4530"))
+			extra.cursor = QTextCursor(editor.document())
+			extra.cursor.setPosition(editor.doc.to_utf16(start))
+			extra.cursor.setPosition(editor.doc.to_utf16(end), QTextCursor.KeepAnchor)
+			selections.append(extra)
+		editor.selections.set_layer("search", selections)
+		if editor.minimap:
+			line_of = editor.doc.buffer.line_of
+			editor.minimap.set_search_hits([line_of(start) for start, _ in matches])
+
+	def clear_search_highlights(self):
+		for file_info in self.open_files.values():
+			for view in file_info["editor"].shared.views:
+				view.selections.clear_layer("search")
+			if file_info["editor"].minimap:
+				file_info["editor"].minimap.set_search_hits([])
+
+	def find_next(self, text, case_sensitive=False):
+		editor = self.get_current_editor()
+		if not editor or not text:
+			return
+		# start after the current cursor, wrapping around
+		match = editor.find_engine.find(text, editor.doc.from_utf16(editor.textCursor().selectionEnd()), case_sensitive)
+		self._highlight_matches(editor, text, case_sensitive)
+		if match:
+			self._select_match(editor, match)
+		else:
+			self.find_dialog.hide()
+			QMessageBox.information(self, "Find",f"Find: Could not find {text}.")
+			self.find_dialog.show()
+
+	def find_previous(self, text, case_sensitive=False):
+		editor = self.get_current_editor()
+		if not editor or not text:
+			return
+		# start before the current cursor, wrapping around
+		match = editor.find_engine.find(text, editor.doc.from_utf16(editor.textCursor().selectionStart()), case_sensitive, backward=True)
+		self._highlight_matches(editor, text, case_sensitive)
+		if match:
+			self._select_match(editor, match)
+		else:
+			QMessageBox.information(self, "Find", f"‘{text}’ not found.")
+
+	def open_command_palette(self):
+		if not hasattr(self, 'command_palette'):
+			self.command_palette = CommandPalette(self)
+		self.command_palette.move(
+			self.x() + self.width() * 0.1,
+			self.y() + 10
+		)
+		self.command_palette.setObjectName("CommandPalette")
+		self.command_palette.update_list(self.command_palette.input.text())
+		self.command_palette.show()
+		self.command_palette.input.setFocus()
+
+	
+	def load_folder_icon(self):
+		"""Load folder icon from file or use base64 fallback"""
+		icon_path = os.path.join(os.path.dirname(__file__), "icons/folder.svg")
+		return QIcon(icon_path)
+	
+	def load_file_icon(self):
+		"""Load file icon - using generic document icon"""
+		parent = os.path.join(os.path.dirname(__file__), "icons")
+		icons = {'general_file': QIcon(os.path.join(parent, "general_file.svg"))}
+		for icon in os.listdir(parent):
+			if icon.startswith("extension_"):
+				extension_name = icon.removeprefix("extension_").removesuffix(".svg")
+				icons[extension_name] = QIcon(os.path.join(parent, icon))
+		return icons
+		
+	def load_config(self):
+		return self.config_store.load()
+
+	def project_state(self, name):
+		"""A section of the current project's state ("session", "editors", "breakpoints", ...)"""
+		return self.config_store.section(name, self.config.get("current_project") or "")
+
+	def state_changed(self, name=None):
+		"""Mark the settings (or a project section) changed, they're written a moment later"""
+		if name is None:
+			self.config_store.changed(ConfigStore.SETTINGS)
+		else:
+			self.config_store.changed(name, self.config.get("current_project") or "")
+		self._config_flush.start()
+
+	def save_config(self):
+		"""Everything the session holds onto, written out before returning"""
+		self._remember_session()
+		for path, file_info in self.open_files.items():
+			self._remember_breakpoints(path, file_info["editor"])
+			self._remember_view(path, file_info["editor"])
+		self.state_changed()
+		self._config_flush.stop()
+		try:
+			self.config_store.flush(wait=True)
+		except OSError as e:
+			QMessageBox.warning(self, "Error", f"Could not save the settings: {str(e)}")
+
+	def _remember_session(self):
+		"""The open tabs, in tab order, and the current one"""
+		if self._closing_project:
+			return
+		paths = {file_info["widget"]: path for path, file_info in self.open_files.items()}
+		session = self.project_state("session")
+		session["open_files"] = [
+			paths[widget] for widget in map(self.editor_tabs.widget, range(self.editor_tabs.count()))
+			if paths.get(widget)
+		]
+		current = self.get_current_editor()
+		session["current_file"] = getattr(current, 'file_path', None)
+		self.state_changed("session")
+
+	def _remember_breakpoints(self, path, editor):
+		"""Keep a file's breakpoints in the project's state, per path"""
+		if not path:
+			return
+		saved = self.project_state("breakpoints")
+		if len(editor.breakpoints):
+			saved[path] = editor.breakpoints.to_config()
+		else:
+			saved.pop(path, None)
+		self.state_changed("breakpoints")
+
+	def _remember_view(self, path, editor):
+		if not path:
+			return
+		states = self.project_state("editors")
+		# Most recent last, so the oldest go first once there are too many
+		states.pop(path, None)
+		states[path] = editor.view_state()
+		for stale in list(states)[:-EDITOR_STATES_KEPT]:
+			del states[stale]
+		self.state_changed("editors")
+
+	def _init_ui(self):
+		self._create_actions()
+		self._create_toolbar()
+		self._create_menus()
+		
+		# Main splitter
+		self.main_splitter = QSplitter(Qt.Horizontal)
+		
+		# Left panel with project tree
+		left_panel = self._create_left_panel()
+		
+		# Right panel with editor
+		right_panel = self._create_editor_panel()
+
+		self._create_status_bar()
+		
+		self.main_splitter.addWidget(left_panel)
+		self.main_splitter.addWidget(right_panel)
+		self.main_splitter.setSizes([280, 920])
+
+		# A text browser so traceback links can be clicked, opened by us rather than Qt
+		self.console_output = QTextBrowser()
+		self.console_output.setOpenLinks(False)
+		self.console_output.anchorClicked.connect(self._open_console_link)
+		self.console_output.document().setMaximumBlockCount(CONSOLE_MAX_LINES)
+		self.console_output.setFixedHeight(150)
+		self.console_output.setObjectName("Console")
+
+		# Created when first shown, the kernel only starts once something runs in it
+		self.repl_panel = None
+		self.test_panel = None
+
+		self.root_splitter = QSplitter(Qt.Vertical)
+		self.root_splitter.addWidget(self.main_splitter)
+		self.root_splitter.addWidget(self.console_output)
+		self.root_splitter.setStretchFactor(1, 1)  # Make top grow with window
+		
+		self.setCentralWidget(self.root_splitter)
+
+		# Initially hide project tree, stop button and console
+		left_panel.hide()
+		self.console_output.hide()
+		self.stop_button.hide()
+
+	def _create_left_panel(self):
+		"""Create the left project panel"""
+		panel = QFrame()
+		panel.setFrameStyle(QFrame.NoFrame)
+		layout = QVBoxLayout(panel)
+		layout.setContentsMargins(0, 0, 0, 0)
+		layout.setSpacing(0)
+		
+		# Project header
+		header = QLabel("Project")
+		header.setObjectName("panel_header")
+		header.setFixedHeight(24)
+		header.setContentsMargins(8, 4, 8, 4)
+		layout.addWidget(header)
+		
+		# Project tree with custom icons, the model is created when a project is opened
+		self.model = None
+		
+		self.tree = QTreeView()
+		self.tree.setUniformRowHeights(True)
+		self.tree.setHeaderHidden(True)
+		self.tree.setRootIsDecorated(True)
+		self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
+		self.tree.customContextMenuRequested.connect(self._on_tree_context_menu)
+		self.tree.doubleClicked.connect(self._on_tree_double_click)
+			
+		layout.addWidget(self.tree)
+		return panel
+
+	def _ensure_project_model(self):
+		"""Create the file system model on first use"""
+		if self.model is None:
+			self.model = ProjectTreeModel(
+				FileIconProvider(self.folder_icon, self.file_icon),
+				self.config.get("exclude_globs", DEFAULT_EXCLUDE_GLOBS)
+			)
+			self.tree.setModel(self.model)
+			self.tree.verticalScrollBar().valueChanged.connect(self._on_tree_scrolled)
+		return self.model
+
+	def _on_tree_scrolled(self, value):
+		scroll_bar = self.tree.verticalScrollBar()
+		if value >= scroll_bar.maximum() - scroll_bar.pageStep():
+			bottom = self.tree.indexAt(QPoint(1, self.tree.viewport().height() - 1))
+			self.model.show_more(bottom)
+
+	def _create_editor_panel(self):
+		"""Create the main editor panel"""
+		panel = QFrame()
+		panel.setFrameStyle(QFrame.NoFrame)
+		layout = QVBoxLayout(panel)
+		layout.setContentsMargins(0, 0, 0, 0)
+		layout.setSpacing(0)
+		
+		# Editor tabs
+		self.editor_tabs = QTabWidget()
+		self.editor_tabs.setObjectName("editor_tabs")
+		self.editor_tabs.setTabPosition(QTabWidget.North)
+		self.editor_tabs.setTabsClosable(True)
+		self.editor_tabs.setMovable(True)
+		self.editor_tabs.tabCloseRequested.connect(self.close_tab)
+		self.editor_tabs.currentChanged.connect(self._tab_changed)
+		
+		# Add new tab button
+		new_tab_btn = QPushButton("+")
+		new_tab_btn.setObjectName("new_tab_button")
+		new_tab_btn.setFixedSize(24, 24)
+		new_tab_btn.clicked.connect(self._create_new_tab)
+		self.editor_tabs.setCornerWidget(new_tab_btn, Qt.TopRightCorner)
+		
+		layout.addWidget(self.editor_tabs)
+		
+		return panel
+		
+	def _adjust_input_height(self):
+		"""Adjust input field height based on content"""
+		doc = self.console_input.document()
+		height = doc.size().height() + 10
+		self.console_input.setFixedHeight(min(int(height), 150))
+		
+	def run_command(self, cmdlet, args, cwd=None, env=None):
+		"""Execute a Python command and show output in console"""
+		# Clear previous process if any
+		if getattr(self, 'console_process') is not None:
+			self.console_process.kill()
+			self.console_process = None
+			
+		self.console_output.clear()
+		# Create and start process
+		self.console_process = BuildThread(self.console_output)
+		self.console_process.finished.connect(self._command_finished)
+		
+		# Start Python with the command, watched by the resource monitor once it's up
+		process = self.console_process
+		self._set_process_options(process, cwd, env)
+		process.started.connect(lambda: self.resource_monitor.start(
+			process.processId(), self.config.get("monitor_interval_ms", 500),
+			self.config.get("run_limits", {}).get("memory_mb", 0)
+		))
+		process.start_build(cmdlet, args)
+		self.console_output.show()
+
+	def _set_process_options(self, process, cwd=None, env=None):
+		if cwd:
+			process.setWorkingDirectory(cwd)
+		if env is not None:
+			environment = QProcessEnvironment()
+			for key, value in env.items():
+				environment.insert(key, value)
+			process.setProcessEnvironment(environment)
+
+	def show_repl(self):
+		"""The Python console panel, created and shown on first use"""
+		if self.repl_panel is None:
+			self.repl_history.load()
+			self.repl_panel = ReplPanel(self.kernel, self.repl_history)
+			self.repl_panel.output.anchorClicked.connect(self._open_console_link)
+			self.root_splitter.addWidget(self.repl_panel)
+		self.repl_panel.show()
+		self.repl_act.setChecked(True)
+		return self.repl_panel
+
+	def show_tests(self):
+		"""The test panel, created and shown on first use"""
+		if self.test_panel is None:
+			self.test_panel = TestPanel(self.tests)
+			self.test_panel.details.anchorClicked.connect(self._open_console_link)
+			self.test_panel.openLocation.connect(self.open_location)
+			self.root_splitter.addWidget(self.test_panel)
+		self.test_panel.show()
+		self.tests_act.setChecked(True)
+		return self.test_panel
+
+	def toggle_tests(self, checked):
+		if checked:
+			self.show_tests()
+		elif self.test_panel is not None:
+			self.test_panel.hide()
+
+	def run_tests(self, which="all"):
+		self.show_tests()
+		self.tests.run(which)
+
+	def _run_tests_at(self, editor, line):
+		path = getattr(editor, 'file_path', None)
+		ids = [test.id for test in self.tests.tests if test.path == path and test.line == line]
+		if ids:
+			self.run_tests(ids)
+
+	def _refresh_test_marks(self, paths):
+		for path in paths:
+			file_info = self.open_files.get(path)
+			if file_info is not None:
+				file_info["editor"].set_test_marks(self.tests.marks(path))
+
+	def toggle_repl(self, checked):
+		if checked:
+			self.show_repl().input.setFocus()
+		elif self.repl_panel is not None:
+			self.repl_panel.hide()
+
+	def run_selection_in_console(self):
+		"""The selection (or the current line) in the console, tracebacks pointing into the file"""
+		editor = self.get_current_editor()
+		if not editor:
+			return
+		cursor = editor.textCursor()
+		if cursor.hasSelection():
+			doc = editor.document()
+			first = doc.findBlock(cursor.selectionStart()).blockNumber()
+			code = cursor.selectedText().replace("\u2029", "\n")
+			if doc.findBlock(cursor.selectionStart()).position() != cursor.selectionStart():
+				# Started mid-line, the part before it isn't code to run
+				code = code.lstrip()
+		else:
+			first = cursor.blockNumber()
+			code = cursor.block().text()
+		code = textwrap.dedent(code)
+		if not code.strip():
+			return
+		path = getattr(editor, 'file_path', None)
+		panel = self.show_repl()
+		if path:
+			# Padded so the line numbers in tracebacks are the file's
+			panel.execute("\n" * first + code, path, echo=panel.prompted(code))
+		else:
+			panel.execute(code)
+
+	def run_file_in_console(self):
+		"""The whole file in the console, its globals stay behind to poke at"""
+		editor = self.get_current_editor()
+		if not editor:
+			return
+		path = getattr(editor, 'file_path', None)
+		name = os.path.basename(path) if path else "untitled"
+		self.show_repl().execute(
+			editor.doc.text(), path, file=bool(path), echo=f">>> # Running {name}"
+		)
+
+	def run_cell(self, advance=False):
+		"""The `# %%` cell under the cursor in the console, then on to the next one if `advance`"""
+		editor = self.get_current_editor()
+		if not editor:
+			return
+		_, last = self.cell_runner.run(self.show_repl(), editor, editor.textCursor().blockNumber())
+		if advance:
+			block = editor.document().findBlockByNumber(last + 1)
+			cursor = editor.textCursor()
+			if block.isValid():
+				cursor.setPosition(block.position())
+				cursor.movePosition(QTextCursor.NextBlock)
+			else:
+				cursor.movePosition(QTextCursor.End)
+			editor.setTextCursor(cursor)
+			editor.ensureCursorVisible()
+
+	def _open_console_link(self, url):
+		"""Open a traceback frame's file at its line"""
+		self.open_location(url.toLocalFile(), int(url.fragment() or 1) - 1)
+
+	def open_location(self, path, line):
+		if not os.path.isfile(path):
+			self.statusBar().showMessage(f"Not found: {path}", 3000)
+			return
+		self._open_file(path, os.path.basename(path))
+		editor = self.open_files[path]["editor"]
+		editor.setTextCursor(QTextCursor(editor.document().findBlockByNumber(max(0, line))))
+		editor.centerCursor()
+		editor.setFocus()
+
+	def _on_memory_limit(self, message):
+		self.console_output.insertPlainText(f"\n{message}\n")
+		self.statusBar().showMessage(message, 5000)
+
+	def _command_finished(self):
+		self.building_label.hide()
+		peak = self.resource_monitor.stop()
+		if peak is not None and peak.rss:
+			self.console_output.insertPlainText(f"\nPeak: {ResourceMonitor.describe(peak)}\n")
+		self.console_output.insertPlainText("Finished Build.")
+		self.run_button.setIcon(QIcon(resource_path("./icons/run_file.svg")))
+	def _create_toolbar(self):
+		toolbar = QToolBar()
+		toolbar.setObjectName("main_toolbar")
+		toolbar.setToolButtonStyle(Qt.ToolButtonStyle.ToolButtonIconOnly)
+		toolbar.setIconSize(QSize(16, 16))
+		toolbar.setFloatable(False)
+		toolbar.setMovable(False)
+		
+		# Add some common actions (icons would be loaded from resources in real app)
+		self.addToolBar(toolbar)
+
+		self.run_config_combo = QComboBox()
+		self.run_config_combo.setObjectName("run_config_combo")
+		self.run_config_combo.setToolTip("Run configuration")
+		self.run_config_combo.setMinimumWidth(160)
+		self.run_config_combo.activated.connect(self._on_run_config_activated)
+		toolbar.addWidget(self.run_config_combo)
+		self._refresh_run_configurations()
+
+	def _create_actions(self):
+		# File actions
+		self.new_file_act = QAction("New File", self)
+		self.new_file_act.setShortcut("Ctrl+N")
+		self.new_file_act.triggered.connect(self._create_new_tab)
+		
+		self.open_file_act = QAction("Open File...", self)
+		self.open_file_act.setShortcut("Ctrl+O")
+		self.open_file_act.triggered.connect(self.open_file)
+		
+		self.open_project_act = QAction("Open Project...", self)
+		self.open_project_act.triggered.connect(self.open_project)
+		
+		self.save_act = QAction("Save", self)
+		self.save_act.setShortcut("Ctrl+S")
+		self.save_act.triggered.connect(self.save_file)
+		
+		self.save_all_act = QAction("Save All", self)
+		self.save_all_act.setShortcut("Ctrl+Shift+S")
+		self.save_all_act.triggered.connect(self.save_all_files)
+		
+		self.close_tab_act = QAction("Close Tab", self)
+		self.close_tab_act.setShortcut("Ctrl+W")
+		self.close_tab_act.triggered.connect(self.close_current_tab)
+		
+		self.exit_act = QAction("Exit", self)
+		self.exit_act.triggered.connect(self.close)
+		
+		# View actions
+		self.toggle_project_act = QAction("Project", self)
+		self.toggle_project_act.setShortcut("Alt+1")
+		self.toggle_project_act.setCheckable(True)
+		self.toggle_project_act.triggered.connect(self.toggle_project_panel)
+		
+		# Tab size actions
+		self.tab2_act = QAction("2", self, checkable=True)
+		self.tab2_act.triggered.connect(lambda: self.set_tab_size(2))
+		self.tab4_act = QAction("4", self, checkable=True)
+		self.tab4_act.triggered.connect(lambda: self.set_tab_size(4))
+		self.tab8_act = QAction("8", self, checkable=True)
+		self.tab8_act.triggered.connect(lambda: self.set_tab_size(8))
+		self.tab_actions = [self.tab2_act, self.tab4_act, self.tab8_act]
+
+		# Folding actions, on the current editor
+		self.fold_acts = []
+		for name, shortcut, method in (
+			("Fold", "Ctrl+Shift+[", "fold"),
+			("Unfold", "Ctrl+Shift+]", "unfold"),
+			("Fold All", "Ctrl+K, Ctrl+0", "fold_all"),
+			("Unfold All", "Ctrl+K, Ctrl+J", "unfold_all"),
+		):
+			action = QAction(name, self)
+			action.setShortcut(shortcut)
+			action.triggered.connect(lambda _=False, method=method: self._on_current_editor(method))
+			self.fold_acts.append(action)
+
+		# Multi-cursor actions, on the current editor too
+		self.add_next_occurrence_act = QAction("Add Next Occurrence", self)
+		self.add_next_occurrence_act.setShortcut("Ctrl+D")
+		self.add_next_occurrence_act.triggered.connect(lambda: self._on_current_editor("add_next_occurrence"))
+
+		self.select_all_occurrences_act = QAction("Select All Occurrences", self)
+		self.select_all_occurrences_act.setShortcut("Ctrl+Shift+L")
+		self.select_all_occurrences_act.triggered.connect(lambda: self._on_current_editor("select_all_occurrences"))
+
+		self.build_file_act = QAction("Build", self)
+		self.build_file_act.setShortcut("Ctrl+B")
+		self.build_file_act.triggered.connect(lambda: self.build_file())
+
+		self.run_coverage_act = QAction("Run with Coverage", self)
+		self.run_coverage_act.setShortcut("Ctrl+Shift+B")
+		self.run_coverage_act.triggered.connect(lambda: self.build_file(coverage=True))
+
+		self.coverage_act = QAction("Coverage Overlay", self, checkable=True)
+		self.coverage_act.setChecked(self.config.get("coverage_overlay", True))
+		self.coverage_act.triggered.connect(self.toggle_coverage)
+
+		self.clear_coverage_act = QAction("Clear Coverage", self)
+		self.clear_coverage_act.triggered.connect(self.clear_coverage)
+
+		self.run_configs_act = QAction("Edit Run Configurations...", self)
+		self.run_configs_act.triggered.connect(self.edit_run_configurations)
+
+		self.run_settings_act = QAction("Run Settings...", self)
+		self.run_settings_act.triggered.connect(self.edit_run_settings)
+
+		# Python console actions
+		self.repl_act = QAction("Python Console", self, checkable=True)
+		self.repl_act.setShortcut("Alt+4")
+		self.repl_act.triggered.connect(self.toggle_repl)
+
+		self.run_selection_act = QAction("Run Selection in Console", self)
+		self.run_selection_act.setShortcut("Alt+Shift+E")
+		self.run_selection_act.triggered.connect(self.run_selection_in_console)
+
+		self.run_file_console_act = QAction("Run File in Console", self)
+		self.run_file_console_act.setShortcut("Alt+Shift+R")
+		self.run_file_console_act.triggered.connect(self.run_file_in_console)
+
+		self.run_cell_act = QAction("Run Cell", self)
+		self.run_cell_act.setShortcut("Ctrl+Return")
+		self.run_cell_act.triggered.connect(lambda: self.run_cell())
+
+		self.run_cell_advance_act = QAction("Run Cell and Advance", self)
+		self.run_cell_advance_act.setShortcut("Shift+Return")
+		self.run_cell_advance_act.triggered.connect(lambda: self.run_cell(advance=True))
+
+		self.interrupt_kernel_act = QAction("Interrupt Kernel", self)
+		self.interrupt_kernel_act.setShortcut("Ctrl+Alt+C")
+		self.interrupt_kernel_act.triggered.connect(self.kernel.interrupt)
+
+		self.restart_kernel_act = QAction("Restart Kernel", self)
+		self.restart_kernel_act.triggered.connect(lambda: self.show_repl().restart())
+
+		# Test runner actions
+		self.tests_act = QAction("Tests", self, checkable=True)
+		self.tests_act.setShortcut("Alt+5")
+		self.tests_act.triggered.connect(self.toggle_tests)
+
+		self.run_tests_act = QAction("Run All Tests", self)
+		self.run_tests_act.triggered.connect(lambda: self.run_tests("all"))
+
+		self.run_failed_tests_act = QAction("Run Failed Tests", self)
+		self.run_failed_tests_act.triggered.connect(lambda: self.run_tests("failed"))
+
+		self.run_affected_tests_act = QAction("Run Affected Tests", self)
+		self.run_affected_tests_act.triggered.connect(lambda: self.run_tests("affected"))
+
+		self.perf_hud_act = QAction("Performance HUD", self, checkable=True)
+		self.perf_hud_act.setShortcut("Ctrl+Alt+P")
+		self.perf_hud_act.triggered.connect(self.toggle_perf_hud)
+
+		# Split panes, more views of the current file
+		self.split_right_act = QAction("Split Right", self)
+		self.split_right_act.setShortcut("Ctrl+\\")
+		self.split_right_act.triggered.connect(lambda: self.split_editor(Qt.Horizontal))
+
+		self.split_down_act = QAction("Split Down", self)
+		self.split_down_act.setShortcut("Ctrl+K, Ctrl+\\")
+		self.split_down_act.triggered.connect(lambda: self.split_editor(Qt.Vertical))
+
+		self.unsplit_act = QAction("Unsplit", self)
+		self.unsplit_act.triggered.connect(self.unsplit_editor)
+
+		self.minimap_act = QAction("Minimap", self, checkable=True)
+		self.minimap_act.setChecked(self.config.get("minimap", True))
+		self.minimap_act.triggered.connect(self.toggle_minimap)
+
+		self.export_trace_act = QAction("Export Performance Trace...", self)
+		self.export_trace_act.triggered.connect(self.export_trace)
+
+		shortcut = QShortcut(QKeySequence("Ctrl+Shift+P"), self)
+		shortcut.activated.connect(self.open_command_palette)
+
+		
+	def build_file(self, coverage=False):
+		if getattr(self, 'console_process') is not None:
+			self.console_process.kill()
+			self.console_process = None
+		current_editor = self.get_current_editor()
+		self.run_button.hide()
+		self.debugrun_button.hide()
+		self.stop_button.show()
+		self.console_output.show()
+		if current_editor and hasattr(current_editor, 'file_path'):
+			file_path = current_editor.file_path
+			project = self.config.get("current_project")
+			configuration = self.current_run_configuration()
+			script = configuration.script_path(file_path, project)
+
+			output = None
+			if coverage:
+				self._coverage_runs += 1
+				output = os.path.join(cache_dir(), f"coverage-run-{os.getpid()}-{self._coverage_runs}.json")
+
+			self.building_label.show()
+			self.run_command(
+				*self.run_manager.run_command(script, self.config.get("run_limits"), configuration, output),
+				cwd=configuration.working_directory(script, project), env=configuration.environment()
+			)
+			if output:
+				# Tied to this run, a killed run just leaves no report behind
+				self.console_process.finished.connect(lambda _status, output=output: self._merge_coverage(output))
+
+	def _coverage_data(self):
+		if self.coverage is None:
+			self.coverage = CoverageData.for_project(self.config.get("current_project") or "")
+		return self.coverage
+
+	def _merge_coverage(self, output):
+		"""Fold a coverage run's report into the project's coverage and repaint its files"""
+		try:
+			with open(output, 'r', encoding='utf-8') as f:
+				report = json.load(f)
+			os.remove(output)
+		except (OSError, ValueError):
+			return
+		coverage = self._coverage_data()
+		paths = coverage.merge_report(report)
+		try:
+			coverage.save()
+		except OSError as e:
+			print(f"Coverage: {e}", file=sys.stderr)
+		for path in paths:
+			self._apply_coverage(path)
+		executed = sum(len(data["executed"]) for data in report.values())
+		executable = sum(len(data["executable"]) for data in report.values())
+		if executable:
+			self.console_output.insertPlainText(
+				f"\nCoverage: {executed} of {executable} lines ({executed * 100 // executable}%) in {len(report)} files\n"
+			)
+
+	def _load_coverage(self):
+		"""The project's coverage, onto the files that are open, once the overlay is on"""
+		if self.coverage_act.isChecked():
+			self._coverage_data()
+			for path in list(self.open_files):
+				if path:
+					self._apply_coverage(path)
+
+	def _apply_coverage(self, path):
+		file_info = self.open_files.get(path)
+		if file_info is None or self.coverage is None:
+			return
+		shown = self.coverage_act.isChecked()
+		file_info["editor"].set_coverage(self.coverage.get(path) if shown else None)
+
+	def toggle_coverage(self, checked):
+		self.config["coverage_overlay"] = checked
+		self.state_changed()
+		if checked:
+			self._coverage_data()
+		for path in list(self.open_files):
+			if path:
+				self._apply_coverage(path)
+
+	def clear_coverage(self):
+		coverage = self._coverage_data()
+		coverage.clear()
+		try:
+			coverage.save()
+		except OSError:
+			pass
+		for file_info in self.open_files.values():
+			file_info["editor"].set_coverage(None)
+
+	def run_configurations(self):
+		"""The project's run configurations (never empty) and the name of the selected one"""
+		entry = self.project_state("run_configurations")
+		configurations = [RunConfiguration.from_config(c) for c in entry.get("configs", [])]
+		return configurations or [RunConfiguration("Default")], entry.get("selected")
+
+	def current_run_configuration(self):
+		configurations, selected = self.run_configurations()
+		return next((c for c in configurations if c.name == selected), configurations[0])
+
+	def _store_run_configurations(self, configurations, selected):
+		self.project_state("run_configurations").update(
+			configs=[c.to_config() for c in configurations], selected=selected
+		)
+		self.state_changed("run_configurations")
+		self._refresh_run_configurations()
+
+	def select_run_configuration(self, name):
+		configurations, _ = self.run_configurations()
+		self._store_run_configurations(configurations, name)
+
+	def _refresh_run_configurations(self):
+		configurations, selected = self.run_configurations()
+		combo = self.run_config_combo
+		combo.clear()
+		for configuration in configurations:
+			combo.addItem(configuration.name)
+		combo.insertSeparator(combo.count())
+		combo.addItem("Edit Configurations...")
+		combo.setCurrentIndex(max(0, combo.findText(selected or "")))
+
+	def _on_run_config_activated(self, index):
+		if index == self.run_config_combo.count() - 1:
+			self._refresh_run_configurations()
+			self.edit_run_configurations()
+		else:
+			self.select_run_configuration(self.run_config_combo.itemText(index))
+
+	def edit_run_configurations(self):
+		configurations, selected = self.run_configurations()
+		dialog = RunConfigurationsDialog(self, configurations, self.interpreters)
+		if dialog.exec() == QDialog.Accepted:
+			configurations = dialog.values()
+			names = [c.name for c in configurations]
+			current = dialog.list.currentRow()
+			selected = names[current] if 0 <= current < len(names) else (names[0] if names else None)
+			self._store_run_configurations(configurations, selected)
+
+	def _on_interpreters_found(self, project, interpreters):
+		if project == (self.config.get("current_project") or ""):
+			self.interpreters = interpreters
+
+	def edit_run_settings(self):
+		dialog = RunSettingsDialog(self, self.config.get("run_limits", {}), self.config.get("monitor_interval_ms", 500))
+		while dialog.exec() == QDialog.Accepted:
+			try:
+				self.config["run_limits"], self.config["monitor_interval_ms"] = dialog.values()
+			except ValueError as e:
+				QMessageBox.warning(self, "Run Settings", str(e))
+				continue
+			self.state_changed()
+			return
+
+	def _create_menus(self):
+		menu_bar = self.menuBar()
+		
+		# File menu
+		file_menu = menu_bar.addMenu("File")
+		file_menu.addAction(self.new_file_act)
+		file_menu.addAction(self.open_file_act)
+		file_menu.addAction(self.open_project_act)
+		file_menu.addSeparator()
+		file_menu.addAction(self.save_act)
+		file_menu.addAction(self.save_all_act)
+		file_menu.addSeparator()
+		file_menu.addAction(self.close_tab_act)
+		file_menu.addSeparator()
+		file_menu.addAction(self.exit_act)
+		
+		# Edit menu
+		edit_menu = menu_bar.addMenu("Edit")
+		edit_menu.addAction(self.add_next_occurrence_act)
+		edit_menu.addAction(self.select_all_occurrences_act)
+		
+		# View menu
+		view_menu = menu_bar.addMenu("View")
+		view_menu.addAction(self.toggle_project_act)
+		view_menu.addAction(self.minimap_act)
+		view_menu.addSeparator()
+		view_menu.addAction(self.split_right_act)
+		view_menu.addAction(self.split_down_act)
+		view_menu.addAction(self.unsplit_act)
+		view_menu.addSeparator()
+		view_menu.addAction(self.repl_act)
+		view_menu.addAction(self.tests_act)
+		view_menu.addAction(self.coverage_act)
+		view_menu.addSeparator()
+		view_menu.addAction(self.perf_hud_act)
+		view_menu.addAction(self.export_trace_act)
+		
+		# Code menu
+		code_menu = menu_bar.addMenu("Code")
+		tab_menu = code_menu.addMenu("Tab Size")
+		for action in self.tab_actions:
+			tab_menu.addAction(action)
+		self.tab4_act.setChecked(True)
+		fold_menu = code_menu.addMenu("Folding")
+		for action in self.fold_acts:
+			fold_menu.addAction(action)
+		
+		# Tools menu
+		build_menu = menu_bar.addMenu("Build")
+		build_menu.addAction(self.build_file_act)
+		build_menu.addAction(self.run_coverage_act)
+		build_menu.addAction(self.clear_coverage_act)
+		build_menu.addAction(self.run_configs_act)
+		build_menu.addAction(self.run_settings_act)
+		build_menu.addSeparator()
+		build_menu.addAction(self.run_selection_act)
+		build_menu.addAction(self.run_file_console_act)
+		build_menu.addAction(self.run_cell_act)
+		build_menu.addAction(self.run_cell_advance_act)
+		build_menu.addAction(self.interrupt_kernel_act)
+		build_menu.addAction(self.restart_kernel_act)
+		build_menu.addSeparator()
+		build_menu.addAction(self.run_tests_act)
+		build_menu.addAction(self.run_failed_tests_act)
+		build_menu.addAction(self.run_affected_tests_act)
+		
+		# Help menu
+		help_menu = menu_bar.addMenu("Help")
+
+	def _create_status_bar(self):
+		status = QStatusBar()
+		status.setObjectName("snakeide_statusbar")
+
+		status
+		
+		# Left side info
+		self.cursor_label = QLabel("Ln 1, Col 1")
+		self.cursor_label.setObjectName("status_label")
+		status.addWidget(self.cursor_label)
+		
+		self.encoding_label = QLabel("UTF-8")
+		self.encoding_label.setObjectName("status_label")
+		status.addWidget(self.encoding_label)
+
+		self.building_label = QLabel("Running File...")
+		self.building_label.setObjectName("building_label")
+		status.addWidget(self.building_label)
+		self.building_label.hide()
+
+		self.resource_monitor = ResourceMonitor()
+		self.resource_monitor.limitExceeded.connect(self._on_memory_limit)
+		status.addWidget(self.resource_monitor)
+		
+		build_icons_container = QWidget()
+		self.build_icons = QHBoxLayout()
+
+		build_icons_container.setLayout(self.build_icons)
+
+		self.run_button = QPushButton()
+		self.run_button.setObjectName("RunBTN")
+		self.run_button.setIcon(QIcon(resource_path("./icons/run_file.svg")))
+
+		self.run_button.clicked.connect(lambda: self.build_file())
+
+		self.stop_button = QPushButton()
+		self.stop_button.setObjectName("stopBTN")
+		self.stop_button.setIcon(QIcon(resource_path("./icons/stop_execution.svg")))
+
+		self.stop_button.clicked.connect(self.stop_execution)
+
+		self.debugrun_button = QPushButton()
+		self.debugrun_button.setObjectName("debugRunBTN")
+		self.debugrun_button.setIcon(QIcon(resource_path("./icons/debug_run.svg")))
+
+		self.debugrun_button.clicked.connect(self.debug_run)
+
+		self.continue_button = QPushButton()
+		self.continue_button.setObjectName("ContinueBTN")
+		self.continue_button.setIcon(QIcon(resource_path("./icons/resume_execution.svg")))
+
+		self.continue_button.clicked.connect(self.continue_run)
+
+		self.build_icons.addWidget(self.run_button)
+		self.build_icons.addWidget(self.stop_button)
+		self.build_icons.addWidget(self.debugrun_button)
+		self.build_icons.addWidget(self.continue_button)
+
+
+		# Right side info
+		status.addPermanentWidget(build_icons_container)
+		
+		self.setStatusBar(status)
+		
+		# Cursor position updates come from the editor bus, see _on_editor_cursor_moved
+	def stop_execution(self):
+		if getattr(self, 'console_process') is not None:
+			self.console_process.kill()
+			self.console_process = None
+		self.run_button.show()
+		self.debugrun_button.show()
+		self.stop_button.hide()
+
+	def debug_run(self):
+		if getattr(self, 'console_process') is not None:
+			self.console_process.kill()
+			self.console_process = None
+		self.debugrun_button.hide()
+		self.run_button.hide()
+		self.stop_button.show()
+		self.console_output.show()
+		self.console_output.clear()
+		# Create and start process
+		editor = self.get_current_editor()
+		project = self.config.get("current_project")
+		configuration = self.current_run_configuration()
+		self.console_process = DebugThread(self.console_output, editor)
+		self.console_process.finished.connect(self._command_finished)
+		# The open file's text under the selected configuration's interpreter, arguments,
+		# environment and folder, like a plain run
+		file_path = getattr(editor, "file_path", None) or ""
+		self._set_process_options(
+			self.console_process, configuration.working_directory(file_path, project),
+			self.run_manager.debug_environment(configuration.environment(), file_path)
+		)
+		# Always under pdb, so breakpoints added while it runs still apply
+		self.console_process.start_build(*self.run_manager.debug_command(editor.doc, configuration))
+
+	def _push_breakpoint(self, editor, line):
+		process = self.console_process
+		if isinstance(process, DebugThread) and process.editor.shared is editor.shared:
+			process.push_breakpoint(line)
+
+	def _on_editor_cursor_moved(self, editor):
+		editor.on_cursor_moved()
+		if editor is self.get_current_editor():
+			self._update_cursor_position()
+
+	def _on_editor_selection_changed(self, editor):
+		if editor is self.get_current_editor():
+			self._update_cursor_position()
+
+	def continue_run(self):
+		if isinstance(self.console_process, DebugThread):
+			self.console_process.write('continue\n')
+		
+	def _update_cursor_position(self):
+		"""Update cursor position in status bar"""
+		editor = self.get_current_editor()
+		if editor:
+			cursor = editor.textCursor()
+			line = cursor.blockNumber() + 1
+			col = cursor.columnNumber() + 1
+			selected = cursor.selectionEnd() - cursor.selectionStart()
+			if selected:
+				self.cursor_label.setText(f"Ln {line}, Col {col} ({selected} selected)")
+			else:
+				self.cursor_label.setText(f"Ln {line}, Col {col}")
+
+	def _apply_snakeide_theme(self):
+		# snakeide Darcula color scheme
+		snakeide_style = f"""
+		QMainWindow {{
+			background-color: #2B2B2B;
+			color: #A9B7C6;
+			font-family: "Segoe UI";
+		}}
+		
+		QDialog {{
+			background-color: #2B2B2B;
+			color: #A9B7C6;
+			font-family: "Segoe UI";
+		}}
+		
+		QLineEdit {{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			border: 1px solid #5E6060;
+			padding: 5px;
+			border-radius: 3px;
+		}}
+		
+		QLabel {{
+			color: #A9B7C6;
+		}}
+	
+		QPushButton {{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			border: 1px solid #5E6060;
+			padding: 5px 10px;
+			border-radius: 3px;
+		}}
+		
+		QPushButton:hover {{
+			background-color: #4C5052;
+		}}
+		
+		QPushButton:pressed {{
+			background-color: #2B2B2B;
+		}}
+		
+		QMenuBar {{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			border: none;
+			padding: 2px;
+		}}
+
+		QTextEdit[objectName="Console"]{{
+			font-family: 'Cascadia Mono';
+			font-size: 16px;
+			background-color: #2B2B2B;
+			color: #EEEEEE;
+			margin: 5px;
+			border: 1px solid #424242;
+		}}
+
+		QTextEdit[objectName="Console"]:focus{{
+			border: 1px solid #696969;
+		}}
+		
+		QMenuBar::item {{
+			background-color: transparent;
+			padding: 4px 8px;
+			margin: 0px;
+		}}
+		
+		QMenuBar::item:selected {{
+			background-color: #4C5052;
+		}}
+		
+		QMenuBar::item:pressed {{
+			background-color: #4C5052;
+		}}
+		
+		QMenu {{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			border: 1px solid #5E6060;
+			margin: 0px;
+		}}
+		
+		QMenu::item {{
+			padding: 4px 20px;
+			margin: 0px;
+		}}
+		
+		QMenu::item:selected {{
+			background-color: #4C5052;
+		}}
+		
+		QMenu::separator {{
+			height: 1px;
+			background-color: #5E6060;
+			margin: 2px 0px;
+		}}
+		
+		QToolBar {{
+			background-color: #3C3F41;
+			border: none;
+			spacing: 2px;
+			padding: 2px;
+		}}
+		
+		QSplitter {{
+			background-color: #2B2B2B;
+		}}
+		
+		QSplitter::handle {{
+			background-color: #3C3F41;
+			width: 1px;
+			height: 1px;
+		}}
+		
+		QSplitter::handle:hover {{
+			background-color: #4C5052;
+		}}
+		
+		QTabWidget::pane {{
+			background-color: #2B2B2B;
+			border: none;
+		}}
+		
+		QTabBar {{
+			background-color: #3C3F41;
+			border-bottom: 1px solid #323232;
+		}}
+		
+		QTabBar::tab {{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			padding: 4px 8px;
+			border: none;
+			min-width: 80px;
+		}}
+		
+		QTabBar::tab:selected {{
+			background-color: #4C5052;
+			border-bottom: 2px solid #6897BB;
+		}}
+		
+		QTabBar::tab:hover {{
+			background-color: #4C5052;
+		}}
+		
+		QTabBar::close-button {{
+			image: url('{resource_path('icons/close_tab.svg')}');
+			subcontrol-position: right;
+			padding: 2px;
+		}}
+		
+		QTabBar::close-button:hover {{
+			background-color: #5E6060;
+			border-radius: 3px;
+		}}
+		
+		QPushButton#new_tab_button {{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			border: none;
+			font-weight: bold;
+		}}
+		
+		QPushButton#new_tab_button:hover {{
+			background-color: #4C5052;
+		}}
+		
+		QLabel[objectName="panel_header"] {{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			font-weight: bold;
+			font-size: 11px;
+			border-bottom: 1px solid #323232;
+		}}
+
+		QLabel[objectName="building_label"] {{
+			color: #A9B7C6;
+			padding: 2px 4px;
+		}}
+		
+		QPlainTextEdit[objectName^="editor_"] {{
+			background-color: #2B2B2B;
+			color: #A9B7C6;
+			border: none;
+			selection-background-color: #214283;
+			selection-color: #A9B7C6;
+		}}
+		
+		QTreeView {{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			border: none;
+			outline: none;
+			show-decoration-selected: 0;
+		}}
+		
+		QTreeView::item {{
+			padding: 2px;
+		}}
+		
+		QTreeView::item:selected {{
+			background-color: #4C5052;
+		}}
+		
+		QTreeView::item:hover {{
+			background-color: #4C5052;
+		}}
+		
+		QTreeView::branch:has-children:!has-siblings:closed,
+		QTreeView::branch:closed:has-children:has-siblings {{
+			border-image: none;
+			margin: 2px;
+			image: url("{resource_path('icons/caret-right.svg')}");
+		}}
+		
+		QTreeView::branch:open:has-children:!has-siblings,
+		QTreeView::branch:open:has-children:has-siblings {{
+			border-image: none;
+			margin: 2px;
+			image: url("{resource_path('icons/caret-down.svg')}");
+		}}
+		
+		QStatusBar {{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			border-top: 1px solid #323232;
+		}}
+		
+		QStatusBar[objectName="snakeide_statusbar"] {{
+			font-size: 11px;
+		}}
+		
+		QLabel[objectName="status_label"] {{
+			color: #A9B7C6;
+			padding: 2px 4px;
+		}}
+		
+		QScrollBar:vertical {{
+			background-color: #3C3F41;
+			width: 12px;
+			border: none;
+		}}
+		
+		QScrollBar::handle:vertical {{
+			background-color: #5E6060;
+			min-height: 20px;
+			border-radius: 6px;
+			margin: 0px 2px;
+		}}
+		
+		QScrollBar::handle:vertical:hover {{
+			background-color: #7C7C7C;
+		}}
+		
+		QScrollBar::add-line:vertical,
+		QScrollBar::sub-line:vertical {{
+			height: 0px;
+		}}
+		
+		QScrollBar:horizontal {{
+			background-color: #3C3F41;
+			height: 12px;
+			border: none;
+		}}
+		
+		QScrollBar::handle:horizontal {{
+			background-color: #5E6060;
+			min-width: 20px;
+			border-radius: 6px;
+			margin: 2px 0px;
+		}}
+		
+		QScrollBar::handle:horizontal:hover {{
+			background-color: #7C7C7C;
+		}}
+		
+		QScrollBar::add-line:horizontal,
+		QScrollBar::sub-line:horizontal {{
+			width: 0px;
+		}}
+
+		QDialog[objectName="CommandPalette"]{{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			border-top: 1px solid #323232;
+		}}
+		QListWidget[objectName="CommandPaletteList"]{{
+			background-color: #3C3F41;
+			color: #A9B7C6;
+			border-top: 1px solid #323232;
+		}}
+		"""
+		self.setStyleSheet(snakeide_style)
+
+	def toggle_project_panel(self):
+		"""Toggle project panel visibility"""
+		left_panel = self.main_splitter.widget(0)
+		if left_panel.isVisible():
+			left_panel.hide()
+			self.toggle_project_act.setChecked(False)
+		else:
+			left_panel.show()
+			self.toggle_project_act.setChecked(True)
+
+	def set_tab_size(self, size):
+		"""Set tab size for editor"""
+		self._tab_size = size
+		for editor_info in self.open_files.values():
+			for editor in editor_info["editor"].shared.views:
+				fm = QFontMetrics(editor.font())
+				editor.setTabStopDistance(size * fm.horizontalAdvance(' '))
+		
+		for act in self.tab_actions:
+			act.setChecked(False)
+		getattr(self, f'tab{size}_act').setChecked(True)
+
+	def open_file(self):
+		"""Open a single file"""
+		path, _ = QFileDialog.getOpenFileName(
+			self, "Open File", "", 
+			"Python Files (*.py);;All Files (*.*)"
+		)
+		if path:
+			self._open_file(path)
+
+	def open_project(self):
+		path = QFileDialog.getExistingDirectory(self, "Open Project", "")
+		self._open_folder(path)
+
+	def _create_new_tab(self):
+		"""Create a new empty tab"""
+		self._open_file(None, "Untitled.py")
+
+	@traced()
+	def _open_file(self, path, title="Untitled.py"):
+		"""Open a file in a new tab or switch to existing tab"""
+		# Check if file is already open
+		if path and path in self.open_files:
+			tab_index = self.editor_tabs.indexOf(self.open_files[path]["widget"])
+			self.editor_tabs.setCurrentIndex(tab_index)
+			return
+			
+		# Create new editor
+		editor = CodeEditor()
+		editor.setObjectName("editor_" + str(len(self.open_files)))
+		editor.file_path = path
+		editor.doc.path = path
+		
+		# Set tab size
+		fm = QFontMetrics(editor.font())
+		editor.setTabStopDistance(self._tab_size * fm.horizontalAdvance(' '))
+		editor.setLineWrapMode(QPlainTextEdit.NoWrap)
+		
+		# Create highlighter, during startup Pygments is loaded after the first frame
+		if self._startup_done:
+			highlighter = self._create_highlighter(editor)
+		else:
+			highlighter = None
+			self._deferred_startup.append(lambda: self._attach_highlighter(editor))
+		
+		# Create container widget for editor, with the minimap on its right
+		container = QWidget()
+		layout = QHBoxLayout(container)
+		layout.setContentsMargins(0, 0, 0, 0)
+		layout.setSpacing(0)
+		layout.addWidget(editor)
+		minimap = Minimap(editor, self.minimap_renderer)
+		minimap.setVisible(self.minimap_act.isChecked())
+		layout.addWidget(minimap)
+		
+		# Add to tabs
+		tab_index = self.editor_tabs.addTab(container, title)
+		self.editor_tabs.setCurrentIndex(tab_index)
+		
+		# Store file info
+		self.open_files[path] = {
+			"editor": editor,
+			"highlighter": highlighter,
+			"widget": container
+		}
+		
+		# Load file if path exists
+		if path and os.path.exists(path):
+			try:
+				with open(path, 'r', encoding='utf-8') as f:
+					text = f.read()
+				editor.setPlainText(text)
+				editor.breakpoints.load_config(self.project_state("breakpoints").get(path, []))
+				state = self.project_state("editors").get(path)
+				if state:
+					editor.restore_view_state(state)
+				editor.set_test_marks(self.tests.marks(path))
+				self._apply_coverage(path)
+				
+				# Set tab title to filename
+				filename = os.path.basename(path)
+				self.editor_tabs.setTabText(tab_index, filename)
+				
+				self.statusBar().showMessage(f"Opened: {filename}", 2000)
+			except Exception as e:
+				QMessageBox.warning(self, "Error", f"Could not open file: {str(e)}")
+		
+		self.file_watcher.watch(path)
+		editor.completer = self.completions
+		self._connect_editor(editor)
+		# The text went in before the bus was attached, check it now rather than at the first edit
+		self.diagnostics.schedule(editor)
+		# Focusing another pane of the file makes it the current editor
+		editor.shared.activeChanged.connect(self.editor_bus.set_current)
+		self._remember_session()
+
+	def _connect_editor(self, editor, contents=True):
+		editor.breakpointsChanged.connect(lambda line: self._push_breakpoint(editor, line))
+		editor.breakpointsChanged.connect(lambda _line: self._remember_breakpoints(editor.file_path, editor))
+		editor.testMarkClicked.connect(lambda line: self._run_tests_at(editor, line))
+		# Cursor, selection and content events reach the window through the bus
+		self.editor_bus.attach(editor, contents)
+
+	def split_editor(self, orientation):
+		"""Another pane on the current file, right of or below the current one"""
+		editor = self.get_current_editor()
+		if not editor:
+			return
+		file_info = next(info for info in self.open_files.values() if info["editor"].shared is editor.shared)
+		parent = editor.parentWidget()
+		if not isinstance(parent, QSplitter):
+			splitter = QSplitter(orientation, file_info["widget"])
+			file_info["widget"].layout().replaceWidget(editor, splitter)
+			splitter.addWidget(editor)
+			# The first pane made the document, it has to outlive that pane now
+			editor.shared.set_owner(file_info["widget"])
+		elif parent.orientation() != orientation:
+			# Splitting across the current split nests a splitter where the pane was
+			sizes = parent.sizes()
+			splitter = QSplitter(orientation, parent)
+			parent.insertWidget(parent.indexOf(editor), splitter)
+			splitter.addWidget(editor)
+			parent.setSizes(sizes)
+		else:
+			splitter = parent
+		view = editor.split()
+		view.setObjectName(editor.objectName() + "_split")
+		view.file_path = editor.file_path
+		splitter.insertWidget(splitter.indexOf(editor) + 1, view)
+		splitter.setSizes([1 << 16] * splitter.count())
+		if file_info["highlighter"] is not None:
+			file_info["highlighter"].add_view(view)
+		# The first pane posts the file's content events, once is enough for all of them
+		self._connect_editor(view, contents=False)
+		view.setFocus()
+		editor.shared.set_active(view)
+
+	def unsplit_editor(self):
+		"""Back to one pane on the current file, the one it was opened in"""
+		editor = self.get_current_editor()
+		if not editor:
+			return
+		file_info = next(info for info in self.open_files.values() if info["editor"].shared is editor.shared)
+		first = file_info["editor"]
+		top = file_info["widget"].layout().itemAt(0).widget()
+		if top is first:
+			return
+		for view in first.shared.views[1:]:
+			self.completions.forget(view)
+			self.cell_runner.forget(view)
+		file_info["widget"].layout().replaceWidget(top, first)
+		top.hide()
+		top.deleteLater()
+		first.show()
+		first.setFocus()
+		first.shared.set_active(first)
+
+	def _create_highlighter(self, editor):
+		from highlighter import PythonHighlighter
+		highlighter = PythonHighlighter(editor.document())
+		highlighter.add_view(editor)
+		return highlighter
+
+	def _attach_highlighter(self, editor):
+		for file_info in self.open_files.values():
+			if file_info["editor"] is editor and file_info["highlighter"] is None:
+				file_info["highlighter"] = highlighter = self._create_highlighter(editor)
+				for view in editor.shared.views[1:]:
+					highlighter.add_view(view)
+
+	def get_current_editor(self):
+		"""Get the current editor widget"""
+		current_widget = self.editor_tabs.currentWidget()
+		if current_widget:
+			# Any pane of the container leads to the one last focused
+			editor = current_widget.findChild(CodeEditor)
+			return editor.shared.active if editor else None
+		return None
+
+	def _on_current_editor(self, method):
+		editor = self.get_current_editor()
+		if editor:
+			getattr(editor, method)()
+
+	@traced()
+	def save_file(self):
+		"""Save current file"""
+		editor = self.get_current_editor()
+		if not editor:
+			return
+			
+		path = editor.file_path
+		if path:
+			if not self._confirm_overwrite(path):
+				return
+			try:
+				self._write_file(path, editor)
+				self.statusBar().showMessage(f"Saved: {os.path.basename(path)}", 2000)
+			except Exception as e:
+				QMessageBox.warning(self, "Error", f"Could not save file: {str(e)}")
+		else:
+			# Save As dialog
+			self.save_file_as()
+
+	@traced()
+	def save_file_as(self):
+		"""Save current file with a new name"""
+		editor = self.get_current_editor()
+		if not editor:
+			return
+			
+		path, _ = QFileDialog.getSaveFileName(
+			self, "Save File", "", 
+			"Python Files (*.py);;All Files (*.*)"
+		)
+		if path:
+			try:
+				self._write_file(path, editor)
+				
+				# Update tab info
+				editor.doc.path = path
+				for view in editor.shared.views:
+					view.file_path = path
+				filename = os.path.basename(path)
+				tab_index = self.editor_tabs.currentIndex()
+				self.editor_tabs.setTabText(tab_index, filename)
+				
+				# Update open files
+				old_path = None
+				for p, info in self.open_files.items():
+					if info["editor"].shared is editor.shared:
+						old_path = p
+						break
+				old_info = self.open_files.pop(old_path)
+				self.file_watcher.unwatch(old_path)
+				self.open_files[path] = {
+					"editor": old_info["editor"],
+					"highlighter": old_info["highlighter"],
+					"widget": old_info["widget"]
+				}
+				self.file_watcher.watch(path)
+				
+				self.statusBar().showMessage(f"Saved: {filename}", 2000)
+			except Exception as e:
+				QMessageBox.warning(self, "Error", f"Could not save file: {str(e)}")
+
+	@traced()
+	def save_all_files(self):
+		"""Save all open files"""
+		for path, file_info in self.open_files.items():
+			if path:  # Skip untitled files
+				editor = file_info["editor"]
+				if not self._confirm_overwrite(path):
+					continue
+				try:
+					self._write_file(path, editor)
+				except Exception as e:
+					QMessageBox.warning(self, "Error", f"Could not save {path}: {str(e)}")
+		self.statusBar().showMessage("All files saved", 2000)
+
+	@traced()
+	def _write_file(self, path, editor):
+		with open(path, 'w', encoding='utf-8') as f:
+			editor.buffer.write_to(f)
+		editor.document().setModified(False)
+		self.completions.update_file(path)
+		self.tests.file_saved(path)
+		# Coverage of what used to be in the file doesn't apply any more
+		self._apply_coverage(path)
+		self.file_watcher.mark_current(path)
+		self._set_disk_conflict(path, False)
+
+	def _confirm_overwrite(self, path):
+		"""Ask before a save clobbers a change that was made on disk behind our back"""
+		if not self.open_files[path].get("disk_conflict"):
+			return True
+		reply = QMessageBox.question(
+			self, "File Changed on Disk",
+			f"{os.path.basename(path)} was changed on disk since it was opened.\n"
+			"Overwrite it with the version in the editor?",
+			QMessageBox.Yes | QMessageBox.No
+		)
+		return reply == QMessageBox.Yes
+
+	def _set_disk_conflict(self, path, conflict):
+		file_info = self.open_files.get(path)
+		if file_info is None or bool(file_info.get("disk_conflict")) == conflict:
+			return
+		file_info["disk_conflict"] = conflict
+		index = self.editor_tabs.indexOf(file_info["widget"])
+		name = os.path.basename(path)
+		self.editor_tabs.setTabText(index, f"{name} (changed on disk)" if conflict else name)
+
+	def _on_files_changed_on_disk(self, paths):
+		"""Reload untouched buffers in place, flag the ones with unsaved edits"""
+		conflicts = []
+		reloaded = 0
+		for path in paths:
+			file_info = self.open_files.get(path)
+			if file_info is None:
+				continue
+			editor = file_info["editor"]
+			text = None
+			if not editor.document().isModified():
+				try:
+					with open(path, 'r', encoding='utf-8') as f:
+						text = f.read()
+				except (OSError, UnicodeDecodeError):
+					pass
+			if text is None:
+				# Unsaved edits, or a file we can't read back: the next save has to ask first
+				self._set_disk_conflict(path, True)
+				conflicts.append(os.path.basename(path))
+				continue
+			self._reload_editor(editor, text)
+			self.file_watcher.mark_current(path)
+			self._apply_coverage(path)
+			reloaded += 1
+		if conflicts:
+			self.statusBar().showMessage(f"Changed on disk, not reloaded: {', '.join(conflicts)}", 5000)
+		elif reloaded:
+			self.statusBar().showMessage(f"Reloaded {reloaded} file(s) changed on disk", 2000)
+
+	def _reload_editor(self, editor, text):
+		"""Replace the buffer as one undoable edit, keeping the cursor and scroll position"""
+		if editor.buffer.matches(text):
+			return
+		position = editor.textCursor().position()
+		v_scroll = editor.verticalScrollBar().value()
+		cursor = QTextCursor(editor.document())
+		cursor.beginEditBlock()
+		cursor.select(QTextCursor.Document)
+		cursor.insertText(text)
+		cursor.endEditBlock()
+		editor.document().setModified(False)
+		cursor.setPosition(min(position, editor.document().characterCount() - 1))
+		editor.setTextCursor(cursor)
+		editor.verticalScrollBar().setValue(v_scroll)
+
+	def close_current_tab(self):
+		"""Close the current tab"""
+		current_index = self.editor_tabs.currentIndex()
+		if current_index >= 0:
+			self.close_tab(current_index)
+
+	def close_tab(self, index, confirmation=False):
+		"""Close a tab by index"""
+		widget = self.editor_tabs.widget(index)
+		
+		# Find the file path for this tab
+		path = None
+		for p, file_info in self.open_files.items():
+			if file_info["widget"] == widget:
+				path = p
+				break
+		
+		# Check if we need to save
+		if path:
+			editor = self.open_files[path]["editor"]
+			if confirmation:
+				if editor.document().isModified():
+					reply = QMessageBox.question(
+						self, "Save Changes?",
+						f"Do you want to save changes to {os.path.basename(path)}?",
+						QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel
+					)
+					if reply == QMessageBox.Save:
+						self.save_file()
+					elif reply == QMessageBox.Cancel:
+						return
+			self.save_file()
+		
+		# Remove the tab
+		self.editor_tabs.removeTab(index)
+		
+		# Remove from open files
+		if path in self.open_files:
+			self._remember_breakpoints(path, self.open_files[path]["editor"])
+			self._remember_view(path, self.open_files[path]["editor"])
+			self.diagnostics.forget(self.open_files[path]["editor"])
+			self.minimap_renderer.forget(self.open_files[path]["editor"].minimap)
+			for view in self.open_files[path]["editor"].shared.views:
+				self.completions.forget(view)
+				self.cell_runner.forget(view)
+			del self.open_files[path]
+			self.file_watcher.unwatch(path)
+		self._remember_session()
+
+	def _tab_changed(self, index):
+		"""Handle tab change event"""
+		if index >= 0:
+			self.editor_bus.set_current(self.get_current_editor())
+			self._remember_session()
+
+	def _open_folder(self, path=None):
+		if path:
+			path = os.path.abspath(path)
+			# The project being left keeps its tabs, cursors and breakpoints for next time
+			self.save_config()
+
+			self._closing_project = True
+			try:
+				for tab_index in range(self.editor_tabs.count()-1, -1, -1):
+					self.close_tab(tab_index)
+			finally:
+				self._closing_project = False
+
+			self._set_project_root(path)
+			self._reopen_project_files()
+
+	def _reopen_project_files(self):
+		"""The tabs the project had open last time"""
+		session = self.project_state("session")
+		files = [file_path for file_path in session.get("open_files", []) if file_path and os.path.exists(file_path)]
+		for file_path in files:
+			self._open_file(file_path, os.path.basename(file_path))
+		current = session.get("current_file")
+		if current in self.open_files:
+			self.editor_tabs.setCurrentWidget(self.open_files[current]["widget"])
+
+	def _set_project_root(self, path):
+		"""Point the project tree at `path` without touching the open tabs"""
+		if path:
+			path = os.path.abspath(path)
+
+			# The folder itself is the invisible root, its entries are the top-level rows
+			model = self._ensure_project_model()
+			model.setRootPath(path)
+
+			# UI updates
+			left_panel = self.main_splitter.widget(0)
+			left_panel.show()
+			self.toggle_project_act.setChecked(True)
+
+			self.kernel.working_directory = path
+			self.tests.set_root(path)
+			self.coverage = None
+			if self._startup_done:
+				self._load_coverage()
+			if self._startup_done:
+				self.completions.index_project(path)
+			else:
+				self._deferred_startup.append(lambda: self.completions.index_project(path))
+
+			project_name = os.path.basename(path)
+			self.config['current_project'] = path
+			self.state_changed()
+			self.setWindowTitle(f"{project_name} - Snake IDE")
+			self._refresh_run_configurations()
+			if self._startup_done:
+				self.interpreter_scanner.scan(path)
+
+
+
+	def _on_tree_double_click(self, index: QModelIndex):
+		"""Handle tree double click"""
+		if not index.isValid():
+			return
+			
+		path = self.model.filePath(index)
+		if os.path.isfile(path):
+			self._open_file(path)
+
+	def _on_tree_context_menu(self, point):
+		"""Handle tree context menu"""
+		if self.model is None:
+			return
+		index = self.tree.indexAt(point)
+		if not index.isValid():
+			# If clicking on empty space, use root path
+			if self.model.rootPath():
+				path = self.model.rootPath()
+			else:
+				return
+		else:
+			path = self.model.filePath(index)
+			if not os.path.isdir(path):
+				path = os.path.dirname(path)
+				
+		menu = QMenu(self)
+		new_file = menu.addAction("New Python File")
+		new_folder = menu.addAction("New Directory")
+		rename = menu.addAction("Rename")
+		delete_selected = menu.addAction("Delete Selected")
+		menu.addSeparator()
+		
+		action = menu.exec_(self.tree.viewport().mapToGlobal(point))
+		
+		if action == new_file:
+			name, ok = QFileDialog.getSaveFileName(
+				self, "New Python File", 
+				os.path.join(path, "untitled.py"),
+				"Python Files (*.py)"
+			)
+			if ok and name:
+				try:
+					with open(name, 'w', encoding='utf-8') as f:
+						f.write("# New Python file\n")
+					self._open_file(name)
+				except Exception as e:
+					QMessageBox.warning(self, "Error", str(e))
+					
+		elif action == new_folder:
+			dialog = CustomInputDialog(self, "New Folder", "Folder name:")
+			if dialog.exec_() == QDialog.Accepted:
+				folder_name = dialog.get_text()
+				if folder_name:
+					try:
+						new_folder_path = os.path.join(path, folder_name)
+						os.makedirs(new_folder_path, exist_ok=True)
+					except Exception as e:
+						QMessageBox.warning(self, "Error", str(e))
+						
+		elif action == rename:
+			if index.isValid():
+				old_name = os.path.basename(path)
+				dialog = CustomInputDialog(self, "Rename", "New name:", old_name)
+				if dialog.exec_() == QDialog.Accepted:
+					new_name = dialog.get_text()
+					if new_name and new_name != old_name:
+						try:
+							parent_dir = os.path.dirname(path)
+							new_path = os.path.join(parent_dir, new_name)
+							os.rename(path, new_path)
+						except Exception as e:
+							QMessageBox.warning(self, "Error", str(e))
+			
+		elif action == delete_selected:
+			if index.isValid():
+				path = self.model.filePath(index)
+				reply = QMessageBox.question(
+					self, "Confirm Delete",
+					f"Are you sure you want to delete '{os.path.basename(path)}'?",
+					QMessageBox.Yes | QMessageBox.No
+				)
+				if reply == QMessageBox.Yes:
+					try:
+						if os.path.isfile(path):
+							os.remove(path)
+						else:
+							shutil.rmtree(path) 
+					except Exception as e:
+						QMessageBox.warning(self, "Error", str(e))
+					
+	def toggle_minimap(self, checked):
+		self.config["minimap"] = checked
+		self.state_changed()
+		for file_info in self.open_files.values():
+			file_info["editor"].minimap.setVisible(checked)
+
+	def toggle_perf_hud(self, checked):
+		if not tracer.enabled:
+			self.perf_hud_act.setChecked(False)
+			self.statusBar().showMessage("Tracing is off, start Snake IDE with --trace (or SNAKEIDE_TRACE=1)", 4000)
+			return
+		if self.perf_hud is None:
+			self.perf_hud = PerfHud(self)
+		self.perf_hud.setVisible(checked)
+
+	def export_trace(self):
+		if not tracer.enabled:
+			self.statusBar().showMessage("Tracing is off, start Snake IDE with --trace (or SNAKEIDE_TRACE=1)", 4000)
+			return
+		path, _ = QFileDialog.getSaveFileName(
+			self, "Export Performance Trace", "snakeide-trace.json", "Chrome Trace (*.json)"
+		)
+		if path:
+			try:
+				count = tracer.export_chrome_trace(path)
+				self.statusBar().showMessage(f"Wrote {count} trace events to {os.path.basename(path)}", 4000)
+			except OSError as e:
+				QMessageBox.warning(self, "Error", f"Could not write trace: {str(e)}")
+
+	def closeEvent(self, event):
+		self.save_config()
+		self.diagnostics.shutdown()
+		self.kernel.shutdown()
+		self.tests.shutdown()
+		if self.repl_panel is not None:
+			try:
+				self.repl_history.save()
+			except OSError:
+				pass
+		event.accept()
+
+class EditorEventBus(QObject):
+	"""Editor events for everything outside the editor, coalesced to at most one per frame
+
+	Each CodeEditor is attached once; its cursor, selection and content signals only mark
+	the editor dirty and a single timer delivers one event of each kind per frame. The
+	status bar, the gutter and later panels subscribe here instead of to editor signals.
+	"""
+	cursorMoved = Signal(object)
+	selectionChanged = Signal(object)
+	contentsChanged = Signal(object)
+	currentEditorChanged = Signal(object)
+
+	FRAME_MS = 16
+	ORDER = ("contents", "cursor", "selection")
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self._pending = {}
+		self._signals = {
+			"contents": self.contentsChanged,
+			"cursor": self.cursorMoved,
+			"selection": self.selectionChanged,
+		}
+		self.timer = QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.setInterval(self.FRAME_MS)
+		self.timer.timeout.connect(self._flush)
+
+	def attach(self, editor, contents=True):
+		"""`contents` False for a second view of a document, its first view posts those"""
+		if getattr(editor, "_event_bus", None) is self:
+			return
+		editor._event_bus = self
+		editor.cursorPositionChanged.connect(lambda: self.post(editor, "cursor"))
+		editor.selectionChanged.connect(lambda: self.post(editor, "selection"))
+		if contents:
+			editor.document().contentsChanged.connect(lambda: self.post(editor, "contents"))
+		editor.destroyed.connect(lambda *_: self._pending.pop(editor, None))
+		self.post(editor, "cursor")
+
+	def set_current(self, editor):
+		self.currentEditorChanged.emit(editor)
+		if editor is not None:
+			self.post(editor, "cursor")
+
+	def post(self, editor, kind):
+		self._pending.setdefault(editor, set()).add(kind)
+		if not self.timer.isActive():
+			self.timer.start()
+
+	def _flush(self):
+		pending, self._pending = self._pending, {}
+		for editor, kinds in pending.items():
+			for kind in self.ORDER:
+				if kind in kinds:
+					self._signals[kind].emit(editor)
+
+
+class EventLoopLagMonitor(QObject):
+	"""Measures how late a repeating timer fires, i.e. how long the event loop was blocked"""
+	def __init__(self, parent=None, interval_ms=50):
+		super().__init__(parent)
+		self.interval = interval_ms / 1000
+		self.timer = QTimer(self)
+		self.timer.setTimerType(Qt.PreciseTimer)
+		self.timer.setInterval(interval_ms)
+		self.timer.timeout.connect(self._tick)
+
+	def start(self):
+		self._last = time.perf_counter()
+		self.timer.start()
+
+	def _tick(self):
+		now = time.perf_counter()
+		tracer.counter("event loop lag", max(0.0, now - self._last - self.interval) * 1000)
+		self._last = now
+
+
+class PerfHud(QLabel):
+	"""Overlay in the editor corner with p50/p99 of every traced span"""
+	def __init__(self, ide):
+		super().__init__(ide)
+		self.ide = ide
+		self.setObjectName("perf_hud")
+		self.setAttribute(Qt.WA_TransparentForMouseEvents)
+		self.setFont(QFont("Cascadia Mono", 9))
+		self.setStyleSheet("background: rgba(20, 20, 20, 210); color: #D6D6DD; padding: 6px;")
+		self.timer = QTimer(self)
+		self.timer.setInterval(500)
+		self.timer.timeout.connect(self.refresh)
+
+	def setVisible(self, visible):
+		super().setVisible(visible)
+		if visible:
+			self.refresh()
+			self.timer.start()
+		else:
+			self.timer.stop()
+
+	def refresh(self):
+		rows = [f"{'span':<40}{'calls':>8}{'p50 ms':>9}{'p99 ms':>9}"]
+		for name, (calls, p50, p99) in sorted(tracer.stats().items(), key=lambda item: -item[1][2]):
+			rows.append(f"{name[-40:]:<40}{calls:>8}{p50:>9.2f}{p99:>9.2f}")
+		self.setText("\n".join(rows))
+		self.adjustSize()
+		# Top right corner of the editor tabs
+		tabs = self.ide.editor_tabs
+		corner = tabs.mapTo(self.ide, tabs.rect().topRight())
+		self.move(corner.x() - self.width() - 16, corner.y() + 32)
+		self.raise_()
+
+
+class Sparkline(QWidget):
+	"""The last few values of one metric as a line, small enough for the status bar"""
+	def __init__(self, color, length=60, parent=None):
+		super().__init__(parent)
+		self.color = QColor(color)
+		self.values = deque(maxlen=length)
+		self.setFixedSize(length, 16)
+
+	def add(self, value):
+		self.values.append(value)
+		self.update()
+
+	def clear(self):
+		self.values.clear()
+		self.update()
+
+	def paintEvent(self, event):
+		if len(self.values) < 2:
+			return
+		painter = QPainter(self)
+		painter.setRenderHint(QPainter.Antialiasing)
+		painter.setPen(self.color)
+		top = max(self.values) or 1
+		height = self.height() - 2
+		x0 = self.width() - len(self.values)
+		points = [QPoint(x0 + i, 1 + int(height - value / top * height)) for i, value in enumerate(self.values)]
+		painter.drawPolyline(points)
+
+
+class ResourceMonitor(QWidget):
+	"""Status bar readout of a running script's process tree: sparklines while it runs, peaks after
+
+	Samples on the GUI thread, reading a few /proc files per process takes well under a millisecond.
+	"""
+	limitExceeded = Signal(str)
+	METRICS = (
+		("cpu", "#83D6C5", lambda sample: f"CPU {sample.cpu:.0f}%"),
+		("rss", "#AAA0FA", lambda sample: format_bytes(sample.rss)),
+		("threads", "#EBC88D", lambda sample: f"{sample.threads} thr"),
+		("io", "#E394DC", lambda sample: f"I/O {format_bytes(sample.read_rate + sample.write_rate)}/s"),
+	)
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		layout = QHBoxLayout(self)
+		layout.setContentsMargins(4, 0, 4, 0)
+		self.labels, self.sparklines = {}, {}
+		for name, color, _ in self.METRICS:
+			label = QLabel()
+			label.setObjectName("status_label")
+			# Wide enough for the longest reading, so the status bar doesn't jitter
+			label.setMinimumWidth(label.fontMetrics().horizontalAdvance("peak I/O 999.9 MB/s"))
+			self.labels[name] = label
+			self.sparklines[name] = Sparkline(color)
+			layout.addWidget(label)
+			layout.addWidget(self.sparklines[name])
+		self.sampler = None
+		self.memory_limit = 0
+		self.timer = QTimer(self)
+		self.timer.timeout.connect(self.sample)
+		self.hide()
+
+	def start(self, pid, interval_ms=500, memory_limit_mb=0):
+		if not ProcessTreeSampler.available() or not pid:
+			return
+		self.sampler = ProcessTreeSampler(pid)
+		self.memory_limit = memory_limit_mb << 20
+		for sparkline in self.sparklines.values():
+			sparkline.clear()
+		self.sample()
+		self.timer.start(max(50, interval_ms))
+		self.setToolTip("")
+		self.show()
+
+	def stop(self):
+		"""Stop sampling, returns the peak ResourceSample (or None) and leaves it on display"""
+		self.timer.stop()
+		if self.sampler is None:
+			return None
+		peak, self.sampler = self.sampler.peak, None
+		if peak is not None:
+			self._show(peak, "peak ")
+			self.setToolTip("Peak values of the last run")
+		return peak
+
+	@traced()
+	def sample(self):
+		sample = self.sampler.sample()
+		if not sample.processes:
+			return
+		self.sparklines["cpu"].add(sample.cpu)
+		self.sparklines["rss"].add(sample.rss)
+		self.sparklines["threads"].add(sample.threads)
+		self.sparklines["io"].add(sample.read_rate + sample.write_rate)
+		self._show(sample)
+		if self.memory_limit and sample.rss > self.memory_limit:
+			self.sampler.kill()
+			self.limitExceeded.emit(
+				f"Killed: {format_bytes(sample.rss)} resident, over the {self.memory_limit >> 20} MB limit"
+			)
+
+	def _show(self, sample, prefix=""):
+		for name, _, text in self.METRICS:
+			self.labels[name].setText(prefix + text(sample))
+
+	@staticmethod
+	def describe(sample):
+		return " · ".join(text(sample) for _, _, text in ResourceMonitor.METRICS)
+
+
+class FileIconProvider(QFileIconProvider):
+	"""Custom icon provider for file system model"""
+	def __init__(self, folder_icon, file_icons):
+		super().__init__()
+		self.folder_icon = folder_icon
+		self.file_icons = file_icons
+		self._suffix_icons = {}
+		
+	def icon(self, type: QFileInfo):
+		if isinstance(type, QFileInfo):
+			if type.isDir():
+				return self.folder_icon
+
+			return self.file_icons.get(type.completeSuffix(), self.file_icons['general_file'])
+		return type
+
+	def icon_for_name(self, name, is_dir):
+		"""Icon lookup for the project tree, cached per suffix"""
+		if is_dir:
+			return self.folder_icon
+		suffix = name.partition(".")[2]
+		icon = self._suffix_icons.get(suffix)
+		if icon is None:
+			icon = self._suffix_icons[suffix] = self.file_icons.get(suffix, self.file_icons['general_file'])
+		return icon
+
+
+class _TreeNode:
+	__slots__ = ("name", "path", "is_dir", "parent", "row", "children", "available", "state", "pending", "rules")
+
+	UNLOADED, LOADING, LOADED = range(3)
+
+	def __init__(self, name, path, is_dir, parent=None, row=0):
+		self.name = name
+		self.path = path
+		self.is_dir = is_dir
+		self.parent = parent
+		self.row = row
+		self.children = []
+		self.available = []  # listed but not handed to the view yet
+		self.state = _TreeNode.UNLOADED
+		self.pending = None  # entries collected while a refresh scan is running
+		self.rules = None  # IgnoreRules inside this folder, once it has been listed
+
+
+class DirectoryScanner(QObject):
+	"""Lists directories on a background thread and hands the entries back in batches"""
+	batchReady = Signal(str, int, list, bool, object)  # path, generation, entries, last batch, rules inside path
+
+	BATCH_SIZE = 512
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self._requests = queue.Queue()
+		self._thread = threading.Thread(target=self._run, name="snakeide-scanner", daemon=True)
+		self._thread.start()
+
+	def request(self, path, generation, rules):
+		"""List `path` with `rules`, the rules of the folder it is in"""
+		self._requests.put((path, generation, rules))
+
+	def _run(self):
+		while True:
+			path, generation, rules = self._requests.get()
+			try:
+				# Reads the folder's own .gitignore, off the UI thread
+				rules = rules.for_directory(path)
+				entries = scan_directory(path, rules)
+			except OSError:
+				entries = []
+			for start in range(0, len(entries), self.BATCH_SIZE):
+				batch = entries[start:start + self.BATCH_SIZE]
+				self.batchReady.emit(path, generation, batch, start + self.BATCH_SIZE >= len(entries), rules)
+			if not entries:
+				self.batchReady.emit(path, generation, [], True, rules)
+
+
+class ProjectTreeModel(QAbstractItemModel):
+	"""Lazy project tree: folders are listed on first expand, honouring .gitignore and exclude globs"""
+	# Rows are handed to the view a chunk at a time as it scrolls down (see show_more), so a
+	# huge folder never makes QTreeView lay out all of its entries at once
+	FETCH_CHUNK = 1000
+
+	def __init__(self, icon_provider, exclude_globs=DEFAULT_EXCLUDE_GLOBS, parent=None):
+		super().__init__(parent)
+		self.icon_provider = icon_provider
+		self.exclude_globs = list(exclude_globs)
+		self._root = None
+		self._nodes = {}  # path -> loaded or loading folder node
+		self._generation = 0
+		self._rules = None
+
+		self.scanner = DirectoryScanner(self)
+		self.scanner.batchReady.connect(self._on_batch)
+
+		# inotify (or the platform equivalent) on every folder that has been listed
+		self.watcher = QFileSystemWatcher(self)
+		self.watcher.directoryChanged.connect(self._on_directory_changed)
+		self._changed = set()
+		self._refresh_timer = QTimer(self)
+		self._refresh_timer.setSingleShot(True)
+		self._refresh_timer.setInterval(150)
+		self._refresh_timer.timeout.connect(self._refresh_changed)
+
+	def setRootPath(self, path):
+		path = os.path.normpath(os.path.abspath(path))
+		self.beginResetModel()
+		if self.watcher.directories():
+			self.watcher.removePaths(self.watcher.directories())
+		self._generation += 1
+		self._nodes = {}
+		self._changed.clear()
+		self._rules = IgnoreRules.from_globs(self.exclude_globs, path)
+		self._root = _TreeNode(os.path.basename(path), path, True)
+		self.endResetModel()
+		self._load(self._root)
+
+	def rootPath(self):
+		return self._root.path if self._root else ""
+
+	def filePath(self, index):
+		node = self._node(index)
+		return node.path if node else ""
+
+	def _node(self, index):
+		if index.isValid():
+			return index.internalPointer()
+		return self._root
+
+	def _index_of(self, node):
+		if node is None or node is self._root:
+			return QModelIndex()
+		return self.createIndex(node.row, 0, node)
+
+	def index(self, row, column, parent=QModelIndex()):
+		node = self._node(parent)
+		if node is None or column != 0 or not 0 <= row < len(node.children):
+			return QModelIndex()
+		return self.createIndex(row, 0, node.children[row])
+
+	def parent(self, index):
+		if not index.isValid():
+			return QModelIndex()
+		return self._index_of(index.internalPointer().parent)
+
+	def rowCount(self, parent=QModelIndex()):
+		node = self._node(parent)
+		return len(node.children) if node else 0
+
+	def columnCount(self, parent=QModelIndex()):
+		return 1
+
+	def hasChildren(self, parent=QModelIndex()):
+		node = self._node(parent)
+		if node is None or not node.is_dir:
+			return False
+		# Unlisted folders get an expander, it goes away if they turn out empty
+		return node.state != _TreeNode.LOADED or bool(node.children)
+
+	def canFetchMore(self, parent):
+		# QTreeView fetches greedily while laying out, so this only covers the first listing
+		node = self._node(parent)
+		return node is not None and node.is_dir and node.state == _TreeNode.UNLOADED
+
+	def fetchMore(self, parent):
+		node = self._node(parent)
+		if node is not None:
+			self._load(node)
+
+	def show_more(self, index):
+		"""Expose the next chunk of the nearest folder around `index` that still has hidden entries"""
+		node = index.internalPointer().parent if index.isValid() else self._root
+		while node is not None:
+			if node.available:
+				self._expose(node, self.FETCH_CHUNK)
+				return True
+			node = node.parent
+		return False
+
+	def _expose(self, node, count):
+		"""Move up to `count` listed entries into the rows the view can see"""
+		entries = node.available[:count]
+		if not entries:
+			return
+		del node.available[:len(entries)]
+		first = len(node.children)
+		self.beginInsertRows(self._index_of(node), first, first + len(entries) - 1)
+		node.children.extend(self._make_nodes(node, entries, first))
+		self.endInsertRows()
+
+	def data(self, index, role=Qt.DisplayRole):
+		if not index.isValid():
+			return None
+		node = index.internalPointer()
+		if role == Qt.DisplayRole:
+			return node.name
+		if role == Qt.DecorationRole:
+			return self.icon_provider.icon_for_name(node.name, node.is_dir)
+		if role == Qt.ToolTipRole:
+			return node.path
+		return None
+
+	def _load(self, node):
+		if node.state != _TreeNode.UNLOADED:
+			return
+		node.state = _TreeNode.LOADING
+		self._nodes[node.path] = node
+		self.scanner.request(node.path, self._generation, self._parent_rules(node))
+
+	def _parent_rules(self, node):
+		# A folder is only listed after the one above it, whose listing set its rules
+		return node.parent.rules if node.parent is not None else self._rules
+
+	def _make_nodes(self, parent, entries, first_row):
+		return [
+			_TreeNode(name, os.path.join(parent.path, name), is_dir, parent, first_row + i)
+			for i, (name, is_dir) in enumerate(entries)
+		]
+
+	def _on_batch(self, path, generation, entries, last, rules):
+		node = self._nodes.get(path)
+		if generation != self._generation or node is None:
+			return
+		node.rules = rules
+		if node.state == _TreeNode.LOADING:
+			# First listing: show the first chunk as soon as it arrives, keep the rest for fetchMore
+			node.available.extend(entries)
+			self._expose(node, self.FETCH_CHUNK - len(node.children))
+			if last:
+				node.state = _TreeNode.LOADED
+				self.watcher.addPath(path)
+				if not node.children:
+					# Drop the expander
+					index = self._index_of(node)
+					self.dataChanged.emit(index, index)
+		else:
+			# Refresh of an already listed folder: collect everything, then apply the difference
+			if node.pending is None:
+				node.pending = []
+			node.pending.extend(entries)
+			if last:
+				self._apply_listing(node, node.pending)
+				node.pending = None
+
+	def _apply_listing(self, node, entries):
+		parent_index = self._index_of(node)
+		sort_key = lambda entry: (not entry[1], entry[0].lower())
+		if node.available:
+			# Only the visible rows are diffed, whatever sorts after them waits for fetchMore again
+			last_key = sort_key((node.children[-1].name, node.children[-1].is_dir))
+			node.available = [entry for entry in entries if sort_key(entry) > last_key]
+			entries = [entry for entry in entries if sort_key(entry) <= last_key]
+		children = node.children
+		first_changed = len(children)
+		# Removed rows go a contiguous run at a time, back to front so the rows before stay put
+		wanted = set(entries)
+		removed = [row for row, child in enumerate(children) if (child.name, child.is_dir) not in wanted]
+		end = len(removed)
+		while end:
+			start = end - 1
+			while start and removed[start - 1] == removed[start] - 1:
+				start -= 1
+			first, last = removed[start], removed[end - 1]
+			self.beginRemoveRows(parent_index, first, last)
+			gone = children[first:last + 1]
+			del children[first:last + 1]
+			for child in gone:
+				self._forget(child)
+			self.endRemoveRows()
+			first_changed = first
+			end = start
+		# New entries likewise, each run of them that lands between the same two rows at once
+		existing = {(child.name, child.is_dir) for child in children}
+		added = sorted((entry for entry in entries if entry not in existing), key=sort_key)
+		keys = [sort_key((child.name, child.is_dir)) for child in children]
+		row = i = 0
+		while i < len(added):
+			row = bisect.bisect_left(keys, sort_key(added[i]), row)
+			j = i + 1
+			while j < len(added) and (row == len(keys) or sort_key(added[j]) < keys[row]):
+				j += 1
+			self.beginInsertRows(parent_index, row, row + j - i - 1)
+			children[row:row] = self._make_nodes(node, added[i:j], row)
+			keys[row:row] = [None] * (j - i)  # never compared, the search starts past them
+			self.endInsertRows()
+			first_changed = min(first_changed, row)
+			row += j - i
+			i = j
+		self._renumber(node, first_changed)
+
+	def _renumber(self, node, start):
+		children = node.children
+		for row in range(start, len(children)):
+			children[row].row = row
+
+	def _forget(self, node):
+		"""Stop tracking a removed subtree"""
+		if node.is_dir and self._nodes.pop(node.path, None) is not None:
+			self.watcher.removePath(node.path)
+			for child in node.children:
+				self._forget(child)
+
+	def _on_directory_changed(self, path):
+		self._changed.add(path)
+		self._refresh_timer.start()
+
+	def _refresh_changed(self):
+		changed, self._changed = self._changed, set()
+		for path in changed:
+			node = self._nodes.get(path)
+			if node is not None and node.state == _TreeNode.LOADED:
+				self.scanner.request(path, self._generation, self._parent_rules(node))
+
+class OpenFileWatcher(QObject):
+	"""Notices when open files change on disk
+
+	Watches the folders holding the files and the files themselves. The folder watch
+	sees editors/git replacing a file by renaming a new one over it, the file watch
+	sees writes in place (sed -i, git checkout), which inotify only reports on the
+	file. A file replaced by a rename loses its watch and is watched again. Bursts of
+	events (a branch switch touching thousands of files) are coalesced into one
+	reconcile pass.
+	"""
+	# Paths whose size/mtime no longer match what we loaded or saved. Their signature is
+	# only updated by mark_current(), once the IDE has actually reloaded (or saved) them;
+	# a change is reported once, a file left in conflict isn't reported again for every
+	# later event in its folder
+	filesChanged = Signal(list)
+
+	def __init__(self, parent=None, delay_ms=200):
+		super().__init__(parent)
+		self._signatures = {}  # path -> (mtime_ns, size) or None when missing
+		self._reported = {}  # path -> signature last sent in filesChanged, until mark_current()
+		self._folders = {}  # folder -> number of open files in it
+		self._dirty = set()
+		self.watcher = QFileSystemWatcher(self)
+		self.watcher.directoryChanged.connect(self._on_directory_changed)
+		self.watcher.fileChanged.connect(self._on_file_changed)
+		self._timer = QTimer(self)
+		self._timer.setSingleShot(True)
+		self._timer.setInterval(delay_ms)
+		self._timer.timeout.connect(self.reconcile)
+
+	@staticmethod
+	def signature(path):
+		try:
+			st = os.stat(path)
+		except OSError:
+			return None
+		return (st.st_mtime_ns, st.st_size)
+
+	def watch(self, path):
+		if not path or path in self._signatures:
+			return
+		self._signatures[path] = self.signature(path)
+		folder = os.path.dirname(path)
+		self._folders[folder] = self._folders.get(folder, 0) + 1
+		if self._folders[folder] == 1:
+			self.watcher.addPath(folder)
+		if os.path.exists(path):
+			self.watcher.addPath(path)
+
+	def unwatch(self, path):
+		if self._signatures.pop(path, False) is False:
+			return
+		self._reported.pop(path, None)
+		if path in self.watcher.files():
+			self.watcher.removePath(path)
+		folder = os.path.dirname(path)
+		self._folders[folder] -= 1
+		if not self._folders[folder]:
+			del self._folders[folder]
+			self.watcher.removePath(folder)
+
+	def mark_current(self, path):
+		"""Record the on-disk state after we read or wrote `path` ourselves"""
+		if path in self._signatures:
+			self._signatures[path] = self.signature(path)
+			self._reported.pop(path, None)
+
+	def _on_directory_changed(self, folder):
+		self._dirty.add(folder)
+		self._timer.start()
+
+	def _on_file_changed(self, path):
+		self._dirty.add(os.path.dirname(path))
+		self._timer.start()
+
+	def reconcile(self):
+		dirty, self._dirty = self._dirty, set()
+		changed = []
+		watched = set(self.watcher.files())
+		for path, old in self._signatures.items():
+			if os.path.dirname(path) in dirty:
+				new = self.signature(path)
+				if new is not None and path not in watched:
+					# Replaced by a rename (or created), the old watch went with the old file
+					self.watcher.addPath(path)
+				if new != self._reported.get(path, old):
+					self._reported[path] = new
+					changed.append(path)
+		if changed:
+			self.filesChanged.emit(changed)
+
+
+class InstanceServer(QObject):
+	"""Receives the paths later launches forward instead of starting their own IDE"""
+	pathsReceived = Signal(list)
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		from PySide6.QtNetwork import QLocalServer
+		self.server = QLocalServer(self)
+		self.server.newConnection.connect(self._on_new_connection)
+
+	def listen(self):
+		from PySide6.QtNetwork import QLocalServer, QLocalSocket
+		address = instance_address()
+		if self.server.listen(address):
+			return True
+		# Another IDE may have started listening since our forward failed, its socket is live
+		probe = QLocalSocket()
+		probe.connectToServer(address)
+		if probe.waitForConnected(200):
+			probe.abort()
+			return False
+		# Nobody answers, so this is a socket left behind by a crashed IDE
+		QLocalServer.removeServer(address)
+		return self.server.listen(address)
+
+	def _on_new_connection(self):
+		while self.server.hasPendingConnections():
+			connection = self.server.nextPendingConnection()
+			connection.readyRead.connect(lambda connection=connection: self._read(connection))
+			connection.disconnected.connect(connection.deleteLater)
+
+	def _read(self, connection):
+		while connection.canReadLine():
+			try:
+				paths = json.loads(connection.readLine().data().decode("utf-8"))
+			except ValueError:
+				continue
+			self.pathsReceived.emit(paths)
+
+if __name__ == '__main__':
+	args = _args
+	app = QApplication(sys.argv)
+	app.setApplicationName("Snake IDE")	
+	startup_profiler.mark("qapplication")
+	window = snakeideEditor(args.paths, startup_profiler)
+	window.showMaximized()
+	QTimer.singleShot(0, window._finish_startup)
+
+	if not (args.new_window or args.profile_startup):
+		instance_server = InstanceServer(window)
+		instance_server.pathsReceived.connect(window.open_forwarded_paths)
+		instance_server.listen()
+
+	if args.profile_startup:
+		def report_startup():
+			print(startup_profiler.report(STARTUP_BUDGET_MS, until="first frame"))
+			app.exit(0 if startup_profiler.elapsed_ms("first frame") <= STARTUP_BUDGET_MS else 1)
+		QTimer.singleShot(0, report_startup)
+	
 	sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""One worker of the IDE's test runner pool, run as `python -u testrunner.py` in the project
+
+Frames like kernel.py's (a 4-byte big-endian length, then a UTF-8 JSON object), so results
+come back structured instead of scraped from pytest's output. Requests, on stdin:
+	{"type": "collect", "ids": ["tests/test_a.py", "tests/test_b.py::test_x", ...]}   first, once
+	{"type": "run", "ids": [node ids]}    a batch, an empty one (or EOF) ends the session
+Replies:
+	{"type": "collect_error", "id": "tests/test_c.py", "text": "..."}
+	{"type": "collected", "ids": [node ids]}
+	{"type": "next"}                      ready for another batch
+	{"type": "start", "id": node id}
+	{"type": "result", "id": ..., "outcome": "passed" | "failed" | "skipped" | "error",
+	 "duration": seconds, "path": "tests/test_a.py", "line": 0-based, "text": "...",
+	 "message": "assert 2 == 3", "crash": ["/abs/path.py", 1-based line] or null}
+	{"type": "done", "status": pytest's exit code}
+
+Every worker collects the whole selection and the IDE hands out batches as workers ask,
+like pytest-xdist's load scheduling. Needs pytest in the project's interpreter; pytest's
+own terminal output goes to stderr.
+"""
+import json
+import os
+import struct
+import sys
+import threading
+
+import pytest
+
+_HEADER = struct.Struct(">I")
+
+
+class Channel:
+	"""Frames out through a private copy of the original stdout"""
+	def __init__(self, fd):
+		self._out = os.fdopen(fd, 'wb', buffering=0)
+		self._lock = threading.Lock()
+
+	def send(self, message):
+		data = json.dumps(message).encode("utf-8")
+		with self._lock:
+			self._out.write(_HEADER.pack(len(data)) + data)
+
+
+def read_frames(stream):
+	while True:
+		header = stream.read(_HEADER.size)
+		if len(header) < _HEADER.size:
+			return
+		(size,) = _HEADER.unpack(header)
+		yield json.loads(stream.read(size).decode("utf-8"))
+
+
+OUTCOME_RANK = {"passed": 0, "skipped": 1, "failed": 2, "error": 3}
+
+
+class Reporter:
+	"""pytest plugin: runs the batches the IDE hands out and reports each test once"""
+	def __init__(self, channel, requests):
+		self.channel = channel
+		self.requests = requests
+		self.reports = {}  # node id -> [outcome, duration, text parts, crash location]
+
+	def pytest_collectreport(self, report):
+		if report.failed:
+			self.channel.send({"type": "collect_error", "id": report.nodeid, "text": report.longreprtext})
+
+	@pytest.hookimpl(tryfirst=True)
+	def pytest_runtestloop(self, session):
+		items = {item.nodeid: item for item in session.items}
+		self.channel.send({"type": "collected", "ids": list(items)})
+		while not (session.shouldfail or session.shouldstop):
+			self.channel.send({"type": "next"})
+			message = next(self.requests, None)
+			if not message or not message.get("ids"):
+				break
+			batch = [items[node_id] for node_id in message["ids"] if node_id in items]
+			for index, item in enumerate(batch):
+				# The last of a batch tears its fixtures down, the next batch is another file
+				nextitem = batch[index + 1] if index + 1 < len(batch) else None
+				item.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+				if session.shouldfail or session.shouldstop:
+					break
+		return True
+
+	def pytest_runtest_logstart(self, nodeid, location):
+		self.channel.send({"type": "start", "id": nodeid})
+
+	def pytest_runtest_logreport(self, report):
+		# Setup, call and teardown come separately, they go out as one result after teardown
+		entry = self.reports.setdefault(report.nodeid, ["passed", 0.0, [], None])
+		outcome = report.outcome
+		if outcome == "failed" and report.when != "call":
+			outcome = "error"
+		if OUTCOME_RANK[outcome] > OUTCOME_RANK[entry[0]]:
+			entry[0] = outcome
+		entry[1] += report.duration
+		if report.skipped and isinstance(report.longrepr, tuple):
+			entry[2].append(report.longrepr[2])
+		elif report.failed:
+			entry[2].append(report.longreprtext)
+			entry[2] += [f"----- {title} -----\n{content}" for title, content in report.sections]
+			crash = getattr(report.longrepr, "reprcrash", None)
+			if crash is not None and entry[3] is None:
+				entry[3] = crash
+		if report.when == "teardown":
+			del self.reports[report.nodeid]
+			path, line, _ = report.location
+			crash = entry[3]
+			self.channel.send({
+				"type": "result", "id": report.nodeid, "outcome": entry[0], "duration": entry[1],
+				"path": path, "line": line, "text": "\n".join(entry[2]),
+				"message": crash.message.splitlines()[0] if crash is not None and crash.message else "",
+				"crash": [os.path.abspath(crash.path), crash.lineno] if crash is not None else None,
+			})
+
+
+def main():
+	# Frames get the real stdout to themselves, pytest's printing goes to stderr
+	channel = Channel(os.dup(1))
+	os.dup2(2, 1)
+	sys.stdout = os.fdopen(1, 'w', buffering=1, encoding="utf-8", errors="replace")
+	stdin = os.fdopen(os.dup(0), 'rb')
+	devnull = os.open(os.devnull, os.O_RDONLY)
+	os.dup2(devnull, 0)
+
+	# The project is importable, not the folder testrunner.py happens to live in
+	sys.path[0] = os.getcwd()
+	requests = read_frames(stdin)
+	message = next(requests, None)
+	if not message or not message.get("ids"):
+		return
+	status = pytest.main(
+		# Workers share the project, pytest's own cache would see them race
+		["-q", "-p", "no:cacheprovider", "-p", "no:xdist", "--rootdir", os.getcwd(), *message["ids"]],
+		plugins=[Reporter(channel, requests)],
+	)
+	channel.send({"type": "done", "status": int(status)})
+
+
+if __name__ == '__main__':
+	main()